@@ -0,0 +1,345 @@
+"""
+Rejestr otwartych zmian w pamięci procesu
+
+Endpointy statusu (/api/workers/status, /api/worker/{id}/status, /api/employees,
+/api/active_workers) odpytywane są przez panel co kilkadziesiąt sekund z każdej
+otwartej karty. Zamiast za każdym razem pytać bazę o otwarte zmiany, korzystają
+z rejestru, który:
+  - jest ładowany przy starcie serwera,
+  - jest aktualizowany po każdym commicie sesji SessionLocal, która zmieniła
+    zmiany lub pracowników (start, stop, awaryjne zakończenie, edycje, import),
+  - jest porównywany z tabelą shifts, gdy liczniki data_versions pokażą zapis
+    z innego procesu (np. drugiego serwera API albo skryptu naprawczego), a niezależnie
+    od tego co ACTIVE_SHIFTS_RECONCILE_SECONDS; rozbieżności są logowane i poprawiane.
+
+Własne commity procesu nie wywołują porównania: każdy commit zgłasza, o ile podbił
+liczniki data_versions (install_session_hooks), a porównanie następuje tylko wtedy,
+gdy liczniki urosły bardziej, niż to wyjaśniają.
+"""
+import asyncio
+import datetime as dt
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+import models
+
+logger = logging.getLogger("app")
+
+ACTIVE_SHIFTS_RECONCILE_SECONDS = int(os.environ.get("ACTIVE_SHIFTS_RECONCILE_SECONDS", "300"))
+ACTIVE_SHIFTS_CHECK_SECONDS = float(os.environ.get("ACTIVE_SHIFTS_CHECK_SECONDS", "2"))
+
+_SHIFT_FIELDS = ("id", "employee_id", "start_time", "start_location", "start_latitude", "start_longitude")
+
+# Zapisy do tabel, których wyzwalacze podbijają liczniki data_versions (migracja 2)
+_TRACKED_WRITE = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|UPDATE|DELETE\s+FROM)\s+\"?(?:employees|shifts)\b", re.IGNORECASE
+)
+_WRITES_QUERY = "SELECT SUM(version) FROM data_versions WHERE table_name IN ('employees', 'shifts')"
+
+def _read_writes(dbapi_connection):
+    """Suma liczników data_versions dla employees i shifts; None w bazie bez tej tabeli"""
+    try:
+        row = dbapi_connection.execute(_WRITES_QUERY).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0]
+
+def _shift_entry(shift):
+    return {field: getattr(shift, field) for field in _SHIFT_FIELDS}
+
+class ActiveShiftRegistry:
+    """Otwarte zmiany (klucz: ID pracownika) i podstawowe dane pracowników"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shifts = {}
+        self._employees = {}
+        self.loaded = False
+        self.last_reconcile = None
+        self.reconcile_fixes = 0
+        self.reconcile_skipped = 0
+        # Przyrost liczników data_versions z commitów tego procesu (DataVersionWatcher)
+        self.local_writes = 0
+        # Numer stanu rejestru (ETag endpointów serwowanych z rejestru); epoka odróżnia procesy
+        self._epoch = format(time.time_ns(), "x")
+        self._generation = 0
+
+    @property
+    def version(self):
+        with self._lock:
+            return f"{self._epoch}-{self._generation}"
+
+    def _read_state(self, db):
+        employees = {
+            row.id: {"name": row.name, "is_admin": bool(row.is_admin)}
+            for row in db.query(models.Employee.id, models.Employee.name, models.Employee.is_admin)
+        }
+        shifts = {}
+        open_shifts = db.query(models.Shift).filter(models.Shift.stop_time.is_(None)).order_by(models.Shift.id)
+        for shift in open_shifts:
+            # Przy kilku otwartych zmianach pracownika liczy się najstarsza (jak w .first())
+            shifts.setdefault(shift.employee_id, _shift_entry(shift))
+        return shifts, employees
+
+    def load(self, db):
+        shifts, employees = self._read_state(db)
+        with self._lock:
+            self._shifts = shifts
+            self._employees = employees
+            self.loaded = True
+            self._generation += 1
+        logger.info(f"Rejestr otwartych zmian: {len(shifts)} aktywnych, {len(employees)} pracowników")
+
+    def reconcile(self, db, external_write=False, attempts=3):
+        """Porównuje rejestr z bazą i zastępuje go stanem z bazy. Zwraca liczbę rozbieżności.
+
+        external_write=True oznacza, że wykryto zapis z innego procesu - rozbieżności
+        są wtedy spodziewane i nie są zgłaszane jako ostrzeżenie. Jeśli w trakcie
+        odczytu rejestr dostał zmiany z commitu tego procesu, odczyt mógł ich nie
+        zawierać - jest wtedy powtarzany, a po attempts próbach rejestr zostaje bez
+        zmian i zwracane jest None.
+        """
+        for _ in range(attempts):
+            with self._lock:
+                generation = self._generation
+            shifts, employees = self._read_state(db)
+            with self._lock:
+                if self._generation == generation:
+                    fixes = sum(1 for key in shifts.keys() | self._shifts.keys()
+                                if shifts.get(key) != self._shifts.get(key))
+                    fixes += sum(1 for key in employees.keys() | self._employees.keys()
+                                 if employees.get(key) != self._employees.get(key))
+                    self._shifts = shifts
+                    self._employees = employees
+                    self.loaded = True
+                    self.last_reconcile = dt.datetime.now()
+                    self.reconcile_fixes += fixes
+                    if fixes:
+                        self._generation += 1
+                    break
+            # Nowy odczyt ma zobaczyć aktualne wiersze, a nie obiekty z mapy tożsamości sesji
+            db.rollback()
+        else:
+            with self._lock:
+                self.reconcile_skipped += 1
+            logger.info("Porównanie rejestru otwartych zmian z bazą pominięte - trwające zapisy, ponowienie później")
+            return None
+        if fixes and external_write:
+            logger.info(f"Rejestr otwartych zmian zaktualizowany po zapisie z innego procesu ({fixes} pozycji)")
+        elif fixes:
+            logger.warning(f"Rejestr otwartych zmian różnił się od bazy w {fixes} pozycjach - poprawiono")
+        return fixes
+
+    def record_local_writes(self, count):
+        with self._lock:
+            self.local_writes += count
+
+    def apply(self, changes):
+        """Nanosi zmiany zebrane z zatwierdzonej transakcji"""
+        with self._lock:
+            self._generation += 1
+            for kind, key, value in changes:
+                if kind == "shift":
+                    current = self._shifts.get(value["employee_id"])
+                    if value.pop("open"):
+                        if current is None or current["id"] >= value["id"]:
+                            self._shifts[value["employee_id"]] = value
+                    elif current is not None and current["id"] == value["id"]:
+                        del self._shifts[value["employee_id"]]
+                    # Zmiana mogła zostać przeniesiona na innego pracownika
+                    for employee_id, entry in list(self._shifts.items()):
+                        if entry["id"] == key and employee_id != value["employee_id"]:
+                            del self._shifts[employee_id]
+                elif kind == "shift_deleted":
+                    for employee_id, entry in list(self._shifts.items()):
+                        if entry["id"] == key:
+                            del self._shifts[employee_id]
+                elif kind == "employee":
+                    self._employees[key] = value
+                elif kind == "employee_deleted":
+                    self._employees.pop(key, None)
+
+    def get(self, employee_id):
+        with self._lock:
+            entry = self._shifts.get(employee_id)
+            return dict(entry) if entry else None
+
+    def active_shifts(self):
+        with self._lock:
+            return [dict(entry) for entry in self._shifts.values()]
+
+    def employees(self):
+        with self._lock:
+            return {employee_id: dict(employee) for employee_id, employee in self._employees.items()}
+
+    def employee(self, employee_id):
+        with self._lock:
+            employee = self._employees.get(employee_id)
+            return dict(employee) if employee else None
+
+active_shifts = ActiveShiftRegistry()
+
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault("active_shift_changes", [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, models.Shift):
+            entry = _shift_entry(obj)
+            entry["open"] = obj.stop_time is None and obj.start_time is not None
+            changes.append(("shift", obj.id, entry))
+        elif isinstance(obj, models.Employee):
+            changes.append(("employee", obj.id, {"name": obj.name, "is_admin": bool(obj.is_admin)}))
+    for obj in session.deleted:
+        if isinstance(obj, models.Shift):
+            changes.append(("shift_deleted", obj.id, None))
+        elif isinstance(obj, models.Employee):
+            changes.append(("employee_deleted", obj.id, None))
+
+def queue_shift_changes(session, shifts):
+    """Zmiany zapisane zbiorczo (insert/update z pominięciem jednostki pracy ORM),
+    nanoszone na rejestr po commicie sesji jak pozostałe"""
+    changes = session.info.setdefault("active_shift_changes", [])
+    for shift in shifts:
+        entry = _shift_entry(shift)
+        entry["open"] = shift.stop_time is None and shift.start_time is not None
+        changes.append(("shift", shift.id, entry))
+
+def queue_employees_deleted(session, employee_ids):
+    """Pracownicy usunięci zbiorczo (DELETE z pominięciem jednostki pracy ORM)"""
+    changes = session.info.setdefault("active_shift_changes", [])
+    changes.extend(("employee_deleted", employee_id, None) for employee_id in employee_ids)
+
+def _apply_changes(session):
+    changes = session.info.pop("active_shift_changes", None)
+    if changes:
+        active_shifts.apply(changes)
+
+def _discard_changes(session):
+    session.info.pop("active_shift_changes", None)
+
+def _writes_before(conn, cursor, statement, parameters, context, executemany):
+    """Przed pierwszym zapisem do employees/shifts w transakcji zapamiętuje liczniki data_versions"""
+    if "writes_before" in conn.info or not _TRACKED_WRITE.match(statement):
+        return
+    dbapi_connection = cursor.connection
+    if dbapi_connection.isolation_level is None:
+        # Połączenie w trybie autocommit - zapisy nie są liczone (najwyżej zbędne porównanie)
+        return
+    if not dbapi_connection.in_transaction:
+        # Blokada zapisu przed odczytem - między odczytem a zapisem nie zmieści się commit innego procesu
+        dbapi_connection.execute("BEGIN IMMEDIATE")
+    conn.info["writes_before"] = _read_writes(dbapi_connection)
+
+def _count_local_writes(conn):
+    """Przed commitem (blokada zapisu nadal trzymana): o ile transakcja podbiła liczniki"""
+    before = conn.info.pop("writes_before", None)
+    if before is None:
+        return
+    after = _read_writes(conn.connection.dbapi_connection)
+    if after is not None and after > before:
+        active_shifts.record_local_writes(after - before)
+
+def _forget_writes(conn):
+    conn.info.pop("writes_before", None)
+
+def install_session_hooks(session_factory):
+    """Podpina aktualizację rejestru pod commit sesji z podanej fabryki
+    i liczenie zapisów własnych commitów na jej silniku"""
+    event.listen(session_factory, "after_flush", _collect_changes)
+    event.listen(session_factory, "after_commit", _apply_changes)
+    event.listen(session_factory, "after_rollback", _discard_changes)
+    engine = session_factory.kw.get("bind")
+    if engine is not None and not event.contains(engine, "before_cursor_execute", _writes_before):
+        event.listen(engine, "before_cursor_execute", _writes_before)
+        event.listen(engine, "commit", _count_local_writes)
+        event.listen(engine, "begin", _forget_writes)
+        event.listen(engine, "rollback", _forget_writes)
+
+def load_active_shifts(session_factory):
+    db = session_factory()
+    try:
+        active_shifts.load(db)
+    finally:
+        db.close()
+
+def ensure_active_shifts_loaded(session_factory):
+    """Ładuje rejestr przy pierwszym użyciu, jeśli nie udało się to przy starcie"""
+    if not active_shifts.loaded:
+        load_active_shifts(session_factory)
+
+def reconcile_active_shifts(session_factory, external_write=False, attempts=3):
+    db = session_factory()
+    try:
+        return active_shifts.reconcile(db, external_write, attempts)
+    finally:
+        db.close()
+
+class DataVersionWatcher:
+    """Wykrywa zapisy do pliku bazy z innych procesów.
+
+    PRAGMA data_version zmienia się po commicie każdego innego połączenia, także
+    połączeń z puli tego procesu, i nie mówi, ile było commitów - służy tylko do
+    taniego sprawdzenia, czy w ogóle coś się zmieniło. Wtedy przyrost liczników
+    data_versions porównywany jest z przyrostem zgłoszonym przez własne commity
+    (registry.local_writes). Bez tabeli data_versions każda zmiana jest traktowana
+    jak zapis z zewnątrz.
+    """
+
+    def __init__(self, engine, registry=active_shifts):
+        self._connection = sqlite3.connect(engine.url.database, check_same_thread=False)
+        self._registry = registry
+        self._version = self._read_version()
+        self.sync()
+
+    def _read_version(self):
+        return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def sync(self):
+        """Nowy punkt odniesienia (przed porównaniem rejestru z bazą)"""
+        self._writes = _read_writes(self._connection)
+        self._local = self._registry.local_writes
+
+    def changed(self):
+        """Czy od sync() były zapisy, których nie wyjaśniają commity tego procesu"""
+        version = self._read_version()
+        if version == self._version:
+            return False
+        self._version = version
+        # Najpierw liczniki, potem własne zapisy - commit zgłoszony po odczycie liczników
+        # daje chwilowo ujemną różnicę, wyrównaną przy następnym sprawdzeniu
+        writes = _read_writes(self._connection)
+        local = self._registry.local_writes
+        if writes is None or self._writes is None:
+            return True
+        return writes - self._writes > local - self._local
+
+    def close(self):
+        self._connection.close()
+
+async def reconcile_periodically(engine, session_factory):
+    """Zadanie w tle: kontrola spójności rejestru z tabelą shifts"""
+    watcher = await run_in_threadpool(DataVersionWatcher, engine)
+    last_reconcile = time.monotonic()
+    pending = False
+    try:
+        while True:
+            await asyncio.sleep(ACTIVE_SHIFTS_CHECK_SECONDS)
+            try:
+                pending = await run_in_threadpool(watcher.changed) or pending
+                if pending or time.monotonic() - last_reconcile >= ACTIVE_SHIFTS_RECONCILE_SECONDS:
+                    # Punkt odniesienia przed odczytem - zapis w trakcie porównania wykryje następne sprawdzenie
+                    await run_in_threadpool(watcher.sync)
+                    fixes = await run_in_threadpool(reconcile_active_shifts, session_factory, pending)
+                    if fixes is not None:
+                        pending = False
+                        last_reconcile = time.monotonic()
+            except Exception as e:
+                logger.error(f"Błąd podczas kontroli rejestru otwartych zmian: {str(e)}")
+    finally:
+        watcher.close()
@@ -8,6 +8,7 @@ import subprocess
 import json
 import datetime as dt
 from database import get_db
+from daily_attendance import refresh_daily_attendance
 from sqlalchemy import text
 
 def print_header(title):
@@ -16,6 +17,11 @@ def print_header(title):
     print(f" {title}")
     print("=" * 60)
 
+def refresh_attendance(db, stopped):
+    """Przelicza daily_attendance dla zmian (employee_id, start_time) zakończonych surowym SQL"""
+    refresh_daily_attendance(db, [(employee_id, dt.date.fromisoformat(str(start_time)[:10]))
+                                  for employee_id, start_time in stopped])
+
 def show_menu():
     """Wyświetla główne menu"""
     print_header("TERMINAL DIAGNOSTYCZNY SYSTEMU LISTA OBECNOŚCI")
@@ -46,7 +52,8 @@ def system_info_menu():
 1. Status serwerów
 2. Liczba rekordów w tabelach
 3. Informacje o środowisku
-4. Powrót
+4. Monitor pętli zdarzeń
+5. Powrót
 """)
     return input("Wybierz opcję: ")
 
@@ -133,7 +140,7 @@ def end_session(all_sessions=False):
             
             # Dodaj log administratora dla każdej zakończonej sesji
             active_workers = db.execute(text("""
-                SELECT employee_id FROM shifts 
+                SELECT employee_id, start_time FROM shifts 
                 WHERE stop_time = :now
             """), {"now": now}).fetchall()
             
@@ -146,6 +153,8 @@ def end_session(all_sessions=False):
                     "action_time": now
                 })
             
+            # Dzienne podsumowanie w tej samej transakcji co zakończenie zmian
+            refresh_attendance(db, active_workers)
             db.commit()
             print(f"\n✅ Pomyślnie zakończono {count} aktywnych sesji.")
         
@@ -194,6 +203,9 @@ def end_session(all_sessions=False):
                 "action_time": now
             })
             
+            refresh_attendance(db, db.execute(text(
+                "SELECT employee_id, start_time FROM shifts WHERE id = :session_id"
+            ), {"session_id": session_id}).fetchall())
             db.commit()
             print(f"\n✅ Pomyślnie zakończono sesję pracownika: {employee[1]} (ID: {employee[0]})")
     
@@ -307,6 +319,39 @@ def check_system_info():
     
     input("\nNaciśnij Enter, aby kontynuować...")
 
+def check_loop_monitor():
+    """Wyświetla opóźnienia pętli zdarzeń i ostatnie blokujące wywołania"""
+    print_header("MONITOR PĘTLI ZDARZEŃ")
+    
+    try:
+        import requests
+        response = requests.get("http://127.0.0.1:8000/api/loop-monitor", timeout=5)
+        monitor = response.json().get("monitor")
+    except Exception as e:
+        print(f"❌ Nie można pobrać danych monitora: {e}")
+        input("\nNaciśnij Enter, aby kontynuować...")
+        return
+    
+    if not monitor or not monitor.get("enabled"):
+        print("Monitor jest wyłączony. Uruchom serwer ze zmienną środowiskową LOOP_MONITOR=1")
+        input("\nNaciśnij Enter, aby kontynuować...")
+        return
+    
+    print(f"Próg blokady: {monitor['threshold_ms']} ms")
+    print(f"Średnie opóźnienie: {monitor['avg_lag_ms']} ms, maksymalne: {monitor['max_lag_ms']} ms")
+    print(f"Liczba blokad: {monitor['stall_count']}")
+    
+    stalls = monitor.get("recent_stalls", [])
+    if not stalls:
+        print("\n✅ Brak zarejestrowanych blokad pętli zdarzeń")
+    for stall in stalls[:10]:
+        print("\n" + "-" * 60)
+        print(f"{stall['time'][:19]}  {stall['route']}  ({stall['duration_ms']} ms)")
+        for line in (stall.get("stack") or [])[-6:]:
+            print(line)
+    
+    input("\nNaciśnij Enter, aby kontynuować...")
+
 def run_connection_test():
     """Uruchamia diagnostykę połączenia API"""
     print_header("DIAGNOSTYKA POŁĄCZENIA API")
@@ -526,6 +571,9 @@ def search_employee():
                     "action_time": now
                 })
                 
+                refresh_attendance(db, db.execute(text(
+                    "SELECT employee_id, start_time FROM shifts WHERE id = :session_id"
+                ), {"session_id": active_session[0]}).fetchall())
                 db.commit()
                 print(f"\n✅ Pomyślnie zakończono sesję pracownika: {employees[0][1]} (ID: {employees[0][0]})")
     
@@ -587,6 +635,8 @@ def main():
                     elif info_option == "3":
                         check_system_info()
                     elif info_option == "4":
+                        check_loop_monitor()
+                    elif info_option == "5":
                         break
                     else:
                         print("\nNieprawidłowa opcja.")
@@ -2,18 +2,233 @@
 Moduł do obsługi ewidencji czasu pracy
 """
 from fastapi import APIRouter, Request, Depends, HTTPException
-from database import get_db
+from database import get_read_db, SessionLocal
+from active_shifts import active_shifts, ensure_active_shifts_loaded
+from data_versions import data_etag, etag_matches, not_modified, etag_response
+from summary_cache import cached_result
+from singleflight import shared_result
 import models
 from typing import Optional
 from datetime import datetime, timedelta
 from fastapi.responses import JSONResponse
+from sqlalchemy import func, case
 import logging
 
 logger = logging.getLogger("app")
 router = APIRouter()
 
+# Endpointy są zwykłymi funkcjami (def), a nie async def: FastAPI wykonuje je w puli
+# wątków, więc długie zapytania raportowe nie blokują pętli zdarzeń i rejestracji czasu pracy
+
+def summary_query(db, date_from_obj, date_to_obj):
+    """Zapytanie podsumowania obecności wszystkich pracowników (jeden wiersz na pracownika).
+
+    Dane pochodzą z dziennego podsumowania (daily_attendance), agregowanego w SQL
+    per pracownik, a pracownicy bez zmian w okresie dołączani są przez LEFT JOIN.
+    """
+    daily = models.DailyAttendance
+    totals = db.query(
+        daily.employee_id.label("employee_id"),
+        func.sum(daily.minutes).label("total_minutes"),
+        func.sum(daily.completed_shifts).label("completed_shifts"),
+        func.count().label("days_present"),
+        func.sum(case((daily.day_type == "saturday", 1), else_=0)).label("saturdays"),
+        func.sum(case((daily.day_type == "sunday", 1), else_=0)).label("sundays")
+    ).filter(
+        daily.date >= date_from_obj,
+        daily.date <= date_to_obj,
+        daily.shift_count > 0
+    ).group_by(daily.employee_id).subquery()
+
+    return db.query(
+        models.Employee.id,
+        models.Employee.name,
+        models.Employee.hourly_rate,
+        totals.c.total_minutes,
+        totals.c.completed_shifts,
+        totals.c.days_present,
+        totals.c.saturdays,
+        totals.c.sundays
+    ).outerjoin(totals, totals.c.employee_id == models.Employee.id).order_by(models.Employee.id)
+
+def summary_row(row):
+    """Wiersz podsumowania w formacie oczekiwanym przez frontend"""
+    total_minutes = int(row.total_minutes or 0)
+    completed_shifts = int(row.completed_shifts or 0)
+    hours = total_minutes // 60
+    minutes = total_minutes % 60
+
+    return {
+        "id": row.id,
+        "name": row.name,
+        "total_time": f"{hours}h {minutes}min",
+        "total_hours": hours + (minutes / 60),
+        "completed_shifts": completed_shifts,
+        "avg_shift": f"{total_minutes // completed_shifts // 60}h {total_minutes // completed_shifts % 60}min" if completed_shifts > 0 else "0h 0min",
+        "days_present": row.days_present or 0,
+        "saturdays": row.saturdays or 0,
+        "sundays": row.sundays or 0,
+        "holidays": 0,  # Do implementacji później - wymaga listy świąt
+        "rate": row.hourly_rate
+    }
+
+def summarize_attendance(db, date_from_obj, date_to_obj):
+    """Zwraca podsumowanie obecności wszystkich pracowników jednym zapytaniem grupującym"""
+    return [summary_row(row) for row in summary_query(db, date_from_obj, date_to_obj).all()]
+
+def shift_details(shift, name, hourly_rate):
+    """Wiersz szczegółów zmiany (shift może być obiektem Shift albo wierszem z jego kolumnami)"""
+    duration_minutes = 0
+    status = "W trakcie"
+    if shift.stop_time:
+        duration = shift.stop_time - shift.start_time
+        duration_minutes = int(duration.total_seconds() // 60)
+        status = f"{duration_minutes // 60}h {duration_minutes % 60}min"
+
+    # Określenie typu dnia na podstawie nowych pól
+    typ_dnia = "Dzień roboczy"
+    if shift.status == "Nieobecny":
+        typ_dnia = "Nieobecny"
+    elif shift.is_holiday:
+        typ_dnia = "Urlop"
+    elif shift.is_sick:
+        typ_dnia = "Chorobowe"
+
+    return {
+        "log_id": shift.id,
+        "date": shift.start_time.strftime("%Y-%m-%d"),
+        "start": shift.start_time.strftime("%H:%M"),
+        "stop": shift.stop_time.strftime("%H:%M") if shift.stop_time else "-",
+        "duration": status,
+        "duration_min": duration_minutes,
+        "name": name,
+        "is_holiday": "tak" if shift.is_holiday else "nie",
+        "is_sick": "tak" if shift.is_sick else "nie",
+        "typ": typ_dnia,
+        "kwota": (hourly_rate or 0) * (duration_minutes / 60) if duration_minutes > 0 else 0,
+        "start_lat": shift.start_latitude,
+        "start_lon": shift.start_longitude,
+        "stop_lat": shift.stop_latitude,
+        "stop_lon": shift.stop_longitude
+    }
+
+def attendance_for_day(db, date_obj):
+    """Zmiany rozpoczęte danego dnia w formacie /api/attendance_by_date"""
+    # Pobranie logów obecności z danego dnia
+    start_of_day = datetime.combine(date_obj, datetime.min.time())
+    end_of_day = datetime.combine(date_obj, datetime.max.time())
+    
+    # Używamy tabeli shifts zamiast attendance_logs
+    shifts = db.query(models.Shift).filter(
+        models.Shift.start_time >= start_of_day,
+        models.Shift.start_time <= end_of_day
+    ).all()
+    
+    result = []
+    for shift in shifts:
+        employee = db.query(models.Employee).filter(models.Employee.id == shift.employee_id).first()
+        if not employee:
+            continue
+            
+        # Obliczanie czasu trwania zmiany
+        duration = "W trakcie"
+        if shift.stop_time:
+            start = shift.start_time
+            stop = shift.stop_time
+            diff = stop - start
+            hours, remainder = divmod(diff.seconds, 3600)
+            minutes, _ = divmod(remainder, 60)
+            duration = f"{hours}h {minutes}min"
+        
+        result.append({
+            "id": shift.id,
+            "worker_id": shift.employee_id,
+            "name": employee.name,
+            "start_time": shift.start_time.strftime("%H:%M"),
+            "stop_time": shift.stop_time.strftime("%H:%M") if shift.stop_time else "-",
+            "duration": duration,
+            "is_holiday": False,  # Te pola nie istnieją w tabeli shifts, dodajemy domyślne wartości
+            "is_sick": False
+        })
+    return result
+
+def attendance_details_result(db, employee, date_from, date_to, date_from_obj, date_to_obj):
+    """Zmiany pracownika z zakresu z pustymi wpisami dla dni bez zmian i podsumowaniem"""
+    # Pobieramy zmiany pracownika w zadanym okresie
+    shifts = db.query(models.Shift).filter(
+        models.Shift.employee_id == employee.id,
+        models.Shift.start_time >= datetime.combine(date_from_obj, datetime.min.time()),
+        models.Shift.start_time <= datetime.combine(date_to_obj, datetime.max.time())
+    ).order_by(models.Shift.start_time.desc()).all()
+    
+    # Przygotowujemy dane do zwrócenia w formacie, którego oczekuje frontend
+    # Generujemy wszystkie dni z zakresu
+    all_days = []
+    current_date = date_from_obj
+    while current_date <= date_to_obj:
+        all_days.append(current_date.isoformat())
+        current_date += timedelta(days=1)
+    
+    # Przygotowanie pustego wyniku
+    result = {
+        "logs": [],
+        "summary": {
+            "worker_id": employee.id,
+            "name": employee.name,
+            "date_from": date_from,
+            "date_to": date_to,
+            "total_hours": 0,
+            "total_days": 0,
+            "total_amount": 0
+        }
+    }
+    
+    # Przygotowujemy mapowanie dni do zmian
+    shifts_by_date = {}
+    total_minutes = 0
+    
+    for shift in shifts:
+        shift_data = shift_details(shift, employee.name, employee.hourly_rate)
+        total_minutes += shift_data.pop("duration_min")
+        shift_date = shift_data["date"]
+        shifts_by_date[shift_date] = shift_data
+    
+    # Dodajemy wszystkie dni, także te bez zmian
+    for day in all_days:
+        if day in shifts_by_date:
+            result["logs"].append(shifts_by_date[day])
+        else:
+            # Dodajemy pusty wpis dla dni bez zmian
+            dayOfWeek = datetime.strptime(day, "%Y-%m-%d").strftime("%A")
+            result["logs"].append({
+                "log_id": 0,
+                "date": day,
+                "start": "08:00",
+                "stop": "16:00",
+                "duration": "0h 0min",
+                "name": employee.name,
+                "is_holiday": "nie",
+                "is_sick": "nie",
+                "typ": "Nieobecny",
+                "kwota": 0,
+                "start_lat": None,
+                "start_lon": None,
+                "stop_lat": None,
+                "stop_lon": None
+            })
+    
+    # Aktualizujemy podsumowanie
+    result["summary"]["total_hours"] = total_minutes / 60
+    result["summary"]["total_days"] = len([s for s in shifts if s.stop_time is not None])
+    result["summary"]["total_amount"] = employee.hourly_rate * (total_minutes / 60)
+    
+    # Sortujemy logi po dacie
+    result["logs"].sort(key=lambda x: x["date"])
+    
+    return result
+
 @router.get("/api/attendance_details")
-async def get_attendance_details(
+def get_attendance_details(
     request: Request, 
     worker_id: Optional[str] = None, 
     date_from: Optional[str] = None, 
@@ -60,7 +275,7 @@ async def get_attendance_details(
                 content={"detail": "Data początkowa nie może być późniejsza niż data końcowa"}
             )
         
-        db = next(get_db())
+        db = get_read_db(request)
         
         # Pobieramy pracownika
         employee = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
@@ -70,120 +285,10 @@ async def get_attendance_details(
                 content={"detail": f"Nie znaleziono pracownika o ID: {worker_id}"}
             )
         
-        # Pobieramy zmiany pracownika w zadanym okresie
-        shifts = db.query(models.Shift).filter(
-            models.Shift.employee_id == worker_id,
-            models.Shift.start_time >= datetime.combine(date_from_obj, datetime.min.time()),
-            models.Shift.start_time <= datetime.combine(date_to_obj, datetime.max.time())
-        ).order_by(models.Shift.start_time.desc()).all()
-        
-        # Przygotowujemy dane do zwrócenia w formacie, którego oczekuje frontend
-        # Generujemy wszystkie dni z zakresu
-        all_days = []
-        current_date = date_from_obj
-        while current_date <= date_to_obj:
-            all_days.append(current_date.isoformat())
-            current_date += timedelta(days=1)
-        
-        # Przygotowanie pustego wyniku
-        result = {
-            "logs": [],
-            "summary": {
-                "worker_id": worker_id,
-                "name": employee.name,
-                "date_from": date_from,
-                "date_to": date_to,
-                "total_hours": 0,
-                "total_days": 0,
-                "total_amount": 0
-            }
-        }
-        
-        # Przygotowujemy mapowanie dni do zmian
-        shifts_by_date = {}
-        total_minutes = 0
-        
-        for shift in shifts:
-            shift_date = shift.start_time.strftime("%Y-%m-%d")
-            
-            # Obliczanie czasu trwania zmiany
-            duration_minutes = 0
-            status = "W trakcie"
-            
-            if shift.stop_time:
-                duration = shift.stop_time - shift.start_time
-                duration_minutes = int(duration.total_seconds() // 60)
-                total_minutes += duration_minutes
-                hours = duration_minutes // 60
-                minutes = duration_minutes % 60
-                status = f"{hours}h {minutes}min"
-            
-            # Format dla frontendu
-            # Określenie typu dnia na podstawie nowych pól
-            typ_dnia = "Dzień roboczy"
-            if shift.status == "Nieobecny":
-                typ_dnia = "Nieobecny"
-            elif shift.is_holiday:
-                typ_dnia = "Urlop"
-            elif shift.is_sick:
-                typ_dnia = "Chorobowe"
-                
-            # Określenie statusu obecności
-            is_holiday = "tak" if shift.is_holiday else "nie"
-            is_sick = "tak" if shift.is_sick else "nie"
-                
-            shift_data = {
-                "log_id": shift.id,
-                "date": shift_date,
-                "start": shift.start_time.strftime("%H:%M"),
-                "stop": shift.stop_time.strftime("%H:%M") if shift.stop_time else "-",
-                "duration": status,
-                "name": employee.name,
-                "is_holiday": is_holiday,
-                "is_sick": is_sick,
-                "typ": typ_dnia,
-                "kwota": employee.hourly_rate * (duration_minutes / 60) if duration_minutes > 0 else 0,
-                "start_lat": shift.start_latitude,
-                "start_lon": shift.start_longitude,
-                "stop_lat": shift.stop_latitude,
-                "stop_lon": shift.stop_longitude
-            }
-            
-            shifts_by_date[shift_date] = shift_data
-        
-        # Dodajemy wszystkie dni, także te bez zmian
-        for day in all_days:
-            if day in shifts_by_date:
-                result["logs"].append(shifts_by_date[day])
-            else:
-                # Dodajemy pusty wpis dla dni bez zmian
-                dayOfWeek = datetime.strptime(day, "%Y-%m-%d").strftime("%A")
-                result["logs"].append({
-                    "log_id": 0,
-                    "date": day,
-                    "start": "08:00",
-                    "stop": "16:00",
-                    "duration": "0h 0min",
-                    "name": employee.name,
-                    "is_holiday": "nie",
-                    "is_sick": "nie",
-                    "typ": "Nieobecny",
-                    "kwota": 0,
-                    "start_lat": None,
-                    "start_lon": None,
-                    "stop_lat": None,
-                    "stop_lon": None
-                })
-        
-        # Aktualizujemy podsumowanie
-        result["summary"]["total_hours"] = total_minutes / 60
-        result["summary"]["total_days"] = len([s for s in shifts if s.stop_time is not None])
-        result["summary"]["total_amount"] = employee.hourly_rate * (total_minutes / 60)
-        
-        # Sortujemy logi po dacie
-        result["logs"].sort(key=lambda x: x["date"])
-        
-        return result
+        # Równoczesne identyczne żądania dzielą jedno obliczenie
+        return shared_result(db, "attendance_details", (worker_id, date_from, date_to),
+                             lambda: attendance_details_result(db, employee, date_from, date_to,
+                                                               date_from_obj, date_to_obj))
     except Exception as e:
         print(f"Błąd podczas pobierania szczegółów obecności: {str(e)}")
         return JSONResponse(
@@ -192,7 +297,7 @@ async def get_attendance_details(
         )
 
 @router.get("/api/attendance_summary")
-async def get_attendance_summary(request: Request, date_from: str, date_to: str):
+def get_attendance_summary(request: Request, date_from: str, date_to: str):
     """Pobierz podsumowanie obecności w zadanym okresie"""
     print(f"Pobieranie podsumowania obecności od {date_from} do {date_to}")
     user = request.session.get("user")
@@ -212,57 +317,10 @@ async def get_attendance_summary(request: Request, date_from: str, date_to: str)
                 content={"detail": "Data początkowa nie może być późniejsza niż data końcowa"}
             )
         
-        db = next(get_db())
+        db = get_read_db(request)
         
-        # Pobranie wszystkich pracowników
-        employees = db.query(models.Employee).all()
-        
-        result = []
-        for employee in employees:
-            # Pobranie logów obecności dla danego pracownika w zadanym okresie z tabeli shifts
-            shifts_data = db.query(models.Shift).filter(
-                models.Shift.employee_id == employee.id,
-                models.Shift.start_time >= datetime.combine(date_from_obj, datetime.min.time()),
-                models.Shift.start_time <= datetime.combine(date_to_obj, datetime.max.time())
-            ).all()
-            
-            # Obliczenie łącznego czasu pracy
-            total_minutes = 0
-            completed_shifts = 0
-            
-            for shift in shifts_data:
-                if shift.stop_time:
-                    start = shift.start_time
-                    stop = shift.stop_time
-                    diff = stop - start
-                    total_minutes += diff.seconds // 60
-                    completed_shifts += 1
-            
-            hours = total_minutes // 60
-            minutes = total_minutes % 60
-            
-            # Dodajemy dane o dniach pracy, sobotach, niedzielach i świętach
-            days_present = len(set([shift.start_time.date() for shift in shifts_data]))
-            saturdays = len(set([shift.start_time.date() for shift in shifts_data if shift.start_time.date().weekday() == 5]))
-            sundays = len(set([shift.start_time.date() for shift in shifts_data if shift.start_time.date().weekday() == 6]))
-            holidays = 0  # Do implementacji później - wymaga listy świąt
-            
-            # Pobierz stawkę godzinową pracownika
-            rate = employee.hourly_rate if hasattr(employee, "hourly_rate") else 0
-            
-            result.append({
-                "id": employee.id,
-                "name": employee.name,
-                "total_time": f"{hours}h {minutes}min",
-                "total_hours": hours + (minutes / 60),
-                "completed_shifts": completed_shifts,
-                "avg_shift": f"{total_minutes // completed_shifts // 60}h {total_minutes // completed_shifts % 60}min" if completed_shifts > 0 else "0h 0min",
-                "days_present": days_present,
-                "saturdays": saturdays,
-                "sundays": sundays,
-                "holidays": holidays,
-                "rate": rate
-            })
+        result = cached_result(db, "attendance_summary", date_from_obj, date_to_obj,
+                               lambda: summarize_attendance(db, date_from_obj, date_to_obj))
         
         return result
     except Exception as e:
@@ -273,7 +331,7 @@ async def get_attendance_summary(request: Request, date_from: str, date_to: str)
         )
 
 @router.get("/api/attendance_by_date")
-async def get_attendance_by_date(request: Request, date: str):
+def get_attendance_by_date(request: Request, date: str):
     """Pobierz obecności na dany dzień"""
     print(f"Pobieranie obecności dla daty: {date}")
     user = request.session.get("user")
@@ -285,46 +343,17 @@ async def get_attendance_by_date(request: Request, date: str):
     
     try:
         date_obj = datetime.strptime(date, "%Y-%m-%d").date()
-        db = next(get_db())
-        
-        # Pobranie logów obecności z danego dnia
-        start_of_day = datetime.combine(date_obj, datetime.min.time())
-        end_of_day = datetime.combine(date_obj, datetime.max.time())
+        db = get_read_db(request)
+        etag = data_etag(db, ("employees", "shifts"), date_obj)
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
-        # Używamy tabeli shifts zamiast attendance_logs
-        shifts = db.query(models.Shift).filter(
-            models.Shift.start_time >= start_of_day,
-            models.Shift.start_time <= end_of_day
-        ).all()
+        # Wynik z pamięci podręcznej jest sprawdzany względem liczników odczytanych już po ETag
+        # (summary_cache.py), więc nigdy nie jest starszy niż stan, z którego policzono ETag
+        result = cached_result(db, "attendance_by_date", date_obj, date_obj,
+                               lambda: attendance_for_day(db, date_obj))
         
-        result = []
-        for shift in shifts:
-            employee = db.query(models.Employee).filter(models.Employee.id == shift.employee_id).first()
-            if not employee:
-                continue
-                
-            # Obliczanie czasu trwania zmiany
-            duration = "W trakcie"
-            if shift.stop_time:
-                start = shift.start_time
-                stop = shift.stop_time
-                diff = stop - start
-                hours, remainder = divmod(diff.seconds, 3600)
-                minutes, _ = divmod(remainder, 60)
-                duration = f"{hours}h {minutes}min"
-            
-            result.append({
-                "id": shift.id,
-                "worker_id": shift.employee_id,
-                "name": employee.name,
-                "start_time": shift.start_time.strftime("%H:%M"),
-                "stop_time": shift.stop_time.strftime("%H:%M") if shift.stop_time else "-",
-                "duration": duration,
-                "is_holiday": False,  # Te pola nie istnieją w tabeli shifts, dodajemy domyślne wartości
-                "is_sick": False
-            })
-        
-        return result
+        return etag_response(result, etag)
     except Exception as e:
         print(f"Błąd podczas pobierania obecności: {str(e)}")
         return JSONResponse(
@@ -333,7 +362,7 @@ async def get_attendance_by_date(request: Request, date: str):
         )
 
 @router.get("/api/active_workers")
-async def get_active_workers(request: Request):
+def get_active_workers(request: Request):
     """Pobierz listę aktywnych pracowników"""
     logger.debug("Pobieranie listy aktywnych pracowników...")
     # Zrezygnujmy z wymogu autoryzacji dla tego endpointu
@@ -345,46 +374,29 @@ async def get_active_workers(request: Request):
     #     )
     
     try:
-        db = next(get_db())
-        try:
-            # Pobierz pracowników którzy rozpoczęli pracę i nie zakończyli jej jeszcze
-            today = datetime.now().date()
-            today_start = datetime.combine(today, datetime.min.time())
-            
-            # Debug - wypisz czas początkowy dzisiaj
-            print(f"DEBUG: Szukam pracowników aktywnych od {today_start}")
-            
-            # Pokaż wszystkie aktywne zmiany (nie tylko z dzisiaj)
-            shifts = db.query(models.Shift).filter(
-                models.Shift.stop_time == None            ).all()
-            
-            print(f"DEBUG: Znalazłem {len(shifts)} aktywnych zmian")
-            
-            active_workers = []
-            for shift in shifts:
-                employee = db.query(models.Employee).filter(models.Employee.id == shift.employee_id).first()
-                if employee:
-                    active_workers.append({
-                        "id": employee.id,
-                        "name": employee.name,
-                        "start_time": shift.start_time.strftime("%H:%M") if shift.start_time else "-",
-                        "shift_id": shift.id,
-                        "location": shift.start_location or "Nieznana",
-                        "status": "online",  # Dodany status online
-                        "coordinates": {
-                            "lat": shift.start_latitude,
-                            "lon": shift.start_longitude
-                        } if shift.start_latitude and shift.start_longitude else None
-                    })
-            
-            # Jeśli brak aktywnych pracowników, zwróć pustą listę
-            if not active_workers:
-                return []
-            
-            return active_workers
-        finally:
-            # Zawsze zamknij połączenie
-            db.close()
+        # Otwarte zmiany i nazwy pracowników z rejestru w pamięci (bez zapytań do bazy)
+        ensure_active_shifts_loaded(SessionLocal)
+        shifts = active_shifts.active_shifts()
+        employees = active_shifts.employees()
+        
+        active_workers = []
+        for shift in shifts:
+            employee = employees.get(shift["employee_id"])
+            if employee:
+                active_workers.append({
+                    "id": shift["employee_id"],
+                    "name": employee["name"],
+                    "start_time": shift["start_time"].strftime("%H:%M") if shift["start_time"] else "-",
+                    "shift_id": shift["id"],
+                    "location": shift["start_location"] or "Nieznana",
+                    "status": "online",  # Dodany status online
+                    "coordinates": {
+                        "lat": shift["start_latitude"],
+                        "lon": shift["start_longitude"]
+                    } if shift["start_latitude"] and shift["start_longitude"] else None
+                })
+        
+        return active_workers
         
     except Exception as e:
         logger.error(f"Błąd podczas pobierania aktywnych pracowników: {str(e)}")
@@ -395,25 +407,25 @@ async def get_active_workers(request: Request):
 
 # Przekierowania dla starych endpointów
 @router.get("/attendance_by_date")
-async def get_attendance_by_date_redirect(request: Request, date: str):
+def get_attendance_by_date_redirect(request: Request, date: str):
     """Przekierowanie dla endpointu /attendance_by_date"""
     print(f"Przekierowuję /attendance_by_date do /api/attendance_by_date dla daty {date}")
-    return await get_attendance_by_date(request, date)
+    return get_attendance_by_date(request, date)
 
 @router.get("/attendance_details")
-async def get_attendance_details_redirect(request: Request, worker_id: str, date_from: str, date_to: str):
+def get_attendance_details_redirect(request: Request, worker_id: str, date_from: str, date_to: str):
     """Przekierowanie dla endpointu /attendance_details"""
     print(f"Przekierowuję /attendance_details do /api/attendance_details dla pracownika {worker_id}, okres {date_from} - {date_to}")
-    return await get_attendance_details(request, worker_id, date_from, date_to)
+    return get_attendance_details(request, worker_id, date_from, date_to)
 
 @router.get("/attendance_summary")
-async def get_attendance_summary_redirect(request: Request, date_from: str, date_to: str):
+def get_attendance_summary_redirect(request: Request, date_from: str, date_to: str):
     """Przekierowanie dla endpointu /attendance_summary"""
     print(f"Przekierowuję /attendance_summary do /api/attendance_summary dla okresu {date_from} - {date_to}")
-    return await get_attendance_summary(request, date_from, date_to)
+    return get_attendance_summary(request, date_from, date_to)
 
 @router.get("/active_workers")
-async def get_active_workers_redirect(request: Request):
+def get_active_workers_redirect(request: Request):
     """Przekierowanie dla endpointu /active_workers"""
     print("Przekierowuję /active_workers do /api/active_workers")
-    return await get_active_workers(request)
+    return get_active_workers(request)
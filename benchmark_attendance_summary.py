@@ -0,0 +1,130 @@
+"""
+Benchmark podsumowania obecności (/api/attendance_summary)
+
+Porównuje dawną implementację N+1 (jedno zapytanie o zmiany na pracownika)
+z agregacją jednym zapytaniem grupującym (attendance.summarize_attendance)
+nad dziennym podsumowaniem daily_attendance.
+Dane testowe generowane są w tymczasowej bazie SQLite, database.db nie jest używana.
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from attendance import summarize_attendance
+from daily_attendance import rebuild_daily_attendance
+
+EMPLOYEE_COUNTS = [100, 200, 400, 800]
+DATE_FROM = date(2025, 7, 1)
+DATE_TO = date(2025, 7, 31)
+
+def seed_database(db, employee_count):
+    """Tworzy pracowników i ich zmiany z jednego miesiąca"""
+    random.seed(employee_count)
+    employees = []
+    shifts = []
+    for i in range(employee_count):
+        employee_id = f"EMP{i:05d}"
+        employees.append(models.Employee(id=employee_id, name=f"Pracownik {i}", pin="1234", hourly_rate=30.0))
+        day = DATE_FROM
+        while day <= DATE_TO:
+            if random.random() < 0.75:
+                start = datetime.combine(day, datetime.min.time()) + timedelta(hours=random.choice([6, 7, 8, 14]))
+                stop = start + timedelta(minutes=random.randint(240, 600))
+                # Około 2% zmian pozostaje otwartych
+                shifts.append(models.Shift(employee_id=employee_id, start_time=start,
+                                           stop_time=stop if random.random() > 0.02 else None))
+            day += timedelta(days=1)
+    db.add_all(employees)
+    db.add_all(shifts)
+    db.commit()
+    rebuild_daily_attendance(db)
+    return len(shifts)
+
+def legacy_summary(db, date_from_obj, date_to_obj):
+    """Dawna implementacja: osobne zapytanie o zmiany dla każdego pracownika"""
+    result = []
+    for employee in db.query(models.Employee).all():
+        shifts_data = db.query(models.Shift).filter(
+            models.Shift.employee_id == employee.id,
+            models.Shift.start_time >= datetime.combine(date_from_obj, datetime.min.time()),
+            models.Shift.start_time <= datetime.combine(date_to_obj, datetime.max.time())
+        ).all()
+        total_minutes = sum((s.stop_time - s.start_time).seconds // 60 for s in shifts_data if s.stop_time)
+        result.append({
+            "id": employee.id,
+            "total_hours": total_minutes // 60 + (total_minutes % 60) / 60,
+            "completed_shifts": len([s for s in shifts_data if s.stop_time]),
+            "days_present": len(set(s.start_time.date() for s in shifts_data)),
+            "saturdays": len(set(s.start_time.date() for s in shifts_data if s.start_time.weekday() == 5)),
+            "sundays": len(set(s.start_time.date() for s in shifts_data if s.start_time.weekday() == 6)),
+        })
+    return result
+
+def measure(engine, session_factory, func):
+    """Zwraca (czas w ms, liczba zapytań SQL, wynik)"""
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    db = session_factory()
+    try:
+        started = time.perf_counter()
+        result = func(db, DATE_FROM, DATE_TO)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count_statement)
+    return elapsed_ms, len(statements), result
+
+def run_benchmark():
+    """Uruchamia benchmark dla rosnącej liczby pracowników"""
+    print("\n===== BENCHMARK PODSUMOWANIA OBECNOŚCI =====")
+    print(f"Okres: {DATE_FROM} - {DATE_TO}\n")
+    print(f"{'pracownicy':>10} {'zmiany':>8} | {'N+1 [ms]':>10} {'zapytania':>9} | {'SQL [ms]':>9} {'zapytania':>9} | {'ms/prac. SQL':>12}")
+    print("-" * 84)
+
+    all_consistent = True
+    for employee_count in EMPLOYEE_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}")
+            Base.metadata.create_all(bind=engine)
+            session_factory = sessionmaker(bind=engine)
+
+            db = session_factory()
+            shift_count = seed_database(db, employee_count)
+            db.close()
+
+            legacy_ms, legacy_queries, legacy_result = measure(engine, session_factory, legacy_summary)
+            grouped_ms, grouped_queries, grouped_result = measure(engine, session_factory, summarize_attendance)
+            engine.dispose()
+
+        # Weryfikacja zgodności wyników obu implementacji
+        legacy_by_id = {row["id"]: row for row in legacy_result}
+        for row in grouped_result:
+            expected = legacy_by_id[row["id"]]
+            for key in ("completed_shifts", "days_present", "saturdays", "sundays", "total_hours"):
+                if row[key] != expected[key]:
+                    all_consistent = False
+                    print(f"   ❌ Niezgodność dla {row['id']}: {key} = {row[key]} (oczekiwano {expected[key]})")
+
+        print(f"{employee_count:>10} {shift_count:>8} | {legacy_ms:>10.1f} {legacy_queries:>9} | "
+              f"{grouped_ms:>9.1f} {grouped_queries:>9} | {grouped_ms / employee_count:>12.3f}")
+
+    print("-" * 84)
+    if all_consistent:
+        print("✅ Wyniki agregacji SQL są zgodne z dawną implementacją")
+    else:
+        print("❌ Wyniki agregacji SQL różnią się od dawnej implementacji")
+    return all_consistent
+
+if __name__ == "__main__":
+    run_benchmark()
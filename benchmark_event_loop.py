@@ -0,0 +1,173 @@
+"""
+Benchmark opóźnień rejestracji czasu pracy podczas generowania raportów
+
+Uruchamia aplikację (main.app) w tymczasowym katalogu z własną bazą SQLite
+i mierzy czas odpowiedzi /api/start i /api/stop w trzech scenariuszach:
+  1. bez obciążenia,
+  2. równolegle z raportami (/api/attendance_by_date, /api/attendance_summary),
+     które wykonują się w puli wątków,
+  3. równolegle z tym samym raportem wywołanym bezpośrednio w async def
+     (dawne zachowanie - zapytania blokują pętlę zdarzeń).
+Wszystkie żądania obsługuje jedna pętla zdarzeń, jak pojedynczy worker uvicorn.
+Domyślnie używany jest produkcyjny profil bazy (DB_PROFILE=production).
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, date, timedelta
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+EMPLOYEE_COUNT = 1500
+CLOCK_WORKERS = 10
+REPORT_WORKERS = 2
+DURATION_SECONDS = 4
+REPORT_DAY = date.today()
+
+def prepare_environment(tmp_dir):
+    """Przygotowuje katalog roboczy aplikacji i bazę z danymi testowymi"""
+    os.chdir(tmp_dir)
+    os.environ.setdefault("DB_PROFILE", "production")
+    for name in ("static", "frontend", "templates"):
+        os.makedirs(name, exist_ok=True)
+    sys.path.insert(0, REPO_DIR)
+
+    import models
+    from database import engine, SessionLocal
+    from auth import get_password_hash
+    from daily_attendance import rebuild_daily_attendance
+    from migrations import run_migrations
+
+    models.Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    random.seed(EMPLOYEE_COUNT)
+    db = SessionLocal()
+    employees = [dict(id="admin", name="Administrator", pin="0000", is_admin=True, hourly_rate=30.0,
+                      password_hash=get_password_hash("admin"))]
+    shifts = []
+    month_start = REPORT_DAY.replace(day=1)
+    for i in range(EMPLOYEE_COUNT):
+        employee_id = f"EMP{i:05d}"
+        employees.append(dict(id=employee_id, name=f"Pracownik {i}", pin="1234", hourly_rate=30.0))
+        day = month_start
+        while day < REPORT_DAY:
+            if random.random() < 0.75:
+                start = datetime.combine(day, datetime.min.time()) + timedelta(hours=random.choice([6, 7, 8]))
+                shifts.append(dict(employee_id=employee_id, start_time=start,
+                                   stop_time=start + timedelta(minutes=random.randint(300, 540))))
+            day += timedelta(days=1)
+        # Zmiany z dnia raportu (zakończone), żeby raport dzienny miał co liczyć
+        start = datetime.combine(REPORT_DAY, datetime.min.time()) + timedelta(hours=1)
+        shifts.append(dict(employee_id=employee_id, start_time=start, stop_time=start + timedelta(minutes=30)))
+    db.bulk_insert_mappings(models.Employee, employees)
+    db.bulk_insert_mappings(models.Shift, shifts)
+    db.commit()
+    rebuild_daily_attendance(db)
+    db.close()
+
+def register_blocking_report(app):
+    """Raport wywołany w async def bez puli wątków - odtwarza dawne zachowanie endpointów"""
+    from fastapi import Request
+    from attendance import get_attendance_by_date
+
+    @app.get("/benchmark/blocking_attendance_by_date")
+    async def blocking_attendance_by_date(request: Request, date: str):
+        return get_attendance_by_date(request, date)
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def run_scenario(client, report_paths):
+    """Mierzy opóźnienia start/stop, opcjonalnie z równoległymi raportami"""
+    latencies = []
+    reports_done = 0
+    deadline = time.perf_counter() + DURATION_SECONDS
+
+    async def clock_worker(index):
+        employee_ids = [f"EMP{i:05d}" for i in range(index, EMPLOYEE_COUNT, CLOCK_WORKERS)]
+        while time.perf_counter() < deadline:
+            employee_id = random.choice(employee_ids)
+            for path in ("/api/start", "/api/stop"):
+                started = time.perf_counter()
+                response = await client.post(path, json={"worker_id": employee_id})
+                assert response.status_code in (200, 400), response.text
+                latencies.append(time.perf_counter() - started)
+
+    async def report_worker(index):
+        nonlocal reports_done
+        while time.perf_counter() < deadline:
+            response = await client.get(report_paths[index % len(report_paths)])
+            assert response.status_code == 200, response.text
+            reports_done += 1
+
+    tasks = [clock_worker(i) for i in range(CLOCK_WORKERS)]
+    if report_paths:
+        tasks += [report_worker(i) for i in range(REPORT_WORKERS)]
+    await asyncio.gather(*tasks)
+    return latencies, reports_done
+
+async def run_benchmark_async():
+    import httpx
+    import main
+
+    register_blocking_report(main.app)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        response = await client.post("/api/login", json={"username": "admin", "password": "admin"})
+        assert response.status_code == 200, response.text
+
+        month_start = REPORT_DAY.replace(day=1)
+        offloaded = [
+            f"/api/attendance_by_date?date={REPORT_DAY}",
+            f"/api/attendance_summary?date_from={month_start}&date_to={REPORT_DAY}",
+        ]
+        blocking = [f"/benchmark/blocking_attendance_by_date?date={REPORT_DAY}"]
+
+        scenarios = [
+            ("bez raportów", []),
+            ("raporty w puli wątków", offloaded),
+            ("raporty w pętli zdarzeń", blocking),
+        ]
+        print(f"{'scenariusz':>24} | {'start/stop':>10} {'p50 [ms]':>9} {'p95 [ms]':>9} {'max [ms]':>9} | {'raporty':>7}")
+        print("-" * 80)
+        results = {}
+        for name, paths in scenarios:
+            latencies, reports = await run_scenario(client, paths)
+            results[name] = latencies
+            print(f"{name:>24} | {len(latencies):>10} {percentile(latencies, 0.5) * 1000:>9.1f} "
+                  f"{percentile(latencies, 0.95) * 1000:>9.1f} {max(latencies) * 1000:>9.1f} | {reports:>7}")
+        print("-" * 80)
+    return results
+
+def run_benchmark():
+    print("\n===== BENCHMARK OPÓŹNIEŃ START/STOP PODCZAS RAPORTÓW =====")
+    print(f"Pracownicy: {EMPLOYEE_COUNT}, klienci start/stop: {CLOCK_WORKERS}, klienci raportów: {REPORT_WORKERS}, "
+          f"czas scenariusza: {DURATION_SECONDS} s\n")
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            prepare_environment(tmp_dir)
+            results = asyncio.run(run_benchmark_async())
+        finally:
+            from database import engine
+            engine.dispose()
+            os.chdir(previous_dir)
+
+    idle = percentile(results["bez raportów"], 0.95)
+    offloaded = percentile(results["raporty w puli wątków"], 0.95)
+    blocking = percentile(results["raporty w pętli zdarzeń"], 0.95)
+    if offloaded < blocking:
+        print(f"✅ p95 start/stop z raportami w puli wątków: {offloaded * 1000:.1f} ms "
+              f"(bez raportów {idle * 1000:.1f} ms, raporty blokujące pętlę {blocking * 1000:.1f} ms)")
+    else:
+        print("❌ Raporty w puli wątków nadal opóźniają rejestrację czasu pracy")
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,139 @@
+"""
+Benchmark listy płac (payroll.py)
+
+Miesiąc zmian dla EMPLOYEE_COUNT pracowników (zmiany dzienne, popołudniowe
+i nocne, także w weekendy). Porównuje podział minut na kategorie pętlą
+w Pythonie (zmiana po zmianie, odcinkami między północą, 6:00 i 22:00)
+z wektorowym podziałem w NumPy (payroll.compute_payroll) i sprawdza zgodność
+wyników. Mierzy też pełną listę płac z bazy (payroll.monthly_payroll).
+Dane testowe generowane są w tymczasowej bazie SQLite, database.db nie jest używana.
+"""
+import os
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from daily_attendance import NIGHT_START_MINUTE, NIGHT_END_MINUTE, DAILY_NORM_MINUTES
+from database import Base
+from payroll import CATEGORIES, RATE_COLUMNS, SATURDAY, SUNDAY, NIGHT, REGULAR, OVERTIME, compute_payroll, \
+    effective_rates, monthly_payroll
+
+EMPLOYEE_COUNT = 10000
+YEAR, MONTH = 2025, 7
+DB_EMPLOYEE_COUNT = 2000
+
+def generate_month(employee_count, seed=0):
+    """Zmiany miesiąca jako tablice NumPy: indeks pracownika, początek, koniec, oraz stawki"""
+    rng = np.random.default_rng(seed)
+    days = 31
+    employee_index, day = np.nonzero(rng.random((employee_count, days)) < 0.7)
+    start_hour = rng.choice([6, 7, 8, 14, 22], size=len(day))
+    start = (np.datetime64(f"{YEAR:04d}-{MONTH:02d}-01T00:00:00") + day * np.timedelta64(1, "D")
+             + start_hour * np.timedelta64(1, "h") + rng.integers(0, 900, len(day)) * np.timedelta64(1, "s"))
+    stop = start + rng.integers(4 * 3600, 12 * 3600, len(day)) * np.timedelta64(1, "s")
+    rates = np.column_stack([rng.uniform(25, 40, employee_count)] +
+                            [rng.choice([0.0, 45.0], size=employee_count) for _ in RATE_COLUMNS[1:]])
+    return employee_index, start, stop, rates
+
+def split_shift_loop(start, stop, worked_before):
+    """Podział jednej zmiany w Pythonie (odcinkami między granicami kategorii)"""
+    result = [0.0] * len(CATEGORIES)
+    duration = (stop - start).total_seconds() / 60
+    overtime = min(max(worked_before + duration - DAILY_NORM_MINUTES, 0), duration)
+    result[OVERTIME] = overtime
+    end = stop - timedelta(minutes=overtime)
+    position = start
+    while position < end:
+        midnight = datetime.combine(position.date(), datetime.min.time())
+        boundaries = [midnight + timedelta(minutes=minute) for minute in (NIGHT_END_MINUTE, NIGHT_START_MINUTE, 24 * 60)]
+        boundary = min(boundary for boundary in boundaries if boundary > position)
+        segment_end = min(boundary, end)
+        minutes = (segment_end - position).total_seconds() / 60
+        minute_of_day = (position - midnight).total_seconds() / 60
+        if position.weekday() == 6:
+            result[SUNDAY] += minutes
+        elif position.weekday() == 5:
+            result[SATURDAY] += minutes
+        elif minute_of_day < NIGHT_END_MINUTE or minute_of_day >= NIGHT_START_MINUTE:
+            result[NIGHT] += minutes
+        else:
+            result[REGULAR] += minutes
+        position = segment_end
+    return result
+
+def payroll_loop(employee_index, start, stop, rates):
+    """Lista płac liczona zmiana po zmianie (punkt odniesienia)"""
+    rates = effective_rates(rates)
+    minutes = np.zeros_like(rates)
+    worked = defaultdict(float)
+    shifts = sorted(zip(employee_index.tolist(), start.tolist(), stop.tolist()))
+    for employee, shift_start, shift_stop in shifts:
+        key = (employee, shift_start.date())
+        split = split_shift_loop(shift_start, shift_stop, worked[key])
+        worked[key] += (shift_stop - shift_start).total_seconds() / 60
+        minutes[employee] += split
+    return minutes, minutes / 60 * rates
+
+def benchmark_arrays():
+    employee_index, start, stop, rates = generate_month(EMPLOYEE_COUNT)
+    print(f"Pracownicy: {EMPLOYEE_COUNT}, zmiany: {len(start)} ({YEAR}-{MONTH:02d})\n")
+
+    started = time.perf_counter()
+    loop_minutes, loop_amounts = payroll_loop(employee_index, start, stop, rates)
+    loop_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    minutes, amounts = compute_payroll(employee_index, start, stop, rates)
+    vector_time = time.perf_counter() - started
+
+    difference = float(np.abs(amounts - loop_amounts).max())
+    print(f"{'wariant':>12} | {'czas [s]':>9} {'zmiany/s':>12}")
+    print("-" * 40)
+    print(f"{'pętla':>12} | {loop_time:>9.3f} {len(start) / loop_time:>12.0f}")
+    print(f"{'NumPy':>12} | {vector_time:>9.3f} {len(start) / vector_time:>12.0f}")
+    print("-" * 40)
+    print(f"NumPy {loop_time / vector_time:.0f}x szybciej, suma wypłat {amounts.sum():,.2f} zł, "
+          f"największa różnica względem pętli {difference:.6f} zł")
+    minutes_total = minutes.sum(axis=0)
+    print("Minuty: " + ", ".join(f"{name} {value:,.0f}" for name, value in zip(CATEGORIES, minutes_total)))
+    if difference < 0.01 and np.allclose(minutes, loop_minutes):
+        print("✅ Wynik wektorowy zgodny z pętlą")
+    else:
+        print("❌ Wynik wektorowy różni się od pętli")
+    return loop_time, vector_time
+
+def benchmark_database():
+    """Pełna lista płac z bazy: odczyt zmian, tablice NumPy i wynik"""
+    employee_index, start, stop, rates = generate_month(DB_EMPLOYEE_COUNT, seed=1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        db.bulk_insert_mappings(models.Employee, [
+            dict(id=f"EMP{i:05d}", name=f"Pracownik {i}", pin="1234", **dict(zip(RATE_COLUMNS, rates[i].tolist())))
+            for i in range(DB_EMPLOYEE_COUNT)
+        ])
+        db.bulk_insert_mappings(models.Shift, [
+            dict(employee_id=f"EMP{employee:05d}", start_time=shift_start, stop_time=shift_stop)
+            for employee, shift_start, shift_stop in zip(employee_index.tolist(), start.tolist(), stop.tolist())
+        ])
+        db.commit()
+
+        started = time.perf_counter()
+        payroll = monthly_payroll(db, YEAR, MONTH)
+        elapsed = time.perf_counter() - started
+        db.close()
+        engine.dispose()
+    print(f"\nLista płac z bazy: {DB_EMPLOYEE_COUNT} pracowników, {payroll['shift_count']} zmian - {elapsed:.2f} s")
+    return elapsed
+
+if __name__ == "__main__":
+    print("\n===== BENCHMARK LISTY PŁAC =====")
+    benchmark_arrays()
+    benchmark_database()
@@ -0,0 +1,176 @@
+"""
+Benchmark profili silnika SQLite (DB_PROFILE)
+
+Symuluje jednoczesną rejestrację czasu pracy (start/stop zmiany, jak /api/start
+i /api/stop) i generowanie podsumowań obecności (/api/attendance_summary).
+Porównuje profil "default" (jeden silnik, domyślny dziennik rollback)
+z profilem "production" (WAL, pragmy, osobna pula połączeń do odczytu).
+Dane testowe generowane są w tymczasowej bazie SQLite, database.db nie jest używana.
+"""
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, date, timedelta
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base, create_db_engine
+from attendance import summarize_attendance
+from daily_attendance import refresh_for_shifts, rebuild_daily_attendance
+
+EMPLOYEE_COUNT = 300
+WRITER_THREADS = 8
+READER_THREADS = 4
+DURATION_SECONDS = 5
+DATE_FROM = date(2025, 7, 1)
+DATE_TO = date(2025, 7, 31)
+
+def seed_database(db):
+    """Tworzy pracowników i ich zmiany z jednego miesiąca"""
+    random.seed(EMPLOYEE_COUNT)
+    shifts = []
+    for i in range(EMPLOYEE_COUNT):
+        employee_id = f"EMP{i:05d}"
+        db.add(models.Employee(id=employee_id, name=f"Pracownik {i}", pin="1234", hourly_rate=30.0))
+        day = DATE_FROM
+        while day <= DATE_TO:
+            if random.random() < 0.75:
+                start = datetime.combine(day, datetime.min.time()) + timedelta(hours=random.choice([6, 7, 8, 14]))
+                shifts.append(models.Shift(employee_id=employee_id, start_time=start,
+                                           stop_time=start + timedelta(minutes=random.randint(240, 600))))
+            day += timedelta(days=1)
+    db.add_all(shifts)
+    db.commit()
+    rebuild_daily_attendance(db)
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def clock_in_out(session_factory, employee_id):
+    """Rozpoczyna albo kończy zmianę pracownika (odpowiednik /api/start i /api/stop)"""
+    db = session_factory()
+    try:
+        shift = db.query(models.Shift).filter(
+            models.Shift.employee_id == employee_id,
+            models.Shift.stop_time.is_(None)
+        ).first()
+        if shift:
+            shift.stop_time = datetime.now()
+        else:
+            shift = models.Shift(employee_id=employee_id, start_time=datetime.now())
+            db.add(shift)
+        refresh_for_shifts(db, [shift])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def run_profile(profile):
+    """Uruchamia obciążenie mieszane dla jednego profilu i zwraca wyniki"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+        write_engine = create_db_engine(url, profile=profile)
+        read_engine = create_db_engine(url, profile=profile, read_only=True) if profile == "production" else write_engine
+        Base.metadata.create_all(bind=write_engine)
+        write_sessions = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
+        read_sessions = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+        db = write_sessions()
+        seed_database(db)
+        db.close()
+
+        write_latencies = []
+        read_latencies = []
+        errors = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + DURATION_SECONDS
+
+        def writer(worker_index):
+            rng = random.Random(worker_index)
+            while time.perf_counter() < deadline:
+                # Każdy wątek obsługuje własną pulę pracowników, jak osobny terminal
+                employee_id = f"EMP{rng.randrange(worker_index, EMPLOYEE_COUNT, WRITER_THREADS):05d}"
+                started = time.perf_counter()
+                try:
+                    clock_in_out(write_sessions, employee_id)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        write_latencies.append(elapsed)
+                except OperationalError as e:
+                    with lock:
+                        errors.append(str(e.orig))
+
+        def reader():
+            while time.perf_counter() < deadline:
+                db = read_sessions()
+                started = time.perf_counter()
+                try:
+                    summarize_attendance(db, DATE_FROM, DATE_TO)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        read_latencies.append(elapsed)
+                except OperationalError as e:
+                    with lock:
+                        errors.append(str(e.orig))
+                finally:
+                    db.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(WRITER_THREADS)]
+        threads += [threading.Thread(target=reader) for _ in range(READER_THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        journal_mode = write_engine.connect().exec_driver_sql("PRAGMA journal_mode").scalar()
+        if read_engine is not write_engine:
+            read_engine.dispose()
+        write_engine.dispose()
+
+    return {
+        "journal_mode": journal_mode,
+        "writes": len(write_latencies),
+        "write_p50": percentile(write_latencies, 0.50) * 1000,
+        "write_p95": percentile(write_latencies, 0.95) * 1000,
+        "reads": len(read_latencies),
+        "read_p50": percentile(read_latencies, 0.50) * 1000,
+        "read_p95": percentile(read_latencies, 0.95) * 1000,
+        "errors": errors
+    }
+
+def run_benchmark():
+    print("\n===== BENCHMARK PROFILI SILNIKA SQLITE =====")
+    print(f"Pracownicy: {EMPLOYEE_COUNT}, wątki zapisu: {WRITER_THREADS}, wątki raportów: {READER_THREADS}, "
+          f"czas: {DURATION_SECONDS} s\n")
+    print(f"{'profil':>10} {'dziennik':>8} | {'zapisy/s':>8} {'p50 [ms]':>9} {'p95 [ms]':>9} | "
+          f"{'raporty/s':>9} {'p50 [ms]':>9} {'p95 [ms]':>9} | {'błędy':>5}")
+    print("-" * 96)
+
+    results = {}
+    for profile in ("default", "production"):
+        r = run_profile(profile)
+        results[profile] = r
+        print(f"{profile:>10} {r['journal_mode']:>8} | {r['writes'] / DURATION_SECONDS:>8.1f} {r['write_p50']:>9.1f} "
+              f"{r['write_p95']:>9.1f} | {r['reads'] / DURATION_SECONDS:>9.1f} {r['read_p50']:>9.1f} "
+              f"{r['read_p95']:>9.1f} | {len(r['errors']):>5}")
+        for error in sorted(set(r["errors"])):
+            print(f"           ❌ {error}")
+
+    print("-" * 96)
+    if results["production"]["journal_mode"].lower() == "wal" and not results["production"]["errors"]:
+        print("✅ Profil produkcyjny działa w trybie WAL bez błędów blokad")
+    else:
+        print("❌ Profil produkcyjny nie działa zgodnie z oczekiwaniami")
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
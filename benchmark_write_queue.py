@@ -0,0 +1,129 @@
+"""
+Benchmark kolejki zapisów z grupowym commitem (write_queue.py)
+
+Symuluje poranny szczyt (6:00): wszyscy pracownicy rozpoczynają zmianę naraz
+(odpowiednik /api/start), wiele wątków jednocześnie. Porównuje zapis bez kolejki
+(każde żądanie we własnej transakcji, jak run_in_threadpool) z zapisem przez jeden
+wątek zapisujący, który zatwierdza paczki zleceń jednym commitem - dla profili
+silnika "default" i "production" (database.py).
+Dane testowe generowane są w tymczasowej bazie SQLite, database.db nie jest używana.
+"""
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base, create_db_engine
+from migrations import run_migrations
+from shift_service import start_shift, recover_start
+from write_queue import WriteQueue, run_write
+
+EMPLOYEE_COUNT = 2000
+REQUEST_THREADS = 32
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_case(profile, use_queue):
+    """Rozpoczyna zmiany wszystkich pracowników i zwraca wyniki"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+        engine = create_db_engine(url, profile=profile, pool_size=REQUEST_THREADS, max_overflow=0)
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        db = session_factory()
+        employee_ids = [f"EMP{i:05d}" for i in range(EMPLOYEE_COUNT)]
+        db.add_all(models.Employee(id=employee_id, name=employee_id, pin="1234") for employee_id in employee_ids)
+        db.commit()
+        db.close()
+
+        queue = WriteQueue(session_factory) if use_queue else None
+        if queue:
+            queue.start()
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def clock_in(employee_id):
+            started = time.perf_counter()
+            try:
+                if queue:
+                    queue.submit(start_shift, employee_id, "Brama", idempotency_key=f"start-{employee_id}",
+                                 recover=recover_start).result()
+                else:
+                    db = session_factory()
+                    try:
+                        run_write(db, start_shift, employee_id, "Brama", idempotency_key=f"start-{employee_id}",
+                                  recover=recover_start)
+                    finally:
+                        db.close()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+            except OperationalError as e:
+                with lock:
+                    errors.append(str(e.orig))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=REQUEST_THREADS) as pool:
+            list(pool.map(clock_in, employee_ids))
+        total = time.perf_counter() - started
+
+        stats = queue.snapshot() if queue else None
+        if queue:
+            queue.stop()
+        db = session_factory()
+        shifts = db.query(models.Shift).count()
+        db.close()
+        engine.dispose()
+
+    return {
+        "clock_ins_per_second": len(latencies) / total,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "avg_batch": stats["avg_batch"] if stats else 1,
+        "shifts": shifts,
+        "errors": errors
+    }
+
+def run_benchmark():
+    print("\n===== BENCHMARK KOLEJKI ZAPISÓW =====")
+    print(f"Pracownicy: {EMPLOYEE_COUNT}, wątki żądań: {REQUEST_THREADS}\n")
+    print(f"{'profil':>10} {'kolejka':>8} | {'starty/s':>9} {'p50 [ms]':>9} {'p95 [ms]':>9} "
+          f"{'paczka':>7} | {'zmiany':>6} {'błędy':>5}")
+    print("-" * 80)
+
+    results = {}
+    for profile in ("default", "production"):
+        for use_queue in (False, True):
+            r = run_case(profile, use_queue)
+            results[(profile, use_queue)] = r
+            print(f"{profile:>10} {'tak' if use_queue else 'nie':>8} | {r['clock_ins_per_second']:>9.1f} "
+                  f"{r['p50']:>9.1f} {r['p95']:>9.1f} {r['avg_batch']:>7.1f} | {r['shifts']:>6} {len(r['errors']):>5}")
+            for error in sorted(set(r["errors"])):
+                print(f"           ❌ {error}")
+
+    print("-" * 80)
+    for profile in ("default", "production"):
+        direct, queued = results[(profile, False)], results[(profile, True)]
+        speedup = queued["clock_ins_per_second"] / direct["clock_ins_per_second"] if direct["clock_ins_per_second"] else 0
+        print(f"{profile}: kolejka {speedup:.1f}x szybciej, błędy blokad {len(direct['errors'])} -> {len(queued['errors'])}")
+    if all(r["shifts"] == EMPLOYEE_COUNT and not r["errors"] for (_, use_queue), r in results.items() if use_queue):
+        print("✅ Kolejka zapisów zapisała wszystkie starty bez błędów blokad")
+    else:
+        print("❌ Kolejka zapisów nie działa zgodnie z oczekiwaniami")
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -1,5 +1,9 @@
 # Konfiguracja funkcji aplikacji mobilnej
 # Te ustawienia można zmieniać bez przebudowy aplikacji
+#
+# UWAGA: plik służy tylko jako wartości początkowe. Przy pierwszym uruchomieniu serwer
+# tworzy z niego settings.json (config_store.py) i od tej pory zmiany z panelu trafiają
+# tam oraz do historii settings_history - edycja tego pliku nie zmienia już ustawień.
 
 MOBILE_APP_CONFIG = {
     "timer_enabled": True,
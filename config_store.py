@@ -0,0 +1,316 @@
+"""
+Magazyn ustawień aplikacji
+
+Ustawienia (konfiguracja aplikacji mobilnej, wersja aplikacji, zaokrąglanie czasu,
+e-mail) są przechowywane w settings.json jako typowany model AppSettings (schemas.py),
+a nie jako kod Pythona w config.py zmieniany wyrażeniami regularnymi. Magazyn:
+  - trzyma wczytane ustawienia w pamięci - odczyt to zwrócenie gotowego obiektu,
+  - najwyżej raz na CONFIG_CHECK_INTERVAL sekund porównuje czas modyfikacji i rozmiar
+    plików (os.stat), więc zapis z innego procesu (port główny, alternatywny, panel 8002)
+    jest podmieniany bez restartu; słuchacze (add_listener) dostają wtedy nową wersję,
+  - zapisuje atomowo: plik tymczasowy w tym samym katalogu, fsync, os.replace -
+    czytający widzi starą albo nową treść, nigdy połowę pliku,
+  - każdy zapis odnotowuje w tabeli settings_history (migrations.py, migracja 3)
+    z kolejnym numerem rewizji zamiast kopii config_backup_*.py,
+  - trzyma gotową, zserializowaną odpowiedź /api/mobile-config z ETag opartym
+    o CONFIG_VERSION i treść konfiguracji.
+Gdy settings.json nie istnieje, jest tworzony z dotychczasowego config.py.
+Port panelu webowego (web_panel_port) też jest polem AppSettings - przy pierwszym
+odczycie przejmuje WEB_PANEL_PORT z configs/app_config.py; pozostałe adresy serwerów
+nadal pochodzą z tej centralnej konfiguracji.
+Jeśli plik nie daje się wczytać, serwowana jest poprzednia wersja, a odczyt jest
+ponawiany przy kolejnym sprawdzeniu.
+"""
+import datetime as dt
+import json
+import logging
+import os
+import runpy
+import tempfile
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from data_versions import make_etag
+from schemas import AppSettings
+
+logger = logging.getLogger("app")
+
+# Pliki w katalogu projektu (niezależnie od katalogu roboczego serwera)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SETTINGS_PATH = os.environ.get("SETTINGS_PATH", os.path.join(BASE_DIR, "settings.json"))
+LEGACY_CONFIG_PATH = os.path.join(BASE_DIR, "config.py")
+CENTRAL_CONFIG_PATH = os.path.join(BASE_DIR, "configs", "app_config.py")
+
+# Co ile sekund sprawdzać, czy inny proces nie zapisał ustawień (0 - przy każdym odczycie)
+CONFIG_CHECK_INTERVAL = float(os.environ.get("CONFIG_CHECK_INTERVAL", "1.0"))
+
+# Ile razy ponowić zapis, gdy inny proces zajął ten sam numer rewizji
+SAVE_RETRIES = 3
+
+# Sekcje AppSettings i odpowiadające im zmienne z dawnego config.py
+LEGACY_SECTIONS = {
+    "mobile_app": "MOBILE_APP_CONFIG",
+    "app_version": "APP_VERSION_INFO",
+    "time_rounding": "TIME_ROUNDING_CONFIG",
+    "email": "EMAIL_CONFIG",
+}
+
+# Pojedyncze pola AppSettings zapisywane przez update() obok sekcji
+SETTINGS_FIELDS = ("web_panel_port",)
+
+def mobile_app_sections(mobile_app_config):
+    """Sekcje update() z formularza konfiguracji mobilnej - port panelu to osobne pole"""
+    mobile_app = dict(mobile_app_config)
+    sections = {"mobile_app": mobile_app}
+    if "web_panel_port" in mobile_app:
+        sections["web_panel_port"] = mobile_app.pop("web_panel_port")
+    return sections
+
+def new_config_version():
+    return dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+
+def build_mobile_config(mobile_app_config, config_version, central, web_panel_port=None):
+    """Odpowiedź /api/mobile-config w formacie oczekiwanym przez aplikację mobilną"""
+    config_data = {
+        "config": {
+            "enable_location": mobile_app_config.get("gps_verification", True),
+            "location_interval_seconds": 60,
+            "enable_pin_security": True,
+            "require_device_verification": True,
+            "offline_mode_enabled": mobile_app_config.get("offline_mode", True),
+            "sync_interval_minutes": 15,
+            "battery_saving_mode": False,
+            "notify_on_success": mobile_app_config.get("notifications", True),
+            "debug_mode": mobile_app_config.get("debug_mode", True),
+            "timer_enabled": mobile_app_config.get("timer_enabled", True),
+            "daily_stats": mobile_app_config.get("daily_stats", True),
+            "monthly_stats": mobile_app_config.get("monthly_stats", True),
+            "field_blocking": mobile_app_config.get("field_blocking", False),
+        },
+        "version": config_version,
+        "config_version": config_version,
+        # Czas wczytania konfiguracji (odpowiedź jest serializowana raz na wersję)
+        "timestamp": str(dt.datetime.now())
+    }
+
+    # Dodanie informacji o serwerach jeśli dostępna centralna konfiguracja
+    if central is not None:
+        config_data["config"]["main_server_url"] = central.get("MOBILE_API_URL")
+        config_data["config"]["web_panel_url"] = central.get("WEB_PANEL_URL")
+        if web_panel_port is not None and central.get("APP_DEFAULT_IP"):
+            config_data["config"]["web_panel_url"] = f"http://{central['APP_DEFAULT_IP']}:{web_panel_port}"
+        config_data["config"]["server_ip"] = central.get("APP_DEFAULT_IP")
+    return config_data
+
+def read_python_config(path):
+    """Zmienne pisane wielkimi literami z pliku konfiguracyjnego Pythona (bez sys.modules)"""
+    if not os.path.exists(path):
+        return None
+    values = runpy.run_path(path)
+    return {key: value for key, value in values.items() if key.isupper()}
+
+def legacy_settings(path):
+    """Ustawienia z dawnego config.py (przy pierwszym uruchomieniu magazynu)"""
+    values = read_python_config(path) or {}
+    data = {section: values[name] for section, name in LEGACY_SECTIONS.items() if name in values}
+    data["config_version"] = values.get("CONFIG_VERSION", new_config_version())
+    return AppSettings.model_validate(data)
+
+def write_atomic(path, content):
+    """Zapis przez plik tymczasowy i os.replace - plik zawsze ma pełną treść"""
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".settings-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+class ConfigSnapshot:
+    """Ustawienia wczytane z pliku w danej wersji"""
+
+    def __init__(self, stamp, settings, central):
+        self.stamp = stamp
+        self.settings = settings
+        self.revision = settings.revision
+        self.version = settings.config_version
+        self.mobile_app_config = settings.mobile_app.model_dump()
+        self.app_version_info = settings.app_version.model_dump()
+        self.time_rounding = settings.time_rounding.model_dump()
+        self.email = settings.email.model_dump()
+        self.web_panel_port = settings.web_panel_port
+        self.central = central
+
+        mobile_config = build_mobile_config(self.mobile_app_config, self.version, central, self.web_panel_port)
+        self.mobile_config_body = json.dumps(mobile_config, ensure_ascii=False).encode("utf-8")
+        # ETag z CONFIG_VERSION i treści (bez znacznika czasu), zgodny między procesami
+        self.mobile_config_etag = make_etag("mobile-config", self.version,
+                                            json.dumps(mobile_config["config"], sort_keys=True))
+        self.app_version_etag = make_etag("app-version", self.version,
+                                          json.dumps(self.app_version_info, sort_keys=True))
+
+class ConfigStore:
+    def __init__(self, settings_path=SETTINGS_PATH, central_path=CENTRAL_CONFIG_PATH,
+                 legacy_path=LEGACY_CONFIG_PATH, check_interval=CONFIG_CHECK_INTERVAL, engine=None):
+        self.settings_path = settings_path
+        self.central_path = central_path
+        self.legacy_path = legacy_path
+        self.check_interval = check_interval
+        self.engine = engine
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._listeners = []
+        self.loads = 0
+
+    def bind(self, engine):
+        """Baza danych z tabelą settings_history (bez niej zapisy nie trafiają do historii)"""
+        self.engine = engine
+
+    def add_listener(self, callback):
+        """callback(snapshot) wywoływany po wczytaniu innej wersji ustawień niż poprzednia"""
+        self._listeners.append(callback)
+
+    def _stamp(self):
+        stamp = []
+        for path in (self.settings_path, self.central_path):
+            try:
+                info = os.stat(path)
+                stamp.append((info.st_mtime_ns, info.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _read_settings(self, central):
+        if not os.path.exists(self.settings_path):
+            settings = legacy_settings(self.legacy_path)
+            if central and "WEB_PANEL_PORT" in central:
+                settings.web_panel_port = central["WEB_PANEL_PORT"]
+            write_atomic(self.settings_path, settings.model_dump_json(indent=2))
+            logger.info(f"Utworzono {self.settings_path} na podstawie {self.legacy_path}")
+            return settings
+        with open(self.settings_path, "r", encoding="utf-8") as f:
+            settings = AppSettings.model_validate_json(f.read())
+        if "web_panel_port" not in settings.model_fields_set and central and "WEB_PANEL_PORT" in central:
+            # settings.json sprzed przeniesienia portu - port nadal z centralnej konfiguracji
+            settings.web_panel_port = central["WEB_PANEL_PORT"]
+        return settings
+
+    def _reload(self, stamp):
+        previous = self._snapshot
+        central = read_python_config(self.central_path)
+        settings = self._read_settings(central)
+        if stamp[0] is None:
+            # Plik został właśnie utworzony z config.py
+            stamp = self._stamp()
+        self._snapshot = ConfigSnapshot(stamp, settings, central)
+        self.loads += 1
+        logger.info(f"Wczytano ustawienia (rewizja {settings.revision}, wersja {settings.config_version})")
+        if previous is not None and (previous.revision, previous.version, previous.web_panel_port) != \
+                (settings.revision, settings.config_version, settings.web_panel_port):
+            for callback in self._listeners:
+                try:
+                    callback(self._snapshot)
+                except Exception as e:
+                    logger.error(f"Błąd powiadomienia o zmianie ustawień: {str(e)}")
+        return self._snapshot
+
+    def get(self):
+        """Aktualne ustawienia; plik jest wczytywany ponownie tylko po zmianie"""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and snapshot.stamp is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+
+        stamp = self._stamp()
+        self._checked_at = now
+        if snapshot is not None and snapshot.stamp == stamp:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.stamp == stamp:
+                return snapshot
+            try:
+                return self._reload(stamp)
+            except Exception as e:
+                if snapshot is None:
+                    raise
+                # Plik z błędem - zostajemy przy poprzedniej wersji
+                logger.error(f"Nie udało się wczytać ustawień: {str(e)}")
+                return snapshot
+
+    def invalidate(self):
+        """Wymusza sprawdzenie pliku przy następnym odczycie"""
+        with self._lock:
+            if self._snapshot is not None:
+                # Poprzednia wersja zostaje jako zapasowa, gdyby odczyt się nie powiódł
+                self._snapshot.stamp = None
+
+    def _next_revision(self, conn, current):
+        last = conn.execute(text("SELECT MAX(revision) FROM settings_history")).scalar()
+        return max(current, last or 0) + 1
+
+    def update(self, sections, author=None):
+        """
+        Zapisuje zmienione sekcje ustawień, np. {"mobile_app": {...}}, albo pola
+        z SETTINGS_FIELDS, np. {"web_panel_port": 8003}.
+        Wartości są łączone z bieżącymi i walidowane (pydantic.ValidationError przy
+        błędnych danych - nic nie jest wtedy zapisywane). Zwraca nową wersję ustawień.
+        """
+        unknown = set(sections) - set(LEGACY_SECTIONS) - set(SETTINGS_FIELDS)
+        if unknown:
+            raise ValueError(f"Nieznane sekcje ustawień: {', '.join(sorted(unknown))}")
+
+        with self._lock:
+            for attempt in range(SAVE_RETRIES):
+                # Zawsze od treści pliku - mógł go zmienić inny proces
+                self.invalidate()
+                current = self.get().settings
+                data = current.model_dump()
+                for section, values in sections.items():
+                    if section in SETTINGS_FIELDS:
+                        data[section] = values
+                    else:
+                        data[section].update(values)
+                data["config_version"] = new_config_version()
+                settings = AppSettings.model_validate(data)
+
+                if self.engine is None:
+                    settings.revision = current.revision + 1
+                    write_atomic(self.settings_path, settings.model_dump_json(indent=2))
+                    break
+                try:
+                    with self.engine.begin() as conn:
+                        settings.revision = self._next_revision(conn, current.revision)
+                        content = settings.model_dump_json(indent=2)
+                        conn.execute(
+                            text("INSERT INTO settings_history (revision, config_version, saved_at, saved_by, sections, content) "
+                                 "VALUES (:revision, :config_version, :saved_at, :saved_by, :sections, :content)"),
+                            {"revision": settings.revision, "config_version": settings.config_version,
+                             "saved_at": dt.datetime.now(), "saved_by": author,
+                             "sections": ",".join(sorted(sections)), "content": content}
+                        )
+                        # Plik podmieniany przed commitem - błąd zapisu wycofuje wpis w historii
+                        write_atomic(self.settings_path, content)
+                    break
+                except IntegrityError:
+                    # Ten sam numer rewizji zapisał równocześnie inny proces - od nowa z jego zmianami
+                    logger.warning(f"Konflikt rewizji ustawień {settings.revision}, próba {attempt + 1}")
+            else:
+                raise RuntimeError("Nie udało się zapisać ustawień - równoczesne zapisy innych procesów")
+
+            self.invalidate()
+            snapshot = self.get()
+            logger.info(f"Zapisano ustawienia: rewizja {snapshot.revision}, sekcje {', '.join(sorted(sections))}, autor {author}")
+            return snapshot
+
+config_store = ConfigStore()
@@ -0,0 +1,225 @@
+"""
+Dzienne podsumowanie obecności (tabela daily_attendance)
+
+Każdy wiersz to suma zmian jednego pracownika z jednego dnia. Wiersze są
+przeliczane w tej samej transakcji, w której zmienia się tabela shifts,
+dzięki czemu raporty miesięczne czytają kilka tysięcy gotowych wierszy
+zamiast wszystkich zmian. Dni zmienione z pominięciem przeliczania są
+naprawiane przy starcie serwera (repair_daily_attendance).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+import datetime as dt
+import logging
+
+import models
+from summary_cache import queue_summary_invalidation, queue_range_invalidation
+
+logger = logging.getLogger("app")
+
+NIGHT_START_MINUTE = 22 * 60   # Pora nocna od 22:00...
+NIGHT_END_MINUTE = 6 * 60      # ...do 6:00
+DAILY_NORM_MINUTES = 8 * 60    # Dobowa norma czasu pracy
+
+def day_type_for(day):
+    """Zwraca klasę dnia: weekday, saturday lub sunday"""
+    weekday = day.weekday()
+    if weekday == 5:
+        return "saturday"
+    if weekday == 6:
+        return "sunday"
+    return "weekday"
+
+def shift_minutes(start_time, stop_time):
+    """Czas trwania zmiany w pełnych minutach"""
+    return int((stop_time - start_time).total_seconds() // 60)
+
+def night_minutes(start_time, stop_time):
+    """Liczba minut zmiany przypadających na porę nocną"""
+    total = 0
+    day = start_time.date() - timedelta(days=1)
+    while datetime.combine(day, datetime.min.time()) < stop_time:
+        midnight = datetime.combine(day, datetime.min.time())
+        windows = (
+            (midnight, midnight + timedelta(minutes=NIGHT_END_MINUTE)),
+            (midnight + timedelta(minutes=NIGHT_START_MINUTE), midnight + timedelta(days=1))
+        )
+        for window_start, window_end in windows:
+            overlap_start = max(start_time, window_start)
+            overlap_end = min(stop_time, window_end)
+            if overlap_end > overlap_start:
+                total += (overlap_end - overlap_start).total_seconds()
+        day += timedelta(days=1)
+    return int(total // 60)
+
+def _day_totals(shifts):
+    """Sumuje zmiany jednego pracownika z jednego dnia"""
+    completed = [s for s in shifts if s.stop_time is not None]
+    minutes = sum(shift_minutes(s.start_time, s.stop_time) for s in completed)
+    return {
+        "shift_count": len(shifts),
+        "completed_shifts": len(completed),
+        "minutes": minutes,
+        "night_minutes": sum(night_minutes(s.start_time, s.stop_time) for s in completed),
+        "overtime_minutes": max(0, minutes - DAILY_NORM_MINUTES)
+    }
+
+def shift_day(shift):
+    """Dzień, do którego zaliczana jest zmiana"""
+    return shift.start_time.date() if shift.start_time else None
+
+def refresh_daily_attendance(db, keys):
+    """Przelicza wiersze daily_attendance dla podanych par (employee_id, dzień).
+
+    Nie zatwierdza transakcji - wywołujący robi commit razem ze zmianą w shifts.
+    """
+    days_by_employee = defaultdict(set)
+    for employee_id, day in keys:
+        if employee_id is None or day is None:
+            continue
+        if isinstance(day, datetime):
+            day = day.date()
+        days_by_employee[str(employee_id)].add(day)
+
+    if not days_by_employee:
+        return
+
+    # Także zapisy zbiorcze z pominięciem ORM - zapamiętane podsumowania tych dni są nieaktualne
+    queue_summary_invalidation(db, set().union(*days_by_employee.values()))
+
+    # Sesje mają autoflush=False, więc oczekujące zmiany trzeba wysłać ręcznie
+    db.flush()
+    now = dt.datetime.utcnow()
+
+    for employee_id, days in days_by_employee.items():
+        shifts = db.query(models.Shift).filter(
+            models.Shift.employee_id == employee_id,
+            models.Shift.start_time >= datetime.combine(min(days), datetime.min.time()),
+            models.Shift.start_time <= datetime.combine(max(days), datetime.max.time())
+        ).all()
+
+        shifts_by_day = defaultdict(list)
+        for shift in shifts:
+            shifts_by_day[shift_day(shift)].append(shift)
+
+        for day in days:
+            row = db.get(models.DailyAttendance, (employee_id, day))
+            day_shifts = shifts_by_day.get(day)
+            if not day_shifts:
+                if row is not None:
+                    db.delete(row)
+                continue
+
+            if row is None:
+                row = models.DailyAttendance(employee_id=employee_id, date=day, day_type=day_type_for(day))
+                db.add(row)
+            for field, value in _day_totals(day_shifts).items():
+                setattr(row, field, value)
+            row.updated_at = now
+
+def refresh_for_shifts(db, shifts):
+    """Przelicza dni, do których należą podane zmiany"""
+    refresh_daily_attendance(db, [(shift.employee_id, shift_day(shift)) for shift in shifts])
+
+def rebuild_daily_attendance(db, date_from=None, date_to=None, chunk_size=5000):
+    """Odbudowuje daily_attendance z tabeli shifts (cała historia lub zakres dat).
+
+    Zwraca liczbę zapisanych wierszy. Zatwierdza transakcję.
+    """
+    rollup = db.query(models.DailyAttendance)
+    shifts = db.query(models.Shift).filter(models.Shift.start_time.isnot(None))
+    if date_from:
+        rollup = rollup.filter(models.DailyAttendance.date >= date_from)
+        shifts = shifts.filter(models.Shift.start_time >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        rollup = rollup.filter(models.DailyAttendance.date <= date_to)
+        shifts = shifts.filter(models.Shift.start_time <= datetime.combine(date_to, datetime.max.time()))
+
+    rollup.delete(synchronize_session=False)
+
+    now = dt.datetime.utcnow()
+    written = 0
+    current_key = None
+    current_shifts = []
+    pending = []
+
+    def flush_day():
+        nonlocal written
+        if current_key is None:
+            return
+        employee_id, day = current_key
+        pending.append(dict(employee_id=employee_id, date=day, day_type=day_type_for(day),
+                            updated_at=now, **_day_totals(current_shifts)))
+        written += 1
+
+    ordered = shifts.order_by(models.Shift.employee_id, models.Shift.start_time).yield_per(chunk_size)
+    for shift in ordered:
+        key = (shift.employee_id, shift_day(shift))
+        if key != current_key:
+            flush_day()
+            current_key = key
+            current_shifts = []
+            if len(pending) >= chunk_size:
+                db.bulk_insert_mappings(models.DailyAttendance, pending)
+                pending.clear()
+        current_shifts.append(shift)
+    flush_day()
+
+    if pending:
+        db.bulk_insert_mappings(models.DailyAttendance, pending)
+    queue_range_invalidation(db, date_from, date_to)
+    db.commit()
+
+    logger.info(f"Odbudowano daily_attendance: {written} wierszy")
+    return written
+
+# Dni, których wiersz daily_attendance nie zgadza się z tabelą shifts: brak wiersza, inna
+# liczba zmian (wszystkich lub zakończonych) albo minut, oraz wiersze dni bez żadnej zmiany.
+# Minuty liczone jak shift_minutes() - pełne sekundy (zapas na błąd julianday) i pełne minuty.
+STALE_DAYS_QUERY = """
+SELECT s.employee_id, s.day FROM (
+    SELECT employee_id, date(start_time) AS day, COUNT(*) AS shift_count,
+           SUM(stop_time IS NOT NULL) AS completed_shifts,
+           SUM(CASE WHEN stop_time IS NOT NULL
+                    THEN CAST((julianday(stop_time) - julianday(start_time)) * 86400 + 0.001 AS INTEGER) / 60
+                    ELSE 0 END) AS minutes
+    FROM shifts WHERE start_time IS NOT NULL AND employee_id IS NOT NULL
+    GROUP BY employee_id, date(start_time)
+) s
+LEFT JOIN daily_attendance d ON d.employee_id = s.employee_id AND d.date = s.day
+WHERE d.employee_id IS NULL OR d.shift_count != s.shift_count
+   OR d.completed_shifts != s.completed_shifts OR d.minutes != s.minutes
+UNION
+SELECT d.employee_id, d.date FROM daily_attendance d
+WHERE NOT EXISTS (SELECT 1 FROM shifts s WHERE s.employee_id = d.employee_id
+                  AND s.start_time >= d.date AND s.start_time < date(d.date, '+1 day'))
+"""
+
+def repair_daily_attendance(db):
+    """Przelicza dni, których podsumowanie rozeszło się z tabelą shifts.
+
+    Zapisy z pominięciem refresh_daily_attendance (surowy SQL, narzędzia spoza
+    serwera) zostawiłyby nieaktualne wiersze na zawsze - przy starcie serwera
+    jedno zapytanie porównuje sumy dni z tabelą shifts i przelicza tylko te,
+    które się różnią. Zwraca liczbę przeliczonych dni. Zatwierdza transakcję.
+    """
+    stale = [(employee_id, dt.date.fromisoformat(str(day)[:10]))
+             for employee_id, day in db.connection().exec_driver_sql(STALE_DAYS_QUERY)]
+    if stale:
+        refresh_daily_attendance(db, stale)
+        db.commit()
+        logger.warning(f"Przeliczono {len(stale)} nieaktualnych dni w daily_attendance")
+    return len(stale)
+
+def ensure_daily_attendance(engine, session_factory):
+    """Tworzy tabelę daily_attendance, wypełnia ją, jeśli jest pusta, i naprawia nieaktualne dni"""
+    models.Base.metadata.create_all(bind=engine, tables=[models.DailyAttendance.__table__])
+    db = session_factory()
+    try:
+        if db.query(models.DailyAttendance).first() is None and db.query(models.Shift).first() is not None:
+            print("Tabela daily_attendance jest pusta - odbudowuję ją z historii zmian...")
+            rebuild_daily_attendance(db)
+        else:
+            repair_daily_attendance(db)
+    finally:
+        db.close()
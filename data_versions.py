@@ -0,0 +1,79 @@
+"""
+Warunkowe GET (ETag / If-None-Match) dla endpointów odczytu
+
+Aplikacja mobilna i panel wielokrotnie pobierają te same dane (lista pracowników,
+konfiguracja mobilna, wersja aplikacji, obecności z dnia). ETag liczony jest
+z taniego licznika wersji, a nie z treści odpowiedzi, więc przy zgodnym
+If-None-Match endpoint zwraca 304 bez wykonywania zapytania i serializacji.
+
+Źródła wersji:
+  - data_etag()  - liczniki z tabeli data_versions, podbijane przez wyzwalacze
+                   na employees i shifts (migrations.py, migracja 2), więc widzą
+                   także zapisy surowym SQL i z innych procesów,
+  - make_etag()  - dowolne wartości, np. active_shifts.version dla endpointów
+                   serwowanych z rejestru otwartych zmian albo CONFIG_VERSION
+                   konfiguracji mobilnej (config_store.py).
+Jeśli licznika dla tabeli nie ma (baza bez migracji 2), ETag nie jest wysyłany
+i endpoint działa jak dotychczas.
+"""
+import hashlib
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+
+# Przeglądarka i aplikacja mają zawsze pytać serwer (If-None-Match), ale mogą trzymać kopię
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+_versions_query = text(
+    "SELECT table_name, version FROM data_versions WHERE table_name IN :tables"
+).bindparams(bindparam("tables", expanding=True))
+
+def make_etag(*parts):
+    """Słaby ETag z podanych wartości (treść równoważna, niekoniecznie identyczna bajtowo)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def get_data_versions(db, tables):
+    """Liczniki wersji podanych tabel; brakujące tabele nie występują w wyniku"""
+    try:
+        rows = db.execute(_versions_query, {"tables": list(tables)})
+    except OperationalError:
+        # Baza bez tabeli data_versions
+        db.rollback()
+        return {}
+    return {row.table_name: row.version for row in rows}
+
+def data_etag(db, tables, *parts):
+    """ETag z liczników tabel i parametrów żądania; None, gdy któregoś licznika brakuje"""
+    versions = get_data_versions(db, tables)
+    if any(table not in versions for table in tables):
+        return None
+    return make_etag(*(f"{table}:{versions[table]}" for table in tables), *parts)
+
+def etag_matches(request, etag):
+    """Czy nagłówek If-None-Match zawiera podany ETag (porównanie słabe, RFC 9110)"""
+    if not etag:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL})
+
+def etag_response(content, etag):
+    """Odpowiedź JSON z nagłówkiem ETag (bez nagłówka, gdy etag jest None)"""
+    headers = {"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL} if etag else None
+    return JSONResponse(content=jsonable_encoder(content), headers=headers)
+
+def etag_bytes_response(body, etag, media_type="application/json"):
+    """Odpowiedź z gotową (wcześniej zserializowaną) treścią i nagłówkiem ETag"""
+    return Response(content=body, media_type=media_type,
+                    headers={"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL})
@@ -1,10 +1,17 @@
 # database.py
 # Ulepszona implementacja obsługi bazy danych z lepszym zarządzaniem połączeniami
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool
+from collections import deque
 from contextlib import contextmanager
+import contextvars
+import datetime as dt
+import os
+import threading
+import time
 import logging
 
 # Konfiguracja logowania
@@ -18,23 +25,157 @@ logger = logging.getLogger("database")
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./database.db"
 
-# Konfiguracja silnika z parametrami wydajnościowymi
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={
-        "check_same_thread": False,
-        "timeout": 30
-    },
-    pool_size=10,
-    max_overflow=20,
-    pool_recycle=3600,  # odnawia połączenia po godzinie
-    pool_pre_ping=True  # weryfikuje połączenie przed użyciem
-)
+# Profil silnika bazy danych: "default" albo "production"
+# (tryb WAL, pragmy wydajnościowe i osobna pula połączeń do odczytu raportów)
+DB_PROFILE = os.environ.get("DB_PROFILE", "default")
+
+SQLITE_PRODUCTION_PRAGMAS = {
+    "journal_mode": "WAL",       # czytelnicy nie blokują zapisujących i odwrotnie
+    "synchronous": "NORMAL",     # w trybie WAL bezpieczne i znacznie szybsze niż FULL
+    "busy_timeout": 30000,       # czekaj do 30 s na blokadę zamiast zgłaszać "database is locked"
+    "cache_size": -65536,        # 64 MB pamięci podręcznej stron
+    "mmap_size": 268435456,      # 256 MB odczytu przez mapowanie pamięci
+    "temp_store": "MEMORY"
+}
+
+# Czas oczekiwania na połączenie z puli, powyżej którego logujemy ostrzeżenie
+SLOW_CHECKOUT_WARNING_SECONDS = 1.0
+
+class PoolStats:
+    """Statystyki puli połączeń: pobrania, czas oczekiwania i wycieki sesji"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.slow_checkouts = 0
+        self.peak_checked_out = 0
+        self.leaked_sessions = 0
+        self.recent_leaks = deque(maxlen=50)
+
+    def record_wait(self, seconds, checked_out):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            if seconds >= SLOW_CHECKOUT_WARNING_SECONDS:
+                self.slow_checkouts += 1
+
+    def record_leak(self, route):
+        with self._lock:
+            self.leaked_sessions += 1
+            self.recent_leaks.append({"route": route, "time": dt.datetime.now().isoformat()})
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "slow_checkouts": self.slow_checkouts,
+                "peak_checked_out": self.peak_checked_out,
+                "leaked_sessions": self.leaked_sessions,
+                "recent_leaks": list(self.recent_leaks)
+            }
+
+pool_stats = PoolStats()
+
+# Ścieżka aktualnie obsługiwanego żądania i sesje otwarte w jego trakcie
+_current_route = contextvars.ContextVar("current_route", default=None)
+_request_sessions = contextvars.ContextVar("request_sessions", default=None)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool mierzący czas oczekiwania na wolne połączenie"""
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        waited = time.perf_counter() - started
+        pool_stats.record_wait(waited, self.checkedout())
+        if waited >= SLOW_CHECKOUT_WARNING_SECONDS:
+            logger.warning(f"Oczekiwanie na połączenie z puli trwało {waited:.2f} s (żądanie: {_current_route.get() or '-'})")
+        return connection
+
+def apply_sqlite_pragmas(db_engine, pragmas):
+    """Ustawia pragmy SQLite na każdym nowym połączeniu silnika"""
+    @event.listens_for(db_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def create_db_engine(url=SQLALCHEMY_DATABASE_URL, profile=DB_PROFILE, read_only=False, pool_size=10, max_overflow=20):
+    """Tworzy silnik bazy danych dla wybranego profilu.
+
+    Profil "production" włącza tryb WAL i pragmy z SQLITE_PRODUCTION_PRAGMAS,
+    a silnik tylko do odczytu dodatkowo blokuje zapisy (PRAGMA query_only).
+    """
+    # Konfiguracja silnika z parametrami wydajnościowymi
+    db_engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": 30
+        },
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=3600,  # odnawia połączenia po godzinie
+        pool_pre_ping=True  # weryfikuje połączenie przed użyciem
+    )
+
+    if profile == "production":
+        pragmas = dict(SQLITE_PRODUCTION_PRAGMAS)
+        if read_only:
+            pragmas["query_only"] = "ON"
+        apply_sqlite_pragmas(db_engine, pragmas)
+
+    return db_engine
+
+engine = create_db_engine()
+
+# Raporty (tylko odczyt) w profilu produkcyjnym korzystają z osobnej puli połączeń,
+# dzięki czemu długie zapytania nie zajmują połączeń potrzebnych do rejestracji czasu pracy
+if DB_PROFILE == "production":
+    read_engine = create_db_engine(read_only=True)
+else:
+    read_engine = engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
+@event.listens_for(SessionLocal, "after_begin")
+@event.listens_for(ReadSessionLocal, "after_begin")
+def _track_request_session(session, transaction, connection):
+    """Zapamiętuje sesje, które pobrały połączenie w trakcie żądania HTTP"""
+    sessions = _request_sessions.get()
+    if sessions is not None and session not in sessions:
+        sessions.append(session)
+
+def _describe_pool(pool):
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin()
+    }
+
+def get_pool_status():
+    """Zwraca stan puli połączeń i statystyki do diagnostyki"""
+    status = {"profile": DB_PROFILE}
+    status.update(_describe_pool(engine.pool))
+    if read_engine is not engine:
+        status["reader"] = _describe_pool(read_engine.pool)
+    status.update(pool_stats.snapshot())
+    return status
+
 # Generator do użycia w Depends
 def get_db():
     db = SessionLocal()
@@ -47,6 +188,64 @@ def get_db():
     finally:
         db.close()
 
+def get_request_db(request) -> Session:
+    """Zwraca sesję przypisaną do żądania HTTP.
+
+    Sesja jest tworzona przy pierwszym użyciu i zamykana przez DBSessionMiddleware
+    po wysłaniu odpowiedzi, więc handler nie musi jej zamykać.
+    """
+    db = getattr(request.state, "db", None)
+    if db is None:
+        db = SessionLocal()
+        request.state.db = db
+    return db
+
+def get_read_db(request) -> Session:
+    """Zwraca sesję tylko do odczytu przypisaną do żądania HTTP (zapytania raportowe).
+
+    W profilu domyślnym korzysta z tego samego silnika co get_request_db.
+    """
+    db = getattr(request.state, "read_db", None)
+    if db is None:
+        db = ReadSessionLocal()
+        request.state.read_db = db
+    return db
+
+class DBSessionMiddleware:
+    """Middleware ASGI zarządzające cyklem życia sesji bazy danych w żądaniu.
+
+    Zamyka sesję żądania po wysłaniu odpowiedzi (także strumieniowej), a każdą inną
+    sesję, która wciąż trzyma połączenie, zgłasza jako wyciek z nazwą trasy i zamyka.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sessions = []
+        route_token = _current_route.set(scope.get("path"))
+        sessions_token = _request_sessions.set(sessions)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            state = scope.get("state", {})
+            request_dbs = [db for db in (state.get("db"), state.get("read_db")) if db is not None]
+            route = getattr(scope.get("route"), "path", None) or scope.get("path")
+            for session in sessions:
+                if session in request_dbs or not session.in_transaction():
+                    continue
+                pool_stats.record_leak(route)
+                logger.warning(f"Sesja bazy danych przeżyła żądanie {scope.get('method')} {route} - zamykam ją")
+                session.close()
+            for db in request_dbs:
+                db.close()
+            _request_sessions.reset(sessions_token)
+            _current_route.reset(route_token)
+
 # Context manager do ręcznego zarządzania sesją
 @contextmanager
 def db_session():
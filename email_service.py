@@ -2,6 +2,10 @@
 # Funkcje do wysyłania raportów przez email
 
 import smtplib
+import os
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
@@ -9,44 +13,180 @@ from email import encoders
 import base64
 from datetime import datetime
 from fastapi import HTTPException
-from config import EMAIL_CONFIG
+from config_store import config_store
 
-def send_email(to_email: str, subject: str, body: str, attachment_data: bytes = None, attachment_name: str = None):
-    """Wysyła email z opcjonalnym załącznikiem"""
+# Limit czasu operacji SMTP w sekundach
+SMTP_TIMEOUT = float(os.environ.get("SMTP_TIMEOUT", "30"))
+# Ile połączeń SMTP może być otwartych jednocześnie (kolejka wysyłki używa po jednym na wątek)
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", "2"))
+# Połączenie nieużywane dłużej niż tyle sekund jest sprawdzane komendą NOOP przed użyciem
+SMTP_IDLE_SECONDS = 30
+
+def email_config():
+    """Ustawienia email; HTTPException 400, gdy wysyłka jest wyłączona albo nieskonfigurowana"""
+    # Ustawienia czytane przy każdym wysłaniu - zmiana w settings.json działa bez restartu
+    EMAIL_CONFIG = config_store.get().email
     if not EMAIL_CONFIG["enabled"]:
         raise HTTPException(status_code=400, detail="Wysyłanie emaili jest wyłączone")
     
     if not EMAIL_CONFIG["smtp_username"] or not EMAIL_CONFIG["smtp_password"]:
         raise HTTPException(status_code=400, detail="Nie skonfigurowano danych SMTP")
+    return EMAIL_CONFIG
+
+def build_message(EMAIL_CONFIG, to_email: str, subject: str, body: str, attachment_data: bytes = None,
+                  attachment_name: str = None):
+    """Wiadomość HTML z opcjonalnym załącznikiem"""
+    msg = MIMEMultipart()
+    msg['From'] = f"{EMAIL_CONFIG['sender_name']} <{EMAIL_CONFIG['sender_email']}>"
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    
+    # Dodanie treści
+    msg.attach(MIMEText(body, 'html'))
     
+    # Dodanie załącznika jeśli jest
+    if attachment_data and attachment_name:
+        part = MIMEBase('application', 'octet-stream')
+        part.set_payload(attachment_data)
+        encoders.encode_base64(part)
+        part.add_header(
+            'Content-Disposition',
+            f'attachment; filename= {attachment_name}'
+        )
+        msg.attach(part)
+    return msg
+
+def open_smtp(EMAIL_CONFIG):
+    """Nowe połączenie SMTP: STARTTLS (jeśli włączone) i logowanie"""
+    server = smtplib.SMTP(EMAIL_CONFIG["smtp_server"], EMAIL_CONFIG["smtp_port"], timeout=SMTP_TIMEOUT)
     try:
-        # Tworzenie wiadomości
-        msg = MIMEMultipart()
-        msg['From'] = f"{EMAIL_CONFIG['sender_name']} <{EMAIL_CONFIG['sender_email']}>"
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        # Dodanie treści
-        msg.attach(MIMEText(body, 'html'))
-        
-        # Dodanie załącznika jeśli jest
-        if attachment_data and attachment_name:
-            part = MIMEBase('application', 'octet-stream')
-            part.set_payload(attachment_data)
-            encoders.encode_base64(part)
-            part.add_header(
-                'Content-Disposition',
-                f'attachment; filename= {attachment_name}'
-            )
-            msg.attach(part)
-        
-        # Wysłanie emaila
-        server = smtplib.SMTP(EMAIL_CONFIG["smtp_server"], EMAIL_CONFIG["smtp_port"])
-        server.starttls()
+        if EMAIL_CONFIG.get("use_tls", True):
+            server.starttls()
         server.login(EMAIL_CONFIG["smtp_username"], EMAIL_CONFIG["smtp_password"])
-        text = msg.as_string()
-        server.sendmail(EMAIL_CONFIG["sender_email"], to_email, text)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+def keeps_connection(error):
+    """Czy po błędzie połączenie nadaje się do dalszej wysyłki (serwer odrzucił tylko tę wiadomość)"""
+    return isinstance(error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)) \
+        and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+def _close(server):
+    try:
         server.quit()
+    except Exception:
+        server.close()
+
+class SmtpPool:
+    """Otwarte, zalogowane połączenia SMTP używane ponownie przez kolejne wiadomości.
+
+    Połączenie jest zamykane, gdy zmienią się ustawienia serwera, gdy nie odpowiada
+    na NOOP po dłuższej przerwie albo gdy wysyłka zakończy się błędem połączenia.
+    """
+
+    def __init__(self, size=SMTP_POOL_SIZE):
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self.in_use = 0
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def acquire(self, EMAIL_CONFIG):
+        if not self._slots.acquire(timeout=SMTP_TIMEOUT):
+            raise TimeoutError("Brak wolnego połączenia SMTP")
+        try:
+            server = self._take(EMAIL_CONFIG)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+        return server
+
+    def _take(self, EMAIL_CONFIG):
+        signature = tuple(EMAIL_CONFIG.get(key) for key in
+                          ("smtp_server", "smtp_port", "smtp_username", "smtp_password", "use_tls"))
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, server_signature, last_used = self._idle.pop()
+            if server_signature != signature:
+                _close(server)
+                continue
+            if time.monotonic() - last_used > SMTP_IDLE_SECONDS:
+                try:
+                    alive = server.noop()[0] == 250
+                except Exception:
+                    alive = False
+                if not alive:
+                    server.close()
+                    self.discarded += 1
+                    continue
+            self.reused += 1
+            return server, signature
+        server = open_smtp(EMAIL_CONFIG)
+        self.opened += 1
+        return server, signature
+
+    def release(self, connection, broken=False):
+        server, signature = connection
+        if broken:
+            server.close()
+            self.discarded += 1
+        else:
+            with self._lock:
+                self._idle.append((server, signature, time.monotonic()))
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, EMAIL_CONFIG):
+        """Połączenie z puli; po błędzie połączenia zamykane zamiast zwracane"""
+        connection = self.acquire(EMAIL_CONFIG)
+        try:
+            yield connection[0]
+        except Exception as e:
+            self.release(connection, broken=not keeps_connection(e))
+            raise
+        self.release(connection)
+
+    def close(self):
+        """Zamyka bezczynne połączenia (przy zamykaniu aplikacji)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _, _ in idle:
+            _close(server)
+
+    def snapshot(self):
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": self.in_use,
+            "opened": self.opened,
+            "reused": self.reused,
+            "discarded": self.discarded
+        }
+
+smtp_pool = SmtpPool()
+
+def send_message(server, EMAIL_CONFIG, to_email: str, msg):
+    server.sendmail(EMAIL_CONFIG["sender_email"], to_email, msg.as_string())
+
+def send_email(to_email: str, subject: str, body: str, attachment_data: bytes = None, attachment_name: str = None):
+    """Wysyła email z opcjonalnym załącznikiem (połączeniem z puli smtp_pool)"""
+    EMAIL_CONFIG = email_config()
+    
+    try:
+        msg = build_message(EMAIL_CONFIG, to_email, subject, body, attachment_data, attachment_name)
+        with smtp_pool.connection(EMAIL_CONFIG) as server:
+            send_message(server, EMAIL_CONFIG, to_email, msg)
         
         return True
         
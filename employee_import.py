@@ -0,0 +1,318 @@
+"""
+Import pracowników z pliku CSV (/api/import_employees_csv)
+
+Import 2000 pracowników trwał minuty i blokował pozostałe żądania: bcrypt liczony
+wiersz po wierszu w pętli zdarzeń, osobny SELECT i commit dla każdego wiersza.
+Teraz:
+  - istniejące ID pobierane są jednym zapytaniem, a ID nowych pracowników nadaje
+    EmployeeIdAllocator bez zapytań (kolizja z inną osobą dostaje kolejny numer,
+    np. jkowalski2; ta sama osoba jest zgłaszana jako już istniejąca),
+  - hasła (bcrypt) liczone są w puli procesów (IMPORT_HASH_WORKERS),
+  - pracownicy zapisywani są paczkami po IMPORT_CHUNK_SIZE, z commitem na paczkę,
+  - import działa jako zadanie w tle z postępem (ImportJob); endpoint czeka na
+    wynik najwyżej IMPORT_WAIT_SECONDS, dłuższy import zwraca 202 z ID zadania,
+    którego postęp podaje GET /api/import_employees_csv/{job_id}.
+
+Plik można też przesłać bez parsowania w przeglądarce (multipart, pole "file"):
+Starlette zapisuje go w pliku tymczasowym (SpooledTemporaryFile), a csv_records()
+czyta go przyrostowo - pamięć nie rośnie z rozmiarem pliku, a raport błędów
+podaje numery wierszy pliku.
+"""
+import asyncio
+import csv
+import datetime as dt
+import io
+import itertools
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+import models
+from auth import get_password_hash
+from database import SessionLocal
+
+logger = logging.getLogger("app")
+
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "200"))
+IMPORT_HASH_WORKERS = int(os.environ.get("IMPORT_HASH_WORKERS", str(os.cpu_count() or 1)))
+IMPORT_WAIT_SECONDS = float(os.environ.get("IMPORT_WAIT_SECONDS", "10"))
+# Ile zakończonych zadań importu pamiętać (do odczytu postępu i wyniku)
+IMPORT_JOBS_LIMIT = 20
+# Ile błędów wierszy zapamiętać w raporcie (pozostałe są tylko liczone)
+IMPORT_ERRORS_LIMIT = 1000
+
+POLISH_CHARS = str.maketrans("ąćęłńóśżź", "acelnoszz")
+
+def employee_id_base(first_name, last_name):
+    """ID to pierwsza litera imienia + nazwisko, małymi literami, bez polskich znaków"""
+    emp_id = (first_name[0] + last_name).lower().translate(POLISH_CHARS)
+    # Usuń spacje i inne niestandardowe znaki
+    return "".join(c for c in emp_id if c.isalnum())
+
+class EmployeeIdAllocator:
+    """Nadaje ID nowym pracownikom na podstawie ID zajętych w bazie i w imporcie"""
+
+    def __init__(self, taken):
+        # ID -> imię i nazwisko
+        self.taken = dict(taken)
+
+    @classmethod
+    def load(cls, db):
+        """Wszystkie istniejące ID jednym zapytaniem"""
+        return cls(db.query(models.Employee.id, models.Employee.name).all())
+
+    def allocate(self, first_name, last_name):
+        """Wolne ID dla pracownika; ValueError, gdy ta sama osoba już istnieje"""
+        base = employee_id_base(first_name, last_name)
+        if not base:
+            raise ValueError("Nie można utworzyć ID z imienia i nazwiska")
+        name = f"{first_name} {last_name}"
+        candidate, number = base, 1
+        while candidate in self.taken:
+            if self.taken[candidate] == name:
+                raise ValueError(f"Pracownik o ID {candidate} już istnieje")
+            number += 1
+            candidate = f"{base}{number}"
+        self.taken[candidate] = name
+        return candidate
+
+def prepare_employee(emp, allocator):
+    """Dane pracownika z wiersza importu (bez hasła); ValueError z opisem błędu wiersza"""
+    first_name = str(emp.get("first_name") or "").strip()
+    last_name = str(emp.get("last_name") or "").strip()
+    if not first_name or not last_name:
+        raise ValueError("Brak imienia lub nazwiska")
+    pin = str(emp.get("pin") or "").strip()
+    try:
+        hourly_rate = float(emp.get("hourly_rate") or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"Nieprawidłowa stawka godzinowa: {emp.get('hourly_rate')}")
+    return {
+        "id": allocator.allocate(first_name, last_name),
+        "name": f"{first_name} {last_name}",
+        "pin": pin,
+        "hourly_rate": hourly_rate,
+        "is_admin": False
+    }
+
+_hash_pool = None
+
+def _get_hash_pool():
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=IMPORT_HASH_WORKERS)
+    return _hash_pool
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+async def hash_passwords(passwords):
+    """Hashe bcrypt liczone równolegle w puli procesów, poza pętlą zdarzeń"""
+    global _hash_pool
+    loop = asyncio.get_running_loop()
+    try:
+        pool = _get_hash_pool()
+        return await asyncio.gather(*(loop.run_in_executor(pool, get_password_hash, password)
+                                      for password in passwords))
+    except (BrokenProcessPool, OSError) as e:
+        # Środowisko bez procesów potomnych - liczymy w puli wątków
+        logger.warning(f"Pula procesów do haszowania niedostępna ({str(e)}) - używam puli wątków")
+        _hash_pool = None
+        return await asyncio.gather(*(run_in_threadpool(get_password_hash, password) for password in passwords))
+
+def _insert_chunk(session_factory, rows):
+    """Zapisuje paczkę pracowników jednym commitem; zwraca listę (wiersz, błąd)"""
+    db = session_factory()
+    try:
+        db.add_all(models.Employee(**employee) for _, employee in rows)
+        try:
+            db.commit()
+            return []
+        except IntegrityError:
+            # Któreś ID zajął w międzyczasie inny zapis - paczka pojedynczo
+            db.rollback()
+        errors = []
+        for row, employee in rows:
+            db.add(models.Employee(**employee))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                errors.append((row, f"Pracownik o ID {employee['id']} już istnieje"))
+        return errors
+    finally:
+        db.close()
+
+class ImportJob:
+    """Postęp i wynik jednego importu pracowników"""
+
+    def __init__(self, total=None, session_factory=SessionLocal):
+        self.id = uuid.uuid4().hex
+        self.session_factory = session_factory
+        self.total = total
+        self.processed = 0
+        self.imported = 0
+        self.errors = []
+        self.error_count = 0
+        self.status = "running"
+        self.detail = None
+        self.started_at = dt.datetime.now()
+        self.finished_at = None
+        self.task = None
+        self.done = asyncio.Event()
+
+    def add_error(self, row, error):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_ERRORS_LIMIT:
+            self.errors.append({"row": row, "error": error})
+
+    def finish(self, status="success", detail=None):
+        self.status = status
+        self.detail = detail
+        self.finished_at = dt.datetime.now()
+        self.done.set()
+
+    def result(self):
+        """Wynik w formacie dotychczasowej odpowiedzi endpointu, uzupełniony o postęp"""
+        return {
+            "status": self.status,
+            "job_id": self.id,
+            "imported": self.imported,
+            "processed": self.processed,
+            "errors": self.errors,
+            "error_count": self.error_count,
+            "total": self.total,
+            "detail": self.detail,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+import_jobs = OrderedDict()
+
+def register_job(job):
+    import_jobs[job.id] = job
+    while len(import_jobs) > IMPORT_JOBS_LIMIT:
+        oldest = next(iter(import_jobs.values()))
+        if oldest.status == "running":
+            break
+        import_jobs.popitem(last=False)
+
+async def import_chunk(job, chunk):
+    """Hashuje hasła paczki w puli procesów i zapisuje ją jednym commitem"""
+    hashes = await hash_passwords([employee["pin"] for _, employee in chunk])
+    for (_, employee), password_hash in zip(chunk, hashes):
+        employee["password_hash"] = password_hash  # Domyślnie hasło = PIN
+    failed = await run_in_threadpool(_insert_chunk, job.session_factory, chunk)
+    for row, error in failed:
+        job.add_error(row, error)
+    job.imported += len(chunk) - len(failed)
+
+def _take(rows, count):
+    return list(itertools.islice(rows, count))
+
+async def import_rows(job, rows, parse=None):
+    """Importuje wiersze (numer wiersza, dane) paczkami, aktualizując postęp zadania.
+
+    Wiersze pobierane są paczkami w puli wątków, więc źródłem może być generator
+    czytający plik przyrostowo (csv_records); parse zamienia surowy wiersz na dane
+    pracownika albo zgłasza ValueError z opisem błędu wiersza.
+    """
+    allocator = await run_in_threadpool(_load_allocator, job.session_factory)
+    rows = iter(rows)
+    while True:
+        batch = await run_in_threadpool(_take, rows, IMPORT_CHUNK_SIZE)
+        if not batch:
+            break
+        chunk = []
+        for row, emp in batch:
+            job.processed += 1
+            try:
+                if parse:
+                    emp = parse(emp)
+                chunk.append((row, prepare_employee(emp, allocator)))
+            except ValueError as e:
+                job.add_error(row, str(e))
+        if chunk:
+            await import_chunk(job, chunk)
+
+def _load_allocator(session_factory):
+    db = session_factory()
+    try:
+        return EmployeeIdAllocator.load(db)
+    finally:
+        db.close()
+
+async def _run_job(job, rows, parse=None, cleanup=None):
+    try:
+        await import_rows(job, rows, parse)
+        job.finish()
+        print(f"Import pracowników zakończony: {job.imported} z {job.processed}, błędy: {job.error_count}")
+    except csv.Error as e:
+        job.finish("error", f"Nieprawidłowy plik CSV: {str(e)}")
+    except Exception as e:
+        logger.error(f"Błąd podczas importu pracowników: {str(e)}")
+        job.finish("error", f"Błąd serwera: {str(e)}")
+    finally:
+        if cleanup:
+            cleanup()
+
+def start_import(employees_data, session_factory=SessionLocal):
+    """Uruchamia import listy pracowników jako zadanie w tle"""
+    job = ImportJob(total=len(employees_data), session_factory=session_factory)
+    register_job(job)
+    job.task = asyncio.create_task(_run_job(job, enumerate(employees_data, start=1)))
+    return job
+
+# --- Import z przesłanego pliku CSV (multipart) ----------------------------------
+
+# Nagłówek pliku (pierwszy wiersz) rozpoznajemy po nazwach kolumn
+CSV_HEADER_WORDS = ("imie", "imię", "nazwisko")
+
+def csv_records(stream):
+    """Rekordy pliku CSV (numer wiersza, pola) czytane przyrostowo ze strumienia binarnego.
+
+    Separator (przecinek albo średnik z Excela) rozpoznawany jest z pierwszego
+    wiersza; nagłówek i puste wiersze są pomijane.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    first_line = text.readline()
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+    reader = csv.reader(itertools.chain([first_line], text), delimiter=delimiter)
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        if reader.line_num == 1 and any(word in first_line.lower() for word in CSV_HEADER_WORDS):
+            continue
+        yield reader.line_num, values
+
+def csv_employee(values):
+    """Dane pracownika z wiersza CSV: imie,nazwisko,pin,stawka"""
+    if len(values) != 4:
+        raise ValueError(f"Nieprawidłowa liczba kolumn (oczekiwano: 4, otrzymano: {len(values)})")
+    first_name, last_name, pin, hourly_rate = (value.strip() for value in values)
+    if not pin.isdigit():
+        raise ValueError("PIN musi być liczbą")
+    try:
+        rate = float(hourly_rate.replace(",", "."))
+    except ValueError:
+        raise ValueError("Nieprawidłowa stawka godzinowa")
+    if rate <= 0:
+        raise ValueError("Nieprawidłowa stawka godzinowa")
+    return {"first_name": first_name, "last_name": last_name, "pin": pin, "hourly_rate": rate}
+
+def start_csv_import(upload_file, session_factory=SessionLocal):
+    """Uruchamia import z przesłanego pliku CSV jako zadanie w tle; plik zamykany jest po imporcie"""
+    job = ImportJob(session_factory=session_factory)
+    register_job(job)
+    job.task = asyncio.create_task(_run_job(job, csv_records(upload_file), parse=csv_employee,
+                                            cleanup=upload_file.close))
+    return job
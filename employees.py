@@ -2,19 +2,79 @@
 Endpoint do obsługi zapytań o pracowników, którzy nie mają wpisów za dany okres
 """
 from fastapi import APIRouter, Request, Depends, HTTPException
-from database import get_db
+from database import get_read_db
+from singleflight import shared_result
 import models
 from typing import Optional, List
+from collections import defaultdict
 from datetime import datetime, timedelta
 from fastapi.responses import JSONResponse
+from sqlalchemy import exists
 import logging
 
 logger = logging.getLogger("app")
 router = APIRouter()
 
+# Zwykłe def zamiast async def - FastAPI uruchamia endpoint w puli wątków
+
+def find_employees_without_logs(db, date_from_obj, date_to_obj):
+    """Pracownicy bez żadnej zmiany rozpoczętej w okresie.
+
+    Jedno zapytanie z anty-złączeniem (NOT EXISTS) do dziennego podsumowania
+    daily_attendance zamiast osobnego COUNT na zmianach dla każdego pracownika.
+    """
+    daily = models.DailyAttendance
+    has_logs = exists().where(
+        daily.employee_id == models.Employee.id,
+        daily.date >= date_from_obj,
+        daily.date <= date_to_obj,
+        daily.shift_count > 0
+    )
+    rows = db.query(models.Employee.id, models.Employee.name).filter(~has_logs).order_by(models.Employee.id)
+    return [{"id": row.id, "name": row.name} for row in rows]
+
+def find_employees_without_logs_by_day(db, date_from_obj, date_to_obj):
+    """Dla każdego dnia okresu pracownicy, którzy nie rozpoczęli tego dnia żadnej zmiany.
+
+    Obecności całego okresu pobierane są jednym przebiegiem po daily_attendance
+    (pary dzień-pracownik), a braki wyznaczane są w pamięci dla każdego dnia.
+    Dane pracownika podawane są raz w "employees" (id -> imię), a dni zawierają
+    tylko identyfikatory nieobecnych, więc odpowiedź nie powtarza nazwisk dla
+    każdego dnia okresu.
+    """
+    daily = models.DailyAttendance
+    employees = db.query(models.Employee.id, models.Employee.name).order_by(models.Employee.id).all()
+
+    present = defaultdict(set)
+    rows = db.query(daily.date, daily.employee_id).filter(
+        daily.date >= date_from_obj,
+        daily.date <= date_to_obj,
+        daily.shift_count > 0
+    )
+    for day, employee_id in rows:
+        present[day].add(employee_id)
+
+    absent_names = {}
+    days = []
+    day = date_from_obj
+    while day <= date_to_obj:
+        present_ids = present.get(day, ())
+        absent_ids = []
+        for employee in employees:
+            if employee.id not in present_ids:
+                absent_ids.append(employee.id)
+                absent_names[employee.id] = employee.name
+        days.append({"date": day.strftime("%Y-%m-%d"), "employee_ids": absent_ids})
+        day += timedelta(days=1)
+    return {"employees": absent_names, "days": days}
+
 @router.get("/api/employees_without_logs")
-async def get_employees_without_logs(request: Request, date_from: str, date_to: str):
-    """Zwraca listę pracowników, którzy nie mają wpisów w dzienniku za dany okres"""
+def get_employees_without_logs(request: Request, date_from: str, date_to: str, per_day: bool = False):
+    """Zwraca listę pracowników, którzy nie mają wpisów w dzienniku za dany okres.
+
+    Z per_day=true zwraca słownik pracowników (id -> imię) oraz listę dni okresu
+    z identyfikatorami pracowników bez wpisu danego dnia.
+    """
     print(f"Pobieranie pracowników bez wpisów w okresie: {date_from} - {date_to}")
     user = request.session.get("user")
     # Wyłączamy tymczasowo sprawdzanie autoryzacji dla testów
@@ -30,30 +90,18 @@ async def get_employees_without_logs(request: Request, date_from: str, date_to:
         date_to_obj = datetime.strptime(date_to, "%Y-%m-%d").date()
         
         # Pobierz połączenie z bazą danych
-        db = next(get_db())
-        
-        # Pobierz wszystkich pracowników
-        all_employees = db.query(models.Employee).all()
-        
-        # Lista pracowników bez wpisów w zadanym okresie
-        employees_without_logs = []
+        db = get_read_db(request)
         
-        for employee in all_employees:
-            # Sprawdź, czy pracownik ma jakiekolwiek wpisy w danym okresie
-            shift_count = db.query(models.Shift).filter(
-                models.Shift.employee_id == employee.id,
-                models.Shift.start_time >= datetime.combine(date_from_obj, datetime.min.time()),
-                models.Shift.start_time <= datetime.combine(date_to_obj, datetime.max.time())
-            ).count()
-            
-            # Jeśli nie ma wpisów, dodaj do listy
-            if shift_count == 0:
-                employees_without_logs.append({
-                    "id": employee.id,
-                    "name": employee.name
-                })
+        if date_from_obj > date_to_obj:
+            return JSONResponse(
+                status_code=400,
+                content={"detail": "Data początkowa nie może być późniejsza niż data końcowa"}
+            )
         
-        return employees_without_logs
+        # Równoczesne identyczne żądania dzielą jedno obliczenie
+        find = find_employees_without_logs_by_day if per_day else find_employees_without_logs
+        return shared_result(db, "employees_without_logs", (date_from_obj, date_to_obj, per_day),
+                             lambda: find(db, date_from_obj, date_to_obj))
     except Exception as e:
         logger.error(f"Błąd podczas pobierania pracowników bez wpisów: {str(e)}")
         return JSONResponse(
@@ -63,7 +111,7 @@ async def get_employees_without_logs(request: Request, date_from: str, date_to:
 
 # Przekierowanie dla starego endpointu
 @router.get("/employees_without_logs")
-async def get_employees_without_logs_redirect(request: Request, date_from: str, date_to: str):
+def get_employees_without_logs_redirect(request: Request, date_from: str, date_to: str, per_day: bool = False):
     """Przekierowanie dla endpointu /employees_without_logs"""
     print(f"Przekierowuję /employees_without_logs do /api/employees_without_logs dla okresu {date_from} - {date_to}")
-    return await get_employees_without_logs(request, date_from, date_to)
+    return get_employees_without_logs(request, date_from, date_to, per_day)
@@ -0,0 +1,334 @@
+"""
+Kanał zdarzeń na żywo dla panelu administratora (Server-Sent Events)
+
+Zamiast odpytywać co 30 sekund endpointy statystyk, aktywności, urządzeń
+i logów PIN, komponenty panelu subskrybują GET /api/events i dostają:
+  - shift_started / shift_stopped - rozpoczęcie i zakończenie zmiany,
+  - force_stop                    - awaryjne zakończenie zmiany przez administratora,
+  - pin_attempt                   - próba weryfikacji PIN (bez wprowadzonego PIN-u),
+  - device_log / device_alert     - nowe urządzenie i alert bezpieczeństwa urządzenia.
+
+Zdarzenia publikowane są po commicie sesji SessionLocal (hooki jak w active_shifts.py),
+a zapisy wykonywane surowym SQL (pin_logs) publikują je jawnie przez event_bus.publish().
+Ostatnie EVENTS_BUFFER_SIZE zdarzeń jest trzymanych w pamięci - klient po zerwaniu
+połączenia wznawia od nagłówka Last-Event-ID (lub parametru ?since=). Jeśli kursor jest
+nieznany (restart serwera) albo zbyt stary, klient dostaje zdarzenie reset i powinien
+raz przeładować dane przez zwykłe endpointy.
+Zdarzenia są lokalne dla procesu - przy kilku serwerach API każdy ma własny kanał.
+"""
+import asyncio
+import datetime as dt
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import get_history
+
+import models
+from active_shifts import active_shifts
+
+logger = logging.getLogger("app")
+
+EVENTS_BUFFER_SIZE = int(os.environ.get("EVENTS_BUFFER_SIZE", "1000"))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "500"))
+
+# Czas, po którym przeglądarka ponawia połączenie (pole retry w strumieniu SSE)
+EVENTS_RETRY_MS = 3000
+
+class Subscription:
+    """Kolejka zdarzeń jednego połączenia SSE (w pętli zdarzeń, która je obsługuje)"""
+
+    def __init__(self, loop, maxsize=EVENTS_QUEUE_SIZE):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.overflow = False
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Klient nie nadąża - zamiast zdarzeń dostanie reset
+            self.overflow = True
+
+    def deliver(self, item):
+        self.loop.call_soon_threadsafe(self._put, item)
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflow = False
+
+class EventBus:
+    """Bufor ostatnich zdarzeń i lista subskrybentów"""
+
+    def __init__(self, buffer_size=EVENTS_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._seq = 0
+        # Identyfikatory zdarzeń mają postać "<epoka>-<numer>"; epoka zmienia się po restarcie
+        self.epoch = format(int(time.time() * 1000), "x")
+        self.published = 0
+
+    @property
+    def last_id(self):
+        with self._lock:
+            return f"{self.epoch}-{self._seq}"
+
+    def publish(self, event_type, data, activity=None):
+        with self._lock:
+            self._seq += 1
+            item = {
+                "id": f"{self.epoch}-{self._seq}",
+                "seq": self._seq,
+                "type": event_type,
+                "time": dt.datetime.now().isoformat(timespec="seconds"),
+                "data": data,
+                "activity": activity
+            }
+            self._buffer.append(item)
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(item)
+            except RuntimeError:
+                # Pętla zdarzeń subskrybenta została już zamknięta
+                self.unsubscribe(subscription)
+        return item
+
+    def _parse_cursor(self, cursor):
+        epoch, _, seq = (cursor or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _events_after(self, cursor):
+        """Zdarzenia po kursorze; None, jeśli kursor jest nieznany lub wypadł z bufora"""
+        seq = self._parse_cursor(cursor)
+        if seq is None or seq > self._seq:
+            return None
+        oldest = self._buffer[0]["seq"] if self._buffer else self._seq + 1
+        if seq < oldest - 1:
+            return None
+        return [item for item in self._buffer if item["seq"] > seq]
+
+    def events_after(self, cursor):
+        with self._lock:
+            return self._events_after(cursor)
+
+    def subscribe(self, loop, cursor=None):
+        """Rejestruje subskrybenta i zwraca (subskrypcja, zaległe zdarzenia).
+
+        Zaległe zdarzenia to None, gdy kursor nie pozwala wznowić strumienia
+        (klient powinien dostać reset). Brak kursora oznacza nowe połączenie
+        bez zaległości.
+        """
+        subscription = Subscription(loop)
+        with self._lock:
+            backlog = self._events_after(cursor) if cursor else []
+            self._subscribers.add(subscription)
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def recent(self, limit=50):
+        """Najnowsze zdarzenia (najnowsze na początku)"""
+        with self._lock:
+            return list(reversed(self._buffer))[:limit]
+
+    def status(self):
+        with self._lock:
+            return {
+                "last_id": f"{self.epoch}-{self._seq}",
+                "published": self.published,
+                "buffered": len(self._buffer),
+                "buffer_size": self._buffer.maxlen,
+                "subscribers": len(self._subscribers)
+            }
+
+event_bus = EventBus()
+
+def format_sse(item=None, event_type=None, event_id=None, data=None):
+    """Kodowanie zdarzenia w formacie text/event-stream"""
+    if item is not None:
+        event_type, event_id = item["type"], item["id"]
+        data = {"time": item["time"], "data": item["data"], "activity": item["activity"]}
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+async def event_stream(request, cursor=None, bus=event_bus, heartbeat=EVENTS_HEARTBEAT_SECONDS):
+    """Generator strumienia SSE dla jednego klienta"""
+    subscription, backlog = bus.subscribe(asyncio.get_running_loop(), cursor)
+    try:
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        if backlog is None:
+            yield format_sse(event_type="reset", event_id=bus.last_id, data={"reason": "cursor"})
+        else:
+            for item in backlog:
+                yield format_sse(item)
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # Komentarz utrzymujący połączenie przez proxy
+                yield ": ping\n\n"
+                continue
+            if subscription.overflow:
+                subscription.drain()
+                logger.warning("Klient kanału zdarzeń nie nadąża - wysłano reset")
+                yield format_sse(event_type="reset", event_id=bus.last_id, data={"reason": "overflow"})
+                continue
+            yield format_sse(item)
+    finally:
+        bus.unsubscribe(subscription)
+
+# --- Zdarzenia z zatwierdzonych transakcji -------------------------------------
+
+def _employee_name(employee_id):
+    employee = active_shifts.employee(employee_id)
+    return (employee or {}).get("name") or employee_id
+
+def _activity(activity_type, title, description, user, icon):
+    """Pozycja w formacie komponentu recent-activity.html"""
+    return {
+        "type": activity_type,
+        "title": title,
+        "description": description,
+        "user": user,
+        "time": dt.datetime.now().isoformat(timespec="seconds"),
+        "icon": icon
+    }
+
+def _shift_events(shift, is_new):
+    name = _employee_name(shift.employee_id)
+    if is_new:
+        if shift.stop_time is None and shift.start_time is not None:
+            yield "shift_started", {
+                "shift_id": shift.id,
+                "worker_id": shift.employee_id,
+                "name": name,
+                "start_time": shift.start_time,
+                "location": shift.start_location
+            }, _activity("checkin", "Wejście do pracy", f"{name} rozpoczął pracę", name, "fas fa-clock")
+        return
+
+    history = get_history(shift, "stop_time")
+    if history.added and history.added[0] is not None and not any(history.deleted):
+        yield _shift_stopped_event(shift, name)
+
+def _shift_stopped_event(shift, name):
+    return "shift_stopped", {
+        "shift_id": shift.id,
+        "worker_id": shift.employee_id,
+        "name": name,
+        "stop_time": shift.stop_time,
+        "location": shift.stop_location,
+        "duration_min": shift.duration_min
+    }, _activity("checkout", "Wyjście z pracy", f"{name} zakończył pracę", name, "fas fa-clock")
+
+def queue_shift_events(session, started, stopped):
+    """Zdarzenia zmian zapisanych zbiorczo (insert/update z pominięciem jednostki pracy ORM),
+    publikowane po commicie sesji jak pozostałe"""
+    pending = session.info.setdefault("pending_events", [])
+    for shift in started:
+        pending.extend(_shift_events(shift, is_new=True))
+    for shift in stopped:
+        pending.append(_shift_stopped_event(shift, _employee_name(shift.employee_id)))
+
+def pin_attempt_event(worker_id, device_id, device_model, pin_correct, access_granted, source):
+    """Zdarzenie próby weryfikacji PIN (wprowadzony PIN nigdy nie trafia do kanału)"""
+    name = _employee_name(worker_id)
+    result = "poprawny" if pin_correct else "błędny"
+    return "pin_attempt", {
+        "worker_id": worker_id,
+        "name": name,
+        "device_id": device_id,
+        "device_model": device_model,
+        "pin_correct": bool(pin_correct),
+        "access_granted": bool(access_granted),
+        "source": source
+    }, _activity("login", "Weryfikacja PIN", f"{name}: {result} PIN ({device_model or 'nieznane urządzenie'})",
+                 name, "fas fa-key" if pin_correct else "fas fa-exclamation-triangle")
+
+def config_changed_event(revision, config_version):
+    """Zdarzenie zmiany ustawień (config_store.py) - także zapisanej przez inny proces"""
+    return "config_changed", {
+        "revision": revision,
+        "config_version": config_version
+    }, _activity("system", "Zmiana ustawień", f"Zapisano ustawienia (rewizja {revision}, wersja {config_version})",
+                 "System", "fas fa-cog")
+
+def _new_object_events(obj):
+    if isinstance(obj, models.StatisticsAccessLog):
+        yield pin_attempt_event(obj.worker_id, obj.device_id, obj.device_model,
+                                obj.pin_correct, obj.access_granted, "statistics")
+    elif isinstance(obj, models.DeviceLog):
+        name = _employee_name(obj.worker_id)
+        yield "device_log", {
+            "id": obj.id,
+            "worker_id": obj.worker_id,
+            "device_id": obj.device_id,
+            "device_model": obj.device_model,
+            "is_approved": bool(obj.is_approved),
+            "is_suspicious": bool(obj.is_suspicious)
+        }, _activity("system", "Nowe urządzenie", f"{name}: {obj.device_model or obj.device_id}",
+                     name, "fas fa-mobile-alt")
+    elif isinstance(obj, models.DeviceSecurityAlert):
+        name = _employee_name(obj.worker_id)
+        yield "device_alert", {
+            "id": obj.id,
+            "worker_id": obj.worker_id,
+            "alert_type": obj.alert_type,
+            "old_device_id": obj.old_device_id,
+            "new_device_id": obj.new_device_id,
+            "new_device_model": obj.new_device_model
+        }, _activity("system", "Alert urządzenia", f"{name}: zmiana urządzenia ({obj.alert_type})",
+                     name, "fas fa-shield-alt")
+    elif isinstance(obj, models.AdminLog) and obj.action_type == "FORCE_STOP":
+        name = _employee_name(obj.target_id)
+        yield "force_stop", {
+            "worker_id": obj.target_id,
+            "name": name,
+            "admin_id": obj.admin_id,
+            "notes": obj.notes
+        }, _activity("checkout", "Awaryjne zakończenie zmiany", f"{obj.admin_id} zakończył zmianę: {name}",
+                     obj.admin_id, "fas fa-stop-circle")
+
+def _collect_events(session, flush_context):
+    pending = session.info.setdefault("pending_events", [])
+    for obj in session.new:
+        if isinstance(obj, models.Shift):
+            pending.extend(_shift_events(obj, is_new=True))
+        else:
+            pending.extend(_new_object_events(obj))
+    for obj in session.dirty:
+        if isinstance(obj, models.Shift):
+            pending.extend(_shift_events(obj, is_new=False))
+
+def _publish_events(session):
+    pending = session.info.pop("pending_events", None)
+    for event_type, data, activity in pending or ():
+        event_bus.publish(event_type, data, activity)
+
+def _discard_events(session):
+    session.info.pop("pending_events", None)
+
+def install_event_hooks(session_factory):
+    """Podpina publikację zdarzeń pod commit sesji z podanej fabryki"""
+    event.listen(session_factory, "after_flush", _collect_events)
+    event.listen(session_factory, "after_commit", _publish_events)
+    event.listen(session_factory, "after_rollback", _discard_events)
@@ -0,0 +1,275 @@
+"""
+Eksport raportów obecności do plików CSV i XLSX (po stronie serwera)
+
+Plik generuje osobny wątek (singleflight.shared_stream): wiersze czytane są
+z bazy paczkami po EXPORT_CHUNK_SIZE (yield_per) i zapisywane do pliku
+tymczasowego tak szybko, jak dostarcza je baza - bez czekania na klienta.
+Odpowiedź StreamingResponse czyta ten plik w miarę jego powstawania; każde
+pobieranie zajmuje na ten czas wątek z puli (czekanie na kolejne porcje),
+a generowanie kończy się przed czasem tylko wtedy, gdy rozłączą się wszyscy
+pobierający. Pamięć nie zależy od zakresu dat ani liczby pracowników - rośnie
+plik tymczasowy na dysku.
+
+  - CSV  - UTF-8 z BOM (Excel rozpoznaje polskie znaki), separator przecinek,
+  - XLSX - arkusz zapisywany przyrostowo jako strumień ZIP (zipfile, bez
+           dodatkowych bibliotek), komórki z tekstem jako inlineStr.
+
+Endpointy:
+  - /api/export/attendance_summary  - podsumowanie wszystkich pracowników,
+  - /api/export/attendance_details  - zmiany pracownika albo wszystkich (bez worker_id),
+  - /api/export/attendance_by_date  - zmiany z jednego dnia.
+
+Równoczesne identyczne eksporty (ten sam plik z tych samych danych) generowane są
+raz i czytane przez wszystkie żądania z tego samego pliku tymczasowego.
+"""
+import csv
+import io
+import os
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+
+import models
+from attendance import summary_query, summary_row, shift_details
+from database import get_read_db
+from singleflight import shared_stream
+
+router = APIRouter()
+
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "1000"))
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+SUMMARY_COLUMNS = ["ID", "Imię i nazwisko", "Czas pracy", "Godziny", "Zakończone zmiany", "Średnia zmiana",
+                   "Dni obecności", "Soboty", "Niedziele", "Stawka"]
+DETAILS_COLUMNS = ["ID pracownika", "Imię i nazwisko", "Data", "Start", "Stop", "Czas pracy", "Minuty",
+                   "Typ", "Urlop", "Chorobowe", "Kwota"]
+BY_DATE_COLUMNS = ["ID pracownika", "Imię i nazwisko", "Data", "Start", "Stop", "Czas pracy", "Minuty"]
+
+# Kolumny zmiany potrzebne do shift_details (bez ładowania obiektów ORM)
+SHIFT_COLUMNS = (
+    models.Shift.id, models.Shift.employee_id, models.Shift.start_time, models.Shift.stop_time,
+    models.Shift.status, models.Shift.is_holiday, models.Shift.is_sick,
+    models.Shift.start_latitude, models.Shift.start_longitude,
+    models.Shift.stop_latitude, models.Shift.stop_longitude
+)
+
+# Znaki sterujące niedozwolone w XML
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_SAFE_FILENAME = re.compile(r"[^\w.-]")
+
+def csv_stream(header, chunks):
+    """Plik CSV generowany paczkami wierszy"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+class _ZipSink(io.RawIOBase):
+    """Niepozycjonowalny plik dla zipfile - zapisane bajty odbierane są przez drain()"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+def _xlsx_workbook(sheet_name):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = _INVALID_XML_CHARS.sub("", str(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+def _xlsx_rows(rows):
+    return "".join("<row>" + "".join(_xlsx_cell(value) for value in row) + "</row>" for row in rows).encode("utf-8")
+
+def xlsx_stream(header, chunks, sheet_name="Raport"):
+    """Plik XLSX generowany paczkami wierszy (arkusz zapisywany przyrostowo do strumienia ZIP)"""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr("xl/workbook.xml", _xlsx_workbook(sheet_name))
+        with archive.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(_xlsx_rows([header]))
+            for rows in chunks:
+                sheet.write(_xlsx_rows(rows))
+                yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+def export_response(db, export_format, filename, header, make_chunks, sheet_name):
+    """Odpowiedź strumieniowa z plikiem w wybranym formacie; make_chunks(db) zwraca paczki wierszy"""
+    def produce(session):
+        chunks = make_chunks(session)
+        return xlsx_stream(header, chunks, sheet_name) if export_format == "xlsx" else csv_stream(header, chunks)
+    return StreamingResponse(
+        shared_stream(db, "export", (filename, export_format), produce),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{_SAFE_FILENAME.sub("_", filename)}.{export_format}"'}
+    )
+
+def query_chunks(db, statement, convert):
+    """Paczki wierszy wyniku zapytania (kursor czytany przyrostowo) przekształcone funkcją convert"""
+    result = db.execute(statement.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+    for partition in result.partitions():
+        yield [convert(row) for row in partition]
+
+def summary_export_row(row):
+    summary = summary_row(row)
+    return [summary["id"], summary["name"], summary["total_time"], round(summary["total_hours"], 2),
+            summary["completed_shifts"], summary["avg_shift"], summary["days_present"],
+            summary["saturdays"], summary["sundays"], summary["rate"]]
+
+def details_export_row(row):
+    details = shift_details(row, row.name, row.hourly_rate)
+    return [row.employee_id, row.name, details["date"], details["start"], details["stop"], details["duration"],
+            details["duration_min"], details["typ"], details["is_holiday"], details["is_sick"],
+            round(details["kwota"], 2)]
+
+def by_date_export_row(row):
+    details = shift_details(row, row.name, None)
+    return [row.employee_id, row.name, details["date"], details["start"], details["stop"], details["duration"],
+            details["duration_min"]]
+
+def shifts_statement(date_from_obj, date_to_obj, worker_id=None):
+    """Zmiany rozpoczęte w okresie z nazwą i stawką pracownika, posortowane po pracowniku i czasie"""
+    statement = select(*SHIFT_COLUMNS, models.Employee.name, models.Employee.hourly_rate).join(
+        models.Employee, models.Employee.id == models.Shift.employee_id
+    ).where(
+        models.Shift.start_time >= datetime.combine(date_from_obj, datetime.min.time()),
+        models.Shift.start_time <= datetime.combine(date_to_obj, datetime.max.time())
+    )
+    if worker_id:
+        statement = statement.where(models.Shift.employee_id == worker_id)
+    return statement.order_by(models.Shift.employee_id, models.Shift.start_time)
+
+def _check_request(request, export_format, **dates):
+    """Sprawdza sesję, format i daty; zwraca (odpowiedź błędu, daty jako obiekty date)"""
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse(status_code=401, content={"detail": "Nieautoryzowany dostęp"}), None
+    if export_format not in EXPORT_MEDIA_TYPES:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": f"Nieobsługiwany format: {export_format} (dostępne: csv, xlsx)"}
+        ), None
+    try:
+        parsed = {name: datetime.strptime(value, "%Y-%m-%d").date() for name, value in dates.items()}
+    except (TypeError, ValueError):
+        return JSONResponse(
+            status_code=400,
+            content={"detail": "Nieprawidłowy format daty. Używaj formatu: YYYY-MM-DD"}
+        ), None
+    if "date_from" in parsed and parsed["date_from"] > parsed["date_to"]:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": "Data początkowa nie może być późniejsza niż data końcowa"}
+        ), None
+    return None, parsed
+
+@router.get("/api/export/attendance_summary")
+def export_attendance_summary(request: Request, date_from: str, date_to: str, format: str = "csv"):
+    """Eksport podsumowania obecności wszystkich pracowników"""
+    error, dates = _check_request(request, format, date_from=date_from, date_to=date_to)
+    if error:
+        return error
+    def make_chunks(session):
+        statement = summary_query(session, dates["date_from"], dates["date_to"]).statement
+        return query_chunks(session, statement, summary_export_row)
+    return export_response(get_read_db(request), format, f"ewidencja_obecnosci_{date_from}_{date_to}",
+                           SUMMARY_COLUMNS, make_chunks, "Ewidencja obecności")
+
+@router.get("/api/export/attendance_details")
+def export_attendance_details(request: Request, date_from: str, date_to: str,
+                              worker_id: str = None, format: str = "csv"):
+    """Eksport zmian pracownika (albo wszystkich pracowników, gdy brak worker_id)"""
+    error, dates = _check_request(request, format, date_from=date_from, date_to=date_to)
+    if error:
+        return error
+    db = get_read_db(request)
+    if worker_id and db.get(models.Employee, worker_id) is None:
+        return JSONResponse(
+            status_code=404,
+            content={"detail": f"Nie znaleziono pracownika o ID: {worker_id}"}
+        )
+    statement = shifts_statement(dates["date_from"], dates["date_to"], worker_id)
+    filename = f"szczegoly_{worker_id or 'wszyscy'}_{date_from}_{date_to}"
+    return export_response(db, format, filename, DETAILS_COLUMNS,
+                           lambda session: query_chunks(session, statement, details_export_row), "Szczegóły obecności")
+
+@router.get("/api/export/attendance_by_date")
+def export_attendance_by_date(request: Request, date: str, format: str = "csv"):
+    """Eksport zmian rozpoczętych w danym dniu"""
+    error, dates = _check_request(request, format, date=date)
+    if error:
+        return error
+    statement = shifts_statement(dates["date"], dates["date"])
+    return export_response(get_read_db(request), format, f"obecnosci_{date}", BY_DATE_COLUMNS,
+                           lambda session: query_chunks(session, statement, by_date_export_row), f"Obecności {date}")
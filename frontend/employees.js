@@ -38,87 +38,44 @@ async function handleCsvImport(e) {
   const importMessage = document.getElementById('importMessage');
   importMessage.innerHTML = '<span class="text-info"><i class="fas fa-spinner fa-spin"></i> Przetwarzanie pliku CSV...</span>';
   try {
-    const text = await file.text();
-    // Parsowanie CSV: zakładamy format: imie,nazwisko,pin,stawka
-    const lines = text.split(/\r?\n/).filter(l => l.trim());
-    const employees = [];
-    let lineNumber = 0;
-    const errors = [];
-    
-    for(const line of lines) {
-      lineNumber++;
-      if(lineNumber === 1 && line.toLowerCase().includes('imie') || line.toLowerCase().includes('nazwisko')) {
-        continue; // Pomijamy nagłówek
-      }
-      
-      const values = line.split(',').map(v => v.trim());
-      if(values.length !== 4) {
-        errors.push(`Wiersz ${lineNumber}: Nieprawidłowa liczba kolumn (oczekiwano: 4, otrzymano: ${values.length})`);
-        continue;
-      }
-      
-      const [first_name, last_name, pin, hourly_rate] = values;
-      
-      if(!first_name || !last_name) {
-        errors.push(`Wiersz ${lineNumber}: Brak imienia lub nazwiska`);
-        continue;
-      }
-      
-      if(!/^\d+$/.test(pin)) {
-        errors.push(`Wiersz ${lineNumber}: PIN musi być liczbą`);
-        continue;
-      }
-      
-      const rate = parseFloat(hourly_rate);
-      if(isNaN(rate) || rate <= 0) {
-        errors.push(`Wiersz ${lineNumber}: Nieprawidłowa stawka godzinowa`);
-        continue;
-      }
-      
-      employees.push({
-        first_name, 
-        last_name, 
-        pin,
-        hourly_rate: rate
-      });
-    }
-    
-    if(errors.length > 0) {
-      importMessage.innerHTML = `<div class="alert alert-warning">
-        <strong>Znaleziono błędy w pliku:</strong><br>
-        ${errors.join('<br>')}
-      </div>`;
-      return;
-    }
-    
-    if(employees.length === 0) throw new Error('Brak poprawnych danych w pliku CSV.');
-    // Wyślij do backendu
+    // Plik wysyłany bez parsowania - serwer czyta go przyrostowo i zwraca błędy z numerami wierszy
+    // (format: imie,nazwisko,pin,stawka; separator przecinek albo średnik)
+    const formData = new FormData();
+    formData.append('file', file);
     const apiUrl = getApiUrl('/import_employees_csv');
     const response = await fetch(apiUrl, {
       method: 'POST',
-      headers: {'Content-Type': 'application/json'},
-      body: JSON.stringify({employees})
+      body: formData
     });
     
-    const result = await response.json();
+    let result = await response.json();
     
     if(!response.ok) {
       throw new Error(result.detail || 'Wystąpił błąd podczas importu');
     }
     
+    // Duży import trwa dalej na serwerze (202) - czekamy na wynik, pokazując postęp
+    if(response.status === 202) {
+      result = await waitForImport(result, importMessage);
+    }
+    
     let message = `<div class="alert alert-success">
       Pomyślnie zaimportowano ${result.imported} pracowników.
     </div>`;
     
     if(result.errors && result.errors.length > 0) {
+      const hidden = (result.error_count || result.errors.length) - result.errors.length;
       message += `<div class="alert alert-warning">
-        <strong>Wystąpiły problemy przy imporcie niektórych rekordów:</strong><br>
+        <strong>Wystąpiły problemy przy imporcie niektórych rekordów (${result.error_count || result.errors.length}):</strong><br>
         ${result.errors.map(err => `Wiersz ${err.row}: ${err.error}`).join('<br>')}
+        ${hidden > 0 ? `<br>... i ${hidden} kolejnych` : ''}
       </div>`;
     }
     
     importMessage.innerHTML = message;
-    if(response.ok) {
+    if(result.errors && result.errors.length > 0) {
+      loadEmployeesTable();
+    } else if(response.ok) {
       importMessage.innerHTML = '<span class="text-success"><i class="fas fa-check"></i> Import zakończony sukcesem!</span>';
       loadEmployeesTable();
     } else {
@@ -132,6 +89,25 @@ async function handleCsvImport(e) {
 }
 });
 
+// Odpytuje serwer o postęp importu uruchomionego w tle, aż się zakończy
+async function waitForImport(job, importMessage) {
+  while(job.status === 'running') {
+    // Przy imporcie z pliku liczba wierszy nie jest znana z góry (total = null)
+    const progress = job.total ? `${job.processed}/${job.total} (${Math.round(job.processed * 100 / job.total)}%)` : `${job.processed} wierszy`;
+    importMessage.innerHTML = `<span class="text-info"><i class="fas fa-spinner fa-spin"></i> Import w toku: ${progress}, zaimportowano ${job.imported}</span>`;
+    await new Promise(resolve => setTimeout(resolve, 1000));
+    const response = await fetch(getApiUrl(`/import_employees_csv/${job.job_id}`));
+    job = await response.json();
+    if(!response.ok) {
+      throw new Error(job.detail || 'Nie można pobrać postępu importu');
+    }
+  }
+  if(job.status === 'error') {
+    throw new Error(job.detail || 'Wystąpił błąd podczas importu');
+  }
+  return job;
+}
+
 // Funkcja odświeżania listy pracowników
 function loadEmployees() {
   loadEmployeesTable();
@@ -0,0 +1,145 @@
+// Kanał zdarzeń na żywo (SSE, /api/events) współdzielony przez komponenty panelu.
+//
+// Użycie:
+//   const unsubscribe = LiveEvents.subscribe(['shift_started', 'shift_stopped'], (type, payload) => {...}, {
+//       fallback: loadStats,   // wywoływane zamiast zdarzeń, gdy kanał nie działa (oraz po resecie)
+//       interval: 30000,       // co ile odpytywać w trybie awaryjnym
+//       debounce: 1000         // łączenie serii zdarzeń w jedno wywołanie handlera
+//   });
+//
+// Jedno połączenie EventSource obsługuje wszystkie subskrypcje na stronie. Przeglądarka
+// sama wznawia połączenie z nagłówkiem Last-Event-ID; gdy serwer nie może wznowić
+// strumienia (restart, zbyt stary kursor), wysyła zdarzenie reset i subskrybenci
+// przeładowują dane funkcją fallback. Gdy kanał jest niedostępny, komponenty wracają
+// do odpytywania w dotychczasowym rytmie.
+(function () {
+    if (window.LiveEvents) {
+        return;
+    }
+
+    const EVENTS_URL = '/api/events';
+    const EVENT_TYPES = ['shift_started', 'shift_stopped', 'force_stop', 'pin_attempt', 'device_log', 'device_alert'];
+    // Po tylu nieudanych próbach połączenia z rzędu przechodzimy na odpytywanie
+    const MAX_FAILURES = 3;
+    const RECONNECT_DELAY = 60000;
+
+    const subscriptions = new Set();
+    let source = null;
+    let connected = false;
+    let failures = 0;
+    let reconnectTimer = null;
+    let polling = false;
+
+    function startPolling(sub) {
+        if (!sub.fallback || sub.timer) return;
+        sub.timer = setInterval(() => {
+            if (!document.hidden) sub.fallback();
+        }, sub.interval);
+    }
+
+    function stopPolling(sub) {
+        if (sub.timer) {
+            clearInterval(sub.timer);
+            sub.timer = null;
+        }
+    }
+
+    function notify(sub, type, payload) {
+        if (!sub.debounce) {
+            sub.handler(type, payload);
+            return;
+        }
+        clearTimeout(sub.debounceTimer);
+        sub.debounceTimer = setTimeout(() => sub.handler(type, payload), sub.debounce);
+    }
+
+    function dispatch(type, message) {
+        let payload = null;
+        try {
+            payload = JSON.parse(message.data);
+        } catch (_) { /* zdarzenie bez danych */ }
+        subscriptions.forEach(sub => {
+            if (sub.types.includes(type)) notify(sub, type, payload);
+        });
+    }
+
+    function reset() {
+        subscriptions.forEach(sub => sub.fallback && sub.fallback());
+    }
+
+    function fallBackToPolling() {
+        if (source) {
+            source.close();
+            source = null;
+        }
+        connected = false;
+        polling = true;
+        subscriptions.forEach(startPolling);
+        console.warn('⚠️ Kanał zdarzeń niedostępny - odświeżanie cykliczne');
+        clearTimeout(reconnectTimer);
+        reconnectTimer = setTimeout(connect, RECONNECT_DELAY);
+    }
+
+    function connect() {
+        if (source || !window.EventSource || subscriptions.size === 0) {
+            if (!window.EventSource) subscriptions.forEach(startPolling);
+            return;
+        }
+        reconnectTimer = null;
+        source = new EventSource(EVENTS_URL, { withCredentials: true });
+
+        source.onopen = () => {
+            const wasConnected = connected;
+            connected = true;
+            failures = 0;
+            subscriptions.forEach(stopPolling);
+            if (polling) {
+                // Nowe połączenie nie ma kursora - dane mogły się zmienić od ostatniego odpytania
+                polling = false;
+                reset();
+            }
+            if (!wasConnected) console.log('📡 Połączono z kanałem zdarzeń');
+        };
+        source.onerror = () => {
+            connected = false;
+            failures++;
+            // CLOSED oznacza, że przeglądarka nie ponowi połączenia (np. 401)
+            if (source.readyState === EventSource.CLOSED || failures >= MAX_FAILURES) {
+                fallBackToPolling();
+            }
+        };
+        EVENT_TYPES.forEach(type => source.addEventListener(type, message => dispatch(type, message)));
+        source.addEventListener('reset', reset);
+    }
+
+    window.LiveEvents = {
+        subscribe(types, handler, options = {}) {
+            const sub = {
+                types,
+                handler,
+                fallback: options.fallback || null,
+                interval: options.interval || 30000,
+                debounce: options.debounce || 0,
+                timer: null,
+                debounceTimer: null
+            };
+            subscriptions.add(sub);
+            if (source) {
+                if (!connected) startPolling(sub);
+            } else if (polling) {
+                startPolling(sub);
+            } else {
+                connect();
+            }
+            return () => {
+                stopPolling(sub);
+                clearTimeout(sub.debounceTimer);
+                subscriptions.delete(sub);
+            };
+        },
+
+        get connected() {
+            return connected;
+        }
+    };
+})();
@@ -2,8 +2,9 @@
 Tworzy endpoint do obsługi zapisu danych obecności pracownika
 """
 from fastapi import APIRouter, Request, Depends, HTTPException
-from database import get_db
-import models
+from database import get_request_db
+from shift_service import record_shift, record_batch_shifts, update_shift, delete_shift, ShiftError
+from write_queue import execute_write
 from typing import Optional, List
 from datetime import datetime, timedelta
 from fastapi.responses import JSONResponse
@@ -58,41 +59,23 @@ async def add_log_entry(request: Request):
                 content={"detail": "Czas rozpoczęcia musi być wcześniejszy niż czas zakończenia"}
             )
         
-        # Oblicz czas trwania w minutach
-        duration = stop_time - start_time
-        duration_minutes = int(duration.total_seconds() // 60)
+        db = get_request_db(request)
         
-        db = next(get_db())
-        
-        # Znajdź pracownika
-        employee = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
-        if not employee:
+        # Zapis przez kolejkę zapisów albo w puli wątków (write_queue.py)
+        try:
+            shift_id = await execute_write(db, record_shift, worker_id, start_time, stop_time,
+                                           start_location, stop_location, start_lat, start_lon,
+                                           stop_lat, stop_lon)
+        except ShiftError as e:
             return JSONResponse(
-                status_code=404,
-                content={"detail": f"Nie znaleziono pracownika o ID: {worker_id}"}
+                status_code=e.status_code,
+                content={"detail": e.detail}
             )
         
-        # Utwórz nowy wpis w tabeli shifts
-        new_shift = models.Shift(
-            employee_id=worker_id,
-            start_time=start_time,
-            stop_time=stop_time,
-            start_location=start_location,
-            stop_location=stop_location,
-            start_latitude=start_lat,
-            start_longitude=start_lon,
-            stop_latitude=stop_lat,
-            stop_longitude=stop_lon,
-            duration_min=duration_minutes
-        )
-        
-        db.add(new_shift)
-        db.commit()
-        
         return {
             "status": "success",
             "message": f"Dodano wpis do dziennika obecności pracownika {worker_id}",
-            "shift_id": new_shift.id
+            "shift_id": shift_id
         }
     except Exception as e:
         print(f"Błąd podczas dodawania wpisu do dziennika obecności: {str(e)}")
@@ -121,47 +104,8 @@ async def add_batch_logs(request: Request):
                 content={"detail": "Oczekiwano tablicy z danymi logów"}
             )
         
-        db = next(get_db())
-        added_count = 0
-        
-        for log_entry in logs_data:
-            employee_id = log_entry.get("employee_id")
-            date_str = log_entry.get("date")
-            
-            if not employee_id or not date_str:
-                continue
-            
-            # Sprawdź czy pracownik istnieje
-            employee = db.query(models.Employee).filter(models.Employee.id == employee_id).first()
-            if not employee:
-                continue
-            
-            # Przyjmij domyślne godziny pracy: 8:00 - 16:00
-            try:
-                date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-                start_time = datetime.combine(date_obj, datetime.strptime("08:00", "%H:%M").time())
-                stop_time = datetime.combine(date_obj, datetime.strptime("16:00", "%H:%M").time())
-                
-                # Oblicz czas trwania w minutach
-                duration_minutes = 8 * 60  # 8 godzin
-                
-                # Utwórz nowy wpis w tabeli shifts
-                new_shift = models.Shift(
-                    employee_id=employee_id,
-                    start_time=start_time,
-                    stop_time=stop_time,
-                    start_location="Dodane ręcznie (batch)",
-                    stop_location="Dodane ręcznie (batch)",
-                    duration_min=duration_minutes
-                )
-                
-                db.add(new_shift)
-                added_count += 1
-            except Exception as e:
-                print(f"Błąd dodawania wpisu dla pracownika {employee_id}, data {date_str}: {str(e)}")
-                continue
-        
-        db.commit()
+        db = get_request_db(request)
+        added_count = await execute_write(db, record_batch_shifts, logs_data)
         
         return {
             "status": "success",
@@ -194,46 +138,16 @@ async def update_log_entry(log_id: int, request: Request):
         is_sick = data.get("is_sick", "nie")
         is_present = data.get("is_present", True)
         
-        db = next(get_db())
-        shift = db.query(models.Shift).filter(models.Shift.id == log_id).first()
-        
-        if not shift:
+        db = get_request_db(request)
+        try:
+            await execute_write(db, update_shift, log_id, start_time_str, stop_time_str,
+                                is_holiday, is_sick, is_present)
+        except ShiftError as e:
             return JSONResponse(
-                status_code=404,
-                content={"detail": f"Nie znaleziono wpisu o ID: {log_id}"}
+                status_code=e.status_code,
+                content={"detail": e.detail}
             )
         
-        # Jeśli jest nieobecny, ustawiamy specjalne wartości
-        if is_present is False:
-            # Dla nieobecności ustawiamy godziny 00:00-00:00 i typ jako "Nieobecny"
-            shift.start_time = datetime.fromisoformat(start_time_str.split('T')[0] + "T00:00:00")
-            shift.stop_time = datetime.fromisoformat(stop_time_str.split('T')[0] + "T00:00:00")
-            shift.status = "Nieobecny"
-            shift.duration_min = 0
-        else:
-            # Dla obecności normalne wartości
-            shift.start_time = datetime.fromisoformat(start_time_str)
-            shift.stop_time = datetime.fromisoformat(stop_time_str)
-            shift.status = "Obecny"
-            
-            # Obliczanie czasu trwania w minutach
-            duration = shift.stop_time - shift.start_time
-            duration_minutes = int(duration.total_seconds() // 60)
-            shift.duration_min = duration_minutes
-        
-        # Aktualizacja pól urlop/chorobowe
-        if is_holiday == "tak":
-            shift.is_holiday = True
-        else:
-            shift.is_holiday = False
-            
-        if is_sick == "tak":
-            shift.is_sick = True
-        else:
-            shift.is_sick = False
-            
-        db.commit()
-        
         return {"success": True, "message": "Wpis zaktualizowany"}
         
     except Exception as e:
@@ -255,18 +169,15 @@ async def delete_log_entry(log_id: int, request: Request):
         )
     
     try:
-        db = next(get_db())
-        shift = db.query(models.Shift).filter(models.Shift.id == log_id).first()
-        
-        if not shift:
+        db = get_request_db(request)
+        try:
+            await execute_write(db, delete_shift, log_id)
+        except ShiftError as e:
             return JSONResponse(
-                status_code=404,
-                content={"detail": f"Nie znaleziono wpisu o ID: {log_id}"}
+                status_code=e.status_code,
+                content={"detail": e.detail}
             )
         
-        db.delete(shift)
-        db.commit()
-        
         return {"success": True, "message": "Wpis usunięty"}
         
     except Exception as e:
@@ -0,0 +1,171 @@
+"""
+Monitor opóźnień pętli zdarzeń (asyncio)
+
+Włączany zmienną środowiskową LOOP_MONITOR=1. Korutyna heartbeat co chwilę
+usypia się na LOOP_MONITOR_INTERVAL_MS i mierzy, o ile później się obudziła.
+Osobny wątek (watchdog) sprawdza, czy heartbeat nie milczy dłużej niż
+LOOP_MONITOR_THRESHOLD_MS - jeśli tak, pętla jest zablokowana i watchdog
+zapisuje stos wątku pętli oraz trasę żądania, które ją blokuje.
+Ostatnie przypadki dostępne są pod /api/loop-monitor (także w api_terminal.py).
+"""
+import asyncio
+import datetime as dt
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+logger = logging.getLogger("app")
+
+LOOP_MONITOR_ENABLED = os.environ.get("LOOP_MONITOR", "0").lower() in ("1", "true", "tak")
+LOOP_MONITOR_THRESHOLD_MS = int(os.environ.get("LOOP_MONITOR_THRESHOLD_MS", "200"))
+LOOP_MONITOR_INTERVAL_MS = int(os.environ.get("LOOP_MONITOR_INTERVAL_MS", "50"))
+
+# Liczba zapamiętanych blokad i ramek stosu w każdej z nich
+RECENT_STALLS_LIMIT = 50
+STACK_DEPTH = 15
+
+class LoopMonitor:
+    """Mierzy opóźnienie pętli zdarzeń i zapisuje wywołania, które ją blokują"""
+
+    def __init__(self, threshold_ms=LOOP_MONITOR_THRESHOLD_MS, interval_ms=LOOP_MONITOR_INTERVAL_MS):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self._lock = threading.Lock()
+        self._loop = None
+        self._loop_thread_id = None
+        self._heartbeat_task = None
+        self._watchdog = None
+        self._stop = threading.Event()
+        self._last_beat = 0.0
+        self._captured_beat = None
+        self._pending_stall = None
+        # Zadanie asyncio -> "METODA /ścieżka" obsługiwanego żądania
+        self.task_routes = {}
+
+        self.heartbeats = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self.recent_stalls = deque(maxlen=RECENT_STALLS_LIMIT)
+
+    @property
+    def running(self):
+        return self._heartbeat_task is not None and not self._heartbeat_task.done()
+
+    def start(self):
+        """Uruchamia heartbeat i watchdog. Wywoływać z wątku pętli zdarzeń."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop.clear()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Monitor pętli zdarzeń uruchomiony (próg {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+
+    async def _heartbeat(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - started - self.interval)
+            with self._lock:
+                self._last_beat = now
+                self.heartbeats += 1
+                self.total_lag += lag
+                self.max_lag = max(self.max_lag, lag)
+                if lag >= self.threshold:
+                    self.stall_count += 1
+                    stall = self._pending_stall
+                    if stall is None:
+                        # Watchdog nie zdążył złapać stosu (blokada tuż nad progiem)
+                        stall = self._new_stall(None, "nieznana")
+                        self.recent_stalls.append(stall)
+                    stall["duration_ms"] = round(lag * 1000, 1)
+                self._pending_stall = None
+
+    def _watch(self):
+        check_interval = max(self.interval / 2, 0.01)
+        while not self._stop.wait(check_interval):
+            with self._lock:
+                beat = self._last_beat
+            blocked = time.perf_counter() - beat - self.interval
+            if blocked < self.threshold or self._captured_beat == beat:
+                continue
+            self._captured_beat = beat
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = traceback.format_stack(frame)[-STACK_DEPTH:] if frame is not None else None
+            route = self._current_route()
+            stall = self._new_stall(stack, route)
+            stall["duration_ms"] = round(blocked * 1000, 1)
+            with self._lock:
+                if self._last_beat == beat:
+                    self._pending_stall = stall
+                self.recent_stalls.append(stall)
+            logger.warning(f"Pętla zdarzeń zablokowana od {blocked * 1000:.0f} ms (żądanie: {route})")
+
+    def _current_route(self):
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        if task is None:
+            return "poza żądaniem"
+        return self.task_routes.get(task, "poza żądaniem")
+
+    @staticmethod
+    def _new_stall(stack, route):
+        return {
+            "time": dt.datetime.now().isoformat(),
+            "route": route,
+            "duration_ms": None,
+            "stack": [line.rstrip() for line in stack] if stack else None
+        }
+
+    def snapshot(self):
+        """Statystyki do endpointu diagnostycznego (najnowsze blokady na początku)"""
+        with self._lock:
+            return {
+                "enabled": self.running,
+                "threshold_ms": round(self.threshold * 1000),
+                "interval_ms": round(self.interval * 1000),
+                "heartbeats": self.heartbeats,
+                "avg_lag_ms": round(self.total_lag / self.heartbeats * 1000, 3) if self.heartbeats else 0,
+                "max_lag_ms": round(self.max_lag * 1000, 1),
+                "stall_count": self.stall_count,
+                "recent_stalls": list(reversed(self.recent_stalls))
+            }
+
+loop_monitor = LoopMonitor()
+
+class LoopMonitorMiddleware:
+    """Middleware ASGI zapamiętujące trasę obsługiwaną przez bieżące zadanie asyncio"""
+
+    def __init__(self, app, monitor=loop_monitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        self.monitor.task_routes[task] = f"{scope.get('method')} {scope.get('path')}"
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.task_routes.pop(task, None)
@@ -0,0 +1,534 @@
+"""
+Kolejka wysyłki raportów emailem (/api/mailings)
+
+Dotąd każda wiadomość otwierała nowe połączenie SMTP, wykonywała STARTTLS
+i logowanie, a wysyłka odbywała się w żądaniu - miesięczna wysyłka raportów
+do wszystkich pracowników trwała bardzo długo i blokowała API. Teraz:
+
+  - POST /api/mailings          - zlecenie wysyłki raportu (parametry jak w /api/reports)
+                                  do listy odbiorców; odpowiedź 202 z ID zadania od razu,
+  - GET  /api/mailings/{job_id} - postęp: przygotowane załączniki, wysłane, ponawiane, błędy,
+  - GET  /api/mail-queue        - stan kolejki i puli połączeń SMTP.
+
+Załączniki budowane są równolegle w puli wątków (MAIL_ATTACHMENT_WORKERS) tą samą
+funkcją co raporty w tle (report_jobs.build_report), więc raporty za zamknięte
+okresy korzystają z pamięci podręcznej. Plik z pamięci podręcznej jest dowiązywany
+(albo kopiowany) do katalogu zadania wysyłki, bo przycinanie pamięci podręcznej
+(REPORT_CACHE_FILES) mogłoby go usunąć przed wysłaniem wszystkich wiadomości;
+katalog jest usuwany po zakończeniu wysyłki. Odbiorcy z worker_id dostają szczegóły
+swoich zmian, pozostali jeden wspólny raport. Gotowe wiadomości trafiają do kolejki,
+z której MAIL_SENDERS wątków wysyłkowych pobiera paczki do MAIL_BATCH_SIZE wiadomości
+i wysyła je jednym połączeniem z puli email_service.smtp_pool (bez ponownego
+logowania). Błędy przejściowe (kody 4xx, zerwane połączenie) są ponawiane
+z wykładniczo rosnącą przerwą (MAIL_RETRY_SECONDS, 2x, 4x ...) do MAIL_MAX_ATTEMPTS
+prób; odrzucenie na stałe (5xx) i błąd odczytu załącznika kończą wysyłkę tej
+wiadomości od razu.
+"""
+import datetime as dt
+import logging
+import os
+import queue
+import shutil
+import socket
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import smtplib
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+import models
+import report_jobs
+from database import ReadSessionLocal
+from email_service import (
+    SMTP_POOL_SIZE, smtp_pool, email_config, build_message, send_message, keeps_connection, generate_email_body
+)
+from report_jobs import ReportJob, ReportError, parse_report_request, build_report
+
+logger = logging.getLogger("app")
+router = APIRouter()
+
+MAIL_SENDERS = int(os.environ.get("MAIL_SENDERS", str(SMTP_POOL_SIZE)))
+MAIL_BATCH_SIZE = int(os.environ.get("MAIL_BATCH_SIZE", "20"))
+MAIL_MAX_ATTEMPTS = int(os.environ.get("MAIL_MAX_ATTEMPTS", "4"))
+MAIL_RETRY_SECONDS = float(os.environ.get("MAIL_RETRY_SECONDS", "5"))
+MAIL_ATTACHMENT_WORKERS = int(os.environ.get("MAIL_ATTACHMENT_WORKERS", "2"))
+# Ilu odbiorców może mieć jedno zlecenie
+MAIL_RECIPIENTS_LIMIT = 5000
+# Ile zakończonych zadań wysyłki pamiętać
+MAIL_JOBS_LIMIT = 50
+# Ile błędów wysyłki pokazywać w wyniku zadania
+MAIL_ERRORS_LIMIT = 50
+
+class MailError(Exception):
+    """Błędne zlecenie wysyłki (odpowiedź 400)"""
+
+def is_temporary(error):
+    """Czy błąd wysyłki warto ponowić (4xx, zerwane połączenie, limit czasu, błąd DNS)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # Tylko błędy sieci - lokalne błędy plików (też OSError) nie miną po ponowieniu
+    return isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError, socket.gaierror))
+
+def describe_error(error):
+    if isinstance(error, HTTPException):
+        return error.detail
+    if isinstance(error, smtplib.SMTPResponseException):
+        message = error.smtp_error.decode("utf-8", "replace") if isinstance(error.smtp_error, bytes) \
+            else str(error.smtp_error)
+        return f"{error.smtp_code} {message}"
+    return str(error)
+
+class OutgoingMail:
+    """Jedna wiadomość w kolejce; załącznik czytany z pliku dopiero przy wysyłce"""
+    __slots__ = ("to_email", "subject", "body", "attachment_path", "attachment_name", "job", "attempts")
+
+    def __init__(self, to_email, subject, body, attachment_path=None, attachment_name=None, job=None):
+        self.to_email = to_email
+        self.subject = subject
+        self.body = body
+        self.attachment_path = attachment_path
+        self.attachment_name = attachment_name
+        self.job = job
+        self.attempts = 0
+
+    def message(self, EMAIL_CONFIG):
+        attachment_data = None
+        if self.attachment_path:
+            with open(self.attachment_path, "rb") as file:
+                attachment_data = file.read()
+        return build_message(EMAIL_CONFIG, self.to_email, self.subject, self.body, attachment_data,
+                             self.attachment_name)
+
+class MailQueue:
+    """Wątki wysyłające wiadomości paczkami połączeniami z puli SMTP"""
+
+    def __init__(self, pool=smtp_pool, senders=MAIL_SENDERS, batch_size=MAIL_BATCH_SIZE):
+        self.pool = pool
+        self.senders = senders
+        self.batch_size = batch_size
+        self._mails = queue.Queue()
+        self._threads = []
+        self._timers = set()
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._threads = [threading.Thread(target=self._run, name=f"mail-sender-{number}", daemon=True)
+                             for number in range(self.senders)]
+            for thread in self._threads:
+                thread.start()
+        logger.info(f"Kolejka wysyłki emaili uruchomiona ({self.senders} wątków, paczka do {self.batch_size})")
+
+    def stop(self, timeout=10.0):
+        """Kończy wątki po wysłaniu wiadomości z kolejki; zaplanowane ponowienia są porzucane"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            timers, self._timers = self._timers, set()
+        for timer in timers:
+            timer.cancel()
+        for _ in threads:
+            self._mails.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, mail):
+        """Dodaje wiadomość do kolejki (wątki wysyłkowe startują przy pierwszej wiadomości)"""
+        self.start()
+        self._mails.put(mail)
+
+    def snapshot(self):
+        return {
+            "running": self.running,
+            "senders": self.senders,
+            "batch_size": self.batch_size,
+            "queued": self._mails.qsize(),
+            "in_flight": self.in_flight,
+            "retry_scheduled": len(self._timers),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches
+        }
+
+    def _run(self):
+        while True:
+            mail = self._mails.get()
+            if mail is None:
+                break
+            batch = [mail]
+            while len(batch) < self.batch_size:
+                try:
+                    mail = self._mails.get_nowait()
+                except queue.Empty:
+                    break
+                if mail is None:
+                    # Sygnał zatrzymania należy do innego wątku - wraca na koniec kolejki
+                    self._mails.put(None)
+                    break
+                batch.append(mail)
+            with self._lock:
+                self.in_flight += len(batch)
+            try:
+                self._send_batch(batch)
+            finally:
+                with self._lock:
+                    self.in_flight -= len(batch)
+                    self.batches += 1
+
+    def _send_batch(self, batch):
+        try:
+            EMAIL_CONFIG = email_config()
+        except HTTPException as e:
+            for mail in batch:
+                self._failed(mail, e)
+            return
+
+        connection = None
+        try:
+            for mail in batch:
+                mail.attempts += 1
+                # Wiadomość (z odczytem załącznika) przed wysyłką - błąd pliku nie dotyczy połączenia
+                try:
+                    message = mail.message(EMAIL_CONFIG)
+                except Exception as e:
+                    self._failed(mail, e)
+                    continue
+                try:
+                    if connection is None:
+                        connection = self.pool.acquire(EMAIL_CONFIG)
+                    send_message(connection[0], EMAIL_CONFIG, mail.to_email, message)
+                except Exception as e:
+                    if connection is not None and not keeps_connection(e):
+                        self.pool.release(connection, broken=True)
+                        connection = None
+                    self._retry_or_fail(mail, e)
+                    continue
+                with self._lock:
+                    self.sent += 1
+                if mail.job:
+                    mail.job.mail_sent(mail)
+        finally:
+            if connection is not None:
+                self.pool.release(connection)
+
+    def _retry_or_fail(self, mail, error):
+        if not is_temporary(error) or mail.attempts >= MAIL_MAX_ATTEMPTS:
+            self._failed(mail, error)
+            return
+        delay = MAIL_RETRY_SECONDS * 2 ** (mail.attempts - 1)
+        logger.warning(f"Wysyłka do {mail.to_email} nie powiodła się ({describe_error(error)}) - "
+                       f"ponowienie za {delay:g} s (próba {mail.attempts} z {MAIL_MAX_ATTEMPTS})")
+        timer = threading.Timer(delay, self._requeue)
+        timer.args = (mail, timer)
+        timer.daemon = True
+        with self._lock:
+            self.retries += 1
+            self._timers.add(timer)
+        if mail.job:
+            mail.job.mail_retrying(mail)
+        timer.start()
+
+    def _requeue(self, mail, timer):
+        with self._lock:
+            self._timers.discard(timer)
+        self._mails.put(mail)
+
+    def _failed(self, mail, error):
+        with self._lock:
+            self.failed += 1
+        logger.error(f"Nie wysłano wiadomości do {mail.to_email}: {describe_error(error)}")
+        if mail.job:
+            mail.job.mail_failed(mail, describe_error(error))
+
+mail_queue = MailQueue()
+
+def parse_recipients(data):
+    """Lista odbiorców [{email, worker_id}] ze zlecenia"""
+    recipients = data.get("recipients")
+    if not isinstance(recipients, list) or not recipients:
+        raise MailError("Brak listy odbiorców (recipients)")
+    if len(recipients) > MAIL_RECIPIENTS_LIMIT:
+        raise MailError(f"Zbyt wielu odbiorców (maksymalnie {MAIL_RECIPIENTS_LIMIT})")
+    result = []
+    for recipient in recipients:
+        if isinstance(recipient, str):
+            recipient = {"email": recipient}
+        email = str(recipient.get("email") or "").strip() if isinstance(recipient, dict) else ""
+        if "@" not in email or any(char.isspace() for char in email):
+            raise MailError(f"Nieprawidłowy adres email: {email or recipient}")
+        worker_id = recipient.get("worker_id")
+        result.append((email, str(worker_id) if worker_id else None))
+    return result
+
+class MailingJob:
+    """Postęp jednej wysyłki raportów"""
+
+    def __init__(self, kind, export_format, params, date_from, date_to, recipients, subject=None, owner=None,
+                 session_factory=ReadSessionLocal):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.format = export_format
+        self.params = params
+        self.date_from = date_from
+        self.date_to = date_to
+        self.recipients = recipients
+        self.subject = subject or f"Raport Lista Obecności ({self.date_range})"
+        self.owner = owner
+        self.session_factory = session_factory
+        self.total = len(recipients)
+        self.prepared = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.errors = []
+        self.reports = []
+        self.status = "running"
+        self.detail = None
+        self.started_at = dt.datetime.now()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self.done = threading.Event()
+
+    @property
+    def attachment_dir(self):
+        """Katalog załączników zadania poza przycinaniem pamięci podręcznej raportów"""
+        return os.path.join(report_jobs.REPORT_CACHE_DIR, "mailings", self.id)
+
+    @property
+    def date_range(self):
+        if self.kind == "payroll":
+            return self.params["month"]
+        return f"{self.params['date_from']} - {self.params['date_to']}"
+
+    def report_request(self, worker_id):
+        data = {"kind": "details" if worker_id else self.kind, "format": self.format, **self.params}
+        if worker_id:
+            data.update(worker_id=worker_id, date_from=self.date_from.isoformat(), date_to=self.date_to.isoformat())
+        return data
+
+    def mail_prepared(self, count):
+        with self._lock:
+            self.prepared += count
+
+    def mail_sent(self, mail):
+        with self._lock:
+            self.sent += 1
+        self._check_finished()
+
+    def mail_retrying(self, mail):
+        with self._lock:
+            self.retries += 1
+
+    def mail_failed(self, mail, detail):
+        with self._lock:
+            self.failed += 1
+            if len(self.errors) < MAIL_ERRORS_LIMIT:
+                self.errors.append({"email": mail.to_email, "detail": detail})
+        self._check_finished()
+
+    def _check_finished(self):
+        with self._lock:
+            if self.status != "running" or self.sent + self.failed < self.total:
+                return
+            if self.failed:
+                self.status = "error"
+                self.detail = f"Nie wysłano {self.failed} z {self.total} wiadomości"
+            else:
+                self.status = "success"
+            self.finished_at = dt.datetime.now()
+        # Załączniki zadania (raporty spoza pamięci podręcznej i dowiązane pliki z niej) nie są już potrzebne
+        for report in self.reports:
+            if report.path and not report.cache_key:
+                _remove_file(report.path)
+        shutil.rmtree(self.attachment_dir, ignore_errors=True)
+        print(f"Wysyłka raportów {self.kind} {self.params}: wysłano {self.sent} z {self.total}")
+        self.done.set()
+
+    def result(self):
+        return {
+            "status": self.status,
+            "job_id": self.id,
+            "kind": self.kind,
+            "format": self.format,
+            "params": self.params,
+            "total": self.total,
+            "prepared": self.prepared,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "errors": self.errors,
+            "detail": self.detail,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+mailing_jobs = OrderedDict()
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def pin_attachment(job, report):
+    """Plik raportu, który nie zniknie przed końcem wysyłki.
+
+    Raport z pamięci podręcznej jest dowiązywany (os.link, a gdy się nie da - kopiowany)
+    do katalogu zadania; raport spoza niej już należy do zadania. FileNotFoundError,
+    gdy plik z pamięci podręcznej został właśnie usunięty przez przycinanie.
+    """
+    if not report.cache_key:
+        return report.path
+    os.makedirs(job.attachment_dir, exist_ok=True)
+    path = os.path.join(job.attachment_dir, f"{report.id}.{report.format}")
+    try:
+        os.link(report.path, path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(report.path, path)
+    return path
+
+def register_job(job):
+    mailing_jobs[job.id] = job
+    while len(mailing_jobs) > MAIL_JOBS_LIMIT:
+        oldest = next(iter(mailing_jobs.values()))
+        if oldest.status == "running":
+            break
+        mailing_jobs.popitem(last=False)
+
+def prepare_mails(job, worker_id, recipients):
+    """Buduje załącznik (w wątku puli) i dodaje wiadomości odbiorców do kolejki wysyłki"""
+    try:
+        employee_name = None
+        if worker_id:
+            db = job.session_factory()
+            try:
+                employee = db.get(models.Employee, worker_id)
+            finally:
+                db.close()
+            if employee is None:
+                raise MailError(f"Nie znaleziono pracownika {worker_id}")
+            employee_name = employee.name
+        report = ReportJob(*parse_report_request(job.report_request(worker_id)), owner=job.owner,
+                           session_factory=job.session_factory)
+        job.reports.append(report)
+        build_report(report)
+        try:
+            attachment_path = pin_attachment(job, report)
+        except FileNotFoundError:
+            # Plik usunięty przez przycinanie między zbudowaniem a dowiązaniem - raport od nowa
+            build_report(report)
+            attachment_path = pin_attachment(job, report)
+    except Exception as e:
+        logger.error(f"Błąd podczas przygotowania załącznika raportu: {str(e)}")
+        detail = str(e) if isinstance(e, MailError) else f"Błąd serwera: {str(e)}"
+        for email in recipients:
+            job.mail_failed(OutgoingMail(email, job.subject, None, job=job), detail)
+        return
+
+    job.mail_prepared(len(recipients))
+    body = generate_email_body(job.format, employee_name, job.date_range, report.filename)
+    for email in recipients:
+        mail_queue.submit(OutgoingMail(email, job.subject, body, attachment_path, report.filename, job=job))
+
+_attachment_pool = None
+
+def _get_attachment_pool():
+    global _attachment_pool
+    if _attachment_pool is None:
+        _attachment_pool = ThreadPoolExecutor(max_workers=MAIL_ATTACHMENT_WORKERS, thread_name_prefix="mail-attachment")
+    return _attachment_pool
+
+def shutdown_mail_queue():
+    global _attachment_pool
+    if _attachment_pool is not None:
+        _attachment_pool.shutdown(wait=False, cancel_futures=True)
+        _attachment_pool = None
+    mail_queue.stop()
+    smtp_pool.close()
+
+def start_mailing(data, owner=None, session_factory=ReadSessionLocal):
+    """Zleca wysyłkę raportów (ReportError/MailError dla błędnych parametrów)"""
+    recipients = parse_recipients(data)
+    job = MailingJob(*parse_report_request(data), recipients, subject=data.get("subject"), owner=owner,
+                     session_factory=session_factory)
+    register_job(job)
+    # Jeden załącznik na pracownika, wspólny dla odbiorców bez worker_id
+    groups = OrderedDict()
+    for email, worker_id in recipients:
+        groups.setdefault(worker_id, []).append(email)
+    pool = _get_attachment_pool()
+    for worker_id, emails in groups.items():
+        pool.submit(prepare_mails, job, worker_id, emails)
+    return job
+
+def _admin_error(request):
+    user = request.session.get("user")
+    if not user or user.get("role") != "admin":
+        return JSONResponse(status_code=401, content={"detail": "Nieautoryzowany dostęp"})
+    return None
+
+@router.post("/api/mailings")
+async def submit_mailing(request: Request):
+    """Zleca wysyłkę raportu do listy odbiorców; odpowiedź 202 z ID zadania"""
+    error = _admin_error(request)
+    if error:
+        return error
+    try:
+        email_config()
+        data = await request.json()
+        job = start_mailing(data, owner=request.session["user"].get("id"))
+    except HTTPException as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+    except (ReportError, MailError) as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    except Exception as e:
+        print(f"Błąd podczas zlecania wysyłki raportów: {str(e)}")
+        return JSONResponse(status_code=500, content={"detail": f"Błąd serwera: {str(e)}"})
+    return JSONResponse(status_code=202, content=job.result())
+
+@router.get("/api/mailings/{job_id}")
+def get_mailing(request: Request, job_id: str):
+    """Postęp i wynik wysyłki raportów"""
+    error = _admin_error(request)
+    if error:
+        return error
+    job = mailing_jobs.get(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"detail": "Nie znaleziono zadania wysyłki"})
+    return job.result()
+
+@router.get("/api/mail-queue")
+def get_mail_queue_status(request: Request):
+    """Stan kolejki wysyłki, puli połączeń SMTP i trwających wysyłek"""
+    error = _admin_error(request)
+    if error:
+        return error
+    try:
+        return {
+            "status": "ok",
+            "queue": mail_queue.snapshot(),
+            "pool": smtp_pool.snapshot(),
+            "mailings": [job.result() for job in mailing_jobs.values() if job.status == "running"]
+        }
+    except Exception as e:
+        logger.error(f"Błąd podczas pobierania stanu kolejki wysyłki: {str(e)}")
+        return {"status": "error", "message": str(e)}
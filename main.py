@@ -1,22 +1,40 @@
 ﻿from fastapi import FastAPI, Request, status, Depends, HTTPException, Form, File, UploadFile, Body
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from fastapi.responses import JSONResponse, RedirectResponse, FileResponse
+from fastapi.responses import JSONResponse, RedirectResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
-from database import get_db
+from database import get_db, get_request_db, get_read_db, engine, SessionLocal, DBSessionMiddleware, get_pool_status
 from auth import verify_password, get_password_hash
 import models
+from daily_attendance import refresh_for_shifts, ensure_daily_attendance
+from migrations import run_migrations
+from shift_service import start_shift, stop_shift, recover_start, recover_stop, sync_events, ShiftError
+from write_queue import write_queue, execute_write, WRITE_QUEUE_ENABLED
+from employee_import import start_import, start_csv_import, import_jobs, shutdown_hash_pool, hash_passwords, IMPORT_WAIT_SECONDS
+from worker_batch import run_batch, generate_pins, unique_ids, BatchError
+from loop_monitor import loop_monitor, LoopMonitorMiddleware, LOOP_MONITOR_ENABLED
+from active_shifts import (
+    active_shifts, install_session_hooks, load_active_shifts, ensure_active_shifts_loaded, reconcile_periodically
+)
+from events import event_bus, event_stream, install_event_hooks, pin_attempt_event, config_changed_event
+from summary_cache import summary_cache, install_cache_hooks
+from singleflight import report_flights
+from data_versions import data_etag, make_etag, etag_matches, not_modified, etag_response, etag_bytes_response
+from config_store import config_store, mobile_app_sections, LEGACY_SECTIONS, SETTINGS_FIELDS
+from pydantic import ValidationError
 from typing import List, Dict, Optional
 import secrets
 import json
+import asyncio
 import datetime as dt
 from datetime import timedelta
-from config import TIME_ROUNDING_CONFIG
 import logging
 import os
+from types import SimpleNamespace
 
 # Konfiguracja logowania
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "WARNING")
@@ -30,7 +48,7 @@ logger = logging.getLogger("app")
 
 def round_time(time_obj: dt.datetime, rounding_minutes: int, direction: str = "nearest") -> dt.datetime:
     """Zaokrąglanie czasu"""
-    if not TIME_ROUNDING_CONFIG.get("enabled", False):
+    if not config_store.get().time_rounding.get("enabled", False):
         return time_obj
     
     seconds_since_midnight = time_obj.hour * 3600 + time_obj.minute * 60 + time_obj.second
@@ -87,9 +105,24 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Sesja bazy danych na czas żądania - zamykana po wysłaniu odpowiedzi
+app.add_middleware(DBSessionMiddleware)
+
+# Monitor blokad pętli zdarzeń (włączany zmienną LOOP_MONITOR=1)
+if LOOP_MONITOR_ENABLED:
+    app.add_middleware(LoopMonitorMiddleware)
+
+async def request_body(request: Request) -> bytes:
+    """Treść żądania odczytana w pętli zdarzeń.
+
+    Endpointy z zapytaniami do bazy są zwykłymi funkcjami (def), które FastAPI
+    wykonuje w puli wątków, a tam nie można już czekać na request.json().
+    """
+    return await request.body()
+
 # Endpoint do awaryjnego zakończenia pracy przez administratora
 @app.post("/api/admin/force-stop")
-async def force_stop_work(request: Request):
+def force_stop_work(request: Request, body: bytes = Depends(request_body)):
     """Awaryjne zakończenie pracy pracownika przez administratora"""
     print("Otrzymano żądanie awaryjnego zakończenia pracy")
     user = request.session.get("user")
@@ -100,7 +133,7 @@ async def force_stop_work(request: Request):
         )
     
     try:
-        data = await request.json()
+        data = json.loads(body)
         worker_id = data.get("worker_id")
         reason = data.get("reason", "Awaryjne zakończenie przez administratora")
         
@@ -110,7 +143,7 @@ async def force_stop_work(request: Request):
                 content={"detail": "Brak ID pracownika"}
             )
         
-        db = next(get_db())
+        db = get_request_db(request)
         
         # Sprawdź czy pracownik istnieje
         employee = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
@@ -170,6 +203,7 @@ async def force_stop_work(request: Request):
             print(f"Ostrzeżenie: Nie udało się dodać logu administracyjnego: {log_error}")
             # Kontynuuj mimo błędu logu - ważniejsze jest zakończenie zmiany
         
+        refresh_for_shifts(db, [active_shift])
         db.commit()
         
         # Przygotuj odpowiedź
@@ -194,21 +228,110 @@ async def force_stop_work(request: Request):
 from attendance import router as attendance_router
 from logs import router as logs_router
 from employees import router as employees_router
+from payroll import router as payroll_router
+from exports import router as exports_router
+from report_jobs import router as report_jobs_router, shutdown_report_pool
+from mail_queue import router as mail_queue_router, shutdown_mail_queue
 
 # Podłączenie routerów do aplikacji
 app.include_router(attendance_router)
 app.include_router(logs_router)
 app.include_router(employees_router)
+app.include_router(payroll_router)
+app.include_router(exports_router)
+app.include_router(report_jobs_router)
+app.include_router(mail_queue_router)
+
+@app.on_event("startup")
+def apply_migrations():
+    """Wykonuje zaległe migracje schematu bazy danych"""
+    try:
+        run_migrations(engine)
+    except Exception as e:
+        logger.error(f"Nie udało się wykonać migracji bazy danych: {str(e)}")
+
+@app.on_event("startup")
+def prepare_daily_attendance():
+    """Zapewnia istnienie dziennego podsumowania obecności (daily_attendance)"""
+    try:
+        ensure_daily_attendance(engine, SessionLocal)
+    except Exception as e:
+        logger.error(f"Nie udało się przygotować tabeli daily_attendance: {str(e)}")
+
+# Rejestr otwartych zmian aktualizowany po każdym commicie zmieniającym zmiany lub pracowników
+install_session_hooks(SessionLocal)
+install_event_hooks(SessionLocal)
+# Zapamiętane podsumowania obecności usuwane po commicie zmieniającym zmiany z ich zakresu
+install_cache_hooks(SessionLocal)
+
+# Zapisy ustawień trafiają do settings_history; zmiana ustawień (także zapisana przez
+# inny proces serwera) jest ogłaszana w kanale zdarzeń panelu
+config_store.bind(engine)
+config_store.add_listener(
+    lambda snapshot: event_bus.publish(*config_changed_event(snapshot.revision, snapshot.version))
+)
+
+@app.on_event("startup")
+def prepare_active_shifts():
+    """Ładuje rejestr otwartych zmian używany przez endpointy statusu"""
+    try:
+        load_active_shifts(SessionLocal)
+    except Exception as e:
+        logger.error(f"Nie udało się załadować rejestru otwartych zmian: {str(e)}")
+
+@app.on_event("startup")
+async def start_active_shifts_reconcile():
+    app.state.active_shifts_task = asyncio.create_task(reconcile_periodically(engine, SessionLocal))
+
+@app.on_event("shutdown")
+async def stop_active_shifts_reconcile():
+    task = getattr(app.state, "active_shifts_task", None)
+    if task:
+        task.cancel()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Uruchamia monitor pętli zdarzeń, jeśli jest włączony"""
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+@app.on_event("startup")
+def start_write_queue():
+    """Uruchamia kolejkę zapisów z grupowym commitem, jeśli jest włączona"""
+    if WRITE_QUEUE_ENABLED:
+        write_queue.start()
+
+@app.on_event("shutdown")
+def stop_write_queue():
+    write_queue.stop()
+
+@app.on_event("shutdown")
+def stop_import_hash_pool():
+    shutdown_hash_pool()
+
+@app.on_event("shutdown")
+def stop_report_pool():
+    shutdown_report_pool()
+
+@app.on_event("shutdown")
+def stop_mail_queue():
+    shutdown_mail_queue()
 
 # Endpoint do sprawdzenia statusu pracownika
 @app.get("/api/worker/{worker_id}/status")
-async def get_worker_status(worker_id: str, request: Request):
+def get_worker_status(worker_id: str, request: Request):
     """Sprawdza status aktywnej zmiany pracownika"""
     try:
-        db = next(get_db())
+        # Odpowiedź z rejestru otwartych zmian w pamięci, bez zapytań do bazy; jeśli rejestr
+        # nie załadował się przy starcie, ładowanie odbywa się w puli wątków (handler synchroniczny)
+        ensure_active_shifts_loaded(SessionLocal)
         
         # Sprawdź czy pracownik istnieje
-        employee = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
+        employee = active_shifts.employee(worker_id)
         if not employee:
             return JSONResponse(
                 status_code=404,
@@ -216,29 +339,26 @@ async def get_worker_status(worker_id: str, request: Request):
             )
         
         # Sprawdź aktywne zmiany
-        active_shift = db.query(models.Shift).filter(
-            models.Shift.employee_id == worker_id,
-            models.Shift.stop_time == None
-        ).first()
+        active_shift = active_shifts.get(worker_id)
         
         result = {
             "worker_id": worker_id,
-            "name": employee.name,
+            "name": employee["name"],
             "is_active": active_shift is not None
         }
         
         if active_shift:
             # Oblicz czas trwania zmiany
-            duration = dt.datetime.now() - active_shift.start_time
+            duration = dt.datetime.now() - active_shift["start_time"]
             duration_minutes = duration.total_seconds() // 60
             duration_str = f"{int(duration_minutes // 60)}h {int(duration_minutes % 60)}min"
             
             result.update({
-                "shift_id": active_shift.id,
-                "start_time": active_shift.start_time.isoformat(),
+                "shift_id": active_shift["id"],
+                "start_time": active_shift["start_time"].isoformat(),
                 "duration": duration_str,
                 "duration_minutes": int(duration_minutes),
-                "start_location": active_shift.start_location
+                "start_location": active_shift["start_location"]
             })
         
         return result
@@ -251,43 +371,39 @@ async def get_worker_status(worker_id: str, request: Request):
 
 # Endpoint do pobierania statusu wszystkich pracowników
 @app.get("/api/workers/status")
-async def get_all_workers_status(request: Request):
+def get_all_workers_status(request: Request):
     """Zwraca status wszystkich pracowników z informacją o aktywnych zmianach"""
     try:
-        db = next(get_db())
+        # Odpowiedź z rejestru otwartych zmian w pamięci, bez zapytań do bazy
+        ensure_active_shifts_loaded(SessionLocal)
         
         # Pobierz wszystkich pracowników
-        employees = db.query(models.Employee).all()
-        
-        # Pobierz wszystkie aktywne zmiany
-        active_shifts = db.query(models.Shift).filter(
-            models.Shift.stop_time == None
-        ).all()
+        employees = active_shifts.employees()
         
-        # Utwórz słownik z aktywnymi zmianami dla szybkiego dostępu
-        active_shifts_dict = {shift.employee_id: shift for shift in active_shifts}
+        # Pobierz wszystkie aktywne zmiany (słownik dla szybkiego dostępu)
+        active_shifts_dict = {shift["employee_id"]: shift for shift in active_shifts.active_shifts()}
         
         result = []
-        for employee in employees:
+        for employee_id, employee in employees.items():
             worker_data = {
-                "worker_id": employee.id,
-                "name": employee.name,
-                "is_active": employee.id in active_shifts_dict
+                "worker_id": employee_id,
+                "name": employee["name"],
+                "is_active": employee_id in active_shifts_dict
             }
             
             # Dodaj szczegóły zmiany, jeśli pracownik jest aktywny
-            if employee.id in active_shifts_dict:
-                active_shift = active_shifts_dict[employee.id]
-                duration = dt.datetime.now() - active_shift.start_time
+            if employee_id in active_shifts_dict:
+                active_shift = active_shifts_dict[employee_id]
+                duration = dt.datetime.now() - active_shift["start_time"]
                 duration_minutes = duration.total_seconds() // 60
                 duration_str = f"{int(duration_minutes // 60)}h {int(duration_minutes % 60)}min"
                 
                 worker_data.update({
-                    "shift_id": active_shift.id,
-                    "start_time": active_shift.start_time.isoformat(),
+                    "shift_id": active_shift["id"],
+                    "start_time": active_shift["start_time"].isoformat(),
                     "duration": duration_str,
                     "duration_minutes": int(duration_minutes),
-                    "start_location": active_shift.start_location
+                    "start_location": active_shift["start_location"]
                 })
             
             result.append(worker_data)
@@ -295,7 +411,7 @@ async def get_all_workers_status(request: Request):
         # Posortuj wyniki - aktywni pracownicy na górze
         result.sort(key=lambda x: (not x["is_active"], x["name"]))
         
-        return {"workers": result, "total": len(result), "active": len(active_shifts)}
+        return {"workers": result, "total": len(result), "active": len(active_shifts_dict)}
     except Exception as e:
         print(f"Błąd podczas pobierania statusu pracowników: {str(e)}")
         return JSONResponse(
@@ -322,10 +438,10 @@ async def api_root():
 
 # Przekierowania dla starych endpointów (bez prefiksu /api)
 @app.get("/workers")
-async def get_workers_redirect(request: Request):
+def get_workers_redirect(request: Request):
     """Przekierowanie dla endpointu /workers"""
     print("Przekierowuję /workers do /api/workers")
-    return await get_workers(request)
+    return get_workers(request)
 
 @app.get("/attendance_by_date")
 async def get_attendance_by_date_redirect(request: Request, date: str):
@@ -367,203 +483,35 @@ async def update_mobile_config_endpoint(request: Request):
         data = await request.json()
         print(f"Otrzymano dane konfiguracyjne: {data}")
         
-        if "APP_VERSION_INFO" not in data:
+        sections = {}
+        if "APP_VERSION_INFO" in data:
+            sections["app_version"] = data["APP_VERSION_INFO"]
+        if "MOBILE_APP_CONFIG" in data:
+            # Port panelu webowego to osobne pole ustawień (run_web_panel.py czyta je z magazynu)
+            sections.update(mobile_app_sections(data["MOBILE_APP_CONFIG"]))
+        if not sections:
             return JSONResponse(
                 status_code=400,
-                content={"detail": "Brak wymaganych danych konfiguracyjnych (APP_VERSION_INFO)"}
-            )
-            
-        # Aktualizacja plików konfiguracyjnych
-        import os
-        import re
-        from datetime import datetime
-        
-        # Generowanie nowej wersji konfiguracji
-        now = datetime.now()
-        new_config_version = now.strftime("%Y%m%d-%H%M%S")
-        
-        # Ścieżki do plików konfiguracyjnych
-        config_path = "config.py"
-        central_config_path = "configs/app_config.py"
-        
-        # Sprawdzenie czy plik centralnej konfiguracji istnieje
-        central_config_exists = os.path.exists(central_config_path)
-        
-        # Odczyt aktualnego pliku config.py
-        if not os.path.exists(config_path):
-            return JSONResponse(
-                status_code=500,
-                content={"detail": f"Nie znaleziono pliku konfiguracyjnego: {config_path}"}
-            )
-            
-        # Najpierw aktualizujemy centralną konfigurację jeśli istnieje
-        if central_config_exists:
-            try:
-                print(f"CONFIG: Aktualizacja centralnej konfiguracji {central_config_path}...")
-                with open(central_config_path, "r", encoding="utf-8") as f:
-                    central_config_content = f.read()
-                    
-                # Tworzenie kopii zapasowej centralnej konfiguracji
-                central_backup_path = f"configs/app_config_backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.py"
-                with open(central_backup_path, "w", encoding="utf-8") as f:
-                    f.write(central_config_content)
-                print(f"CONFIG: Utworzono kopię zapasową centralnej konfiguracji: {central_backup_path}")
-                    
-                # Aktualizacja zmiennej WEB_PANEL_URL w centralnej konfiguracji
-                if "MOBILE_APP_CONFIG" in data:
-                    web_panel_port = data["MOBILE_APP_CONFIG"].get("web_panel_port", 8002)
-                    # Aktualizujemy wartość WEB_PANEL_PORT jeśli istnieje
-                    if "WEB_PANEL_PORT =" in central_config_content:
-                        central_config_content = re.sub(
-                            r'WEB_PANEL_PORT\s*=\s*\d+', 
-                            f'WEB_PANEL_PORT = {web_panel_port}', 
-                            central_config_content
-                        )
-                
-                # Zapisanie zaktualizowanej centralnej konfiguracji
-                with open(central_config_path, "w", encoding="utf-8") as f:
-                    f.write(central_config_content)
-                print(f"CONFIG: Zaktualizowano centralną konfigurację {central_config_path}")
-            except Exception as e:
-                print(f"CONFIG: Błąd aktualizacji centralnej konfiguracji: {e}")
-                import traceback
-                print(traceback.format_exc())
-            
-        with open(config_path, "r", encoding="utf-8") as f:
-            config_content = f.read()
-        
-        # Dodaj dodatkowe logowanie
-        print(f"Generowanie nowej wersji konfiguracji: {new_config_version}")
-        print(f"Długość oryginalnego pliku konfiguracyjnego: {len(config_content)} znaków")
-        
-        # Aktualizacja wersji konfiguracji
-        config_content = re.sub(
-            r'CONFIG_VERSION = "[^"]+"', 
-            f'CONFIG_VERSION = "{new_config_version}"', 
-            config_content
-        )
-        
-        # Aktualizacja danych APP_VERSION_INFO
-        new_version_info = data["APP_VERSION_INFO"]
-        version_info_str = "APP_VERSION_INFO = {\n"
-        version_info_str += f'    "current_version": "{new_version_info["current_version"]}",\n'
-        version_info_str += f'    "minimum_version": "{new_version_info["minimum_version"]}",\n'
-        version_info_str += f'    "update_required": {str(new_version_info["update_required"])},\n'
-        version_info_str += f'    "update_message": "{new_version_info["update_message"]}",\n'
-        version_info_str += f'    "play_store_url": "{new_version_info["play_store_url"]}",\n'
-        
-        # Dodanie funkcji
-        features = new_version_info["update_features"]
-        version_info_str += "    \"update_features\": [\n"
-        for feature in features:
-            version_info_str += f'        "{feature}",\n'
-        version_info_str += "    ]\n}"
-        
-        # Aktualizacja konfiguracji aplikacji mobilnej, jeśli została dostarczona
-        if "MOBILE_APP_CONFIG" in data:
-            print("Aktualizowanie MOBILE_APP_CONFIG...")
-            mobile_config = data["MOBILE_APP_CONFIG"]
-            mobile_config_str = "MOBILE_APP_CONFIG = {\n"
-            
-            for key, value in mobile_config.items():
-                # Konwersja wartości na odpowiedni format Pythona
-                if isinstance(value, bool):
-                    mobile_config_str += f'    "{key}": {str(value)},\n'
-                elif isinstance(value, (int, float)):
-                    mobile_config_str += f'    "{key}": {value},\n'
-                else:
-                    mobile_config_str += f'    "{key}": "{str(value)}",\n'
-            
-            mobile_config_str += "}"
-            
-            # Zastąpienie starej konfiguracji mobilnej
-            config_content = re.sub(
-                r'MOBILE_APP_CONFIG = \{[\s\S]*?\}',
-                mobile_config_str,
-                config_content
+                content={"detail": "Brak wymaganych danych konfiguracyjnych (APP_VERSION_INFO lub MOBILE_APP_CONFIG)"}
             )
         
-        # Zastąp sekcję APP_VERSION_INFO w pliku
-        config_content = re.sub(
-            r'APP_VERSION_INFO = \{[\s\S]*?\}',
-            version_info_str,
-            config_content
-        )
-        
-        # Sprawdź czy zmiany zostały zastosowane
-        print(f"CONFIG: Sprawdzam czy APP_VERSION_INFO zostało zmienione...")
-        if version_info_str.replace(" ", "").replace("\n", "") not in config_content.replace(" ", "").replace("\n", ""):
-            print("CONFIG: UWAGA! Wyrażenie regularne nie zadziałało poprawnie dla APP_VERSION_INFO!")
-            # Alternatywne podejście z użyciem indeksowania
-            start_idx = config_content.find("APP_VERSION_INFO = {")
-            if start_idx >= 0:
-                end_idx = config_content.find("}", start_idx)
-                if end_idx >= 0:
-                    end_idx = config_content.find("}", end_idx + 1) + 1  # Znajdź koniec całej struktury
-                    config_content = config_content[:start_idx] + version_info_str + config_content[end_idx+1:]
-                    print("CONFIG: Zastosowano alternatywne podejście do aktualizacji APP_VERSION_INFO")
-        
-        # Utwórz kopię zapasową pliku konfiguracyjnego
-        import time
-        backup_path = f"config_backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.py"
-        try:
-            import shutil
-            shutil.copy(config_path, backup_path)
-            print(f"CONFIG: Utworzono kopię zapasową konfiguracji: {backup_path}")
-        except Exception as backup_error:
-            print(f"CONFIG: Ostrzeżenie: Nie można utworzyć kopii zapasowej: {backup_error}")
-        
-        # Wygeneruj unikalne tymczasowe hasło do weryfikacji
-        verify_code = f"CONFIG_VERIFY_{int(time.time())}"
-        config_content += f"\n\n# Kod weryfikacyjny: {verify_code}\n"
-        
-        # Zapisz zaktualizowany plik
-        try:
-            # Najpierw zapisz do pliku tymczasowego
-            temp_config_path = f"config_temp_{datetime.now().strftime('%Y%m%d%H%M%S')}.py"
-            with open(temp_config_path, "w", encoding="utf-8") as f:
-                f.write(config_content)
-            print(f"CONFIG: Zapisano tymczasowy plik konfiguracyjny: {temp_config_path}")
-            
-            # Sprawdź czy plik tymczasowy został poprawnie zapisany
-            if os.path.exists(temp_config_path):
-                with open(temp_config_path, "r", encoding="utf-8") as verify_file:
-                    verify_content = verify_file.read()
-                if verify_code in verify_content and new_config_version in verify_content:
-                    print(f"CONFIG: Weryfikacja pliku tymczasowego OK")
-                    # Skopiuj plik tymczasowy do właściwego pliku konfiguracyjnego
-                    shutil.copy(temp_config_path, config_path)
-                    print(f"CONFIG: Zaktualizowano plik konfiguracyjny: {config_path}")
-                    # Usuń plik tymczasowy
-                    os.remove(temp_config_path)
-                else:
-                    print("CONFIG: BŁĄD - Plik tymczasowy nie zawiera oczekiwanych zmian!")
-            else:
-                print("CONFIG: BŁĄD - Nie udało się utworzyć pliku tymczasowego!")
-                
-            # Weryfikacja czy plik konfiguracyjny został poprawnie zapisany
-            print(f"CONFIG: Weryfikacja zapisu pliku konfiguracyjnego...")
-            if os.path.exists(config_path):
-                with open(config_path, "r", encoding="utf-8") as verify_file:
-                    verify_content = verify_file.read()
-                if new_config_version in verify_content:
-                    print(f"CONFIG: Weryfikacja OK - nowa wersja konfiguracji ({new_config_version}) znajduje się w pliku")
-                    print(f"CONFIG: Zapisano nową konfigurację. Nowa wersja: {new_config_version}")
-                else:
-                    print("CONFIG: BŁĄD - Nowa wersja nie została znaleziona w zapisanym pliku!")
-            else:
-                print("CONFIG: BŁĄD - Plik konfiguracyjny nie istnieje po zapisie!")
-        except Exception as save_error:
-            print(f"CONFIG: BŁĄD zapisu pliku: {save_error}")
-            raise save_error
+        # Zapis atomowy do settings.json z wpisem w historii (config_store.py)
+        snapshot = await run_in_threadpool(config_store.update, sections, user.get("id"))
+        print(f"CONFIG: Zapisano nową konfigurację. Nowa wersja: {snapshot.version} (rewizja {snapshot.revision})")
         
         return {
             "status": "success",
             "message": "Konfiguracja aplikacji mobilnej została zaktualizowana",
-            "config_version": new_config_version,
-            "timestamp": str(datetime.now())
+            "config_version": snapshot.version,
+            "revision": snapshot.revision,
+            "timestamp": str(dt.datetime.now())
         }
         
+    except ValidationError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "detail": f"Nieprawidłowe dane konfiguracyjne: {str(e)}"}
+        )
     except Exception as e:
         import traceback
         print(f"ERROR: Błąd aktualizacji konfiguracji mobilnej: {e}")
@@ -624,6 +572,12 @@ async def batch_operations_redirect(request: Request):
     print("Przekierowuję /workers/batch do /api/workers/batch")
     return await batch_operations(request)
 
+@app.delete("/workers/batch")
+async def batch_delete_redirect(request: Request):
+    """Przekierowanie dla endpointu /workers/batch (DELETE)"""
+    print("Przekierowuję DELETE /workers/batch do /api/workers/batch")
+    return await batch_delete_workers(request)
+
 @app.get("/worker/{worker_id}")
 async def get_worker_redirect(worker_id: str):
     """Przekierowanie dla endpointu /worker/{worker_id}"""
@@ -653,11 +607,11 @@ async def get_session(request: Request):
     return {"authenticated": False}
 
 @app.post("/api/login")
-async def api_login(request: Request):
+def api_login(request: Request, body: bytes = Depends(request_body)):
     """Obsługa logowania przez API"""
     print("Otrzymano żądanie logowania")
     try:
-        data = await request.json()
+        data = json.loads(body)
         username = data.get("username")
         password = data.get("password")
         print(f"Próba logowania dla użytkownika: {username}")
@@ -665,7 +619,7 @@ async def api_login(request: Request):
         # Dodajemy dokładniejsze logowanie dla celów diagnostycznych
         print(f"Dane logowania: username={username}, password={'*' * (len(password) if password else 0)}")
         
-        db = next(get_db())
+        db = get_request_db(request)
         
         # Zabezpieczenie przed None/pustymi wartościami
         if not username or not password:
@@ -813,35 +767,22 @@ async def start_work(request: Request):
         
         print(f"Rozpoczęcie pracy dla {worker_id}, lokalizacja: {location}, lat: {start_lat}, lon: {start_lon}")
         
-        db = next(get_db())
+        # Ponowione żądanie z tym samym kluczem dostaje wynik pierwszego (shift_service.py)
+        idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
         
-        # Sprawdź, czy pracownik już rozpoczął pracę dzisiaj i nie zakończył
-        today = dt.datetime.now().date()
-        active_shift = db.query(models.Shift).filter(
-            models.Shift.employee_id == worker_id,
-            models.Shift.start_time >= dt.datetime.combine(today, dt.datetime.min.time()),
-            models.Shift.stop_time == None
-        ).first()
+        db = get_request_db(request)
         
-        if active_shift:
+        # Zapis przez kolejkę zapisów albo w puli wątków, żeby zapytania do bazy nie blokowały pętli zdarzeń
+        try:
+            shift_id = await execute_write(db, start_shift, worker_id, location, start_lat, start_lon,
+                                           idempotency_key=idempotency_key, recover=recover_start)
+        except ShiftError as e:
             return JSONResponse(
-                status_code=400,
-                content={"detail": "Pracownik już rozpoczął pracę i jej nie zakończył"}
+                status_code=e.status_code,
+                content={"detail": e.detail}
             )
         
-        # Utwórz nowy wpis w tabeli shifts
-        new_shift = models.Shift(
-            employee_id=worker_id,
-            start_time=dt.datetime.now(),
-            start_location=location,
-            start_latitude=start_lat,
-            start_longitude=start_lon
-        )
-        
-        db.add(new_shift)
-        db.commit()
-        
-        return {"status": "success", "message": "Rozpoczęto pracę", "shift_id": new_shift.id}
+        return {"status": "success", "message": "Rozpoczęto pracę", "shift_id": shift_id}
         
     except Exception as e:
         print(f"Błąd podczas rozpoczynania pracy: {str(e)}")
@@ -919,61 +860,21 @@ async def stop_work(request: Request):
         
         print(f"Zakończenie pracy dla {worker_id}, lokalizacja: {location}, lat: {stop_lat}, lon: {stop_lon}")
         
-        db = next(get_db())
+        # Ponowione żądanie z tym samym kluczem dostaje wynik pierwszego (shift_service.py)
+        idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
         
-        # Znajdź aktywną zmianę pracownika
-        today = dt.datetime.now().date()
-        print(f"Szukam aktywnej zmiany dla {worker_id} od {today}")
+        db = get_request_db(request)
         
+        # Zapis przez kolejkę zapisów albo w puli wątków, żeby zapytania do bazy nie blokowały pętli zdarzeń
         try:
-            active_shift = db.query(models.Shift).filter(
-                models.Shift.employee_id == worker_id,
-                models.Shift.start_time >= dt.datetime.combine(today, dt.datetime.min.time()),
-                models.Shift.stop_time == None
-            ).first()
-            
-            if active_shift:
-                print(f"Znaleziono aktywną zmianę dla {worker_id}, rozpoczętą o {active_shift.start_time}")
-            else:
-                print(f"Nie znaleziono aktywnej zmiany dla {worker_id} od {today}")
-                # Spróbujmy znaleźć jakąkolwiek aktywną zmianę, może została rozpoczęta wczoraj
-                any_active_shift = db.query(models.Shift).filter(
-                    models.Shift.employee_id == worker_id,
-                    models.Shift.stop_time == None
-                ).first()
-                
-                if any_active_shift:
-                    print(f"Znaleziono wcześniejszą aktywną zmianę od {any_active_shift.start_time}")
-                    active_shift = any_active_shift
-                else:
-                    print(f"Nie znaleziono żadnej aktywnej zmiany dla {worker_id}")
-        except Exception as e:
-            print(f"Błąd podczas wyszukiwania aktywnej zmiany: {str(e)}")
-            return JSONResponse(
-                status_code=500,
-                content={"detail": f"Błąd serwera podczas wyszukiwania aktywnej zmiany: {str(e)}"}
-            )
-        
-        if not active_shift:
+            duration_minutes = await execute_write(db, stop_shift, worker_id, location, stop_lat, stop_lon,
+                                                   idempotency_key=idempotency_key, recover=recover_stop)
+        except ShiftError as e:
             return JSONResponse(
-                status_code=400,
-                content={"detail": "Nie znaleziono aktywnej zmiany dla tego pracownika"}
+                status_code=e.status_code,
+                content={"detail": e.detail}
             )
         
-        # Aktualizuj wpis w tabeli shifts
-        stop_time = dt.datetime.now()
-        active_shift.stop_time = stop_time
-        active_shift.stop_location = location
-        active_shift.stop_latitude = stop_lat
-        active_shift.stop_longitude = stop_lon
-        
-        # Oblicz czas trwania w minutach
-        duration = stop_time - active_shift.start_time
-        duration_minutes = duration.total_seconds() // 60
-        active_shift.duration_min = int(duration_minutes)
-        
-        db.commit()
-        
         # Przygotuj odpowiedź
         duration_str = f"{int(duration_minutes // 60)}h {int(duration_minutes % 60)}min"
         
@@ -991,6 +892,42 @@ async def stop_work(request: Request):
             content={"detail": f"Błąd serwera: {str(e)}"}
         )
 
+@app.post("/api/sync/events")
+async def sync_offline_events(request: Request):
+    """Zapis paczki zdarzeń start/stop zebranych przez aplikację mobilną bez zasięgu"""
+    # Jak /api/start i /api/stop - aplikacja mobilna nie ma sesji
+    try:
+        data = await request.json()
+        raw_events = data.get("events") if isinstance(data, dict) else data
+        print(f"Synchronizacja offline: {len(raw_events) if isinstance(raw_events, list) else 0} zdarzeń")
+        
+        db = get_request_db(request)
+        
+        # Cała paczka w jednej transakcji, w puli wątków
+        try:
+            results = await run_in_threadpool(sync_events, db, raw_events)
+        except ShiftError as e:
+            return JSONResponse(
+                status_code=e.status_code,
+                content={"detail": e.detail}
+            )
+        
+        counts = {status: sum(1 for result in results if result["status"] == status)
+                  for status in ("applied", "duplicate", "rejected")}
+        return {
+            "status": "success",
+            **counts,
+            "results": results,
+            "server_time": str(dt.datetime.now())
+        }
+        
+    except Exception as e:
+        print(f"Błąd podczas synchronizacji zdarzeń offline: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Błąd serwera: {str(e)}"}
+        )
+
 
 
 @app.post("/api/logout")
@@ -1007,7 +944,7 @@ async def logout_redirect():
     return RedirectResponse(url="/api/logout", status_code=307)
 
 @app.post("/api/workers")
-async def add_worker(request: Request):
+def add_worker(request: Request, body: bytes = Depends(request_body)):
     """Dodawanie nowego pracownika"""
     print("Dodawanie nowego pracownika...")
     user = request.session.get("user")
@@ -1018,8 +955,8 @@ async def add_worker(request: Request):
         )
     
     try:
-        data = await request.json()
-        db = next(get_db())
+        data = json.loads(body)
+        db = get_request_db(request)
         
         # Sprawdź czy pracownik o takim ID już istnieje
         existing = db.query(models.Employee).filter(models.Employee.id == data["id"]).first()
@@ -1064,7 +1001,7 @@ async def add_worker_redirect():
     return RedirectResponse(url="/api/workers", status_code=307)
 
 @app.get("/api/workers")
-async def get_workers(request: Request):
+def get_workers(request: Request):
     """Pobierz listę wszystkich pracowników"""
     print("Pobieranie listy pracowników...")
     user = request.session.get("user")
@@ -1075,7 +1012,10 @@ async def get_workers(request: Request):
         )
     
     try:
-        db = next(get_db())
+        db = get_request_db(request)
+        etag = data_etag(db, ("employees",))
+        if etag_matches(request, etag):
+            return not_modified(etag)
         employees = db.query(models.Employee).all()
         
         result = []
@@ -1087,7 +1027,7 @@ async def get_workers(request: Request):
                 "is_admin": employee.is_admin
             })
         
-        return result
+        return etag_response(result, etag)
     except Exception as e:
         print(f"Błąd podczas pobierania pracowników: {str(e)}")
         return JSONResponse(
@@ -1096,7 +1036,7 @@ async def get_workers(request: Request):
         )
 
 @app.get("/api/worker/{worker_id}")
-async def get_worker_detail(request: Request, worker_id: str):
+def get_worker_detail(request: Request, worker_id: str):
     """Pobierz dane pojedynczego pracownika"""
     print(f"Pobieranie danych pracownika o ID: {worker_id}")
     user = request.session.get("user")
@@ -1107,7 +1047,10 @@ async def get_worker_detail(request: Request, worker_id: str):
         )
     
     try:
-        db = next(get_db())
+        db = get_request_db(request)
+        etag = data_etag(db, ("employees",), worker_id)
+        if etag_matches(request, etag):
+            return not_modified(etag)
         employee = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
         
         if not employee:
@@ -1135,7 +1078,7 @@ async def get_worker_detail(request: Request, worker_id: str):
             "is_admin": employee.is_admin
         }
         
-        return result
+        return etag_response(result, etag)
     except Exception as e:
         print(f"Błąd podczas pobierania danych pracownika: {str(e)}")
         return JSONResponse(
@@ -1144,7 +1087,7 @@ async def get_worker_detail(request: Request, worker_id: str):
         )
 
 @app.put("/api/worker/{worker_id}/pin")
-async def update_worker_pin(worker_id: int, request: Request):
+def update_worker_pin(worker_id: int, request: Request, body: bytes = Depends(request_body)):
     """Aktualizacja PIN-u pracownika"""
     print(f"Aktualizacja PIN-u pracownika {worker_id}")
     user = request.session.get("user")
@@ -1155,7 +1098,7 @@ async def update_worker_pin(worker_id: int, request: Request):
         )
     
     try:
-        data = await request.json()
+        data = json.loads(body)
         pin = data.get("pin")
         
         if not pin or not isinstance(pin, str) or len(pin) != 4 or not pin.isdigit():
@@ -1164,7 +1107,7 @@ async def update_worker_pin(worker_id: int, request: Request):
                 content={"detail": "PIN musi być 4-cyfrowym kodem"}
             )
         
-        db = next(get_db())
+        db = get_request_db(request)
         worker = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
         
         if not worker:
@@ -1189,7 +1132,7 @@ async def update_worker_pin(worker_id: int, request: Request):
         )
 
 @app.put("/api/worker/{worker_id}")
-async def update_api_worker(worker_id: int, request: Request):
+def update_api_worker(worker_id: int, request: Request, body: bytes = Depends(request_body)):
     """Aktualizacja danych pracownika (API)"""
     print(f"Aktualizacja pracownika {worker_id}")
     user = request.session.get("user")
@@ -1200,8 +1143,8 @@ async def update_api_worker(worker_id: int, request: Request):
         )
     
     try:
-        data = await request.json()
-        db = next(get_db())
+        data = json.loads(body)
+        db = get_request_db(request)
         employee = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
         
         if not employee:
@@ -1257,7 +1200,7 @@ async def update_api_worker(worker_id: int, request: Request):
         )
 
 @app.get("/api/attendance_by_date")
-async def get_attendance_by_date(request: Request, date: str):
+def get_attendance_by_date(request: Request, date: str):
     """Pobierz obecności na dany dzień"""
     print(f"Pobieranie obecności dla daty: {date}")
     user = request.session.get("user")
@@ -1269,7 +1212,7 @@ async def get_attendance_by_date(request: Request, date: str):
     
     try:
         date_obj = dt.datetime.strptime(date, "%Y-%m-%d").date()
-        db = next(get_db())
+        db = get_read_db(request)
         
         # Pobranie logów obecności z danego dnia
         start_of_day = dt.datetime.combine(date_obj, dt.datetime.min.time())
@@ -1317,7 +1260,7 @@ async def get_attendance_by_date(request: Request, date: str):
         )
 
 @app.get("/pin_access_logs")
-async def get_pin_access_logs(request: Request):
+def get_pin_access_logs(request: Request):
     """Endpoint do pobierania logów dostępu PIN"""
     print("Pobieranie logów dostępu PIN...")
     user = request.session.get("user")
@@ -1328,7 +1271,7 @@ async def get_pin_access_logs(request: Request):
         )
         
     try:
-        db = next(get_db())
+        db = get_request_db(request)
         
         # Sprawdzamy czy tabela pin_logs istnieje
         try:
@@ -1366,11 +1309,11 @@ async def get_pin_access_logs(request: Request):
 
 @app.post("/api/pin_verify")
 @app.post("/pin_verify")  # Zachowujemy stary endpoint dla kompatybilności wstecznej
-async def verify_pin(request: Request):
+def verify_pin(request: Request, body: bytes = Depends(request_body)):
     """Endpoint do weryfikacji PIN pracownika"""
     print("Weryfikacja PIN pracownika...")
     try:
-        data = await request.json()
+        data = json.loads(body)
         worker_id = data.get("worker_id")
         pin_entered = data.get("pin")
         device_id = data.get("device_id", "unknown")
@@ -1384,7 +1327,7 @@ async def verify_pin(request: Request):
                 content={"success": False, "error": "Brakuje ID pracownika lub PIN"}
             )
             
-        db = next(get_db())
+        db = get_request_db(request)
         
         # Znajdź pracownika
         worker = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
@@ -1429,6 +1372,10 @@ async def verify_pin(request: Request):
             print(f"Błąd podczas zapisywania logu PIN: {str(e)}")
             # Kontynuujemy weryfikację nawet jeśli nie udało się zapisać logu
             pass
+
+        # pin_logs zapisywane jest surowym SQL, więc zdarzenie publikujemy jawnie
+        pin_correct = bool(worker and worker.pin and worker.pin == pin_entered)
+        event_bus.publish(*pin_attempt_event(worker_id, device_id, device_model, pin_correct, pin_correct, "pin_verify"))
             
         if not worker:
             return {
@@ -1511,74 +1458,12 @@ async def get_mobile_config(request: Request):
     """Pobierz konfigurację aplikacji mobilnej"""
     # Format zgodny z oczekiwaniami aplikacji mobilnej
     try:
-        # Próba importu z centralnej konfiguracji
-        try:
-            from configs.app_config import WEB_PANEL_URL, MOBILE_API_URL, APP_DEFAULT_IP
-            central_config_available = True
-            print("DEBUG: Pobrano centralną konfigurację z configs/app_config.py")
-        except ImportError:
-            central_config_available = False
-            print("DEBUG: Nie można zaimportować centralnej konfiguracji, używam wartości domyślnych")
-        
-        # Próba importu konfiguracji mobilnej z wymuszonym przeładowaniem modułu
-        try:
-            import sys
-            import importlib
-            
-            # Usunięcie modułu z pamięci podręcznej, jeśli istnieje
-            if 'config' in sys.modules:
-                print("DEBUG: Usuwam moduł config z pamięci podręcznej")
-                del sys.modules['config']
-            
-            # Przeładowanie modułu konfiguracyjnego
-            import config
-            importlib.reload(config)
-            MOBILE_APP_CONFIG = config.MOBILE_APP_CONFIG
-            CONFIG_VERSION = getattr(config, 'CONFIG_VERSION', 'unknown')
-            print("DEBUG: Przeładowano konfigurację mobilną z config.py")
-        except ImportError:
-            # Awaryjne wartości domyślne
-            print("DEBUG: Nie można zaimportować config.py, używam wartości domyślnych")
-            MOBILE_APP_CONFIG = {
-                "timer_enabled": True,
-                "daily_stats": True,
-                "monthly_stats": True,
-                "gps_verification": False,
-                "offline_mode": True,
-                "notifications": False,
-                "debug_mode": True
-            }
-            CONFIG_VERSION = "unknown"
-            
-        # Tworzenie odpowiedzi z uwzględnieniem centralnej konfiguracji
-        config_data = {
-            "config": {
-                "enable_location": MOBILE_APP_CONFIG.get("gps_verification", True),
-                "location_interval_seconds": 60,
-                "enable_pin_security": True, 
-                "require_device_verification": True,
-                "offline_mode_enabled": MOBILE_APP_CONFIG.get("offline_mode", True),
-                "sync_interval_minutes": 15,
-                "battery_saving_mode": False,
-                "notify_on_success": MOBILE_APP_CONFIG.get("notifications", True),
-                "debug_mode": MOBILE_APP_CONFIG.get("debug_mode", True),
-                "timer_enabled": MOBILE_APP_CONFIG.get("timer_enabled", True),
-                "daily_stats": MOBILE_APP_CONFIG.get("daily_stats", True),
-                "monthly_stats": MOBILE_APP_CONFIG.get("monthly_stats", True),
-                "field_blocking": MOBILE_APP_CONFIG.get("field_blocking", False),
-            },
-            "version": CONFIG_VERSION,
-            "config_version": CONFIG_VERSION,
-            "timestamp": str(dt.datetime.now())
-        }
-        
-        # Dodanie informacji o serwerach jeśli dostępna centralna konfiguracja
-        if central_config_available:
-            config_data["config"]["main_server_url"] = MOBILE_API_URL
-            config_data["config"]["web_panel_url"] = WEB_PANEL_URL
-            config_data["config"]["server_ip"] = APP_DEFAULT_IP
-        print(f"DEBUG: Wysyłam konfigurację: {config_data}")
-        return config_data
+        # Konfiguracja z magazynu (config_store.py) - pliki czytane ponownie tylko po zmianie,
+        # odpowiedź zserializowana raz na wersję konfiguracji
+        snapshot = config_store.get()
+        if etag_matches(request, snapshot.mobile_config_etag):
+            return not_modified(snapshot.mobile_config_etag)
+        return etag_bytes_response(snapshot.mobile_config_body, snapshot.mobile_config_etag)
     except Exception as e:
         import traceback
         print(f"ERROR in mobile-config: {str(e)}")
@@ -1638,99 +1523,35 @@ async def update_mobile_config(request: Request):
                 content={"detail": "Nieautoryzowany dostęp - wymagane uprawnienia administratora"}
             )
         
-        # Aktualizacja pliku konfiguracyjnego
-        import os
-        import re
-        from datetime import datetime
-        
-        # Generowanie nowej wersji konfiguracji
-        now = datetime.now()
-        new_config_version = now.strftime("%Y%m%d-%H%M%S")
-        
-        # Odczyt aktualnego pliku config.py
-        config_path = "config.py"
-        if not os.path.exists(config_path):
-            logging.error(f"Nie znaleziono pliku konfiguracyjnego: {config_path}")
+        if "MOBILE_APP_CONFIG" not in data:
             return JSONResponse(
-                status_code=500,
-                content={"detail": f"Nie znaleziono pliku konfiguracyjnego: {config_path}"}
+                status_code=400,
+                content={"detail": "Brak wymaganych danych konfiguracyjnych (MOBILE_APP_CONFIG)"}
             )
         
-        logging.info(f"Aktualizacja pliku konfiguracyjnego {config_path}...")
-        
-        with open(config_path, "r", encoding="utf-8") as f:
-            config_content = f.read()
-        
-        logging.info(f"Odczytano {len(config_content)} bajtów z pliku konfiguracyjnego")
-            
-        # Aktualizacja wersji konfiguracji
-        config_content = re.sub(
-            r'CONFIG_VERSION = "[^"]+"', 
-            f'CONFIG_VERSION = "{new_config_version}"', 
-            config_content
+        # Zapis atomowy do settings.json z wpisem w historii (config_store.py)
+        snapshot = await run_in_threadpool(
+            config_store.update, mobile_app_sections(data["MOBILE_APP_CONFIG"]), user.get("id")
         )
-        
-        # Aktualizacja konfiguracji aplikacji mobilnej
-        if "MOBILE_APP_CONFIG" in data:
-            logging.info("Aktualizacja MOBILE_APP_CONFIG...")
-            mobile_config = data["MOBILE_APP_CONFIG"]
-            
-            # Tworzenie nowego bloku konfiguracji
-            mobile_config_str = "MOBILE_APP_CONFIG = {\n"
-            for key, value in mobile_config.items():
-                # Konwersja wartości na odpowiedni format Pythona
-                if isinstance(value, bool):
-                    mobile_config_str += f'    "{key}": {str(value)},\n'
-                elif isinstance(value, (int, float)):
-                    mobile_config_str += f'    "{key}": {value},\n'
-                else:
-                    mobile_config_str += f'    "{key}": "{str(value)}",\n'
-            mobile_config_str += "}\n"
-            
-            # Zastąp istniejący blok konfiguracji
-            pattern = r'MOBILE_APP_CONFIG = \{[\s\S]*?\}'
-            if re.search(pattern, config_content):
-                config_content = re.sub(pattern, mobile_config_str.rstrip(), config_content)
-                logging.info("Zaktualizowano blok MOBILE_APP_CONFIG")
-            else:
-                logging.warning("Nie znaleziono bloku MOBILE_APP_CONFIG do aktualizacji!")
-        
-        # Utwórz kopię zapasową pliku konfiguracyjnego
-        backup_path = f"config_backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.py"
-        try:
-            import shutil
-            shutil.copy(config_path, backup_path)
-            logging.info(f"Utworzono kopię zapasową konfiguracji: {backup_path}")
-        except Exception as backup_error:
-            logging.warning(f"Nie można utworzyć kopii zapasowej: {backup_error}")
-        
-        # Zapisz zaktualizowany plik
-        try:
-            with open(config_path, "w", encoding="utf-8") as f:
-                f.write(config_content)
-            logging.info(f"Zapisano zaktualizowaną konfigurację do {config_path}")
-            
-            # Weryfikacja zapisu
-            if os.path.exists(config_path):
-                with open(config_path, "r", encoding="utf-8") as verify_file:
-                    verify_content = verify_file.read()
-                if new_config_version in verify_content:
-                    logging.info(f"Weryfikacja OK - nowa wersja konfiguracji ({new_config_version}) zapisana")
-                else:
-                    logging.error("Weryfikacja NIEUDANA - nowa wersja nie została zapisana!")
-            else:
-                logging.error("Weryfikacja NIEUDANA - plik konfiguracyjny nie istnieje po zapisie!")
-        except Exception as save_error:
-            logging.error(f"Błąd zapisu pliku konfiguracyjnego: {save_error}")
-            raise save_error
+        logging.info(f"Zapisano konfigurację mobilną w wersji {snapshot.version} (rewizja {snapshot.revision})")
         
         now = dt.datetime.now()  # Używamy zaimportowanego modułu dt
         return {
             "status": "success",
             "message": "Konfiguracja zaktualizowana pomyślnie",
-            "config_version": new_config_version,
+            "config_version": snapshot.version,
+            "revision": snapshot.revision,
             "timestamp": str(now)
         }
+    except ValidationError as e:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "status": "error",
+                "message": f"Nieprawidłowe dane konfiguracji: {str(e)}",
+                "timestamp": str(dt.datetime.now())
+            }
+        )
     except Exception as e:
         logging.error(f"Błąd podczas aktualizacji konfiguracji mobilnej: {e}")
         now = dt.datetime.now()  # Używamy zaimportowanego modułu dt
@@ -1754,7 +1575,7 @@ async def get_time_rounding_config(request: Request):
             content={"detail": "Nieautoryzowany dostęp"}
         )
     
-    return TIME_ROUNDING_CONFIG
+    return config_store.get().time_rounding
 
 @app.post("/api/time-rounding-config")
 async def update_time_rounding_config(request: Request):
@@ -1770,17 +1591,16 @@ async def update_time_rounding_config(request: Request):
     try:
         data = await request.json()
         
-        # Aktualizacja globalnej konfiguracji
-        TIME_ROUNDING_CONFIG["enabled"] = data.get("enabled", False)
-        TIME_ROUNDING_CONFIG["interval_minutes"] = data.get("interval_minutes", 15)
-        TIME_ROUNDING_CONFIG["direction"] = data.get("direction", "nearest")
+        # Zapis do settings.json - widoczny od razu we wszystkich procesach serwera
+        # (interval_minutes/direction ze starszych wersji panelu mapuje TimeRoundingSettings)
+        snapshot = await run_in_threadpool(config_store.update, {"time_rounding": data}, user.get("id"))
         
-        # Zapisz konfigurację do pliku (opcjonalnie)
-        with open("time_rounding_config.json", "w") as f:
-            import json
-            json.dump(TIME_ROUNDING_CONFIG, f, indent=4)
-        
-        return {"success": True, "message": "Konfiguracja zaktualizowana", "config": TIME_ROUNDING_CONFIG}
+        return {"success": True, "message": "Konfiguracja zaktualizowana", "config": snapshot.time_rounding}
+    except ValidationError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": f"Nieprawidłowa konfiguracja zaokrąglania: {str(e)}"}
+        )
     except Exception as e:
         print(f"Błąd podczas aktualizacji konfiguracji zaokrąglania czasu: {str(e)}")
         return JSONResponse(
@@ -1788,6 +1608,66 @@ async def update_time_rounding_config(request: Request):
             content={"detail": f"Błąd serwera: {str(e)}"}
         )
 
+@app.get("/api/settings/history")
+def get_settings_history(request: Request, limit: int = 20, db: Session = Depends(get_db)):
+    """Historia zapisów ustawień (settings_history), najnowsze na początku"""
+    user = request.session.get("user")
+    if not user or user.get("role") != "admin":
+        return JSONResponse(
+            status_code=401,
+            content={"detail": "Nieautoryzowany dostęp"}
+        )
+    
+    entries = db.query(models.SettingsHistory).order_by(models.SettingsHistory.revision.desc()).limit(limit).all()
+    return {
+        "current_revision": config_store.get().revision,
+        "history": [
+            {
+                "revision": entry.revision,
+                "config_version": entry.config_version,
+                "saved_at": entry.saved_at,
+                "saved_by": entry.saved_by,
+                "sections": entry.sections.split(",") if entry.sections else []
+            }
+            for entry in entries
+        ]
+    }
+
+@app.post("/api/settings/history/{revision}/restore")
+def restore_settings(revision: int, request: Request, db: Session = Depends(get_db)):
+    """Przywraca ustawienia z podanej rewizji (jako nowy zapis w historii)"""
+    user = request.session.get("user")
+    if not user or user.get("role") != "admin":
+        return JSONResponse(
+            status_code=401,
+            content={"detail": "Nieautoryzowany dostęp"}
+        )
+    
+    entry = db.get(models.SettingsHistory, revision)
+    if entry is None:
+        return JSONResponse(
+            status_code=404,
+            content={"detail": f"Nie znaleziono rewizji ustawień {revision}"}
+        )
+    
+    try:
+        content = json.loads(entry.content)
+        sections = {section: content[section] for section in (*LEGACY_SECTIONS, *SETTINGS_FIELDS)
+                    if section in content}
+        snapshot = config_store.update(sections, user.get("id"))
+        return {
+            "status": "success",
+            "restored_revision": revision,
+            "revision": snapshot.revision,
+            "config_version": snapshot.version
+        }
+    except Exception as e:
+        print(f"Błąd podczas przywracania ustawień: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Błąd serwera: {str(e)}"}
+        )
+
 @app.get("/api/app-version")
 async def get_app_version(request: Request):
     """Pobiera informacje o aktualnej wersji aplikacji mobilnej"""
@@ -1795,7 +1675,15 @@ async def get_app_version(request: Request):
     
     # Importuj konfigurację z pliku config.py
     try:
-        from config import APP_VERSION_INFO, CONFIG_VERSION
+        snapshot = config_store.get()
+        if snapshot.app_version_info is None:
+            raise ImportError("Brak APP_VERSION_INFO w config.py")
+        APP_VERSION_INFO, CONFIG_VERSION = snapshot.app_version_info, snapshot.version
+        
+        # Wersja zmienia się tylko razem z konfiguracją - bez zmian odpowiadamy 304
+        etag = snapshot.app_version_etag
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
         # Logowanie dla diagnostyki
         print(f"CONFIG: Wersja konfiguracji: {CONFIG_VERSION}")
@@ -1809,7 +1697,7 @@ async def get_app_version(request: Request):
             "timestamp": str(dt.datetime.now())
         }
         print(f"CONFIG: Wysyłam dane wersji: {result}")
-        return result
+        return etag_response(result, etag)
     except ImportError:
         print("Błąd importu konfiguracji z pliku config.py")
         # Awaryjne dane wersji aplikacji
@@ -1883,26 +1771,10 @@ async def connection_test(request: Request):
         
         return info
 
-
-
-@app.get("/api/time-rounding-config")
-async def get_time_rounding_config(request: Request):
-    """Pobierz konfigurację zaokrąglania czasu"""
-    print("Pobieranie konfiguracji zaokrąglania czasu...")
-    user = request.session.get("user")
-    if not user:
-        return JSONResponse(
-            status_code=401,
-            content={"detail": "Nieautoryzowany dostęp"}
-        )
-    
-    # Używamy konfiguracji z config.py
-    return TIME_ROUNDING_CONFIG
-
-@app.post("/api/time-rounding-config")
-async def update_time_rounding_config(request: Request):
-    """Aktualizacja konfiguracji zaokrąglania czasu"""
-    print("Aktualizacja konfiguracji zaokrąglania czasu...")
+@app.post("/api/import_employees_csv")
+async def import_employees_csv(request: Request):
+    """Import pracowników z pliku CSV (przesłany plik multipart albo lista JSON z panelu)"""
+    print("Importowanie pracowników z CSV...")
     user = request.session.get("user")
     if not user or user.get("role") != "admin":
         return JSONResponse(
@@ -1911,27 +1783,49 @@ async def update_time_rounding_config(request: Request):
         )
     
     try:
-        data = await request.json()
-        # W normalnej sytuacji zapisalibyśmy to do bazy danych lub pliku konfiguracyjnego
-        # Tutaj tylko symulujemy aktualizację
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            # Plik trafia do pliku tymczasowego i jest parsowany przyrostowo na serwerze
+            form = await request.form()
+            upload = form.get("file")
+            if not upload or not hasattr(upload, "filename"):
+                return JSONResponse(
+                    status_code=400,
+                    content={"detail": "Brak pliku CSV (pole file)"}
+                )
+            print(f"Import z pliku {upload.filename} ({upload.size} B)")
+            job = start_csv_import(upload.file)
+        else:
+            data = await request.json()
+            employees_data = data.get("employees", [])
+            
+            if not employees_data:
+                return JSONResponse(
+                    status_code=400,
+                    content={"detail": "Brak danych do importu"}
+                )
+            job = start_import(employees_data)
+        
+        # Import w tle (employee_import.py) - odpowiedź z wynikiem, jeśli zdąży się zakończyć,
+        # w przeciwnym razie 202 z ID zadania do odpytywania o postęp
+        try:
+            await asyncio.wait_for(asyncio.shield(job.done.wait()), IMPORT_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            return JSONResponse(status_code=202, content=job.result())
         
-        # Aktualizacja konfiguracji w pamięci
-        global TIME_ROUNDING_CONFIG
-        TIME_ROUNDING_CONFIG.update(data)
+        if job.status == "error":
+            return JSONResponse(status_code=500, content=job.result())
+        return job.result()
         
-        return {"status": "success", "config": TIME_ROUNDING_CONFIG}
     except Exception as e:
-        print(f"Błąd podczas aktualizacji konfiguracji: {str(e)}")
+        print(f"Błąd podczas importu pracowników: {str(e)}")
         return JSONResponse(
             status_code=500,
             content={"detail": f"Błąd serwera: {str(e)}"}
-        ),
-
+        )
 
-@app.post("/api/import_employees_csv")
-async def import_employees_csv(request: Request):
-    """Import pracowników z pliku CSV"""
-    print("Importowanie pracowników z CSV...")
+@app.get("/api/import_employees_csv/{job_id}")
+async def get_import_progress(job_id: str, request: Request):
+    """Postęp i wynik importu pracowników uruchomionego w tle"""
     user = request.session.get("user")
     if not user or user.get("role") != "admin":
         return JSONResponse(
@@ -1939,83 +1833,16 @@ async def import_employees_csv(request: Request):
             content={"detail": "Nieautoryzowany dostęp"}
         )
     
-    try:
-        data = await request.json()
-        employees_data = data.get("employees", [])
-        
-        if not employees_data:
-            return JSONResponse(
-                status_code=400,
-                content={"detail": "Brak danych do importu"}
-            )
-        
-        db = next(get_db())
-        imported = 0
-        errors = []
-        
-        for idx, emp in enumerate(employees_data):
-            try:
-                # Tworzenie ID pracownika na podstawie imienia i nazwiska
-                first_name = emp.get("first_name", "").strip()
-                last_name = emp.get("last_name", "").strip()
-                
-                if not first_name or not last_name:
-                    errors.append({"row": idx + 1, "error": "Brak imienia lub nazwiska"})
-                    continue
-                
-                # ID to pierwsza litera imienia + nazwisko, wszystko małymi literami
-                emp_id = (first_name[0] + last_name).lower()
-                # Usuń polskie znaki
-                emp_id = emp_id.replace("ą", "a").replace("ć", "c").replace("ę", "e") \
-                               .replace("ł", "l").replace("ń", "n").replace("ó", "o") \
-                               .replace("ś", "s").replace("ż", "z").replace("ź", "z")
-                # Usuń spacje i inne niestandardowe znaki
-                emp_id = "".join(c for c in emp_id if c.isalnum())
-                
-                # Sprawdź czy pracownik już istnieje
-                existing = db.query(models.Employee).filter(models.Employee.id == emp_id).first()
-                if existing:
-                    errors.append({"row": idx + 1, "error": f"Pracownik o ID {emp_id} już istnieje"})
-                    continue
-                
-                # Przygotuj dane pracownika
-                pin = emp.get("pin", "")
-                hourly_rate = float(emp.get("hourly_rate", 0))
-                
-                # Utwórz nowego pracownika
-                new_employee = models.Employee(
-                    id=emp_id,
-                    name=f"{first_name} {last_name}",
-                    pin=pin,
-                    password_hash=get_password_hash(pin),  # Domyślnie hasło = PIN
-                    hourly_rate=hourly_rate,
-                    is_admin=False
-                )
-                
-                db.add(new_employee)
-                db.commit()
-                imported += 1
-                
-            except Exception as e:
-                errors.append({"row": idx + 1, "error": str(e)})
-                db.rollback()
-        
-        return {
-            "status": "success",
-            "imported": imported,
-            "errors": errors,
-            "total": len(employees_data)
-        }
-        
-    except Exception as e:
-        print(f"Błąd podczas importu pracowników: {str(e)}")
+    job = import_jobs.get(job_id)
+    if not job:
         return JSONResponse(
-            status_code=500,
-            content={"detail": f"Błąd serwera: {str(e)}"}
+            status_code=404,
+            content={"detail": "Nie znaleziono zadania importu"}
         )
+    return job.result()
 
 @app.post("/api/shift")
-async def add_shift(request: Request):
+def add_shift(request: Request, body: bytes = Depends(request_body)):
     """Ręczne dodanie zmiany pracownika"""
     print("Dodawanie ręcznej zmiany pracownika...")
     user = request.session.get("user")
@@ -2026,7 +1853,7 @@ async def add_shift(request: Request):
         )
     
     try:
-        data = await request.json()
+        data = json.loads(body)
         worker_id = data.get("worker_id")
         date = data.get("date")
         start_time = data.get("start_time")
@@ -2040,7 +1867,7 @@ async def add_shift(request: Request):
                 content={"detail": "Brakujące dane: wymagane worker_id, date, start_time i stop_time"}
             )
         
-        db = next(get_db())
+        db = get_request_db(request)
         
         # Sprawdzamy czy pracownik istnieje
         employee = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
@@ -2085,6 +1912,7 @@ async def add_shift(request: Request):
         )
         
         db.add(new_shift)
+        refresh_for_shifts(db, [new_shift])
         db.commit()
         
         return {
@@ -2101,7 +1929,7 @@ async def add_shift(request: Request):
 
 @app.post("/api/workers/batch")
 async def batch_operations(request: Request):
-    """Operacje wsadowe na pracownikach"""
+    """Operacje wsadowe na pracownikach (delete, set_rate, set_rates, reset_pin, force_stop)"""
     print("Wykonywanie operacji wsadowych na pracownikach...")
     user = request.session.get("user")
     if not user or user.get("role") != "admin":
@@ -2120,58 +1948,59 @@ async def batch_operations(request: Request):
                 status_code=400,
                 content={"detail": "Brak danych do operacji wsadowej"}
             )
+        return await run_worker_batch(request, user, operation, worker_ids, data)
         
-        db = next(get_db())
-        affected = 0
-        
-        if operation == "delete":
-            for emp_id in worker_ids:
-                employee = db.query(models.Employee).filter(models.Employee.id == emp_id).first()
-                if employee:
-                    db.delete(employee)
-                    affected += 1
-            
-            db.commit()
-            return {
-                "status": "success",
-                "message": f"Usunięto {affected} pracowników",
-                "affected": affected
-            }
-        
-        elif operation == "set_rate":
-            hourly_rate = data.get("hourly_rate")
-            if hourly_rate is None:
-                return JSONResponse(
-                    status_code=400,
-                    content={"detail": "Brak stawki godzinowej"}
-                )
-            
-            for emp_id in worker_ids:
-                employee = db.query(models.Employee).filter(models.Employee.id == emp_id).first()
-                if employee:
-                    employee.hourly_rate = float(hourly_rate)
-                    affected += 1
-            
-            db.commit()
-            return {
-                "status": "success",
-                "message": f"Zmieniono stawkę dla {affected} pracowników",
-                "affected": affected
-            }
-        
-        else:
+    except BatchError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    except Exception as e:
+        print(f"Błąd podczas operacji wsadowej: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Błąd serwera: {str(e)}"}
+        )
+
+@app.delete("/api/workers/batch")
+async def batch_delete_workers(request: Request):
+    """Usunięcie zaznaczonych pracowników (lista ID w treści żądania)"""
+    user = request.session.get("user")
+    if not user or user.get("role") != "admin":
+        return JSONResponse(
+            status_code=401,
+            content={"detail": "Nieautoryzowany dostęp"}
+        )
+    
+    try:
+        worker_ids = await request.json()
+        if isinstance(worker_ids, dict):
+            worker_ids = worker_ids.get("worker_ids", [])
+        if not worker_ids:
             return JSONResponse(
                 status_code=400,
-                content={"detail": f"Nieobsługiwana operacja: {operation}"}
+                content={"detail": "Brak danych do operacji wsadowej"}
             )
+        result = await run_worker_batch(request, user, "delete", worker_ids, {})
+        return {**result, "count_deleted": result["affected"]}
         
     except Exception as e:
-        print(f"Błąd podczas operacji wsadowej: {str(e)}")
+        print(f"Błąd podczas usuwania pracowników: {str(e)}")
         return JSONResponse(
             status_code=500,
             content={"detail": f"Błąd serwera: {str(e)}"}
         )
 
+async def run_worker_batch(request, user, operation, worker_ids, data):
+    pins = password_hashes = None
+    if operation == "reset_pin":
+        # Hashe liczone w puli procesów importu, poza pętlą zdarzeń
+        pins = generate_pins(unique_ids(worker_ids))
+        hashes = await hash_passwords(list(pins.values()))
+        password_hashes = dict(zip(pins, hashes))
+    db = get_request_db(request)
+    return await run_in_threadpool(
+        run_batch, db, operation, worker_ids, data, user.get("id"),
+        request.client.host if request.client else None, pins, password_hashes
+    )
+
 # Montowanie plików statycznych - na końcu
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/frontend", StaticFiles(directory="frontend"), name="frontend")
@@ -2186,7 +2015,7 @@ app.include_router(attendance_router)
 
 # Endpoint awaryjnego zakończenia zmiany dla administratorów
 @app.post("/api/admin/force-stop")
-async def admin_force_stop(request: Request):
+def admin_force_stop(request: Request, body: bytes = Depends(request_body)):
     """Awaryjne zakończenie pracy przez administratora"""
     print("Otrzymano żądanie awaryjnego zakończenia pracy")
     
@@ -2199,7 +2028,7 @@ async def admin_force_stop(request: Request):
         )
     
     try:
-        data = await request.json()
+        data = json.loads(body)
         worker_id = data.get("worker_id")
         reason = data.get("reason", "Zakończenie awaryjne przez administratora")
         
@@ -2209,7 +2038,7 @@ async def admin_force_stop(request: Request):
                 content={"detail": "Brak identyfikatora pracownika"}
             )
         
-        db = next(get_db())
+        db = get_request_db(request)
         
         # Znajdź aktywną zmianę pracownika
         today = dt.datetime.now().date()
@@ -2246,6 +2075,7 @@ async def admin_force_stop(request: Request):
         )
         db.add(admin_log)
         
+        refresh_for_shifts(db, [active_shift])
         db.commit()
         
         # Przygotuj odpowiedź
@@ -2268,10 +2098,10 @@ async def admin_force_stop(request: Request):
 
 # Endpoint do sprawdzenia statusu pracownika
 @app.get("/api/worker/{worker_id}/status")
-async def get_worker_status(worker_id: str, request: Request):
+def get_worker_status(worker_id: str, request: Request):
     """Sprawdza status aktywnej zmiany pracownika"""
     try:
-        db = next(get_db())
+        db = get_request_db(request)
         
         # Sprawdź czy pracownik istnieje
         employee = db.query(models.Employee).filter(models.Employee.id == worker_id).first()
@@ -2578,6 +2408,101 @@ def get_system_status(db: Session = Depends(get_db)):
         return {"status": "error", "message": str(e)}
 
 
+@app.get("/api/db-pool-status")
+def get_db_pool_status():
+    """Zwraca stan puli połączeń bazy danych dla terminala diagnostycznego"""
+    try:
+        return {"status": "ok", "pool": get_pool_status()}
+    except Exception as e:
+        logger.error(f"Błąd podczas pobierania stanu puli połączeń: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/api/loop-monitor")
+def get_loop_monitor_status():
+    """Zwraca opóźnienia pętli zdarzeń i ostatnie blokujące wywołania (LOOP_MONITOR=1)"""
+    try:
+        return {"status": "ok", "monitor": loop_monitor.snapshot()}
+    except Exception as e:
+        logger.error(f"Błąd podczas pobierania stanu monitora pętli zdarzeń: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/api/write-queue")
+def get_write_queue_status():
+    """Zwraca stan kolejki zapisów: paczki, średni rozmiar paczki, czas commitu (WRITE_QUEUE=1)"""
+    try:
+        return {"status": "ok", "queue": write_queue.snapshot()}
+    except Exception as e:
+        logger.error(f"Błąd podczas pobierania stanu kolejki zapisów: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/api/summary-cache")
+def get_summary_cache_status():
+    """Zwraca stan pamięci podręcznej podsumowań obecności: wpisy, trafienia, chybienia, unieważnienia"""
+    try:
+        return {"status": "ok", "cache": summary_cache.snapshot()}
+    except Exception as e:
+        logger.error(f"Błąd podczas pobierania stanu pamięci podręcznej podsumowań: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/api/singleflight")
+def get_singleflight_status():
+    """Zwraca liczbę trwających obliczeń raportów i żądań, które dołączyły do cudzego obliczenia"""
+    try:
+        return {"status": "ok", "flights": report_flights.snapshot()}
+    except Exception as e:
+        logger.error(f"Błąd podczas pobierania stanu łączenia żądań: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/api/events")
+async def stream_events(request: Request, since: Optional[str] = None):
+    """Strumień zdarzeń panelu (SSE): start/stop zmian, próby PIN, urządzenia, awaryjne zakończenia.
+
+    Wznowienie od nagłówka Last-Event-ID (wysyłanego automatycznie przez EventSource)
+    albo parametru ?since=.
+    """
+    user = request.session.get("user")
+    if not user or user.get("role") != "admin":
+        return JSONResponse(
+            status_code=401,
+            content={"detail": "Nieautoryzowany dostęp"}
+        )
+
+    cursor = request.headers.get("last-event-id") or since
+    return StreamingResponse(
+        event_stream(request, cursor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/events/status")
+def get_events_status():
+    """Stan kanału zdarzeń: ostatni identyfikator, bufor, liczba subskrybentów"""
+    return {"status": "ok", "events": event_bus.status()}
+
+
+@app.get("/api/dashboard/recent-activity")
+def get_recent_activity(request: Request, limit: int = 50):
+    """Ostatnie aktywności z bufora kanału zdarzeń (dla recent-activity.html)"""
+    user = request.session.get("user")
+    if not user or user.get("role") != "admin":
+        return JSONResponse(
+            status_code=401,
+            content={"detail": "Nieautoryzowany dostęp"}
+        )
+
+    activities = [
+        dict(item["activity"], time=item["time"])
+        for item in event_bus.recent(limit) if item["activity"]
+    ]
+    return {"activities": activities, "last_event_id": event_bus.last_id}
+
+
 @app.get("/api/ping")
 def ping_api():
     """Prosty endpoint do sprawdzenia, czy API działa"""
@@ -2627,21 +2552,21 @@ def ping_api():
 
 
 @app.get("/api/employees")
-def get_employees(db: Session = Depends(get_db)):
+def get_employees(request: Request):
     """Pobiera listę wszystkich pracowników"""
     try:
-        # Użyjmy tylko podstawowych kolumn, które na pewno istnieją
-        workers = db.query(
-            models.Employee.id, 
-            models.Employee.name, 
-            models.Employee.is_admin
-        ).all()
+        # Pracownicy i otwarte zmiany z rejestru w pamięci (bez zapytań do bazy)
+        ensure_active_shifts_loaded(SessionLocal)
+        etag = make_etag("employees", active_shifts.version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        workers = [
+            SimpleNamespace(id=employee_id, **employee)
+            for employee_id, employee in active_shifts.employees().items()
+        ]
         
         # Sprawdź, którzy pracownicy są obecnie obecni
-        current_shifts = db.query(models.Shift).filter(
-            models.Shift.stop_time.is_(None)
-        ).all()
-        active_worker_ids = [shift.employee_id for shift in current_shifts]
+        active_worker_ids = {shift["employee_id"] for shift in active_shifts.active_shifts()}
         
         # Logging dla diagnostyki
         logger.info(f"Pobrano {len(workers)} pracowników, {len(active_worker_ids)} jest aktywnych")
@@ -2688,7 +2613,7 @@ def get_employees(db: Session = Depends(get_db)):
         if employees_data and len(employees_data) > 0:
             print(f"Przykładowy rekord pracownika: {employees_data[0]}")
         
-        return {"status": "ok", "employees": employees_data}
+        return etag_response({"status": "ok", "employees": employees_data}, etag)
     except Exception as e:
         logger.error(f"Błąd podczas pobierania listy pracowników: {str(e)}")
         print(f"BŁĄD API /employees: {str(e)}")
@@ -2818,38 +2743,28 @@ def get_statistics(db: Session = Depends(get_db)):
     """Zwraca podstawowe statystyki systemu dla terminala diagnostycznego"""
     try:
         # Liczba pracowników
-        total_workers = db.query(models.Worker).count()
+        total_workers = db.query(models.Employee).count()
         
         # Aktywne sesje
-        active_sessions = db.query(models.Shift).filter(models.Shift.end_time.is_(None)).count()
+        active_sessions = db.query(models.Shift).filter(models.Shift.stop_time.is_(None)).count()
         
-        # Dzisiejsze logowania
+        # Dzisiejsze logowania i czas pracy z dziennego podsumowania
         today = dt.datetime.now().date()
-        today_start = dt.datetime.combine(today, dt.time.min)
-        today_end = dt.datetime.combine(today, dt.time.max)
-        
-        today_logins = db.query(models.Shift).filter(
-            models.Shift.start_time >= today_start,
-            models.Shift.start_time <= today_end
-        ).count()
-        
-        # Średni i łączny czas pracy dzisiaj
-        completed_shifts_today = db.query(models.Shift).filter(
-            models.Shift.start_time >= today_start,
-            models.Shift.start_time <= today_end,
-            models.Shift.end_time.isnot(None)
-        ).all()
-        
-        total_minutes = 0
-        for shift in completed_shifts_today:
-            duration = (shift.end_time - shift.start_time).total_seconds() / 60
-            total_minutes += duration
+        today_totals = db.query(
+            func.sum(models.DailyAttendance.shift_count),
+            func.sum(models.DailyAttendance.completed_shifts),
+            func.sum(models.DailyAttendance.minutes)
+        ).filter(models.DailyAttendance.date == today).one()
+        
+        today_logins = int(today_totals[0] or 0)
+        completed_shifts_today = int(today_totals[1] or 0)
+        total_minutes = int(today_totals[2] or 0)
             
         avg_work_time = "0h 0m"
         total_work_time = "0h 0m"
         
         if completed_shifts_today:
-            avg_minutes = total_minutes / len(completed_shifts_today)
+            avg_minutes = total_minutes / completed_shifts_today
             avg_hours = int(avg_minutes // 60)
             avg_mins = int(avg_minutes % 60)
             avg_work_time = f"{avg_hours}h {avg_mins}m"
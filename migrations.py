@@ -0,0 +1,197 @@
+"""
+Wersjonowane migracje schematu bazy danych
+
+Numer ostatniej wykonanej migracji przechowywany jest w PRAGMA user_version
+pliku SQLite. Przed migracjami tworzone są brakujące tabele z models.py, więc
+wyzwalacze i indeksy zawsze mają swoje tabele. Migracje uruchamiane są przy
+starcie serwera (main.py) albo ręcznie:
+
+    python migrations.py            # wykonuje zaległe migracje
+    python migrations.py --status   # pokazuje wersję schematu
+"""
+import argparse
+import logging
+from datetime import date
+
+import models
+
+logger = logging.getLogger("app")
+
+def _table_exists(conn, table):
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).first() is not None
+
+def _create_indexes(conn, indexes):
+    """Tworzy indeksy (table, instrukcja CREATE INDEX) dla istniejących tabel.
+
+    Tabele, których jeszcze nie ma, dostaną indeksy z definicji w models.py
+    przy tworzeniu przez create_all.
+    """
+    for table, statement in indexes:
+        if _table_exists(conn, table):
+            conn.exec_driver_sql(statement)
+        else:
+            logger.info(f"Pominięto indeks dla nieistniejącej tabeli {table}")
+
+def _migration_001_hot_path_indexes(conn):
+    _create_indexes(conn, [
+        # Zmiany pracownika w zakresie dat (raporty, przeliczanie daily_attendance)
+        ("shifts", "CREATE INDEX IF NOT EXISTS ix_shifts_employee_start ON shifts (employee_id, start_time)"),
+        # Otwarte zmiany (status pracownika, /api/start, /api/stop, aktywni pracownicy)
+        ("shifts", "CREATE INDEX IF NOT EXISTS ix_shifts_open ON shifts (employee_id) WHERE stop_time IS NULL"),
+        # Raporty dzienne wszystkich pracowników
+        ("shifts", "CREATE INDEX IF NOT EXISTS ix_shifts_start_time ON shifts (start_time)"),
+        # Ostatnie zatwierdzone urządzenie pracownika
+        ("device_logs", "CREATE INDEX IF NOT EXISTS ix_device_logs_worker_approved_created "
+                        "ON device_logs (worker_id, is_approved, created_at)"),
+        # Historia prób dostępu do statystyk pracownika
+        ("statistics_access_logs", "CREATE INDEX IF NOT EXISTS ix_statistics_access_logs_worker_attempted "
+                                   "ON statistics_access_logs (worker_id, attempted_at)"),
+    ])
+    # Odświeżenie statystyk, żeby planista od razu korzystał z nowych indeksów
+    conn.exec_driver_sql("ANALYZE")
+
+# Tabele, których zapisy podbijają licznik w data_versions (ETag w data_versions.py)
+DATA_VERSION_TABLES = ("employees", "shifts")
+
+def _migration_002_data_versions(conn):
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS data_versions ("
+        "table_name VARCHAR PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+    )
+    for table in DATA_VERSION_TABLES:
+        if not _table_exists(conn, table):
+            # Migracja bez wyzwalaczy na zawsze zostawiłaby bazę bez liczników (ETag,
+            # rejestr otwartych zmian, pamięć podsumowań) - user_version nie może wzrosnąć
+            raise RuntimeError(f"Brak tabeli {table} - nie można założyć licznika wersji danych")
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            # Wyzwalacze łapią także zapisy surowym SQL i z innych procesów
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{operation.lower()} "
+                f"AFTER {operation} ON {table} BEGIN "
+                f"UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}'; END"
+            )
+        conn.exec_driver_sql("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)", (table,))
+
+def _migration_003_settings_history(conn):
+    # Każdy zapis ustawień (config_store.py) dostaje kolejny numer rewizji - klucz główny
+    # chroni przed nadaniem tego samego numeru przez dwa procesy serwera naraz
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS settings_history ("
+        "revision INTEGER PRIMARY KEY, config_version VARCHAR NOT NULL, "
+        "saved_at DATETIME NOT NULL, saved_by VARCHAR, sections VARCHAR, content TEXT NOT NULL)"
+    )
+
+def _migration_004_single_open_shift(conn):
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+        "key VARCHAR PRIMARY KEY, operation VARCHAR NOT NULL, worker_id VARCHAR NOT NULL, "
+        "result TEXT NOT NULL, created_at DATETIME)"
+    )
+    if not _table_exists(conn, "shifts"):
+        return
+
+    # Duplikaty otwartych zmian (równoległe lub ponowione /api/start) - otwarta zostaje
+    # najpóźniej rozpoczęta, pozostałe są zamykane bez czasu pracy
+    duplicates = conn.exec_driver_sql(
+        "SELECT s.id, s.employee_id, s.start_time FROM shifts s "
+        "WHERE s.stop_time IS NULL AND EXISTS ("
+        "SELECT 1 FROM shifts o WHERE o.employee_id = s.employee_id AND o.stop_time IS NULL "
+        "AND (o.start_time > s.start_time OR (o.start_time = s.start_time AND o.id > s.id)))"
+    ).fetchall()
+    for shift_id, employee_id, start_time in duplicates:
+        conn.exec_driver_sql(
+            "UPDATE shifts SET stop_time = start_time, duration_min = 0, "
+            "stop_location = 'Zamknięta przez migrację 4 (zdublowana otwarta zmiana)' WHERE id = ?",
+            (shift_id,)
+        )
+        logger.warning(f"Zamknięto zdublowaną otwartą zmianę {shift_id} pracownika {employee_id} z {start_time}")
+    if duplicates and _table_exists(conn, "daily_attendance"):
+        # Zamknięte duplikaty liczą się teraz jako zakończone zmiany dnia
+        from sqlalchemy.orm import Session
+        from daily_attendance import refresh_daily_attendance
+
+        db = Session(bind=conn)
+        refresh_daily_attendance(db, [(employee_id, date.fromisoformat(str(start_time)[:10]))
+                                      for _, employee_id, start_time in duplicates])
+        db.flush()
+        db.close()
+    if duplicates:
+        print(f"Zamknięto {len(duplicates)} zdublowanych otwartych zmian")
+
+    # Indeks otwartych zmian staje się unikalny - drugi równoległy start kończy się IntegrityError
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_shifts_open")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX ix_shifts_open ON shifts (employee_id) WHERE stop_time IS NULL"
+    )
+
+def _migration_005_restore_data_versions(conn):
+    # Bazy, na których migracja 2 wykonała się przed utworzeniem employees i shifts,
+    # mają user_version 4 bez wyzwalaczy i wierszy liczników - zakładamy je ponownie
+    _migration_002_data_versions(conn)
+
+# (wersja, opis, funkcja) - nowe migracje dopisujemy na końcu z kolejnym numerem
+MIGRATIONS = [
+    (1, "Indeksy złożone i częściowe dla zmian, device_logs i statistics_access_logs",
+     _migration_001_hot_path_indexes),
+    (2, "Liczniki wersji danych (data_versions) z wyzwalaczami dla employees i shifts",
+     _migration_002_data_versions),
+    (3, "Historia wersji ustawień aplikacji (settings_history)",
+     _migration_003_settings_history),
+    (4, "Najwyżej jedna otwarta zmiana pracownika (unikalny ix_shifts_open) i klucze idempotencji",
+     _migration_004_single_open_shift),
+    (5, "Wyzwalacze data_versions dla baz, na których migracja 2 pominęła brakujące tabele",
+     _migration_005_restore_data_versions),
+]
+
+def get_schema_version(engine):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def run_migrations(engine):
+    """Wykonuje zaległe migracje, każdą w osobnej transakcji. Zwraca listę wykonanych wersji.
+
+    Najpierw tworzy brakujące tabele (create_all nie zmienia istniejących) - na pustej
+    bazie migracje nie mogą zapisać user_version bez wyzwalaczy dla nieistniejących tabel.
+    """
+    models.Base.metadata.create_all(bind=engine)
+    applied = []
+    current = get_schema_version(engine)
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Migracja {version}: {description}")
+        print(f"Migracja schematu bazy danych {version}: {description}")
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+        applied.append(version)
+    return applied
+
+def main():
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Migracje schematu bazy danych")
+    parser.add_argument("--status", action="store_true", help="Pokaż wersję schematu bez wykonywania migracji")
+    args = parser.parse_args()
+
+    current = get_schema_version(engine)
+    latest = MIGRATIONS[-1][0]
+    print(f"Wersja schematu: {current} (najnowsza: {latest})")
+    if args.status:
+        return True
+
+    try:
+        applied = run_migrations(engine)
+    except Exception as e:
+        print(f"❌ Błąd podczas migracji: {e}")
+        return False
+    if applied:
+        print(f"✅ Wykonano migracje: {', '.join(str(v) for v in applied)}")
+    else:
+        print("✅ Schemat jest aktualny")
+    return True
+
+if __name__ == "__main__":
+    main()
@@ -385,6 +385,11 @@ Future<Map<String, dynamic>> getWorkerInfo(String numerPracownika) async {
   }
 }
 
+// Klucz idempotencji akcji start/stop - ten sam dla wszystkich ponowień jednej akcji
+String _idempotencyKey(String operation, String numerPracownika, DateTime czas) {
+  return '$operation-$numerPracownika-${czas.microsecondsSinceEpoch}';
+}
+
 // Funkcja do wysłania danych o rozpoczęciu pracy
 Future<Map<String, dynamic>> sendStart(
   String numerPracownika,
@@ -408,13 +413,16 @@ Future<Map<String, dynamic>> sendStart(
 
     print('📍 Dane żądania: $requestData');
 
-    final response = await http
-        .post(
-          url,
-          headers: {'Content-Type': 'application/json'},
-          body: json.encode(requestData),
-        )
-        .timeout(Duration(seconds: 10)); // Dodaj timeout
+    // Klucz idempotencji z czasu akcji - ponowienia tego samego startu nie utworzą drugiej zmiany
+    final response = await _fetchWithRetry(
+      url,
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Idempotency-Key': _idempotencyKey('start', numerPracownika, czas),
+      },
+      body: json.encode(requestData),
+    );
 
     print('📍 Status odpowiedzi: ${response.statusCode}');
     print('📍 Treść odpowiedzi: ${response.body}');
@@ -451,9 +459,13 @@ Future<Map<String, dynamic>> sendStop(
 ) async {
   try {
     final url = Uri.parse('$baseUrl/stop');
-    final response = await http.post(
+    final response = await _fetchWithRetry(
       url,
-      headers: {'Content-Type': 'application/json'},
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Idempotency-Key': _idempotencyKey('stop', numerPracownika, czas),
+      },
       body: json.encode({
         'employee_id': numerPracownika,
         'czas_stop': czas.toIso8601String(),
@@ -490,6 +502,59 @@ Future<Map<String, dynamic>> sendStop(
   }
 }
 
+// Zdarzenie start/stop zapisane bez zasięgu - event_id jest tym samym kluczem
+// idempotencji co w sendStart/sendStop, więc serwer nie zapisze go drugi raz
+Map<String, dynamic> offlineEvent(
+  String type,
+  String numerPracownika,
+  double lat,
+  double lon,
+  DateTime czas,
+) {
+  return {
+    'event_id': _idempotencyKey(type, numerPracownika, czas),
+    'type': type,
+    'worker_id': numerPracownika,
+    'time': czas.toIso8601String(),
+    'lat': lat,
+    'lon': lon,
+  };
+}
+
+// Funkcja do wysłania paczki zdarzeń zebranych offline (jedno żądanie zamiast wielu)
+Future<Map<String, dynamic>> syncOfflineEvents(
+  List<Map<String, dynamic>> events,
+) async {
+  try {
+    final url = Uri.parse('$baseUrl/api/sync/events');
+    final response = await _fetchWithRetry(
+      url,
+      method: 'POST',
+      headers: {'Content-Type': 'application/json'},
+      body: json.encode({'events': events}),
+    );
+
+    if (response.statusCode == 200) {
+      final data = json.decode(response.body);
+      // Wyniki w kolejności paczki: applied, duplicate albo rejected (z polem detail)
+      return {
+        'success': true,
+        'applied': data['applied'],
+        'duplicate': data['duplicate'],
+        'rejected': data['rejected'],
+        'results': data['results'],
+      };
+    } else {
+      return {
+        'success': false,
+        'error': 'Błąd serwera: ${response.statusCode}',
+      };
+    }
+  } catch (e) {
+    return {'success': false, 'error': 'Błąd połączenia: $e'};
+  }
+}
+
 // Stałe dla konfiguracji HTTP
 const int timeoutSeconds = 10;
 const int maxRetries = 3;
@@ -565,6 +630,30 @@ Future<http.Response> _fetchWithRetry(
   throw lastException!;
 }
 
+// Ostatnie odpowiedzi z nagłówkiem ETag (klucz: adres URL)
+final Map<String, http.Response> _etagCache = {};
+
+// GET z nagłówkiem If-None-Match - przy 304 serwer nie wysyła ponownie danych,
+// a funkcja zwraca zapamiętaną odpowiedź (oszczędność transferu komórkowego)
+Future<http.Response> _fetchWithEtag(Uri url) async {
+  final cached = _etagCache[url.toString()];
+  final etag = cached?.headers['etag'];
+  final response = await _fetchWithRetry(
+    url,
+    method: 'GET',
+    headers: etag != null ? {'If-None-Match': etag} : null,
+  );
+
+  if (response.statusCode == 304 && cached != null) {
+    print('📦 ${url.path}: bez zmian (304), używam zapamiętanej odpowiedzi');
+    return cached;
+  }
+  if (response.statusCode == 200 && response.headers['etag'] != null) {
+    _etagCache[url.toString()] = response;
+  }
+  return response;
+}
+
 // Funkcja do pobrania konfiguracji mobilnej
 Future<Map<String, dynamic>> getMobileConfig() async {
   try {
@@ -573,7 +662,7 @@ Future<Map<String, dynamic>> getMobileConfig() async {
     ); // Używamy nowej funkcji pomocniczej z prawidłowym endpointem /api/
     print('📱 Pobieranie konfiguracji z: $url');
 
-    final response = await _fetchWithRetry(url, method: 'GET');
+    final response = await _fetchWithEtag(url);
 
     if (response.statusCode == 200) {
       print('✅ Konfiguracja pobrana pomyślnie');
@@ -671,7 +760,7 @@ Future<Map<String, dynamic>> getVersionInfo() async {
     final url = buildApiUrl(
       '/app-version',
     ); // Używamy nowej funkcji pomocniczej
-    final response = await _fetchWithRetry(url, method: 'GET');
+    final response = await _fetchWithEtag(url);
 
     if (response.statusCode == 200) {
       final data = json.decode(response.body);
@@ -2,7 +2,7 @@
 
 # Tutaj będą modele ORM
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Date, Index, Text, text
 from database import Base
 import datetime as dt
 
@@ -24,6 +24,28 @@ class Shift(Base):
     is_holiday = Column(Boolean, nullable=True, default=False) # Czy to urlop
     is_sick = Column(Boolean, nullable=True, default=False)    # Czy to zwolnienie lekarskie
 
+    # Indeksy dodawane w istniejących bazach przez migrations.py (migracja 1);
+    # ix_shifts_open jest unikalny (migracja 4) - najwyżej jedna otwarta zmiana pracownika
+    __table_args__ = (
+        Index("ix_shifts_employee_start", "employee_id", "start_time"),
+        Index("ix_shifts_open", "employee_id", unique=True, sqlite_where=text("stop_time IS NULL")),
+        Index("ix_shifts_start_time", "start_time"),
+    )
+
+class DailyAttendance(Base):
+    __tablename__ = "daily_attendance"
+
+    # Dzienne podsumowanie zmian pracownika (dzień = data rozpoczęcia zmiany)
+    employee_id = Column(String, primary_key=True)
+    date = Column(Date, primary_key=True)
+    day_type = Column(String)                         # weekday/saturday/sunday
+    shift_count = Column(Integer, default=0)          # Wszystkie zmiany rozpoczęte tego dnia
+    completed_shifts = Column(Integer, default=0)     # Zmiany zakończone
+    minutes = Column(Integer, default=0)              # Przepracowane minuty (zakończone zmiany)
+    night_minutes = Column(Integer, default=0)        # Minuty w porze nocnej (22:00-6:00)
+    overtime_minutes = Column(Integer, default=0)     # Minuty ponad dobową normę
+    updated_at = Column(DateTime, default=dt.datetime.utcnow)
+
 class Rate(Base):
     __tablename__ = "rates"
 
@@ -80,6 +102,10 @@ class DeviceLog(Base):
     created_at = Column(DateTime, default=dt.datetime.utcnow)
     updated_at = Column(DateTime, default=dt.datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_device_logs_worker_approved_created", "worker_id", "is_approved", "created_at"),
+    )
+
 class StatisticsAccessLog(Base):
     __tablename__ = "statistics_access_logs"
 
@@ -100,6 +126,10 @@ class StatisticsAccessLog(Base):
     # Znaczniki czasu
     attempted_at = Column(DateTime, default=dt.datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_statistics_access_logs_worker_attempted", "worker_id", "attempted_at"),
+    )
+
 class DeviceSecurityAlert(Base):
     __tablename__ = "device_security_alerts"
 
@@ -129,3 +159,31 @@ class AdminLog(Base):
     
     # Znaczniki czasu
     created_at = Column(DateTime, default=dt.datetime.utcnow)
+
+# Liczniki zmian tabel podbijane przez wyzwalacze (migrations.py, migracja 2)
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    table_name = Column(String, primary_key=True)   # np. "shifts"
+    version = Column(Integer, nullable=False, default=0)
+
+# Historia zapisów ustawień aplikacji (config_store.py, migrations.py, migracja 3)
+class SettingsHistory(Base):
+    __tablename__ = "settings_history"
+
+    revision = Column(Integer, primary_key=True, autoincrement=False)
+    config_version = Column(String, nullable=False)
+    saved_at = Column(DateTime, nullable=False, default=dt.datetime.now)
+    saved_by = Column(String, nullable=True)        # Login administratora
+    sections = Column(String, nullable=True)        # Zmienione sekcje, np. "mobile_app,app_version"
+    content = Column(Text, nullable=False)          # Pełne ustawienia po zapisie (JSON)
+
+# Wyniki /api/start i /api/stop zapamiętane pod kluczem idempotencji (shift_service.py, migracja 4)
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)          # Nagłówek Idempotency-Key od klienta
+    operation = Column(String, nullable=False)      # "start" albo "stop"
+    worker_id = Column(String, nullable=False)
+    result = Column(Text, nullable=False)           # Wynik operacji (JSON) odtwarzany przy powtórzeniu
+    created_at = Column(DateTime, default=dt.datetime.now)
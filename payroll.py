@@ -0,0 +1,207 @@
+"""
+Lista płac ze stawek pracownika (hourly_rate, rate_saturday, rate_sunday, rate_night, rate_overtime)
+
+Zmiany całego miesiąca trafiają do tablic NumPy (indeks pracownika, początek,
+koniec), a czas każdej zmiany dzielony jest na rozłączne kategorie minut:
+
+  - overtime - minuty ponad dobową normę (DAILY_NORM_MINUTES); dzień to data
+               rozpoczęcia zmiany, nadgodziny to ostatnie minuty dnia - jak w daily_attendance,
+  - sunday   - pozostałe minuty przypadające na niedzielę,
+  - saturday - pozostałe minuty przypadające na sobotę,
+  - night    - pozostałe minuty w porze nocnej (NIGHT_START_MINUTE - NIGHT_END_MINUTE),
+  - regular  - reszta.
+
+Podział nie wymaga pętli po zmianach: dla każdej minuty okresu liczona jest
+skumulowana liczba minut sobotnich, niedzielnych i nocnych, a liczba minut
+kategorii w przedziale to różnica sum na jego końcach (z częścią ułamkową
+minuty, więc wynik jest dokładny co do sekundy). Stawka 0 lub pusta oznacza
+stawkę godzinową pracownika.
+"""
+import calendar
+import logging
+from datetime import date, datetime
+
+import numpy as np
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+import models
+from daily_attendance import NIGHT_START_MINUTE, NIGHT_END_MINUTE, DAILY_NORM_MINUTES
+from data_versions import data_etag, etag_matches, not_modified, etag_response
+from database import get_read_db
+from singleflight import shared_result
+
+logger = logging.getLogger("app")
+router = APIRouter()
+
+CATEGORIES = ("regular", "saturday", "sunday", "night", "overtime")
+REGULAR, SATURDAY, SUNDAY, NIGHT, OVERTIME = range(len(CATEGORIES))
+RATE_COLUMNS = ("hourly_rate", "rate_saturday", "rate_sunday", "rate_night", "rate_overtime")
+
+MINUTES_PER_DAY = 24 * 60
+SECOND = np.timedelta64(1, "s")
+
+def _minute_calendar(origin_day, days):
+    """Skumulowane minuty sobotnie, niedzielne i nocne od origin_day (tablica 3 x (n+1)) oraz ich flagi"""
+    minute = np.arange(days * MINUTES_PER_DAY)
+    minute_of_day = minute % MINUTES_PER_DAY
+    # 1970-01-01 był czwartkiem: (dni od epoki + 3) % 7 daje 0 dla poniedziałku
+    weekday = (origin_day.astype("datetime64[D]").astype(np.int64) + minute // MINUTES_PER_DAY + 3) % 7
+    sunday = weekday == 6
+    saturday = weekday == 5
+    night = ~(sunday | saturday) & ((minute_of_day < NIGHT_END_MINUTE) | (minute_of_day >= NIGHT_START_MINUTE))
+    flags = np.vstack((saturday, sunday, night)).astype(np.float64)
+    cumulative = np.zeros((3, flags.shape[1] + 1))
+    np.cumsum(flags, axis=1, out=cumulative[:, 1:])
+    return cumulative, flags
+
+def _minutes_until(cumulative, flags, position):
+    """Wartość sum skumulowanych w ułamkowej pozycji (minuty od początku kalendarza)"""
+    index = np.minimum(np.floor(position).astype(np.int64), flags.shape[1] - 1)
+    return cumulative[:, index] + (position - index) * flags[:, index]
+
+def overtime_minutes(employee_index, day, start, duration, daily_norm=DAILY_NORM_MINUTES):
+    """Minuty nadgodzin każdej zmiany: część dnia pracownika ponad normę, liczona od końca dnia"""
+    order = np.lexsort((start, day, employee_index))
+    sorted_duration = duration[order]
+    worked_before = np.cumsum(sorted_duration) - sorted_duration
+    new_day = np.ones(len(order), dtype=bool)
+    new_day[1:] = (employee_index[order][1:] != employee_index[order][:-1]) | (day[order][1:] != day[order][:-1])
+    day_start = np.maximum.accumulate(np.where(new_day, np.arange(len(order)), 0))
+    worked_before -= worked_before[day_start]
+    overtime = np.empty_like(duration)
+    overtime[order] = np.clip(worked_before + sorted_duration - daily_norm, 0, sorted_duration)
+    return overtime
+
+def split_shift_minutes(employee_index, start, stop, daily_norm=DAILY_NORM_MINUTES):
+    """Dzieli zmiany na kategorie minut.
+
+    employee_index - indeks pracownika każdej zmiany, start/stop - tablice datetime64.
+    Zwraca macierz (liczba zmian x len(CATEGORIES)) minut (float).
+    """
+    result = np.zeros((len(start), len(CATEGORIES)))
+    if not len(start):
+        return result
+    start = start.astype("datetime64[s]")
+    stop = np.maximum(stop.astype("datetime64[s]"), start)
+    origin = start.min().astype("datetime64[D]")
+    days = int((stop.max().astype("datetime64[D]") - origin) / np.timedelta64(1, "D")) + 1
+    cumulative, flags = _minute_calendar(origin, days)
+
+    begin = (start - origin) / SECOND / 60
+    end = (stop - origin) / SECOND / 60
+    duration = end - begin
+    day = (start.astype("datetime64[D]") - origin).astype(np.int64)
+    overtime = overtime_minutes(np.asarray(employee_index), day, begin, duration, daily_norm)
+
+    # Nadgodziny to końcówka zmiany - pozostałe kategorie liczone są z przedziału przed nimi
+    special = _minutes_until(cumulative, flags, end - overtime) - _minutes_until(cumulative, flags, begin)
+    result[:, SATURDAY] = special[0]
+    result[:, SUNDAY] = special[1]
+    result[:, NIGHT] = special[2]
+    result[:, OVERTIME] = overtime
+    result[:, REGULAR] = duration - overtime - special.sum(axis=0)
+    return result
+
+def effective_rates(rates):
+    """Macierz stawek (pracownicy x RATE_COLUMNS); stawka 0/pusta zastąpiona stawką godzinową"""
+    rates = np.nan_to_num(np.asarray(rates, dtype=np.float64))
+    return np.where(rates > 0, rates, rates[:, [0]])
+
+def compute_payroll(employee_index, start, stop, rates, daily_norm=DAILY_NORM_MINUTES):
+    """Minuty i kwoty w kategoriach dla każdego pracownika (dwie macierze pracownicy x CATEGORIES)"""
+    rates = effective_rates(rates)
+    employee_index = np.asarray(employee_index, dtype=np.int64)
+    shift_minutes = split_shift_minutes(employee_index, start, stop, daily_norm)
+    minutes = np.zeros_like(rates)
+    for category in range(len(CATEGORIES)):
+        minutes[:, category] = np.bincount(employee_index, weights=shift_minutes[:, category],
+                                           minlength=len(rates))
+    return minutes, minutes / 60 * rates
+
+def load_month(db, year, month):
+    """Pracownicy ze stawkami i zakończone zmiany rozpoczęte w danym miesiącu, jako tablice NumPy"""
+    employees = db.execute(
+        select(models.Employee.id, models.Employee.name,
+               *(getattr(models.Employee, column) for column in RATE_COLUMNS))
+        .order_by(models.Employee.id)
+    ).all()
+    index = {row.id: position for position, row in enumerate(employees)}
+    rates = np.array([[getattr(row, column) or 0.0 for column in RATE_COLUMNS] for row in employees],
+                     dtype=np.float64).reshape(len(employees), len(RATE_COLUMNS))
+
+    month_start = datetime(year, month, 1)
+    month_end = datetime(year + month // 12, month % 12 + 1, 1)
+    shifts = db.execute(
+        select(models.Shift.employee_id, models.Shift.start_time, models.Shift.stop_time)
+        .where(models.Shift.start_time >= month_start,
+               models.Shift.start_time < month_end,
+               models.Shift.stop_time != None)
+    ).all()
+    # Zmiany pracowników usuniętych z bazy są pomijane
+    shifts = [shift for shift in shifts if shift.employee_id in index]
+    employee_index = np.fromiter((index[shift.employee_id] for shift in shifts), dtype=np.int64, count=len(shifts))
+    start = np.array([shift.start_time for shift in shifts], dtype="datetime64[s]")
+    stop = np.array([shift.stop_time for shift in shifts], dtype="datetime64[s]")
+    return employees, rates, employee_index, start, stop
+
+def monthly_payroll(db, year, month):
+    """Lista płac za miesiąc dla wszystkich pracowników"""
+    employees, rates, employee_index, start, stop = load_month(db, year, month)
+    minutes, amounts = compute_payroll(employee_index, start, stop, rates)
+    used_rates = effective_rates(rates)
+    rounded_minutes = np.rint(minutes).astype(np.int64)
+    rounded_amounts = np.round(amounts, 2)
+
+    result = []
+    for position, employee in enumerate(employees):
+        result.append({
+            "id": employee.id,
+            "name": employee.name,
+            "minutes": dict(zip(CATEGORIES, rounded_minutes[position].tolist())),
+            "rates": dict(zip(CATEGORIES, used_rates[position].tolist())),
+            "amounts": dict(zip(CATEGORIES, rounded_amounts[position].tolist())),
+            "total_minutes": int(rounded_minutes[position].sum()),
+            "total_amount": round(float(amounts[position].sum()), 2)
+        })
+    return {
+        "month": f"{year:04d}-{month:02d}",
+        "days": calendar.monthrange(year, month)[1],
+        "shift_count": len(start),
+        "employees": result,
+        "total_amount": round(float(amounts.sum()), 2)
+    }
+
+@router.get("/api/payroll")
+def get_payroll(request: Request, month: str = None):
+    """Lista płac za miesiąc (format RRRR-MM, domyślnie bieżący)"""
+    user = request.session.get("user")
+    if not user or user.get("role") != "admin":
+        return JSONResponse(
+            status_code=401,
+            content={"detail": "Nieautoryzowany dostęp"}
+        )
+
+    try:
+        period = datetime.strptime(month, "%Y-%m") if month else datetime.combine(date.today(), datetime.min.time())
+    except ValueError:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": "Nieprawidłowy miesiąc (oczekiwano RRRR-MM)"}
+        )
+
+    try:
+        db = get_read_db(request)
+        etag = data_etag(db, ("employees", "shifts"), "payroll", period.year, period.month)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        result = shared_result(db, "payroll", (period.year, period.month),
+                               lambda: monthly_payroll(db, period.year, period.month))
+        return etag_response(result, etag)
+    except Exception as e:
+        print(f"Błąd podczas obliczania listy płac: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Błąd serwera: {str(e)}"}
+        )
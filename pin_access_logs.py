@@ -2,7 +2,7 @@
 Moduł obsługujący dostęp do logów PIN
 """
 from fastapi import APIRouter, Request, Depends, HTTPException
-from database import get_db
+from database import get_request_db
 import models
 from typing import Optional
 from datetime import datetime
@@ -25,7 +25,7 @@ async def get_pin_access_logs(
         raise HTTPException(status_code=401, detail="Nieautoryzowany dostęp")
         
     try:
-        db = next(get_db())
+        db = get_request_db(request)
         query = """
             SELECT * FROM pin_logs
             WHERE 1=1
@@ -0,0 +1,44 @@
+"""
+Odbudowuje dzienne podsumowanie obecności (tabela daily_attendance) z historii zmian
+
+Użycie:
+    python rebuild_daily_attendance.py                          # cała historia
+    python rebuild_daily_attendance.py --from 2025-07-01 --to 2025-07-31
+"""
+import argparse
+from datetime import datetime
+
+import models
+from database import engine, SessionLocal
+from daily_attendance import rebuild_daily_attendance
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def main():
+    parser = argparse.ArgumentParser(description="Odbudowa tabeli daily_attendance z tabeli shifts")
+    parser.add_argument("--from", dest="date_from", type=parse_date, help="Data początkowa (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=parse_date, help="Data końcowa (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine, tables=[models.DailyAttendance.__table__])
+
+    period = f"{args.date_from or 'początek'} - {args.date_to or 'koniec'}"
+    print(f"Odbudowa daily_attendance dla okresu: {period}")
+
+    db = SessionLocal()
+    try:
+        started = datetime.now()
+        written = rebuild_daily_attendance(db, args.date_from, args.date_to)
+        elapsed = (datetime.now() - started).total_seconds()
+        print(f"✅ Zapisano {written} wierszy w {elapsed:.1f} s")
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Błąd podczas odbudowy daily_attendance: {e}")
+        return False
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
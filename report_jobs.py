@@ -0,0 +1,363 @@
+"""
+Raporty generowane w tle (/api/reports) z pamięcią podręczną wyników
+
+Podsumowania i eksporty za długie okresy liczone w żądaniu przekraczały limit
+czasu odwrotnego proxy. Teraz raport zlecany jest jako zadanie:
+
+  - POST /api/reports                  - zlecenie (kind: summary, details, by_date, payroll;
+                                         format: csv albo xlsx); odpowiedź z ID zadania,
+  - GET  /api/reports/{job_id}         - postęp i wynik,
+  - GET  /api/reports/{job_id}/events  - postęp jako strumień SSE, do zakończenia zadania,
+  - GET  /api/reports/{job_id}/download - gotowy plik.
+
+Raporty budowane są w puli wątków (REPORT_WORKERS) z własną sesją tylko do odczytu
+i zapisywane do pliku przyrostowo (exports.py), więc pamięć nie zależy od okresu.
+Endpoint zlecenia czeka na wynik najwyżej REPORT_WAIT_SECONDS - krótkie raporty
+wracają od razu, dłuższe zwracają 202 z ID zadania.
+
+Wyniki raportów za zamknięte okresy (koniec przed dzisiejszym dniem) trafiają do
+REPORT_CACHE_DIR pod nazwą będącą skrótem SHA-256 wszystkiego, od czego zależy
+treść: rodzaju, formatu, parametrów, wersji danych pracowników i sumy kontrolnej
+dziennych podsumowań okresu (liczba wierszy, minuty, ostatnia zmiana). Ponowne
+zlecenie "poprzedniego miesiąca" zwraca gotowy plik, a korekta zmiany z tego
+okresu zmienia sumę kontrolną, więc raport zostanie policzony od nowa.
+"""
+import asyncio
+import calendar
+import datetime as dt
+import hashlib
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+
+from database import ReadSessionLocal
+from exports import (
+    EXPORT_MEDIA_TYPES, SUMMARY_COLUMNS, DETAILS_COLUMNS, BY_DATE_COLUMNS, csv_stream, xlsx_stream,
+    query_chunks, shifts_statement, summary_export_row, details_export_row, by_date_export_row
+)
+from attendance import summary_query
+from summary_cache import period_fingerprint
+from payroll import CATEGORIES, monthly_payroll
+
+logger = logging.getLogger("app")
+router = APIRouter()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+REPORT_WAIT_SECONDS = float(os.environ.get("REPORT_WAIT_SECONDS", "5"))
+REPORT_CACHE_DIR = os.environ.get("REPORT_CACHE_DIR", os.path.join(BASE_DIR, "report_cache"))
+# Ile plików raportów za zamknięte okresy trzymać (najdawniej używane są usuwane)
+REPORT_CACHE_FILES = int(os.environ.get("REPORT_CACHE_FILES", "200"))
+# Ile zakończonych zadań pamiętać (do odczytu postępu i pobrania wyniku)
+REPORT_JOBS_LIMIT = 50
+# Co ile sekund strumień SSE wysyła postęp
+REPORT_PROGRESS_SECONDS = 1.0
+# Zmiana formatu plików raportów unieważnia pamięć podręczną
+REPORT_FORMAT_VERSION = 1
+
+REPORT_KINDS = ("summary", "details", "by_date", "payroll")
+PAYROLL_COLUMNS = (["ID", "Imię i nazwisko"] + [f"Minuty ({category})" for category in CATEGORIES]
+                   + [f"Kwota ({category})" for category in CATEGORIES] + ["Razem minut", "Razem kwota"])
+
+class ReportError(Exception):
+    """Błędne parametry zlecenia raportu (odpowiedź 400)"""
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value or "", "%Y-%m-%d").date()
+    except ValueError:
+        raise ReportError(f"Nieprawidłowy format daty {name}. Używaj formatu: YYYY-MM-DD")
+
+def parse_report_request(data):
+    """Rodzaj, format, parametry i okres raportu z treści zlecenia"""
+    kind = data.get("kind")
+    if kind not in REPORT_KINDS:
+        raise ReportError(f"Nieobsługiwany rodzaj raportu: {kind} (dostępne: {', '.join(REPORT_KINDS)})")
+    export_format = data.get("format") or "csv"
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise ReportError(f"Nieobsługiwany format: {export_format} (dostępne: csv, xlsx)")
+
+    if kind == "payroll":
+        try:
+            month = datetime.strptime(data.get("month") or "", "%Y-%m")
+        except ValueError:
+            raise ReportError("Nieprawidłowy miesiąc (oczekiwano RRRR-MM)")
+        date_from = month.date()
+        date_to = date_from.replace(day=calendar.monthrange(month.year, month.month)[1])
+        params = {"month": month.strftime("%Y-%m")}
+    else:
+        date_from = _parse_date(data.get("date_from"), "date_from")
+        date_to = _parse_date(data.get("date_to"), "date_to")
+        if date_from > date_to:
+            raise ReportError("Data początkowa nie może być późniejsza niż data końcowa")
+        params = {"date_from": date_from.isoformat(), "date_to": date_to.isoformat()}
+        if kind == "details" and data.get("worker_id"):
+            params["worker_id"] = str(data["worker_id"])
+    return kind, export_format, params, date_from, date_to
+
+class ReportJob:
+    """Postęp i wynik jednego raportu"""
+
+    def __init__(self, kind, export_format, params, date_from, date_to, owner=None,
+                 session_factory=ReadSessionLocal):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.format = export_format
+        self.params = params
+        self.date_from = date_from
+        self.date_to = date_to
+        self.owner = owner
+        self.session_factory = session_factory
+        self.processed = 0
+        self.cache_key = None
+        self.cached = False
+        self.path = None
+        self.status = "running"
+        self.detail = None
+        self.started_at = dt.datetime.now()
+        self.finished_at = None
+        self.task = None
+        self.done = asyncio.Event()
+
+    @property
+    def filename(self):
+        suffix = "_".join(self.params.values())
+        return f"raport_{self.kind}_{suffix}.{self.format}"
+
+    def finish(self, status="success", detail=None):
+        self.status = status
+        self.detail = detail
+        self.finished_at = dt.datetime.now()
+        self.done.set()
+
+    def result(self):
+        return {
+            "status": self.status,
+            "job_id": self.id,
+            "kind": self.kind,
+            "format": self.format,
+            "params": self.params,
+            "processed": self.processed,
+            "cached": self.cached,
+            "detail": self.detail,
+            "download_url": f"/api/reports/{self.id}/download" if self.status == "success" else None,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+report_jobs = OrderedDict()
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def register_job(job):
+    report_jobs[job.id] = job
+    while len(report_jobs) > REPORT_JOBS_LIMIT:
+        oldest = next(iter(report_jobs.values()))
+        if oldest.status == "running":
+            break
+        report_jobs.popitem(last=False)
+        # Pliki spoza pamięci podręcznej żyją tyle, co zadanie
+        if oldest.path and not oldest.cache_key:
+            _remove_file(oldest.path)
+
+def cache_key(db, job):
+    """Adres wyniku w pamięci podręcznej albo None dla okresu, który jeszcze trwa"""
+    if job.date_to >= dt.date.today():
+        return None
+    fingerprint = period_fingerprint(db, job.date_from, job.date_to)
+    if fingerprint is None:
+        return None
+    content = json.dumps([REPORT_FORMAT_VERSION, job.kind, job.format, job.params, fingerprint], sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def payroll_chunks(db, job):
+    year, month = map(int, job.params["month"].split("-"))
+    rows = []
+    for employee in monthly_payroll(db, year, month)["employees"]:
+        rows.append([employee["id"], employee["name"]]
+                    + [employee["minutes"][category] for category in CATEGORIES]
+                    + [employee["amounts"][category] for category in CATEGORIES]
+                    + [employee["total_minutes"], employee["total_amount"]])
+    yield rows
+
+def report_chunks(db, job):
+    """Nagłówek, paczki wierszy i nazwa arkusza raportu"""
+    if job.kind == "summary":
+        statement = summary_query(db, job.date_from, job.date_to).statement
+        return SUMMARY_COLUMNS, query_chunks(db, statement, summary_export_row), "Ewidencja obecności"
+    if job.kind == "details":
+        statement = shifts_statement(job.date_from, job.date_to, job.params.get("worker_id"))
+        return DETAILS_COLUMNS, query_chunks(db, statement, details_export_row), "Szczegóły obecności"
+    if job.kind == "by_date":
+        statement = shifts_statement(job.date_from, job.date_to)
+        return BY_DATE_COLUMNS, query_chunks(db, statement, by_date_export_row), "Obecności"
+    return PAYROLL_COLUMNS, payroll_chunks(db, job), f"Lista płac {job.params['month']}"
+
+def _counted(job, chunks):
+    for rows in chunks:
+        job.processed += len(rows)
+        yield rows
+
+def _prune_cache():
+    files = [os.path.join(REPORT_CACHE_DIR, name) for name in os.listdir(REPORT_CACHE_DIR)
+             if name.endswith(tuple(f".{export_format}" for export_format in EXPORT_MEDIA_TYPES))]
+    if len(files) <= REPORT_CACHE_FILES:
+        return
+    files.sort(key=os.path.getmtime)
+    for path in files[:len(files) - REPORT_CACHE_FILES]:
+        _remove_file(path)
+
+def build_report(job):
+    """Buduje plik raportu (w wątku puli); wynik z pamięci podręcznej, jeśli już istnieje"""
+    db = job.session_factory()
+    try:
+        key = job.cache_key = cache_key(db, job)
+        if key:
+            path = os.path.join(REPORT_CACHE_DIR, f"{key}.{job.format}")
+            if os.path.exists(path):
+                os.utime(path)  # Ostatnie użycie - przycinanie usuwa najdawniej używane
+                job.path = path
+                job.cached = True
+                return
+        else:
+            path = os.path.join(REPORT_CACHE_DIR, "jobs", f"{job.id}.{job.format}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        header, chunks, sheet_name = report_chunks(db, job)
+        chunks = _counted(job, chunks)
+        stream = xlsx_stream(header, chunks, sheet_name) if job.format == "xlsx" else csv_stream(header, chunks)
+        # Zapis do pliku tymczasowego i zamiana - równoległe zadanie nie zobaczy niepełnego pliku
+        temporary = f"{path}.{job.id}.tmp"
+        try:
+            with open(temporary, "wb") as output:
+                for part in stream:
+                    output.write(part)
+            os.replace(temporary, path)
+        finally:
+            _remove_file(temporary)
+        job.path = path
+        if key:
+            _prune_cache()
+    finally:
+        db.close()
+
+_report_pool = None
+
+def _get_report_pool():
+    global _report_pool
+    if _report_pool is None:
+        _report_pool = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+    return _report_pool
+
+def shutdown_report_pool():
+    global _report_pool
+    if _report_pool is not None:
+        _report_pool.shutdown(wait=False, cancel_futures=True)
+        _report_pool = None
+
+async def _run_job(job):
+    try:
+        await asyncio.get_running_loop().run_in_executor(_get_report_pool(), build_report, job)
+        job.finish()
+        print(f"Raport {job.kind} {job.params} gotowy: {job.processed} wierszy"
+              f"{' (z pamięci podręcznej)' if job.cached else ''}")
+    except Exception as e:
+        logger.error(f"Błąd podczas generowania raportu: {str(e)}")
+        job.finish("error", f"Błąd serwera: {str(e)}")
+
+def start_report(data, owner=None, session_factory=ReadSessionLocal):
+    """Uruchamia raport jako zadanie w tle (ReportError dla błędnych parametrów)"""
+    job = ReportJob(*parse_report_request(data), owner=owner, session_factory=session_factory)
+    register_job(job)
+    job.task = asyncio.create_task(_run_job(job))
+    return job
+
+def _find_job(request, job_id):
+    """Zadanie widoczne dla zalogowanego użytkownika; (zadanie, odpowiedź błędu)"""
+    user = request.session.get("user")
+    if not user:
+        return None, JSONResponse(status_code=401, content={"detail": "Nieautoryzowany dostęp"})
+    job = report_jobs.get(job_id)
+    if not job or (user.get("role") != "admin" and job.owner != user.get("id")):
+        return None, JSONResponse(status_code=404, content={"detail": "Nie znaleziono zadania raportu"})
+    return job, None
+
+@router.post("/api/reports")
+async def submit_report(request: Request):
+    """Zleca raport; czeka na wynik najwyżej REPORT_WAIT_SECONDS, potem zwraca 202 z ID zadania"""
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse(status_code=401, content={"detail": "Nieautoryzowany dostęp"})
+
+    try:
+        data = await request.json()
+        if data.get("kind") == "payroll" and user.get("role") != "admin":
+            return JSONResponse(status_code=401, content={"detail": "Nieautoryzowany dostęp"})
+        job = start_report(data, owner=user.get("id"))
+    except ReportError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    except Exception as e:
+        print(f"Błąd podczas zlecania raportu: {str(e)}")
+        return JSONResponse(status_code=500, content={"detail": f"Błąd serwera: {str(e)}"})
+
+    try:
+        await asyncio.wait_for(asyncio.shield(job.done.wait()), REPORT_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        return JSONResponse(status_code=202, content=job.result())
+    if job.status == "error":
+        return JSONResponse(status_code=500, content=job.result())
+    return job.result()
+
+@router.get("/api/reports/{job_id}")
+def get_report(request: Request, job_id: str):
+    """Postęp i wynik zadania raportu"""
+    job, error = _find_job(request, job_id)
+    return error or job.result()
+
+async def _progress_stream(job):
+    while True:
+        yield f"event: {'progress' if job.status == 'running' else 'done'}\ndata: {json.dumps(job.result())}\n\n"
+        if job.status != "running":
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(job.done.wait()), REPORT_PROGRESS_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+@router.get("/api/reports/{job_id}/events")
+def stream_report_progress(request: Request, job_id: str):
+    """Postęp zadania raportu jako strumień SSE (zdarzenia progress, na końcu done)"""
+    job, error = _find_job(request, job_id)
+    if error:
+        return error
+    return StreamingResponse(
+        _progress_stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/api/reports/{job_id}/download")
+def download_report(request: Request, job_id: str):
+    """Plik gotowego raportu"""
+    job, error = _find_job(request, job_id)
+    if error:
+        return error
+    if job.status != "success":
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "Raport nie jest gotowy" if job.status == "running" else job.detail}
+        )
+    if not job.path or not os.path.exists(job.path):
+        return JSONResponse(status_code=410, content={"detail": "Plik raportu został usunięty - zleć raport ponownie"})
+    return FileResponse(job.path, media_type=EXPORT_MEDIA_TYPES[job.format], filename=job.filename)
@@ -1,6 +1,44 @@
+"""
+Uruchamia panel webowy na porcie web_panel_port z ustawień (settings.json, config_store.py)
+
+Zmiana portu zapisana w panelu - także przez inny proces serwera - zatrzymuje serwer
+po obsłużeniu trwających żądań i uruchamia go ponownie na nowym porcie.
+"""
+import threading
+
 import uvicorn
 
-# Uruchom aplikację na porcie 8002 dla panelu webowego
+from config_store import config_store, CONFIG_CHECK_INTERVAL
+
+def watch_settings(stop):
+    # Słuchacze magazynu są powiadamiani przy odczycie - plik sprawdzamy także bez żądań
+    while not stop.wait(max(CONFIG_CHECK_INTERVAL, 1.0)):
+        config_store.get()
+
+def serve(host="0.0.0.0"):
+    current = {"server": None, "port": None, "restart": False}
+
+    def on_settings_change(snapshot):
+        server = current["server"]
+        if server is not None and snapshot.web_panel_port != current["port"] and not server.should_exit:
+            print(f"Port panelu zmieniony na {snapshot.web_panel_port} - ponowne uruchomienie serwera")
+            current["restart"] = True
+            server.should_exit = True
+
+    config_store.add_listener(on_settings_change)
+    stop = threading.Event()
+    threading.Thread(target=watch_settings, args=(stop,), name="settings-watch", daemon=True).start()
+    try:
+        while True:
+            current["port"] = config_store.get().web_panel_port
+            current["restart"] = False
+            # Aplikacja jako string importu - main ładowany w tym procesie, z tym samym magazynem ustawień
+            current["server"] = uvicorn.Server(uvicorn.Config("main:app", host=host, port=current["port"]))
+            current["server"].run()
+            if not current["restart"]:
+                break
+    finally:
+        stop.set()
+
 if __name__ == "__main__":
-    # Przekazujemy aplikację jako string importu, aby umożliwić opcję 'reload'
-    uvicorn.run("main:app", host="0.0.0.0", port=8002, reload=True)
+    serve()
@@ -2,9 +2,9 @@
 
 # Tutaj będą schematy Pydantic
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
 class Location(BaseModel):
     lat: float
@@ -103,3 +103,71 @@ class DeviceResponse(BaseModel):
     device_registered: bool
     message: str
     status: str  # "approved", "rejected", "pending"
+
+# Ustawienia aplikacji przechowywane w settings.json (config_store.py)
+
+class MobileAppSettings(BaseModel):
+    # Panel wysyła wszystkie przełączniki formularza - nieznane klucze są zachowywane
+    model_config = ConfigDict(extra="allow")
+
+    timer_enabled: bool = True
+    daily_stats: bool = True
+    monthly_stats: bool = True
+    field_blocking: bool = False
+    gps_verification: bool = False
+    widget_support: bool = False
+    notifications: bool = False
+    offline_mode: bool = True
+    debug_mode: bool = True
+    auto_updates: bool = False
+    forceUpdate: bool = False
+
+class AppVersionSettings(BaseModel):
+    current_version: str = "1.0.0"
+    minimum_version: str = "1.0.0"
+    update_required: bool = False
+    update_message: str = ""
+    play_store_url: str = ""
+    update_features: List[str] = []
+
+class TimeRoundingSettings(BaseModel):
+    enabled: bool = False
+    rounding_minutes: int = Field(15, ge=1, le=60)   # Co ile minut zaokrąglać (5, 10, 15, 30, 60)
+    rounding_direction: Literal["up", "down", "nearest"] = "nearest"
+    start_time_rounding: bool = True
+    end_time_rounding: bool = True
+    max_early_minutes: int = Field(30, ge=0)
+    max_late_minutes: int = Field(30, ge=0)
+    apply_to_breaks: bool = False
+
+    @model_validator(mode="before")
+    @classmethod
+    def legacy_keys(cls, data):
+        # Starsze wersje panelu wysyłają interval_minutes i direction - zapisane ustawienia
+        # ich nie zawierają, więc przy łączeniu z bieżącymi to one są nowszą wartością
+        if isinstance(data, dict):
+            data = dict(data)
+            if "interval_minutes" in data:
+                data["rounding_minutes"] = data.pop("interval_minutes")
+            if "direction" in data:
+                data["rounding_direction"] = data.pop("direction")
+        return data
+
+class EmailSettings(BaseModel):
+    smtp_server: str = "smtp.gmail.com"
+    smtp_port: int = 587
+    smtp_username: str = ""
+    smtp_password: str = ""  # Hasło aplikacji (nie zwykłe hasło!)
+    sender_email: str = ""
+    sender_name: str = "System Lista Obecności"
+    use_tls: bool = True                 # STARTTLS po połączeniu (wyłączyć tylko dla lokalnego serwera)
+    enabled: bool = False
+
+class AppSettings(BaseModel):
+    revision: int = 0                    # Numer zapisu (settings_history.revision)
+    config_version: str = "unknown"      # CONFIG_VERSION widoczne dla aplikacji mobilnej
+    mobile_app: MobileAppSettings = Field(default_factory=MobileAppSettings)
+    app_version: AppVersionSettings = Field(default_factory=AppVersionSettings)
+    time_rounding: TimeRoundingSettings = Field(default_factory=TimeRoundingSettings)
+    email: EmailSettings = Field(default_factory=EmailSettings)
+    web_panel_port: int = Field(8002, ge=1, le=65535)   # Port panelu webowego (run_web_panel.py)
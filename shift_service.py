@@ -0,0 +1,550 @@
+"""
+Rejestracja czasu pracy: rozpoczęcie i zakończenie zmiany
+
+Funkcje są synchroniczne i wykonują całą pracę na bazie danych. start_shift(),
+stop_shift(), record_shift() oraz zmiany dziennika obecności (record_batch_shifts(),
+update_shift(), delete_shift()) nie wywołują commit - endpointy wykonują je przez
+write_queue.execute_write(): w kolejce zapisów z grupowym commitem (WRITE_QUEUE=1)
+albo przez run_in_threadpool we własnej transakcji, żeby zapytania SQLite nie
+blokowały pętli zdarzeń (i innych żądań) na czas zapisu. clock_in() i clock_out()
+to te same zapisy z commitem, dla wywołań spoza endpointów.
+
+Aplikacja mobilna ponawia żądania, a pracownik potrafi nacisnąć przycisk dwa razy:
+  - unikalny indeks ix_shifts_open (migracja 4) gwarantuje najwyżej jedną otwartą
+    zmianę pracownika - równoległy drugi start kończy się IntegrityError,
+  - zakończenie zajmuje zmianę warunkowym UPDATE (stop_time IS NULL), więc dwa
+    równoległe /api/stop nie zakończą tej samej zmiany dwa razy,
+  - z kluczem idempotencji (nagłówek Idempotency-Key) wynik jest zapisywany w tej
+    samej transakcji co zmiana, a powtórzone żądanie dostaje ten sam wynik.
+
+sync_events() przyjmuje paczkę zdarzeń zebranych przez telefon bez zasięgu
+(/api/sync/events) i zapisuje ją w jednej transakcji wstawieniami zbiorczymi;
+identyfikator zdarzenia pełni rolę klucza idempotencji.
+"""
+import datetime as dt
+import json
+import os
+from types import SimpleNamespace
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+
+import models
+from active_shifts import queue_shift_changes
+from daily_attendance import refresh_for_shifts, refresh_daily_attendance, shift_day
+from events import queue_shift_events
+from write_queue import run_write
+
+class ShiftError(Exception):
+    """Błąd rejestracji czasu pracy zwracany klientowi z podanym kodem HTTP"""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def stored_result(db, idempotency_key, operation, worker_id):
+    """Zapamiętany wynik żądania z tym kluczem idempotencji albo None"""
+    entry = db.get(models.IdempotencyKey, idempotency_key)
+    if entry is None:
+        return None
+    if entry.operation != operation or entry.worker_id != str(worker_id):
+        raise ShiftError(422, "Klucz idempotencji został już użyty dla innego żądania")
+    print(f"Powtórzone żądanie {operation} dla {worker_id} (klucz {idempotency_key}) - zwracam zapisany wynik")
+    return json.loads(entry.result)
+
+def _remember_result(db, idempotency_key, operation, worker_id, result):
+    if idempotency_key:
+        db.add(models.IdempotencyKey(key=idempotency_key, operation=operation,
+                                     worker_id=str(worker_id), result=json.dumps(result)))
+
+class ShiftConflict(ShiftError):
+    """Zmianę zajęło równoległe żądanie (warunkowy UPDATE nie znalazł wiersza)"""
+
+def start_shift(db, worker_id, location=None, start_lat=None, start_lon=None, idempotency_key=None):
+    """Rozpoczyna zmianę bez commitu i zwraca jej ID; IntegrityError oznacza równoległy start"""
+    if idempotency_key:
+        result = stored_result(db, idempotency_key, "start", worker_id)
+        if result is not None:
+            return result["shift_id"]
+
+    # Sprawdź, czy pracownik nie ma niezakończonej zmiany (także z poprzednich dni)
+    active_shift = db.query(models.Shift).filter(
+        models.Shift.employee_id == worker_id,
+        models.Shift.stop_time == None
+    ).first()
+
+    if active_shift:
+        # Równoległe żądanie z tym samym kluczem mogło właśnie rozpocząć tę zmianę
+        result = stored_result(db, idempotency_key, "start", worker_id) if idempotency_key else None
+        if result is not None:
+            return result["shift_id"]
+        if active_shift.start_time and active_shift.start_time.date() < dt.datetime.now().date():
+            raise ShiftError(400, f"Pracownik nie zakończył zmiany rozpoczętej {active_shift.start_time:%Y-%m-%d %H:%M}")
+        raise ShiftError(400, "Pracownik już rozpoczął pracę i jej nie zakończył")
+
+    # Utwórz nowy wpis w tabeli shifts
+    new_shift = models.Shift(
+        employee_id=worker_id,
+        start_time=dt.datetime.now(),
+        start_location=location,
+        start_latitude=start_lat,
+        start_longitude=start_lon
+    )
+
+    db.add(new_shift)
+    # Flush nadaje ID i sprawdza unikalny indeks otwartych zmian
+    db.flush()
+    _remember_result(db, idempotency_key, "start", worker_id, {"shift_id": new_shift.id})
+    refresh_for_shifts(db, [new_shift])
+    return new_shift.id
+
+def recover_start(db, error, worker_id, *args, idempotency_key=None):
+    """Wynik startu po wycofaniu transakcji z błędem"""
+    if not isinstance(error, IntegrityError):
+        raise error
+    # Równoległe żądanie zdążyło rozpocząć zmianę (albo zapisać ten sam klucz)
+    if idempotency_key:
+        result = stored_result(db, idempotency_key, "start", worker_id)
+        if result is not None:
+            return result["shift_id"]
+    raise ShiftError(400, "Pracownik już rozpoczął pracę i jej nie zakończył")
+
+def clock_in(db, worker_id, location=None, start_lat=None, start_lon=None, idempotency_key=None):
+    """Rozpoczyna zmianę pracownika i zwraca jej ID"""
+    return run_write(db, start_shift, worker_id, location, start_lat, start_lon,
+                     idempotency_key=idempotency_key, recover=recover_start)
+
+def stop_shift(db, worker_id, location=None, stop_lat=None, stop_lon=None, idempotency_key=None):
+    """Kończy aktywną zmianę bez commitu i zwraca czas jej trwania w minutach"""
+    if idempotency_key:
+        result = stored_result(db, idempotency_key, "stop", worker_id)
+        if result is not None:
+            return result["duration_min"]
+
+    # Znajdź aktywną zmianę pracownika
+    today = dt.datetime.now().date()
+    print(f"Szukam aktywnej zmiany dla {worker_id} od {today}")
+
+    try:
+        active_shift = db.query(models.Shift).filter(
+            models.Shift.employee_id == worker_id,
+            models.Shift.start_time >= dt.datetime.combine(today, dt.datetime.min.time()),
+            models.Shift.stop_time == None
+        ).first()
+
+        if active_shift:
+            print(f"Znaleziono aktywną zmianę dla {worker_id}, rozpoczętą o {active_shift.start_time}")
+        else:
+            print(f"Nie znaleziono aktywnej zmiany dla {worker_id} od {today}")
+            # Spróbujmy znaleźć jakąkolwiek aktywną zmianę, może została rozpoczęta wczoraj
+            any_active_shift = db.query(models.Shift).filter(
+                models.Shift.employee_id == worker_id,
+                models.Shift.stop_time == None
+            ).first()
+
+            if any_active_shift:
+                print(f"Znaleziono wcześniejszą aktywną zmianę od {any_active_shift.start_time}")
+                active_shift = any_active_shift
+            else:
+                print(f"Nie znaleziono żadnej aktywnej zmiany dla {worker_id}")
+    except Exception as e:
+        print(f"Błąd podczas wyszukiwania aktywnej zmiany: {str(e)}")
+        raise ShiftError(500, f"Błąd serwera podczas wyszukiwania aktywnej zmiany: {str(e)}")
+
+    if not active_shift:
+        # Równoległe żądanie z tym samym kluczem mogło właśnie zakończyć zmianę
+        result = stored_result(db, idempotency_key, "stop", worker_id) if idempotency_key else None
+        if result is not None:
+            return result["duration_min"]
+        raise ShiftError(400, "Nie znaleziono aktywnej zmiany dla tego pracownika")
+
+    # Zajęcie zmiany - równoległe zakończenie tej samej zmiany nie znajdzie już wiersza
+    stop_time = dt.datetime.now()
+    claimed = db.execute(
+        update(models.Shift)
+        .where(models.Shift.id == active_shift.id, models.Shift.stop_time == None)
+        .values(stop_time=stop_time)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        raise ShiftConflict(400, "Zmiana została już zakończona")
+
+    # Aktualizuj wpis w tabeli shifts (przez ORM - zmianę widzą rejestr otwartych zmian i kanał zdarzeń)
+    active_shift.stop_time = stop_time
+    active_shift.stop_location = location
+    active_shift.stop_latitude = stop_lat
+    active_shift.stop_longitude = stop_lon
+
+    # Oblicz czas trwania w minutach
+    duration = stop_time - active_shift.start_time
+    duration_minutes = int(duration.total_seconds() // 60)
+    active_shift.duration_min = duration_minutes
+
+    _remember_result(db, idempotency_key, "stop", worker_id, {"duration_min": duration_minutes})
+    refresh_for_shifts(db, [active_shift])
+    return duration_minutes
+
+def recover_stop(db, error, worker_id, *args, idempotency_key=None):
+    """Wynik zakończenia po wycofaniu transakcji z błędem"""
+    # Zmianę zakończyło albo ten sam klucz zapisało równoległe żądanie - jego wynik jest obowiązujący
+    if idempotency_key and isinstance(error, (IntegrityError, ShiftConflict)):
+        result = stored_result(db, idempotency_key, "stop", worker_id)
+        if result is not None:
+            return result["duration_min"]
+    raise error
+
+def clock_out(db, worker_id, location=None, stop_lat=None, stop_lon=None, idempotency_key=None):
+    """Kończy aktywną zmianę pracownika i zwraca czas jej trwania w minutach"""
+    return run_write(db, stop_shift, worker_id, location, stop_lat, stop_lon,
+                     idempotency_key=idempotency_key, recover=recover_stop)
+
+def record_shift(db, worker_id, start_time, stop_time, start_location=None, stop_location=None,
+                 start_lat=None, start_lon=None, stop_lat=None, stop_lon=None):
+    """Dodaje zakończoną zmianę (wpis dziennika obecności) bez commitu i zwraca jej ID"""
+    employee = db.get(models.Employee, worker_id)
+    if not employee:
+        raise ShiftError(404, f"Nie znaleziono pracownika o ID: {worker_id}")
+
+    # Oblicz czas trwania w minutach
+    duration_minutes = int((stop_time - start_time).total_seconds() // 60)
+
+    new_shift = models.Shift(
+        employee_id=worker_id,
+        start_time=start_time,
+        stop_time=stop_time,
+        start_location=start_location,
+        stop_location=stop_location,
+        start_latitude=start_lat,
+        start_longitude=start_lon,
+        stop_latitude=stop_lat,
+        stop_longitude=stop_lon,
+        duration_min=duration_minutes
+    )
+    db.add(new_shift)
+    db.flush()
+    refresh_for_shifts(db, [new_shift])
+    return new_shift.id
+
+# Domyślne godziny wpisów dodawanych zbiorczo (/api/logs/batch)
+BATCH_SHIFT_START = dt.time(8, 0)
+BATCH_SHIFT_STOP = dt.time(16, 0)
+
+def record_batch_shifts(db, entries):
+    """Dodaje wpisy dziennika 8:00-16:00 dla par employee_id/date bez commitu.
+
+    Pomija wpisy bez danych, z nieznanym pracownikiem albo błędną datą; zwraca
+    liczbę dodanych zmian.
+    """
+    employee_ids = {entry.get("employee_id") for entry in entries if entry.get("employee_id")}
+    known = {employee_id for (employee_id,) in
+             db.query(models.Employee.id).filter(models.Employee.id.in_(employee_ids))}
+    added_shifts = []
+    for entry in entries:
+        employee_id = entry.get("employee_id")
+        date_str = entry.get("date")
+        if not employee_id or not date_str or employee_id not in known:
+            continue
+        try:
+            date_obj = dt.datetime.strptime(date_str, "%Y-%m-%d").date()
+        except (TypeError, ValueError) as e:
+            print(f"Błąd dodawania wpisu dla pracownika {employee_id}, data {date_str}: {str(e)}")
+            continue
+        added_shifts.append(models.Shift(
+            employee_id=employee_id,
+            start_time=dt.datetime.combine(date_obj, BATCH_SHIFT_START),
+            stop_time=dt.datetime.combine(date_obj, BATCH_SHIFT_STOP),
+            start_location="Dodane ręcznie (batch)",
+            stop_location="Dodane ręcznie (batch)",
+            duration_min=8 * 60
+        ))
+    db.add_all(added_shifts)
+    refresh_for_shifts(db, added_shifts)
+    return len(added_shifts)
+
+def update_shift(db, shift_id, start_time_str, stop_time_str, is_holiday="nie", is_sick="nie", is_present=True):
+    """Zmienia godziny i rodzaj wpisu dziennika bez commitu"""
+    shift = db.get(models.Shift, shift_id)
+    if not shift:
+        raise ShiftError(404, f"Nie znaleziono wpisu o ID: {shift_id}")
+
+    # Dzień przed zmianą - wpis mógł zostać przeniesiony na inną datę
+    previous_key = (shift.employee_id, shift_day(shift))
+
+    if is_present is False:
+        # Dla nieobecności ustawiamy godziny 00:00-00:00 i typ jako "Nieobecny"
+        shift.start_time = dt.datetime.fromisoformat(start_time_str.split('T')[0] + "T00:00:00")
+        shift.stop_time = dt.datetime.fromisoformat(stop_time_str.split('T')[0] + "T00:00:00")
+        shift.status = "Nieobecny"
+        shift.duration_min = 0
+    else:
+        shift.start_time = dt.datetime.fromisoformat(start_time_str)
+        shift.stop_time = dt.datetime.fromisoformat(stop_time_str)
+        shift.status = "Obecny"
+        shift.duration_min = int((shift.stop_time - shift.start_time).total_seconds() // 60)
+
+    shift.is_holiday = is_holiday == "tak"
+    shift.is_sick = is_sick == "tak"
+    refresh_daily_attendance(db, [previous_key, (shift.employee_id, shift_day(shift))])
+
+def delete_shift(db, shift_id):
+    """Usuwa wpis dziennika bez commitu"""
+    shift = db.get(models.Shift, shift_id)
+    if not shift:
+        raise ShiftError(404, f"Nie znaleziono wpisu o ID: {shift_id}")
+    deleted_key = (shift.employee_id, shift_day(shift))
+    db.delete(shift)
+    refresh_daily_attendance(db, [deleted_key])
+
+# --- Synchronizacja zdarzeń zapisanych offline (/api/sync/events) ---------------
+
+# Największa liczba zdarzeń w jednej paczce
+SYNC_MAX_EVENTS = int(os.environ.get("SYNC_MAX_EVENTS", "500"))
+# O ile minut czas zdarzenia może wyprzedzać zegar serwera (rozjechane zegary telefonów)
+SYNC_MAX_CLOCK_SKEW_MINUTES = int(os.environ.get("SYNC_MAX_CLOCK_SKEW_MINUTES", "5"))
+# Ile razy powtórzyć paczkę, gdy równoległy zapis naruszy ograniczenia bazy
+SYNC_RETRIES = 3
+
+class SyncConflict(Exception):
+    """Stan zmian zmienił się w trakcie zapisu paczki - paczka jest przetwarzana od nowa"""
+
+def _parse_time(value):
+    """Czas zdarzenia z ISO 8601; strefa czasowa jest przeliczana na czas lokalny serwera"""
+    if not isinstance(value, str) or not value:
+        raise ValueError
+    moment = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+def _parse_sync_event(raw, now):
+    """Zdarzenie z paczki w postaci znormalizowanej; ShiftError przy błędnych danych"""
+    if not isinstance(raw, dict):
+        raise ShiftError(400, "Zdarzenie musi być obiektem JSON")
+    event_id = raw.get("event_id") or raw.get("id")
+    if not event_id or not isinstance(event_id, str):
+        raise ShiftError(400, "Brak identyfikatora zdarzenia (event_id)")
+    event_type = raw.get("type")
+    if event_type not in ("start", "stop"):
+        raise ShiftError(400, "Nieznany typ zdarzenia - dozwolone: start, stop")
+    worker_id = raw.get("worker_id") or raw.get("employee_id")
+    if not worker_id:
+        raise ShiftError(400, "Brak identyfikatora pracownika")
+    try:
+        moment = _parse_time(raw.get("time") or raw.get(f"czas_{event_type}"))
+    except ValueError:
+        raise ShiftError(400, "Brak lub nieprawidłowy czas zdarzenia (ISO 8601)")
+    if moment > now + dt.timedelta(minutes=SYNC_MAX_CLOCK_SKEW_MINUTES):
+        raise ShiftError(400, "Czas zdarzenia jest w przyszłości")
+
+    location = raw.get("location")
+    lat, lon = raw.get("lat"), raw.get("lon")
+    nested = raw.get(f"lokalizacja_{event_type}")
+    if isinstance(nested, dict):
+        lat = lat if lat is not None else nested.get("lat")
+        lon = lon if lon is not None else nested.get("lon")
+        location = location or nested.get("text")
+    elif isinstance(nested, str):
+        location = location or nested
+
+    return {
+        "event_id": event_id,
+        "type": event_type,
+        "worker_id": str(worker_id),
+        "time": moment,
+        "location": location or "Offline",
+        "lat": lat,
+        "lon": lon
+    }
+
+def _last_activity(db, worker_ids):
+    """Czas ostatniego rozpoczęcia lub zakończenia zmiany każdego pracownika"""
+    last_time = func.max(func.coalesce(models.Shift.stop_time, models.Shift.start_time))
+    rows = db.query(models.Shift.employee_id, last_time).filter(
+        models.Shift.employee_id.in_(worker_ids)
+    ).group_by(models.Shift.employee_id)
+    return {employee_id: value for employee_id, value in rows}
+
+def _plan_sync(db, events, results):
+    """Sprawdza kolejność zdarzeń każdego pracownika względem bazy i paczki.
+
+    Zwraca nowe zmiany (do wstawienia) i zakończenia istniejących otwartych zmian.
+    """
+    worker_ids = {event["worker_id"] for event in events}
+    known = {row.id for row in db.query(models.Employee.id).filter(models.Employee.id.in_(worker_ids))}
+    open_shifts = {
+        shift.employee_id: shift
+        for shift in db.query(models.Shift).filter(
+            models.Shift.employee_id.in_(worker_ids), models.Shift.stop_time == None
+        )
+    }
+    last_activity = _last_activity(db, worker_ids)
+
+    new_shifts = []
+    stopped_existing = []
+    state = {}
+    for event in events:
+        worker_id = event["worker_id"]
+        if worker_id not in known:
+            results[event["index"]] = _sync_result(event, "rejected", detail="Nieznany pracownik")
+            continue
+        if worker_id not in state:
+            existing = open_shifts.get(worker_id)
+            state[worker_id] = {
+                "open": SimpleNamespace(
+                    id=existing.id, employee_id=worker_id, start_time=existing.start_time,
+                    start_location=existing.start_location, start_latitude=existing.start_latitude,
+                    start_longitude=existing.start_longitude, new=False
+                ) if existing else None,
+                "last_time": last_activity.get(worker_id)
+            }
+        current = state[worker_id]
+        if current["last_time"] is not None and event["time"] < current["last_time"]:
+            results[event["index"]] = _sync_result(
+                event, "rejected", detail="Zdarzenie wcześniejsze niż poprzednie zdarzenie pracownika")
+            continue
+
+        if event["type"] == "start":
+            if current["open"] is not None:
+                results[event["index"]] = _sync_result(
+                    event, "rejected", detail="Pracownik już rozpoczął pracę i jej nie zakończył")
+                continue
+            shift = SimpleNamespace(
+                id=None, employee_id=worker_id, start_time=event["time"], start_location=event["location"],
+                start_latitude=event["lat"], start_longitude=event["lon"], stop_time=None, stop_location=None,
+                stop_latitude=None, stop_longitude=None, duration_min=None, new=True, events=[event]
+            )
+            new_shifts.append(shift)
+            current["open"] = shift
+        else:
+            shift = current["open"]
+            if shift is None:
+                results[event["index"]] = _sync_result(
+                    event, "rejected", detail="Nie znaleziono aktywnej zmiany dla tego pracownika")
+                continue
+            shift.stop_time = event["time"]
+            shift.stop_location = event["location"]
+            shift.stop_latitude = event["lat"]
+            shift.stop_longitude = event["lon"]
+            shift.duration_min = int((event["time"] - shift.start_time).total_seconds() // 60)
+            if shift.new:
+                shift.events.append(event)
+            else:
+                shift.events = [event]
+                stopped_existing.append(shift)
+            current["open"] = None
+        current["last_time"] = event["time"]
+    return new_shifts, stopped_existing
+
+def _sync_result(event, status, **fields):
+    return {"event_id": event.get("event_id"), "type": event.get("type"), "status": status, **fields}
+
+def _event_result(event, shift):
+    result = {"shift_id": shift.id}
+    if event["type"] == "stop":
+        result["duration_min"] = shift.duration_min
+    return result
+
+def _apply_sync(db, events, results):
+    stored = {
+        entry.key: entry
+        for entry in db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.key.in_([event["event_id"] for event in events])
+        )
+    }
+    pending = []
+    for event in events:
+        entry = stored.get(event["event_id"])
+        if entry is None:
+            pending.append(event)
+        elif entry.operation != event["type"] or entry.worker_id != event["worker_id"]:
+            results[event["index"]] = _sync_result(
+                event, "rejected", detail="Klucz idempotencji został już użyty dla innego żądania")
+        else:
+            # Zdarzenie zapisane wcześniej (poprzednia synchronizacja albo /api/start, /api/stop)
+            results[event["index"]] = _sync_result(event, "duplicate", **json.loads(entry.result))
+
+    new_shifts, stopped_existing = _plan_sync(db, pending, results)
+
+    # Najpierw zakończenia istniejących zmian - paczka może po nich rozpocząć nową zmianę
+    for shift in stopped_existing:
+        claimed = db.execute(
+            update(models.Shift)
+            .where(models.Shift.id == shift.id, models.Shift.stop_time == None)
+            .values(stop_time=shift.stop_time, stop_location=shift.stop_location, stop_latitude=shift.stop_latitude,
+                    stop_longitude=shift.stop_longitude, duration_min=shift.duration_min)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            # Zmianę zakończyło w międzyczasie inne żądanie - cała paczka od nowa
+            raise SyncConflict(f"Zmiana {shift.id} została zakończona przez równoległe żądanie")
+
+    # Nowe zmiany jednym wstawieniem zbiorczym (ID w kolejności wierszy)
+    if new_shifts:
+        fields = ("employee_id", "start_time", "start_location", "start_latitude", "start_longitude",
+                  "stop_time", "stop_location", "stop_latitude", "stop_longitude", "duration_min")
+        shift_ids = db.scalars(
+            insert(models.Shift).returning(models.Shift.id, sort_by_parameter_order=True),
+            [{field: getattr(shift, field) for field in fields} for shift in new_shifts]
+        ).all()
+        for shift, shift_id in zip(new_shifts, shift_ids):
+            shift.id = shift_id
+
+    keys = []
+    for shift in new_shifts + stopped_existing:
+        for event in shift.events:
+            result = _event_result(event, shift)
+            results[event["index"]] = _sync_result(event, "applied", **result)
+            keys.append({"key": event["event_id"], "operation": event["type"], "worker_id": event["worker_id"],
+                         "result": json.dumps(result), "created_at": dt.datetime.now()})
+    if keys:
+        db.execute(insert(models.IdempotencyKey), keys)
+
+    changed = new_shifts + stopped_existing
+    refresh_daily_attendance(db, [(shift.employee_id, shift.start_time.date()) for shift in changed])
+    # Zapisy zbiorcze omijają jednostkę pracy ORM - rejestr i kanał zdarzeń dostają je jawnie
+    queue_shift_changes(db, changed)
+    queue_shift_events(db, [shift for shift in new_shifts if shift.stop_time is None],
+                       [shift for shift in changed if shift.stop_time is not None])
+
+def sync_events(db, raw_events):
+    """Zapisuje paczkę zdarzeń start/stop zebranych offline w jednej transakcji.
+
+    Zdarzenia są deduplikowane po event_id (także względem kluczy idempotencji
+    /api/start i /api/stop), a ich kolejność sprawdzana dla każdego pracownika.
+    Zwraca wyniki w kolejności paczki: applied, duplicate albo rejected (z opisem).
+    """
+    if not isinstance(raw_events, list):
+        raise ShiftError(400, "Oczekiwano listy zdarzeń (events)")
+    if len(raw_events) > SYNC_MAX_EVENTS:
+        raise ShiftError(413, f"Za dużo zdarzeń w paczce (maksymalnie {SYNC_MAX_EVENTS})")
+
+    now = dt.datetime.now()
+    for attempt in range(SYNC_RETRIES):
+        results = [None] * len(raw_events)
+        events = []
+        seen = set()
+        for index, raw in enumerate(raw_events):
+            try:
+                event = _parse_sync_event(raw, now)
+            except ShiftError as e:
+                raw_id = raw.get("event_id") if isinstance(raw, dict) else None
+                results[index] = {"event_id": raw_id, "status": "rejected", "detail": e.detail}
+                continue
+            if event["event_id"] in seen:
+                results[index] = _sync_result(event, "duplicate", detail="Zdarzenie powtórzone w paczce")
+                continue
+            seen.add(event["event_id"])
+            event["index"] = index
+            events.append(event)
+
+        try:
+            if events:
+                _apply_sync(db, events, results)
+            db.commit()
+            return results
+        except (IntegrityError, SyncConflict):
+            # Równoległy start/stop albo ta sama paczka wysłana dwa razy - stan od nowa
+            db.rollback()
+            print(f"Konflikt przy synchronizacji paczki ({len(raw_events)} zdarzeń), próba {attempt + 1}")
+    raise ShiftError(409, "Nie udało się zapisać paczki z powodu równoległych zmian - wyślij ją ponownie")
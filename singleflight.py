@@ -0,0 +1,240 @@
+"""
+Łączenie równoczesnych identycznych żądań raportów (single-flight)
+
+Pod koniec miesiąca kilku kierowników w ciągu kilku sekund otwiera to samo
+podsumowanie albo pobiera ten sam eksport, a każde żądanie liczyło wszystko od
+nowa. Teraz identyczne żądania, które przyjdą w trakcie obliczenia, czekają na
+wynik pierwszego i dostają ten sam wynik (albo ten sam błąd):
+
+  - shared_result() - wynik JSON (podsumowanie, szczegóły obecności, pracownicy
+                      bez wpisów, lista płac),
+  - shared_stream() - plik eksportu: jeden wątek generuje plik do pliku
+                      tymczasowego, a wszystkie żądania czytają go w miarę
+                      powstawania, więc pamięć nadal nie zależy od okresu.
+
+Klucz to nazwa endpointu, parametry i liczniki wersji danych (data_versions), więc
+żądanie po zapisie zmiany nie dołącza do obliczenia, które zaczęło się przed nim.
+Zakończone obliczenie nie jest pamiętane - od tego jest summary_cache.py.
+Stan widoczny pod /api/singleflight.
+"""
+import logging
+import tempfile
+import threading
+
+from data_versions import get_data_versions
+from database import ReadSessionLocal
+
+logger = logging.getLogger("app")
+
+# Rozmiar porcji pliku wysyłanej do klienta przy czytaniu wspólnego eksportu
+SHARED_STREAM_READ_SIZE = 64 * 1024
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiting")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiting = 0
+
+class _SharedFile:
+    """Plik tymczasowy dopisywany przez wątek generujący i czytany przez żądania"""
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._condition = threading.Condition()
+        self.size = 0
+        self.finished = False
+        self.error = None
+        self.readers = 0
+
+    def append(self, data):
+        with self._condition:
+            self._file.seek(0, 2)
+            self._file.write(data)
+            self.size += len(data)
+            self._condition.notify_all()
+
+    def finish(self, error=None):
+        with self._condition:
+            self.error = error
+            self.finished = True
+            self._condition.notify_all()
+
+    def read(self, position):
+        """Kolejna porcja od position (czeka na nowe dane); b"" po zakończeniu pliku"""
+        with self._condition:
+            while position >= self.size and not self.finished:
+                self._condition.wait()
+            if position >= self.size:
+                return b""
+            self._file.seek(position)
+            return self._file.read(min(SHARED_STREAM_READ_SIZE, self.size - position))
+
+    def close(self):
+        with self._condition:
+            if not self._file.closed:
+                self._file.close()
+
+class _Reader:
+    """Czytelnik wspólnego pliku eksportu.
+
+    Zwalnia plik po jego końcu, błędzie, close() albo usunięciu obiektu - także
+    wtedy, gdy odpowiedź nie zaczęła się wysyłać (klient rozłączył się przed
+    pierwszą porcją), czego generator nie zapewnia: niezaczęty generator nie
+    wykonuje swojego bloku finally.
+    """
+
+    def __init__(self, flights, shared):
+        self._closed = True
+        self._flights = flights
+        self._shared = shared
+        self._position = 0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            data = self._shared.read(self._position)
+        except BaseException:
+            self.close()
+            raise
+        if not data:
+            error = self._shared.error
+            self.close()
+            if error is not None:
+                raise error
+            raise StopIteration
+        self._position += len(data)
+        return data
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._flights._release(self._shared)
+
+    def __del__(self):
+        self.close()
+
+class SingleFlight:
+    """Rejestr trwających obliczeń; kolejne identyczne wywołania czekają na pierwsze"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self.computed = 0
+        self.shared = 0
+
+    def do(self, key, compute):
+        """Wynik compute() - policzony w tym wywołaniu albo w równoczesnym o tym samym kluczu"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.computed += 1
+            else:
+                call.waiting += 1
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key, produce):
+        """Części pliku z produce() generowanego raz dla wszystkich równoczesnych żądań"""
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is None:
+                shared = self._streams[key] = _SharedFile()
+                self.computed += 1
+                threading.Thread(target=self._produce, args=(key, shared, produce),
+                                 name="singleflight-export", daemon=True).start()
+            else:
+                self.shared += 1
+            shared.readers += 1
+        return _Reader(self, shared)
+
+    def _produce(self, key, shared, produce):
+        error = None
+        try:
+            for part in produce():
+                if part:
+                    shared.append(part)
+                with self._lock:
+                    if shared.readers == 0:
+                        # Wszyscy odbiorcy się rozłączyli - nowe żądania zaczną od początku
+                        del self._streams[key]
+                        break
+        except Exception as e:
+            logger.error(f"Błąd podczas generowania wspólnego eksportu: {str(e)}")
+            error = e
+        finally:
+            # Pod tą samą blokadą co odłączanie czytelników - plik zamyka dokładnie jedna strona
+            with self._lock:
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
+                shared.finish(error)
+                unused = shared.readers == 0
+            if unused:
+                shared.close()
+
+    def _release(self, shared):
+        with self._lock:
+            shared.readers -= 1
+            unused = shared.readers == 0 and shared.finished
+        if unused:
+            shared.close()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._streams),
+                "waiting": sum(call.waiting for call in self._calls.values())
+                           + sum(max(shared.readers - 1, 0) for shared in self._streams.values()),
+                "computed": self.computed,
+                "shared": self.shared
+            }
+
+report_flights = SingleFlight()
+
+def flight_key(db, name, *params, tables=("employees", "shifts")):
+    """Klucz obliczenia: endpoint, parametry i liczniki wersji danych"""
+    versions = get_data_versions(db, tables)
+    return (name, *params, *(versions.get(table) for table in tables))
+
+def shared_result(db, name, params, compute, flights=report_flights):
+    """Wynik compute() współdzielony z równoczesnymi identycznymi żądaniami"""
+    return flights.do(flight_key(db, name, *params), compute)
+
+def shared_stream(db, name, params, produce, flights=report_flights, session_factory=ReadSessionLocal):
+    """Plik produce(db) generowany raz dla równoczesnych identycznych żądań.
+
+    Plik powstaje w osobnym wątku z własną sesją (sesja żądania kończy się razem
+    z nim, a generowanie trwa, dopóki czyta go choć jedno żądanie).
+    """
+    def produce_with_session():
+        session = session_factory()
+        try:
+            yield from produce(session)
+        finally:
+            session.close()
+    return flights.stream(flight_key(db, name, *params), produce_with_session)
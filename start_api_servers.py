@@ -56,6 +56,13 @@ except ImportError:
     print("UWAGA: Nie można zaimportować centralnej konfiguracji z configs/app_config.py")
     print("Używam domyślnych wartości")
 
+# Port panelu webowego z ustawień (settings.json) - zmieniany w panelu, nie w app_config.py
+try:
+    from config_store import config_store
+    WEB_PORT = config_store.get().web_panel_port
+except Exception as e:
+    print(f"UWAGA: Nie można odczytać portu panelu z settings.json ({e}) - używam {WEB_PORT}")
+
 def start_servers():
     """
     Uruchamia główny i alternatywny serwer API w oddzielnych procesach
@@ -106,12 +113,8 @@ def start_servers():
     
     # Uruchomienie serwera panelu webowego
     try:
-        web_server = subprocess.Popen([
-            sys.executable, "-m", "uvicorn", "main:app",
-            "--host", "0.0.0.0",
-            "--port", str(WEB_PORT)  # Rzutowanie na string, aby uniknąć TypeError
-            # Usunięto opcję --reload, aby zapobiec automatycznemu restartowi
-        ])
+        # run_web_panel.py czyta port z ustawień i przenosi panel po jego zmianie
+        web_server = subprocess.Popen([sys.executable, "run_web_panel.py"])
         print(f"✅ Uruchomiono serwer panelu webowego na porcie {WEB_PORT}")
         print(f"📡 Adres: http://{SERVER_IP}:{WEB_PORT}")
     except Exception as e:
@@ -19,6 +19,13 @@ except ImportError:
     HOST_IP = "0.0.0.0"
     CENTRAL_CONFIG_LOADED = False
 
+# Port panelu webowego z ustawień (settings.json) - zmieniany w panelu, nie w app_config.py
+try:
+    from config_store import config_store
+    WEB_PORT = config_store.get().web_panel_port
+except Exception as e:
+    print(f"UWAGA: Nie można odczytać portu panelu z settings.json ({e}) - używam {WEB_PORT}")
+
 def log(message):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {message}")
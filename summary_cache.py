@@ -0,0 +1,246 @@
+"""
+Pamięć podręczna wyników podsumowań obecności
+
+Panel otwiera przez cały dzień te same zakresy /api/attendance_summary
+i /api/attendance_by_date, a każde otwarcie liczyło wynik od nowa. Wyniki trafiają
+teraz do pamięci procesu (LRU, najwyżej SUMMARY_CACHE_SIZE wpisów) pod kluczem:
+endpoint, zakres dat i licznik wersji danych pracowników (data_versions), więc
+zmiana pracownika (nazwa, stawka, import, usunięcie) daje nowy klucz.
+
+Unieważnianie jest dokładne: commit sesji, która zmieniła zmiany, usuwa tylko
+wpisy, których zakres obejmuje dzień zmiany (także dzień sprzed edycji, gdy
+zmiana została przeniesiona). Dni zbierane są z jednostki pracy ORM (Shift)
+oraz z refresh_daily_attendance(), przez które przechodzą też zapisy zbiorcze
+(awaryjne zakończenie zmian, operacje wsadowe). Rollback porzuca zebrane dni.
+
+Zapisy z innych procesów serwera (port alternatywny, panel) nie przechodzą przez
+te hooki. Dlatego każdy wpis pamięta licznik wersji zmian (data_versions) i sumę
+kontrolną dziennych podsumowań swojego zakresu (period_fingerprint) z chwili
+przed obliczeniem. Dopóki licznik się nie zmienił, wpis jest aktualny bez
+dodatkowych zapytań; po zmianie licznika suma kontrolna jest liczona ponownie
+i wpis z inną sumą jest odrzucany - korekta zamkniętego miesiąca z panelu nie
+zostaje w pamięci innego procesu, a wynik nigdy nie jest starszy niż liczniki,
+z których endpoint liczy ETag.
+
+Wpisy za okresy, które jeszcze trwają, dodatkowo wygasają po
+SUMMARY_CACHE_TTL_SECONDS. Zakresy kończące się przed bieżącym miesiącem
+(zamknięte miesiące) nie wygasają; usuwa je korekta zmiany z tego okresu albo
+wyparcie przez nowsze wpisy. Liczniki trafień i chybień dostępne są pod
+/api/summary-cache.
+"""
+import datetime as dt
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, func, inspect
+
+import models
+from data_versions import get_data_versions
+from singleflight import report_flights
+
+logger = logging.getLogger("app")
+
+SUMMARY_CACHE_ENABLED = os.environ.get("SUMMARY_CACHE", "1").lower() in ("1", "true", "tak")
+SUMMARY_CACHE_SIZE = int(os.environ.get("SUMMARY_CACHE_SIZE", "256"))
+SUMMARY_CACHE_TTL_SECONDS = float(os.environ.get("SUMMARY_CACHE_TTL_SECONDS", "300"))
+
+def period_fingerprint(db, date_from, date_to):
+    """Suma kontrolna danych okresu; None, gdy nie da się jej ustalić (bez pamięci podręcznej)"""
+    versions = get_data_versions(db, ("employees",))
+    if "employees" not in versions:
+        return None
+    daily = models.DailyAttendance
+    row = db.query(
+        func.count(), func.max(daily.updated_at), func.sum(daily.minutes),
+        func.sum(daily.shift_count), func.sum(daily.completed_shifts)
+    ).filter(daily.date >= date_from, daily.date <= date_to).one()
+    return [versions["employees"], *(str(value) if value is not None else None for value in row)]
+
+def is_closed_period(date_to, today=None):
+    """Czy zakres kończy się przed pierwszym dniem bieżącego miesiąca"""
+    today = today or dt.date.today()
+    return date_to < today.replace(day=1)
+
+class _Entry:
+    __slots__ = ("date_from", "date_to", "expires_at", "value", "shifts_version", "fingerprint")
+
+    def __init__(self, date_from, date_to, expires_at, value, shifts_version, fingerprint):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.expires_at = expires_at
+        self.value = value
+        self.shifts_version = shifts_version
+        self.fingerprint = fingerprint
+
+class SummaryCache:
+    """Wyniki raportów z zakresem dat, którego dotyczą"""
+
+    def __init__(self, max_entries=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Podbijany przy każdym unieważnieniu - wynik liczony w tym czasie nie trafia do pamięci
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.expired = 0
+        self.evicted = 0
+        self.stale = 0
+
+    def get(self, key, shifts_version=None, fingerprint=None):
+        """Zapamiętany wynik albo None.
+
+        Wpis zapisany przy innym liczniku wersji zmian jest sprawdzany sumą kontrolną
+        okresu (fingerprint() - liczona tylko wtedy) i odrzucany, gdy się różni.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and time.monotonic() >= entry.expires_at:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            current = entry.shifts_version == shifts_version
+
+        if not current and fingerprint is not None:
+            state = fingerprint()
+            with self._lock:
+                if state is None or state != entry.fingerprint:
+                    # Zmiana w tym okresie zapisana poza hookami tego procesu
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                    self.stale += 1
+                    self.misses += 1
+                    return None
+                entry.shifts_version = shifts_version
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return entry.value
+
+    def put(self, key, date_from, date_to, value, generation=None, shifts_version=None, fingerprint=None):
+        """Zapisuje wynik; pomija go, jeśli od generation coś zostało unieważnione.
+
+        shifts_version i fingerprint opisują stan danych sprzed obliczenia wyniku.
+        """
+        expires_at = None if is_closed_period(date_to) else time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = _Entry(date_from, date_to, expires_at, value, shifts_version, fingerprint)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def invalidate(self, ranges):
+        """Usuwa wpisy, których zakres nakłada się na któryś z podanych (od, do)"""
+        ranges = [(start, end) for start, end in ranges if start is not None]
+        if not ranges:
+            return 0
+        with self._lock:
+            self.generation += 1
+            stale = [key for key, entry in self._entries.items()
+                     if any(start <= entry.date_to and end >= entry.date_from for start, end in ranges)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidated += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def snapshot(self):
+        with self._lock:
+            closed = sum(1 for entry in self._entries.values() if entry.expires_at is None)
+            return {
+                "enabled": SUMMARY_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "closed_periods": closed,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / (self.hits + self.misses), 3) if self.hits + self.misses else 0,
+                "invalidated": self.invalidated,
+                "stale": self.stale,
+                "expired": self.expired,
+                "evicted": self.evicted
+            }
+
+summary_cache = SummaryCache()
+
+def cached_result(db, endpoint, date_from, date_to, compute, cache=summary_cache):
+    """Wynik z pamięci podręcznej albo compute() zapamiętany dla zakresu dat.
+
+    Równoczesne chybienia tego samego klucza liczą wynik raz (singleflight.py).
+    Bez licznika wersji pracowników (baza bez migracji 2) wynik nie jest zapamiętywany.
+    """
+    if not SUMMARY_CACHE_ENABLED:
+        return compute()
+    versions = get_data_versions(db, ("employees", "shifts"))
+    if "employees" not in versions:
+        return compute()
+    key = (endpoint, date_from, date_to, versions["employees"])
+    shifts_version = versions.get("shifts")
+    fingerprint = lambda: period_fingerprint(db, date_from, date_to)
+    result = cache.get(key, shifts_version, fingerprint)
+    if result is None:
+        generation = cache.generation
+        # Stan sprzed obliczenia - wynik może być nowszy, ale nigdy starszy niż zapamiętana suma
+        state = fingerprint()
+        result = report_flights.do((*key, shifts_version), compute)
+        cache.put(key, date_from, date_to, result, generation, shifts_version, state)
+    return result
+
+def _day(value):
+    if isinstance(value, dt.datetime):
+        return value.date()
+    return value
+
+def queue_summary_invalidation(session, days):
+    """Dni, których wyniki trzeba usunąć z pamięci po commicie sesji"""
+    ranges = session.info.setdefault("summary_cache_ranges", [])
+    ranges.extend((_day(day), _day(day)) for day in days if day is not None)
+
+def queue_range_invalidation(session, date_from=None, date_to=None):
+    """Zakres dat do unieważnienia po commicie (None - bez ograniczenia z tej strony)"""
+    session.info.setdefault("summary_cache_ranges", []).append(
+        (_day(date_from) or dt.date.min, _day(date_to) or dt.date.max)
+    )
+
+def _collect_days(session, flush_context):
+    days = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.Shift):
+            days.append(obj.start_time)
+            # Zmiana przeniesiona na inny dzień - wyniki z dawnego dnia też są nieaktualne
+            days.extend(inspect(obj).attrs.start_time.history.deleted)
+    if days:
+        queue_summary_invalidation(session, days)
+
+def _invalidate(session):
+    ranges = session.info.pop("summary_cache_ranges", None)
+    if ranges:
+        summary_cache.invalidate(ranges)
+
+def _discard(session):
+    session.info.pop("summary_cache_ranges", None)
+
+def install_cache_hooks(session_factory):
+    """Podpina unieważnianie pamięci podręcznej podsumowań pod commit sesji z podanej fabryki"""
+    event.listen(session_factory, "after_flush", _collect_days)
+    event.listen(session_factory, "after_commit", _invalidate)
+    event.listen(session_factory, "after_rollback", _discard)
@@ -0,0 +1,160 @@
+"""
+Test rejestru otwartych zmian (active_shifts.py)
+
+Sprawdza, że rejestr w pamięci nadąża za startem, zakończeniem, edycją
+i usunięciem zmian zatwierdzonymi przez sesję z podpiętymi hookami, że
+wycofana transakcja niczego nie zmienia, oraz że zapis z innego połączenia
+jest wykrywany (PRAGMA data_version) i poprawiany przez reconcile. Z licznikami
+data_versions własne commity procesu (ORM, zapisy zbiorcze, kolejka zapisów)
+nie są brane za zapis z zewnątrz, a reconcile nie nadpisuje rejestru stanem
+odczytanym przed równoległym commitem. Używa tymczasowej bazy SQLite.
+"""
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from migrations import run_migrations
+from shift_service import clock_in, clock_out, sync_events
+from worker_batch import run_batch
+from active_shifts import (
+    active_shifts, install_session_hooks, load_active_shifts, reconcile_active_shifts, DataVersionWatcher
+)
+
+def test_registry_follows_commits():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "registry.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        install_session_hooks(session_factory)
+
+        db = session_factory()
+        db.add_all([
+            models.Employee(id="JAN001", name="Jan Kowalski", pin="1234"),
+            models.Employee(id="ANN002", name="Anna Nowak", pin="5678"),
+        ])
+        db.add(models.Shift(employee_id="ANN002", start_time=datetime(2025, 7, 1, 6, 0)))
+        db.commit()
+        db.close()
+
+        load_active_shifts(session_factory)
+        assert active_shifts.get("ANN002") is not None
+        assert active_shifts.get("JAN001") is None
+        assert set(active_shifts.employees()) == {"JAN001", "ANN002"}
+
+        # Start zmiany
+        db = session_factory()
+        shift = models.Shift(employee_id="JAN001", start_time=datetime(2025, 7, 1, 8, 0), start_location="Biuro")
+        db.add(shift)
+        db.commit()
+        assert active_shifts.get("JAN001")["start_location"] == "Biuro"
+
+        # Wycofana transakcja nie zmienia rejestru
+        shift.stop_time = datetime(2025, 7, 1, 16, 0)
+        db.flush()
+        db.rollback()
+        assert active_shifts.get("JAN001") is not None
+
+        # Zakończenie zmiany
+        shift = db.get(models.Shift, shift.id)
+        shift.stop_time = datetime(2025, 7, 1, 16, 0)
+        db.commit()
+        assert active_shifts.get("JAN001") is None
+
+        # Usunięcie otwartej zmiany i zmiana nazwy pracownika
+        open_shift = db.query(models.Shift).filter(models.Shift.employee_id == "ANN002").one()
+        db.delete(open_shift)
+        db.get(models.Employee, "JAN001").name = "Jan Nowak"
+        db.commit()
+        db.close()
+        assert active_shifts.get("ANN002") is None
+        assert active_shifts.employee("JAN001")["name"] == "Jan Nowak"
+        assert reconcile_active_shifts(session_factory) == 0, "Rejestr powinien być zgodny z bazą"
+        print("   ✅ Rejestr aktualizowany po commitach, bez zmian po rollbacku")
+
+        # Zapis z innego połączenia (np. drugi serwer API) - bez hooków
+        watcher = DataVersionWatcher(engine)
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO shifts (employee_id, start_time) VALUES ('ANN002', '2025-07-02 06:00:00.000000')")
+        conn.commit()
+        conn.close()
+
+        assert active_shifts.get("ANN002") is None
+        assert watcher.changed(), "data_version powinno wykryć zapis z innego połączenia"
+        assert reconcile_active_shifts(session_factory, external_write=True) == 1
+        assert active_shifts.get("ANN002")["start_time"] == datetime(2025, 7, 2, 6, 0)
+        assert not watcher.changed()
+        watcher.close()
+        engine.dispose()
+        print("   ✅ Zapis z innego połączenia wykryty i naniesiony przez reconcile")
+
+def test_local_writes_and_reconcile_race():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "registry.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        install_session_hooks(session_factory)
+
+        db = session_factory()
+        db.add_all([models.Employee(id=f"P{number}", name=f"Pracownik {number}", pin="1234") for number in range(4)])
+        db.commit()
+        load_active_shifts(session_factory)
+        watcher = DataVersionWatcher(engine)
+
+        # Własne commity: start i stop (UPDATE zajmujący zmianę + ORM), zapis zbiorczy, paczka offline
+        clock_in(db, "P0")
+        clock_in(db, "P1")
+        clock_out(db, "P0")
+        run_batch(db, "force_stop", ["P1"], {"reason": "test"}, "admin")
+        sync_events(db, [{"event_id": "e1", "type": "start", "worker_id": "P2", "time": "2025-07-01T06:00:00"}])
+        db.get(models.Employee, "P3").name = "Zmieniony"
+        db.commit()
+        assert not watcher.changed(), "Własne commity nie są zapisem z zewnątrz"
+        assert active_shifts.get("P2") is not None and active_shifts.employee("P3")["name"] == "Zmieniony"
+
+        # Zapis z innego procesu razem z własnym commitem
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE shifts SET stop_time = '2025-07-01 14:00:00.000000' WHERE employee_id = 'P2'")
+        conn.commit()
+        conn.close()
+        clock_in(db, "P3")
+        assert watcher.changed(), "Przyrost liczników większy niż z własnych commitów"
+        watcher.sync()
+        assert reconcile_active_shifts(session_factory, external_write=True) == 1
+        assert active_shifts.get("P2") is None and not watcher.changed()
+        print("   ✅ Własne commity nie wywołują porównania, zapis z innego procesu tak")
+
+        # Commit tego procesu w trakcie odczytu stanu - odczyt powtórzony, nic nie ginie
+        original_read = active_shifts._read_state
+        def read_then_commit(session):
+            state = original_read(session)
+            if active_shifts.get("P0") is None:
+                clock_in(db, "P0")
+            return state
+        active_shifts._read_state = read_then_commit
+        try:
+            assert reconcile_active_shifts(session_factory) == 0
+            assert active_shifts.get("P0") is not None, "Reconcile nie nadpisał zmiany z równoległego commitu"
+            clock_out(db, "P0")
+            assert reconcile_active_shifts(session_factory, attempts=1) is None
+            assert active_shifts.get("P0") is not None and active_shifts.reconcile_skipped >= 1
+        finally:
+            active_shifts._read_state = original_read
+        assert reconcile_active_shifts(session_factory) == 0
+        print("   ✅ Odczyt stanu z równoległym commitem powtórzony zamiast nadpisania rejestru")
+        watcher.close()
+        db.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("\n===== TEST REJESTRU OTWARTYCH ZMIAN =====")
+    test_registry_follows_commits()
+    test_local_writes_and_reconcile_race()
@@ -0,0 +1,157 @@
+"""
+Test magazynu ustawień (config_store.py)
+
+Sprawdza utworzenie settings.json z dawnego config.py, że ustawienia są wczytywane
+raz i ponownie dopiero po zmianie pliku (także zapisanej przez inny proces - bez
+invalidate), że uszkodzony plik nie psuje serwowanej konfiguracji, oraz zapis:
+walidację, kolejne rewizje w settings_history, powiadomienie słuchaczy, port panelu
+webowego w settings.json i brak plików tymczasowych po zapisie.
+Używa tymczasowego katalogu i tymczasowej bazy SQLite.
+"""
+import json
+import os
+import tempfile
+
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+
+import models
+from database import Base
+from migrations import run_migrations
+from config_store import ConfigStore, mobile_app_sections
+
+CONFIG_TEMPLATE = '''
+MOBILE_APP_CONFIG = {{
+    "timer_enabled": True,
+    "gps_verification": {gps},
+}}
+
+CONFIG_VERSION = "{version}"
+
+TIME_ROUNDING_CONFIG = {{"enabled": True, "rounding_minutes": 15, "rounding_direction": "nearest"}}
+
+APP_VERSION_INFO = {{"current_version": "1.0.5", "minimum_version": "1.0.0"}}
+'''
+
+CENTRAL_TEMPLATE = '''
+APP_DEFAULT_IP = "10.0.0.5"
+WEB_PANEL_PORT = 8005
+MOBILE_API_URL = f"http://{APP_DEFAULT_IP}:8000"
+WEB_PANEL_URL = f"http://{APP_DEFAULT_IP}:{WEB_PANEL_PORT}"
+'''
+
+def write(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+def make_store(tmp_dir, engine=None):
+    return ConfigStore(
+        settings_path=os.path.join(tmp_dir, "settings.json"),
+        central_path=os.path.join(tmp_dir, "app_config.py"),
+        legacy_path=os.path.join(tmp_dir, "config.py"),
+        check_interval=0,
+        engine=engine
+    )
+
+def test_store_reloads_only_after_change():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write(os.path.join(tmp_dir, "config.py"), CONFIG_TEMPLATE.format(gps=False, version="20250801-100000"))
+        write(os.path.join(tmp_dir, "app_config.py"), CENTRAL_TEMPLATE)
+
+        store = make_store(tmp_dir)
+        first = store.get()
+        for _ in range(100):
+            assert store.get() is first
+        assert store.loads == 1
+        assert os.path.exists(store.settings_path), "settings.json utworzony z config.py"
+        assert first.time_rounding["enabled"] is True
+        payload = json.loads(first.mobile_config_body)
+        assert payload["config_version"] == "20250801-100000"
+        assert payload["config"]["enable_location"] is False
+        assert payload["config"]["main_server_url"] == "http://10.0.0.5:8000"
+        assert first.web_panel_port == 8005, "Port panelu przejęty z app_config.py"
+        assert payload["config"]["web_panel_url"] == "http://10.0.0.5:8005"
+        print("   ✅ settings.json utworzony z config.py, 101 odczytów, 1 wczytanie pliku")
+
+        # Zapis z innego procesu - wystarczy zmiana pliku, bez invalidate()
+        data = json.loads(open(store.settings_path, encoding="utf-8").read())
+        data["mobile_app"]["gps_verification"] = True
+        data["config_version"] = "20250801-110000"
+        write(store.settings_path, json.dumps(data))
+        second = store.get()
+        assert store.loads == 2
+        assert json.loads(second.mobile_config_body)["config"]["enable_location"] is True
+        assert second.mobile_config_etag != first.mobile_config_etag
+        print("   ✅ Zmiana pliku widoczna przy następnym odczycie, nowy ETag")
+
+        # Uszkodzony plik - serwowana poprzednia wersja
+        write(store.settings_path, '{"mobile_app": ')
+        assert store.get() is second
+        data["config_version"] = "20250801-120000"
+        write(store.settings_path, json.dumps(data))
+        assert store.get().version == "20250801-120000"
+        print("   ✅ Uszkodzony plik nie zmienia serwowanej konfiguracji")
+
+def test_update_writes_history_and_notifies():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write(os.path.join(tmp_dir, "config.py"), CONFIG_TEMPLATE.format(gps=False, version="20250801-100000"))
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'settings.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+
+        # Dwa magazyny na tych samych plikach - jak dwa procesy serwera
+        store = make_store(tmp_dir, engine)
+        other = make_store(tmp_dir, engine)
+        assert other.get().mobile_app_config["gps_verification"] is False
+        notified = []
+        other.add_listener(lambda snapshot: notified.append(snapshot.revision))
+
+        snapshot = store.update({"mobile_app": {"gps_verification": True}}, author="admin")
+        assert snapshot.revision == 1 and snapshot.mobile_app_config["timer_enabled"] is True
+        snapshot = other.update({"time_rounding": {"interval_minutes": 30, "direction": "up"}}, author="kierownik")
+        assert snapshot.revision == 2
+        assert snapshot.mobile_app_config["gps_verification"] is True, "Zapis innego procesu nie może zginąć"
+        assert snapshot.time_rounding["rounding_minutes"] == 30
+        assert snapshot.time_rounding["rounding_direction"] == "up"
+        assert store.get().revision == 2
+        assert notified == [1, 2]
+        print("   ✅ Zapisy dwóch magazynów łączą się, drugi magazyn powiadomiony o obu wersjach")
+
+        # Błędne dane - nic nie jest zapisywane
+        try:
+            store.update({"time_rounding": {"rounding_direction": "sideways"}})
+            assert False, "Oczekiwano ValidationError"
+        except ValidationError:
+            pass
+        assert store.get().revision == 2
+
+        with engine.connect() as conn:
+            rows = conn.execute(models.SettingsHistory.__table__.select().order_by("revision")).all()
+        assert [(row.revision, row.saved_by, row.sections) for row in rows] == [
+            (1, "admin", "mobile_app"), (2, "kierownik", "time_rounding")
+        ]
+
+        # Port panelu z formularza konfiguracji mobilnej - pole ustawień, nie zmienna w app_config.py
+        sections = mobile_app_sections({"gps_verification": False, "web_panel_port": 8003})
+        assert sections == {"mobile_app": {"gps_verification": False}, "web_panel_port": 8003}
+        snapshot = store.update(sections, author="admin")
+        assert snapshot.web_panel_port == 8003 and "web_panel_port" not in snapshot.mobile_app_config
+        assert other.get().web_panel_port == 8003 and notified[-1] == snapshot.revision
+        try:
+            store.update({"web_panel_port": 70000})
+            assert False, "Oczekiwano ValidationError"
+        except ValidationError:
+            pass
+        assert store.get().web_panel_port == 8003
+        with engine.connect() as conn:
+            rows = conn.execute(models.SettingsHistory.__table__.select().order_by("revision")).all()
+        assert json.loads(rows[-1].content)["web_panel_port"] == 8003
+        assert json.loads(rows[-1].content)["time_rounding"]["rounding_minutes"] == 30
+        assert sorted(os.listdir(tmp_dir)) == ["config.py", "settings.db", "settings.json"], "Bez plików tymczasowych i kopii"
+        engine.dispose()
+        print("   ✅ Błędne dane odrzucone, historia z autorami, port panelu zapisany w settings.json")
+
+if __name__ == "__main__":
+    print("\n===== TEST MAGAZYNU USTAWIEŃ =====")
+    test_store_reloads_only_after_change()
+    test_update_writes_history_and_notifies()
@@ -0,0 +1,141 @@
+"""
+Test spójności dziennego podsumowania obecności (daily_attendance)
+
+Wykonuje typowe operacje na zmianach (start, stop, ręczne dodanie, edycja z
+przeniesieniem daty, usunięcie) z przyrostowym przeliczaniem podsumowania
+i porównuje wynik z pełną odbudową tabeli, także po zapisach surowym SQL
+naprawionych przy starcie serwera. Używa tymczasowej bazy SQLite.
+"""
+import os
+import tempfile
+from datetime import datetime, date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from daily_attendance import (
+    refresh_for_shifts, refresh_daily_attendance, rebuild_daily_attendance,
+    repair_daily_attendance, ensure_daily_attendance, night_minutes, shift_day
+)
+
+def snapshot(db):
+    """Zwraca zawartość daily_attendance jako słownik"""
+    rows = db.query(models.DailyAttendance).all()
+    return {
+        (row.employee_id, row.date): (row.day_type, row.shift_count, row.completed_shifts,
+                                      row.minutes, row.night_minutes, row.overtime_minutes)
+        for row in rows
+    }
+
+def test_night_minutes():
+    """Pora nocna 22:00-6:00, także dla zmian przechodzących przez północ"""
+    assert night_minutes(datetime(2025, 7, 1, 8, 0), datetime(2025, 7, 1, 16, 0)) == 0
+    assert night_minutes(datetime(2025, 7, 1, 20, 0), datetime(2025, 7, 2, 4, 0)) == 360
+    assert night_minutes(datetime(2025, 7, 1, 5, 0), datetime(2025, 7, 1, 23, 0)) == 120
+    print("   ✅ Minuty nocne liczone poprawnie")
+
+def test_incremental_matches_rebuild():
+    """Przyrostowe przeliczanie daje ten sam wynik co pełna odbudowa"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'rollup.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        db.add(models.Employee(id="JAN001", name="Jan Kowalski", pin="1234", hourly_rate=30.0))
+        db.commit()
+
+        # Start i stop (sobota, z nadgodzinami i porą nocną)
+        shift = models.Shift(employee_id="JAN001", start_time=datetime(2025, 7, 5, 14, 0))
+        db.add(shift)
+        refresh_for_shifts(db, [shift])
+        db.commit()
+        shift.stop_time = datetime(2025, 7, 5, 23, 30)
+        refresh_for_shifts(db, [shift])
+        db.commit()
+
+        # Ręcznie dodane zmiany
+        manual = [
+            models.Shift(employee_id="JAN001", start_time=datetime(2025, 7, 7, 8, 0), stop_time=datetime(2025, 7, 7, 16, 0)),
+            models.Shift(employee_id="JAN001", start_time=datetime(2025, 7, 8, 8, 0), stop_time=datetime(2025, 7, 8, 12, 0)),
+        ]
+        db.add_all(manual)
+        refresh_for_shifts(db, manual)
+        db.commit()
+
+        # Edycja z przeniesieniem na niedzielę
+        previous_key = (manual[1].employee_id, shift_day(manual[1]))
+        manual[1].start_time = datetime(2025, 7, 6, 9, 0)
+        manual[1].stop_time = datetime(2025, 7, 6, 13, 0)
+        refresh_daily_attendance(db, [previous_key, (manual[1].employee_id, shift_day(manual[1]))])
+        db.commit()
+
+        # Usunięcie
+        deleted_key = (manual[0].employee_id, shift_day(manual[0]))
+        db.delete(manual[0])
+        refresh_daily_attendance(db, [deleted_key])
+        db.commit()
+
+        incremental = snapshot(db)
+        rebuild_daily_attendance(db)
+        rebuilt = snapshot(db)
+        db.close()
+        engine.dispose()
+
+    assert incremental == rebuilt, f"{incremental} != {rebuilt}"
+    assert incremental[("JAN001", date(2025, 7, 5))] == ("saturday", 1, 1, 570, 90, 90)
+    assert incremental[("JAN001", date(2025, 7, 6))][0] == "sunday"
+    assert ("JAN001", date(2025, 7, 7)) not in incremental
+    assert ("JAN001", date(2025, 7, 8)) not in incremental
+    print("   ✅ Przyrostowe przeliczanie zgodne z pełną odbudową")
+
+def test_repair_after_raw_sql_writes():
+    """Zapisy surowym SQL (terminal diagnostyczny) naprawiane przy starcie serwera"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'repair.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        db = session_factory()
+        db.add(models.Employee(id="JAN001", name="Jan Kowalski", pin="1234"))
+        # Czasy z ułamkami sekund - porównanie minut nie może zgłaszać fałszywych różnic
+        shifts = [
+            models.Shift(employee_id="JAN001", start_time=datetime(2025, 7, day, 7, 59, 59, 999999),
+                         stop_time=datetime(2025, 7, day, 16, 0, 59, 1))
+            for day in range(1, 11)
+        ]
+        shifts.append(models.Shift(employee_id="JAN001", start_time=datetime(2025, 7, 11, 8, 0, 0, 500000)))
+        db.add_all(shifts)
+        refresh_for_shifts(db, shifts)
+        db.commit()
+        assert repair_daily_attendance(db) == 0, "Spójne podsumowanie nie jest przeliczane"
+
+        # Zakończenie otwartej zmiany, usunięcie i dodanie zmiany z pominięciem przeliczania
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "UPDATE shifts SET stop_time = ?, duration_min = 480 WHERE stop_time IS NULL",
+                (datetime(2025, 7, 11, 16, 0, 30, 250000),)
+            )
+            conn.exec_driver_sql("DELETE FROM shifts WHERE start_time < '2025-07-02'")
+            conn.exec_driver_sql("INSERT INTO shifts (employee_id, start_time, stop_time) "
+                                 "VALUES ('JAN001', '2025-07-12 10:00:00.000000', '2025-07-12 12:00:00.000000')")
+        db.expire_all()
+        ensure_daily_attendance(engine, session_factory)
+        repaired = snapshot(db)
+        assert repair_daily_attendance(db) == 0
+        rebuild_daily_attendance(db)
+        rebuilt = snapshot(db)
+        db.close()
+        engine.dispose()
+
+    assert repaired == rebuilt, f"{repaired} != {rebuilt}"
+    assert ("JAN001", date(2025, 7, 1)) not in repaired
+    assert repaired[("JAN001", date(2025, 7, 11))][2:4] == (1, 480)
+    assert repaired[("JAN001", date(2025, 7, 12))][1:4] == (1, 1, 120)
+    print("   ✅ Dni zmienione surowym SQL przeliczone przy starcie, bez fałszywych różnic")
+
+if __name__ == "__main__":
+    print("\n===== TEST DZIENNEGO PODSUMOWANIA OBECNOŚCI =====")
+    test_night_minutes()
+    test_incremental_matches_rebuild()
+    test_repair_after_raw_sql_writes()
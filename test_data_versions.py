@@ -0,0 +1,102 @@
+"""
+Test liczników wersji danych i warunkowego GET (data_versions.py)
+
+Sprawdza, że migracja 2 zakłada wyzwalacze podbijające liczniki przy zapisach
+ORM i surowym SQL, że ETag zmienia się tylko po zapisie do wskazanych tabel,
+że baza bez liczników nie dostaje ETag, że migracje na pustym pliku bazy
+zakładają liczniki (a migracja 5 naprawia bazy, na których ich zabrakło), oraz
+parsowanie If-None-Match.
+Używa tymczasowej bazy SQLite.
+"""
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+import models
+from database import Base
+from migrations import run_migrations, DATA_VERSION_TABLES, MIGRATIONS
+from data_versions import data_etag, etag_matches, get_data_versions
+
+def make_request(if_none_match):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+def test_counters_follow_writes():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "versions.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        # Baza bez migracji - brak liczników, brak ETag
+        models.Employee.__table__.create(bind=engine)
+        db = session_factory()
+        assert data_etag(db, ("employees",)) is None
+        db.close()
+
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        db = session_factory()
+        employees_etag = data_etag(db, ("employees",))
+        both_etag = data_etag(db, ("employees", "shifts"), "2025-07-01")
+        assert employees_etag and both_etag
+
+        db.add(models.Shift(employee_id="JAN001", start_time=datetime(2025, 7, 1, 8, 0)))
+        db.commit()
+        assert data_etag(db, ("employees",)) == employees_etag, "Zapis do shifts nie zmienia ETag pracowników"
+        assert data_etag(db, ("employees", "shifts"), "2025-07-01") != both_etag
+
+        # Zapis surowym SQL z innego połączenia (np. terminal diagnostyczny)
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO employees (id, name, pin) VALUES ('JAN001', 'Jan Kowalski', '1234')")
+        conn.execute("DELETE FROM shifts")
+        conn.commit()
+        conn.close()
+        assert data_etag(db, ("employees",)) != employees_etag
+        assert get_data_versions(db, ("employees", "shifts")) == {"employees": 1, "shifts": 2}
+        db.close()
+        engine.dispose()
+        print("   ✅ Liczniki podbijane przez zapisy ORM i surowym SQL, ETag tylko dla zmienionych tabel")
+
+def test_migrations_on_empty_database():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Pusty plik bazy - migracje przy starcie serwera przed utworzeniem tabel
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'empty.db')}")
+        assert run_migrations(engine) == [version for version, _, _ in MIGRATIONS]
+        assert get_data_versions(sessionmaker(bind=engine)(), DATA_VERSION_TABLES) == {"employees": 0, "shifts": 0}
+        engine.dispose()
+
+        # Baza, na której migracja 2 pominęła tabele (user_version 4 bez wyzwalaczy)
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'broken.db')}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA user_version = 4")
+        assert run_migrations(engine) == [5]
+        db = sessionmaker(bind=engine)()
+        db.add(models.Employee(id="JAN001", name="Jan Kowalski", pin="1234"))
+        db.commit()
+        assert get_data_versions(db, DATA_VERSION_TABLES) == {"employees": 1, "shifts": 0}
+        db.close()
+        engine.dispose()
+    print("   ✅ Liczniki wersji zakładane także na pustej i wcześniej pominiętej bazie")
+
+def test_if_none_match():
+    etag = 'W/"abc"'
+    assert etag_matches(make_request('W/"abc"'), etag)
+    assert etag_matches(make_request('"abc"'), etag), "Porównanie słabe ignoruje prefiks W/"
+    assert etag_matches(make_request('W/"old", W/"abc"'), etag)
+    assert etag_matches(make_request("*"), etag)
+    assert not etag_matches(make_request('W/"old"'), etag)
+    assert not etag_matches(make_request(None), etag)
+    assert not etag_matches(make_request("*"), None), "Bez ETag nigdy 304"
+    print("   ✅ Parsowanie If-None-Match")
+
+if __name__ == "__main__":
+    print("\n===== TEST WARUNKOWEGO GET (ETag) =====")
+    test_counters_follow_writes()
+    test_migrations_on_empty_database()
+    test_if_none_match()
@@ -0,0 +1,142 @@
+"""
+Test importu pracowników z CSV (employee_import.py)
+
+Sprawdza nadawanie ID bez zapytań do bazy (kolizje z inną osobą dostają kolejny
+numer, ta sama osoba jest odrzucana), import paczkami z hasłami liczonymi w puli
+procesów, raport błędów wierszy i postęp zadania, oraz import z przesłanego pliku
+CSV czytanego przyrostowo (separator, nagłówek, numery wierszy pliku).
+Używa tymczasowej bazy SQLite.
+"""
+import asyncio
+import io
+import os
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+import employee_import
+from auth import verify_password
+from database import Base
+from employee_import import (
+    EmployeeIdAllocator, start_import, start_csv_import, csv_records, import_jobs, shutdown_hash_pool
+)
+
+def test_id_allocator():
+    allocator = EmployeeIdAllocator({"jkowalski": "Jan Kowalski", "anowak": "Anna Nowak"})
+    assert allocator.allocate("Józef", "Kowalski") == "jkowalski2"
+    assert allocator.allocate("Julia", "Kowalski") == "jkowalski3"
+    assert allocator.allocate("Łucja", "Żółć") == "lzolc"
+    for first_name, last_name in (("Jan", "Kowalski"), ("Józef", "Kowalski"), ("Łucja", "Żółć")):
+        try:
+            allocator.allocate(first_name, last_name)
+            assert False, "Oczekiwano ValueError"
+        except ValueError as e:
+            assert "już istnieje" in str(e)
+    print("   ✅ ID nadawane bez kolizji, ta sama osoba odrzucona")
+
+def test_chunked_import():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'import.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = session_factory()
+        db.add(models.Employee(id="jkowalski", name="Jan Kowalski", pin="1111"))
+        db.commit()
+
+        employees = [
+            {"first_name": "Jan", "last_name": "Kowalski", "pin": "1234", "hourly_rate": 30},
+            {"first_name": "Józef", "last_name": "Kowalski", "pin": "2345", "hourly_rate": "31.5"},
+            {"first_name": "", "last_name": "Nowak", "pin": "3456", "hourly_rate": 30},
+            {"first_name": "Anna", "last_name": "Nowak", "pin": "4567", "hourly_rate": "abc"},
+            {"first_name": "Anna", "last_name": "Nowak", "pin": "5678", "hourly_rate": 28},
+            {"first_name": "Piotr", "last_name": "Zieliński", "pin": "6789", "hourly_rate": 35},
+        ]
+
+        async def run():
+            job = start_import(employees, session_factory)
+            await job.done.wait()
+            return job
+
+        original_chunk_size = employee_import.IMPORT_CHUNK_SIZE
+        employee_import.IMPORT_CHUNK_SIZE = 2
+        try:
+            job = asyncio.run(run())
+        finally:
+            employee_import.IMPORT_CHUNK_SIZE = original_chunk_size
+            shutdown_hash_pool()
+
+        result = job.result()
+        assert result["status"] == "success" and result["processed"] == result["total"] == 6
+        assert result["imported"] == 3
+        assert [error["row"] for error in result["errors"]] == [1, 3, 4]
+        assert import_jobs[job.id] is job
+
+        db.expire_all()
+        imported = {e.id: e for e in db.query(models.Employee).all()}
+        assert sorted(imported) == ["anowak", "jkowalski", "jkowalski2", "pzielinski"]
+        assert imported["jkowalski2"].hourly_rate == 31.5
+        assert verify_password("5678", imported["anowak"].password_hash)
+        db.close()
+        engine.dispose()
+        print("   ✅ Import paczkami: 3 zapisane, 3 błędy wierszy z numerami")
+
+def test_csv_upload_import():
+    # Plik z Excela: BOM, średnik, nagłówek, pusty wiersz i błędne wiersze
+    content = "\ufeffImię;Nazwisko;PIN;Stawka\n" \
+              "Ewa;Lis;1234;30,5\n" \
+              "\n" \
+              "Adam;Wiśniewski;12a4;30\n" \
+              "Ola;Kruk;1234\n" \
+              "Ewa;Lis;9999;31\n" \
+              "\"Jan Maria\";Rokita;4321;28\n"
+    records = list(csv_records(io.BytesIO(content.encode("utf-8"))))
+    assert [row for row, _ in records] == [2, 4, 5, 6, 7]
+    assert records[0][1] == ["Ewa", "Lis", "1234", "30,5"]
+
+    # Czytanie przyrostowe - z dużego pliku czytany jest tylko początek
+    big = io.BytesIO(b"imie,nazwisko,pin,stawka\n" + b"Jan,Kowalski,1234,30\n" * 200000)
+    rows = csv_records(big)
+    assert [next(rows)[0] for _ in range(3)] == [2, 3, 4]
+    assert big.tell() < len(big.getvalue()) / 10
+    print("   ✅ Plik CSV czytany przyrostowo, separator i nagłówek rozpoznane")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'import.db')}",
+                               connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        upload = io.BytesIO(content.encode("utf-8"))
+
+        async def run():
+            job = start_csv_import(upload, session_factory)
+            await job.done.wait()
+            return job
+
+        try:
+            job = asyncio.run(run())
+        finally:
+            shutdown_hash_pool()
+        result = job.result()
+        assert result["status"] == "success" and result["total"] is None
+        assert result["processed"] == 5 and result["imported"] == 2
+        assert [(error["row"], error["error"]) for error in result["errors"]] == [
+            (4, "PIN musi być liczbą"),
+            (5, "Nieprawidłowa liczba kolumn (oczekiwano: 4, otrzymano: 3)"),
+            (6, "Pracownik o ID elis już istnieje")
+        ]
+        assert upload.closed, "Plik tymczasowy zamknięty po imporcie"
+        db = session_factory()
+        rates = {e.id: e.hourly_rate for e in db.query(models.Employee).all()}
+        assert rates == {"elis": 30.5, "jrokita": 28.0}
+        db.close()
+        engine.dispose()
+        print("   ✅ Import z pliku: 2 zapisane, raport błędów z numerami wierszy pliku")
+
+if __name__ == "__main__":
+    print("\n===== TEST IMPORTU PRACOWNIKÓW =====")
+    test_id_allocator()
+    test_chunked_import()
+    test_csv_upload_import()
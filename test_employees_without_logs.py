@@ -0,0 +1,97 @@
+"""
+Test raportu pracowników bez wpisów (employees.py)
+
+Porównuje anty-złączenie z dziennym podsumowaniem i wariant dzienny z wynikiem
+liczonym wprost ze zmian, sprawdza, że liczba zapytań nie zależy od liczby
+pracowników ani długości okresu, oraz że zmiana przeniesiona na inny dzień
+zmienia wynik po przeliczeniu podsumowania. Używa tymczasowej bazy SQLite.
+"""
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import models
+from daily_attendance import refresh_for_shifts, refresh_daily_attendance
+from database import Base
+from employees import find_employees_without_logs, find_employees_without_logs_by_day
+from migrations import run_migrations
+
+def expected_by_day(db, date_from, date_to):
+    """Wynik dzienny liczony wprost ze zmian (wzorzec)"""
+    shifts = db.query(models.Shift).all()
+    names = {}
+    days = []
+    day = date_from
+    while day <= date_to:
+        present = {shift.employee_id for shift in shifts if shift.start_time.date() == day}
+        absent = [employee for employee in db.query(models.Employee).order_by(models.Employee.id)
+                  if employee.id not in present]
+        names.update((employee.id, employee.name) for employee in absent)
+        days.append({"date": day.strftime("%Y-%m-%d"), "employee_ids": [employee.id for employee in absent]})
+        day += timedelta(days=1)
+    return {"employees": names, "days": days}
+
+def test_employees_without_logs():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'missing.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = session_factory()
+
+        shifts = []
+        for number in range(40):
+            employee_id = f"P{number:02d}"
+            db.add(models.Employee(id=employee_id, name=f"Pracownik {number}", pin="1234", hourly_rate=30))
+            # Co piąty pracownik bez zmian, pozostali pracują w co (number % 4 + 2) dzień
+            if number % 5 == 0:
+                continue
+            for day in range(1, 61, number % 4 + 2):
+                start = datetime(2025, 3, 1, 8) + timedelta(days=day - 1)
+                shifts.append(models.Shift(employee_id=employee_id, start_time=start,
+                                           stop_time=start + timedelta(hours=8)))
+        db.add_all(shifts)
+        refresh_for_shifts(db, shifts)
+        db.commit()
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            missing = find_employees_without_logs(db, date(2025, 3, 1), date(2025, 4, 30))
+            assert [employee["id"] for employee in missing] == [f"P{number:02d}" for number in range(0, 40, 5)]
+            assert len(statements) == 1, "Jedno zapytanie niezależnie od liczby pracowników"
+
+            statements.clear()
+            by_day = find_employees_without_logs_by_day(db, date(2025, 3, 1), date(2025, 4, 30))
+            assert len(statements) == 2, "Pracownicy i jeden przebieg po obecnościach całego okresu"
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert len(by_day["days"]) == 61 and by_day == expected_by_day(db, date(2025, 3, 1), date(2025, 4, 30))
+        assert len(by_day["employees"]) == 40, "Dane pracownika podane raz, nie dla każdego dnia"
+        assert find_employees_without_logs(db, date(2025, 5, 1), date(2025, 5, 2)) == \
+            [{"id": f"P{number:02d}", "name": f"Pracownik {number}"} for number in range(40)]
+        print("   ✅ Anty-złączenie i wariant dzienny zgodne z wynikiem liczonym ze zmian")
+
+        # Zmiana przeniesiona na dzień bez wpisów - oba dni przeliczone w podsumowaniu
+        shift = db.query(models.Shift).filter(models.Shift.employee_id == "P01").order_by(models.Shift.start_time).first()
+        previous_day = shift.start_time.date()
+        shift.start_time = datetime(2025, 5, 1, 8)
+        shift.stop_time = datetime(2025, 5, 1, 12)
+        refresh_daily_attendance(db, [("P01", previous_day), ("P01", date(2025, 5, 1))])
+        db.commit()
+        assert "P01" not in [employee["id"] for employee in find_employees_without_logs(db, date(2025, 5, 1), date(2025, 5, 2))]
+        first_day = find_employees_without_logs_by_day(db, previous_day, previous_day)
+        assert "P01" in first_day["days"][0]["employee_ids"]
+        assert first_day["employees"]["P01"] == "Pracownik 1"
+        print("   ✅ Przeniesiona zmiana zmienia braki w obu dniach")
+        db.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("\n===== TEST PRACOWNIKÓW BEZ WPISÓW =====")
+    test_employees_without_logs()
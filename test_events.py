@@ -0,0 +1,96 @@
+"""
+Test kanału zdarzeń panelu (events.py)
+
+Sprawdza wznawianie strumienia od kursora (Last-Event-ID), reset przy nieznanym
+lub zbyt starym kursorze, dostarczanie zdarzeń do subskrybenta w pętli asyncio
+oraz publikację zdarzeń po commicie sesji (start/stop zmiany, próba PIN,
+alert urządzenia, awaryjne zakończenie) - i brak zdarzeń po rollbacku.
+Używa tymczasowej bazy SQLite.
+"""
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from events import EventBus, event_bus, install_event_hooks
+
+def test_resume_cursor():
+    bus = EventBus(buffer_size=3)
+    first = bus.publish("shift_started", {"worker_id": "JAN001"})
+    for i in range(3):
+        bus.publish("pin_attempt", {"worker_id": f"W{i}"})
+
+    # Bufor mieści 3 ostatnie zdarzenia (2-4) - wznowić można od kursora 1 lub późniejszego
+    resumed = bus.events_after(f"{bus.epoch}-2")
+    assert [item["seq"] for item in resumed] == [3, 4], resumed
+    assert bus.events_after(bus.last_id) == []
+    assert len(bus.events_after(first["id"])) == 3
+    assert bus.events_after(f"{bus.epoch}-0") is None, "Kursor sprzed bufora wymaga resetu"
+    assert bus.events_after("0-1") is None, "Kursor sprzed restartu wymaga resetu"
+    assert bus.events_after(f"{bus.epoch}-99") is None
+    print("   ✅ Wznawianie od kursora i reset przy nieznanym kursorze")
+
+def test_subscriber_receives_events():
+    bus = EventBus()
+
+    async def scenario():
+        subscription, backlog = bus.subscribe(asyncio.get_running_loop())
+        assert backlog == []
+        # Publikacja z innego wątku (jak z puli wątków po commicie)
+        await asyncio.to_thread(bus.publish, "force_stop", {"worker_id": "JAN001"})
+        item = await asyncio.wait_for(subscription.queue.get(), timeout=1)
+        bus.unsubscribe(subscription)
+        return item
+
+    item = asyncio.run(scenario())
+    assert item["type"] == "force_stop" and item["data"]["worker_id"] == "JAN001"
+    assert bus.status()["subscribers"] == 0
+    print("   ✅ Zdarzenie opublikowane w innym wątku dotarło do subskrybenta")
+
+def test_events_published_after_commit():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'events.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        install_event_hooks(session_factory)
+        cursor = event_bus.last_id
+
+        db = session_factory()
+        shift = models.Shift(employee_id="JAN001", start_time=datetime(2025, 7, 1, 8, 0))
+        db.add(shift)
+        db.add(models.StatisticsAccessLog(worker_id="JAN001", device_id="D1", pin_entered="9999",
+                                          pin_correct=False, access_granted=False))
+        db.commit()
+
+        # Rollback nie publikuje zdarzeń
+        shift.stop_time = datetime(2025, 7, 1, 12, 0)
+        db.flush()
+        db.rollback()
+
+        shift = db.get(models.Shift, shift.id)
+        shift.stop_time = datetime(2025, 7, 1, 16, 0)
+        db.add(models.AdminLog(action_type="FORCE_STOP", admin_id="admin", target_id="JAN001"))
+        db.add(models.DeviceSecurityAlert(worker_id="JAN001", old_device_id="D1", new_device_id="D2",
+                                          alert_type="DEVICE_CHANGE"))
+        db.commit()
+        db.close()
+        engine.dispose()
+
+        events = event_bus.events_after(cursor)
+        types = sorted(item["type"] for item in events)
+        assert types == sorted(["shift_started", "pin_attempt", "shift_stopped", "force_stop", "device_alert"]), types
+        pin_event = next(item for item in events if item["type"] == "pin_attempt")
+        assert "9999" not in str(pin_event), "Wprowadzony PIN nie może trafić do kanału"
+        assert all(item["activity"] for item in events)
+        print(f"   ✅ Po commitach opublikowano {len(events)} zdarzeń, rollback niczego nie wysłał")
+
+if __name__ == "__main__":
+    print("\n===== TEST KANAŁU ZDARZEŃ =====")
+    test_resume_cursor()
+    test_subscriber_receives_events()
+    test_events_published_after_commit()
@@ -0,0 +1,111 @@
+"""
+Test eksportu raportów obecności (exports.py)
+
+Sprawdza pliki CSV i XLSX generowane paczkami wierszy z kursora czytanego
+przyrostowo (paczki po EXPORT_CHUNK_SIZE), poprawny arkusz XLSX
+(ZIP zapisywany bez przewijania, XML bez niedozwolonych znaków), oraz zgodność wierszy
+eksportu podsumowania, szczegółów i obecności dnia z danymi w bazie.
+Używa tymczasowej bazy SQLite.
+"""
+import csv
+import io
+import os
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import date, datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import exports
+import models
+from database import Base
+from daily_attendance import rebuild_daily_attendance
+from exports import (
+    csv_stream, xlsx_stream, query_chunks, shifts_statement, summary_query, summary_export_row,
+    details_export_row, by_date_export_row, SUMMARY_COLUMNS, DETAILS_COLUMNS
+)
+
+SHEET_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+def read_xlsx(content):
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        assert archive.testzip() is None
+        assert "xl/workbook.xml" in archive.namelist()
+        sheet = ET.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+    rows = []
+    for row in sheet.iterfind(".//s:row", SHEET_NS):
+        values = []
+        for cell in row.iterfind("s:c", SHEET_NS):
+            text = cell.find(".//s:t", SHEET_NS)
+            number = cell.find("s:v", SHEET_NS)
+            values.append(text.text if text is not None else number.text if number is not None else None)
+        rows.append(values)
+    return rows
+
+def test_file_streams():
+    chunks = [[["Jan", 1, 2.5], ["Ewa \"Lis\", ż", None, 0]], [["A\x01&<B>", 3, True]]]
+    parts = list(csv_stream(["Imię", "Liczba", "Kwota"], iter(chunks)))
+    assert len(parts) == 2, "Jedna część pliku na paczkę wierszy"
+    text = b"".join(parts).decode("utf-8")
+    assert text.startswith("\ufeff")
+    assert list(csv.reader(io.StringIO(text[1:]))) == [
+        ["Imię", "Liczba", "Kwota"], ["Jan", "1", "2.5"], ["Ewa \"Lis\", ż", "", "0"], ["A\x01&<B>", "3", "True"]
+    ]
+
+    rows = read_xlsx(b"".join(xlsx_stream(["Imię", "Liczba", "Kwota"], iter(chunks), "Test")))
+    assert rows == [["Imię", "Liczba", "Kwota"], ["Jan", "1", "2.5"], ["Ewa \"Lis\", ż", None, "0"],
+                    ["A&<B>", "3", "True"]]
+    print("   ✅ CSV i XLSX generowane paczkami wierszy")
+
+def test_export_rows():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'exports.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        for number in range(25):
+            employee_id = f"P{number:02d}"
+            db.add(models.Employee(id=employee_id, name=f"Pracownik {number}", pin="1234", hourly_rate=30))
+            for day in (1, 2, 4):
+                db.add(models.Shift(employee_id=employee_id, start_time=datetime(2025, 10, day, 8),
+                                    stop_time=datetime(2025, 10, day, 16, 30)))
+        db.add(models.Shift(employee_id="P00", start_time=datetime(2025, 10, 4, 18)))
+        db.add(models.Shift(employee_id="NIKT", start_time=datetime(2025, 10, 4, 8)))
+        db.commit()
+        rebuild_daily_attendance(db)
+
+        original_chunk_size = exports.EXPORT_CHUNK_SIZE
+        exports.EXPORT_CHUNK_SIZE = 10
+        try:
+            chunks = query_chunks(db, shifts_statement(date(2025, 10, 1), date(2025, 10, 31)), details_export_row)
+            first = next(chunks)
+            assert len(first) == 10
+            details = first + [row for chunk in chunks for row in chunk]
+            assert len(details) == 76, "Zmiany nieznanego pracownika pominięte"
+            assert details[0] == ["P00", "Pracownik 0", "2025-10-01", "08:00", "16:30", "8h 30min", 510,
+                                  "Dzień roboczy", "nie", "nie", 255.0]
+            assert details[3][4:7] == ["-", "W trakcie", 0]
+
+            summary = [row for chunk in query_chunks(db, summary_query(db, date(2025, 10, 1), date(2025, 10, 31)).statement,
+                                                     summary_export_row) for row in chunk]
+            assert len(summary) == 25 and len(summary[0]) == len(SUMMARY_COLUMNS)
+            assert summary[1] == ["P01", "Pracownik 1", "25h 30min", 25.5, 3, "8h 30min", 3, 1, 0, 30.0]
+
+            by_date = [row for chunk in query_chunks(db, shifts_statement(date(2025, 10, 4), date(2025, 10, 4)),
+                                                     by_date_export_row) for row in chunk]
+            assert len(by_date) == 26 and by_date[1][:4] == ["P00", "Pracownik 0", "2025-10-04", "18:00"]
+
+            content = b"".join(xlsx_stream(DETAILS_COLUMNS, query_chunks(
+                db, shifts_statement(date(2025, 10, 1), date(2025, 10, 31), "P05"), details_export_row)))
+            assert [row[2] for row in read_xlsx(content)[1:]] == ["2025-10-01", "2025-10-02", "2025-10-04"]
+        finally:
+            exports.EXPORT_CHUNK_SIZE = original_chunk_size
+        db.close()
+        engine.dispose()
+        print("   ✅ Wiersze eksportu podsumowania, szczegółów i dnia zgodne z bazą")
+
+if __name__ == "__main__":
+    print("\n===== TEST EKSPORTU RAPORTÓW =====")
+    test_file_streams()
+    test_export_rows()
@@ -0,0 +1,130 @@
+"""
+Test równoległych i ponawianych startów/zakończeń zmian (shift_service.py, migracja 4)
+
+Uruchamia setki równoległych /api/start tego samego pracownika (z kluczem
+idempotencji i bez) i sprawdza, że powstaje dokładnie jedna otwarta zmiana,
+a żądania z tym samym kluczem dostają ten sam wynik. Sprawdza też, że migracja 4
+zamyka istniejące duplikaty przed założeniem unikalnego indeksu, i że równoległe
+zakończenia kończą zmianę tylko raz.
+Używa tymczasowej bazy SQLite.
+"""
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from migrations import run_migrations
+from shift_service import clock_in, clock_out, ShiftError
+
+PARALLEL_REQUESTS = 300
+
+def make_database(tmp_dir):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'shifts.db')}",
+                           connect_args={"check_same_thread": False, "timeout": 30},
+                           pool_size=20, max_overflow=0)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def call(session_factory, action, *args):
+    db = session_factory()
+    try:
+        return action(db, *args)
+    except ShiftError as e:
+        return e.status_code
+    finally:
+        db.close()
+
+def test_parallel_duplicate_starts():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine, session_factory = make_database(tmp_dir)
+
+        # Co drugie żądanie to ponowienie z tym samym kluczem, pozostałe są bez klucza
+        def start(i):
+            key = "start-JAN001-1" if i % 2 == 0 else None
+            return i, call(session_factory, clock_in, "JAN001", "Biuro", None, None, key)
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = dict(pool.map(start, range(PARALLEL_REQUESTS)))
+
+        db = session_factory()
+        shifts = db.query(models.Shift).filter(models.Shift.employee_id == "JAN001").all()
+        assert len(shifts) == 1, f"Oczekiwano jednej zmiany, jest {len(shifts)}"
+        shift_id = shifts[0].id
+        keyed = {results[i] for i in range(0, PARALLEL_REQUESTS, 2)}
+        unkeyed = {results[i] for i in range(1, PARALLEL_REQUESTS, 2)}
+        assert keyed <= {shift_id, 400}, keyed
+        assert unkeyed <= {shift_id, 400}, unkeyed
+        assert list(results.values()).count(shift_id) >= 1
+        # Po zapisaniu klucza każde ponowienie dostaje ten sam wynik
+        assert call(session_factory, clock_in, "JAN001", "Biuro", None, None, "start-JAN001-1") in (shift_id, 400)
+        print(f"   ✅ {PARALLEL_REQUESTS} równoległych startów, 1 zmiana (ID {shift_id})")
+
+        # Same ponowienia jednego żądania - każde dostaje ID tej samej zmiany
+        def retry(_):
+            return call(session_factory, clock_in, "ANN002", "Biuro", None, None, "start-ANN002-1")
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            retried = set(pool.map(retry, range(PARALLEL_REQUESTS)))
+        ann_shifts = db.query(models.Shift).filter(models.Shift.employee_id == "ANN002").all()
+        assert len(ann_shifts) == 1 and retried == {ann_shifts[0].id}, retried
+        print(f"   ✅ {PARALLEL_REQUESTS} ponowień z tym samym kluczem, każde z wynikiem pierwszego")
+
+        # Równoległe zakończenia z tym samym kluczem - jedna zmiana zakończona, ten sam wynik
+        def stop(_):
+            return call(session_factory, clock_out, "JAN001", "Biuro", None, None, "stop-JAN001-1")
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            stops = set(pool.map(stop, range(50)))
+        assert len(stops) == 1 and 400 not in stops, stops
+        assert call(session_factory, clock_out, "JAN001", "Biuro", None, None, "stop-JAN001-1") in stops
+        assert call(session_factory, clock_out, "JAN001", "Biuro", None, None, None) == 400
+        assert call(session_factory, clock_in, "JAN001", "Biuro", None, None, "stop-JAN001-1") == 422, \
+            "Klucz zakończenia nie może rozpocząć zmiany"
+        db.expire_all()
+        assert db.query(models.Shift).filter(models.Shift.employee_id == "JAN001",
+                                             models.Shift.stop_time == None).count() == 0
+        db.close()
+        engine.dispose()
+        print("   ✅ Równoległe zakończenia z kluczem zwracają ten sam wynik")
+
+def test_migration_closes_duplicates():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'legacy.db')}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            # Baza sprzed migracji 4: zwykły indeks i zdublowane otwarte zmiany
+            conn.exec_driver_sql("DROP INDEX ix_shifts_open")
+            conn.exec_driver_sql("CREATE INDEX ix_shifts_open ON shifts (employee_id) WHERE stop_time IS NULL")
+            conn.exec_driver_sql("PRAGMA user_version = 3")
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = session_factory()
+        for minute in (0, 0, 1):
+            db.add(models.Shift(employee_id="JAN001", start_time=datetime(2025, 7, 1, 8, minute)))
+        db.add(models.Shift(employee_id="ANN002", start_time=datetime(2025, 7, 1, 9, 0)))
+        db.commit()
+        db.close()
+
+        assert run_migrations(engine) == [4, 5]
+        db = session_factory()
+        open_shifts = db.query(models.Shift).filter(models.Shift.stop_time == None).all()
+        assert sorted((s.employee_id, s.start_time.minute) for s in open_shifts) == [("ANN002", 0), ("JAN001", 1)]
+        closed = db.query(models.Shift).filter(models.Shift.stop_time != None).all()
+        assert len(closed) == 2 and all(s.duration_min == 0 for s in closed)
+        row = db.get(models.DailyAttendance, ("JAN001", datetime(2025, 7, 1).date()))
+        assert row is not None and row.completed_shifts == 2
+        db.close()
+        engine.dispose()
+        print("   ✅ Migracja 4 zamknęła 2 zdublowane otwarte zmiany")
+
+if __name__ == "__main__":
+    print("\n===== TEST IDEMPOTENTNYCH STARTÓW I ZAKOŃCZEŃ =====")
+    test_parallel_duplicate_starts()
+    test_migration_closes_duplicates()
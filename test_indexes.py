@@ -0,0 +1,116 @@
+"""
+Test indeksów dla najczęstszych zapytań (migracja 1 w migrations.py)
+
+Tworzy tymczasową bazę SQLite w starym układzie (bez nowych indeksów), wykonuje
+migracje i sprawdza przez EXPLAIN QUERY PLAN, że każde gorące zapytanie
+korzysta ze swojego indeksu zamiast skanować tabelę.
+"""
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from migrations import run_migrations, get_schema_version, MIGRATIONS
+
+NEW_INDEXES = [
+    "ix_shifts_employee_start",
+    "ix_shifts_open",
+    "ix_shifts_start_time",
+    "ix_device_logs_worker_approved_created",
+    "ix_statistics_access_logs_worker_attempted",
+]
+
+def create_legacy_database(engine):
+    """Baza jak przed migracją: tabele z modeli, ale bez nowych indeksów"""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in NEW_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        conn.exec_driver_sql("PRAGMA user_version = 0")
+
+def seed(db):
+    random.seed(5)
+    start = datetime(2025, 7, 1, 8, 0)
+    for i in range(200):
+        employee_id = f"EMP{i:04d}"
+        for day in range(30):
+            shift_start = start + timedelta(days=day)
+            # Otwarta zostaje tylko ostatnia zmiana części pracowników
+            open_shift = day == 29 and i % 10 == 0
+            db.add(models.Shift(employee_id=employee_id, start_time=shift_start,
+                                stop_time=None if open_shift else shift_start + timedelta(hours=8)))
+        db.add(models.DeviceLog(worker_id=employee_id, device_id=f"DEV{i}", is_approved=i % 3 != 0,
+                                created_at=start + timedelta(minutes=i)))
+        db.add(models.StatisticsAccessLog(worker_id=employee_id, device_id=f"DEV{i}", pin_correct=True,
+                                          attempted_at=start + timedelta(minutes=i)))
+    db.commit()
+
+def query_plan(db, query):
+    """Zwraca tekst planu EXPLAIN QUERY PLAN dla zapytania ORM"""
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    params = []
+    for key in compiled.positiontup:
+        value = compiled.params[key]
+        params.append(value.isoformat(sep=" ") if isinstance(value, datetime) else value)
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", tuple(params)).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+def hot_queries(db):
+    """(opis, zapytanie, oczekiwany indeks)"""
+    day_start = datetime(2025, 7, 15)
+    day_end = datetime(2025, 7, 15, 23, 59, 59)
+    return [
+        ("otwarta zmiana pracownika",
+         db.query(models.Shift).filter(models.Shift.employee_id == "EMP0010", models.Shift.stop_time.is_(None)),
+         "ix_shifts_open"),
+        ("zmiany pracownika w zakresie dat",
+         db.query(models.Shift).filter(models.Shift.employee_id == "EMP0010",
+                                       models.Shift.start_time >= day_start,
+                                       models.Shift.start_time <= datetime(2025, 7, 31, 23, 59, 59)),
+         "ix_shifts_employee_start"),
+        ("zmiany wszystkich pracowników z jednego dnia",
+         db.query(models.Shift).filter(models.Shift.start_time >= day_start, models.Shift.start_time <= day_end),
+         "ix_shifts_start_time"),
+        ("ostatnie zatwierdzone urządzenie",
+         db.query(models.DeviceLog).filter(models.DeviceLog.worker_id == "EMP0010",
+                                           models.DeviceLog.is_approved == True)
+           .order_by(models.DeviceLog.created_at.desc()),
+         "ix_device_logs_worker_approved_created"),
+        ("próby dostępu do statystyk pracownika",
+         db.query(models.StatisticsAccessLog).filter(models.StatisticsAccessLog.worker_id == "EMP0010")
+           .order_by(models.StatisticsAccessLog.attempted_at.desc()),
+         "ix_statistics_access_logs_worker_attempted"),
+    ]
+
+def test_hot_queries_use_indexes():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'indexes.db')}")
+        create_legacy_database(engine)
+        db = sessionmaker(bind=engine)()
+        seed(db)
+
+        assert get_schema_version(engine) == 0
+        applied = run_migrations(engine)
+        assert applied == [version for version, _, _ in MIGRATIONS]
+        assert get_schema_version(engine) == MIGRATIONS[-1][0]
+        assert run_migrations(engine) == [], "Ponowne uruchomienie nie powinno nic zmieniać"
+        print("   ✅ Migracje wykonane, wersja schematu zapisana w user_version")
+
+        try:
+            for description, query, index_name in hot_queries(db):
+                plan = query_plan(db, query)
+                assert index_name in plan, f"{description}: oczekiwano {index_name}, plan: {plan}"
+                assert "USE TEMP B-TREE" not in plan, f"{description}: sortowanie poza indeksem, plan: {plan}"
+                print(f"   ✅ {description}: {plan}")
+        finally:
+            db.close()
+            engine.dispose()
+
+if __name__ == "__main__":
+    print("\n===== TEST INDEKSÓW GORĄCYCH ZAPYTAŃ =====")
+    test_hot_queries_use_indexes()
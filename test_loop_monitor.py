@@ -0,0 +1,48 @@
+"""
+Test monitora blokad pętli zdarzeń (loop_monitor.py)
+
+Uruchamia monitor w pętli asyncio, wywołuje blokującą operację w zadaniu
+oznaczonym trasą żądania i sprawdza, że blokada została zapisana razem
+ze stosem i trasą, a zwykłe await nie jest raportowane.
+"""
+import asyncio
+import time
+
+from loop_monitor import LoopMonitor
+
+def blocking_report_query():
+    """Symulacja synchronicznego zapytania wykonywanego w async def"""
+    time.sleep(0.3)
+
+async def scenario(monitor):
+    monitor.start()
+    await asyncio.sleep(0.2)
+
+    async def handler():
+        monitor.task_routes[asyncio.current_task()] = "GET /api/attendance_summary"
+        try:
+            await asyncio.sleep(0.1)
+            blocking_report_query()
+        finally:
+            monitor.task_routes.pop(asyncio.current_task(), None)
+
+    await asyncio.create_task(handler())
+    await asyncio.sleep(0.2)
+    monitor.stop()
+
+def test_stall_is_captured_with_stack_and_route():
+    monitor = LoopMonitor(threshold_ms=100, interval_ms=20)
+    asyncio.run(scenario(monitor))
+    snapshot = monitor.snapshot()
+
+    assert snapshot["stall_count"] == 1, snapshot
+    stall = snapshot["recent_stalls"][0]
+    assert stall["route"] == "GET /api/attendance_summary", stall
+    assert stall["duration_ms"] >= 250, stall
+    assert any("blocking_report_query" in line for line in stall["stack"]), stall["stack"]
+    assert snapshot["max_lag_ms"] >= 250
+    print(f"   ✅ Blokada {stall['duration_ms']} ms zapisana ze stosem i trasą {stall['route']}")
+
+if __name__ == "__main__":
+    print("\n===== TEST MONITORA PĘTLI ZDARZEŃ =====")
+    test_stall_is_captured_with_stack_and_route()
@@ -0,0 +1,228 @@
+"""
+Test kolejki wysyłki raportów emailem (mail_queue.py)
+
+Uruchamia lokalny zastępczy serwer SMTP (wątek z socketserver) i sprawdza:
+wysyłkę raportów do wielu odbiorców kilkoma połączeniami z puli zamiast jednym
+na wiadomość, załączniki przygotowane dla każdego pracownika, ponawianie po
+błędzie przejściowym (451) i po zerwanym połączeniu, brak ponowień po odrzuceniu
+na stałe (550), załączniki z pamięci podręcznej raportów przycinanej w trakcie
+wysyłki, brak ponowień przy błędzie odczytu załącznika oraz ponowne użycie
+połączenia przez email_service.send_email.
+Używa tymczasowej bazy SQLite, tymczasowego settings.json i katalogu raportów.
+"""
+import email
+import email.policy
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import email_service
+import mail_queue
+import models
+import report_jobs
+from config_store import ConfigStore
+from daily_attendance import refresh_for_shifts
+from database import Base
+from migrations import run_migrations
+from mail_queue import (
+    start_mailing, parse_recipients, mailing_jobs, shutdown_mail_queue, MailError, OutgoingMail, is_temporary
+)
+
+class StandInSmtp(socketserver.ThreadingTCPServer):
+    """Zastępczy serwer SMTP: zapisuje wiadomości, odpowiedzi RCPT i zerwania połączeń ustawiane w teście"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self.rcpt_replies = {}   # adres -> lista kodów odpowiedzi dla kolejnych prób
+        self.drop_after = None   # zerwij połączenie po tylu wiadomościach (raz)
+
+class StandInHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        sender, recipients, delivered = None, [], 0
+        self.reply("220 zastepczy SMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                with server.lock:
+                    server.logins += 1
+                self.reply("235 OK")
+            elif verb == "MAIL":
+                sender, recipients = command[10:].strip("<>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command[8:].strip("<>")
+                with server.lock:
+                    codes = server.rcpt_replies.get(address)
+                    code = codes.pop(0) if codes else 250
+                if code == 250:
+                    recipients.append(address)
+                self.reply(f"{code} {'OK' if code == 250 else 'odrzucono'}")
+            elif verb == "DATA":
+                self.reply("354 dalej")
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if data_line in (b".\r\n", b""):
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                with server.lock:
+                    server.messages.append((sender, recipients, b"".join(lines)))
+                    delivered += 1
+                    drop = server.drop_after is not None and delivered >= server.drop_after
+                    if drop:
+                        server.drop_after = None
+                if drop:
+                    return
+                self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 nieobsługiwane")
+
+def delivered(smtp_server):
+    """Adresat -> wiadomość (email.message.EmailMessage)"""
+    return {recipients[0]: email.message_from_bytes(data, policy=email.policy.default)
+            for _, recipients, data in smtp_server.messages}
+
+def attachment_rows(message):
+    for part in message.walk():
+        if part.get_filename():
+            return part.get_payload(decode=True).decode("utf-8-sig").splitlines()
+    return None
+
+def test_mail_queue():
+    smtp_server = StandInSmtp()
+    threading.Thread(target=smtp_server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        settings_path = os.path.join(tmp_dir, "settings.json")
+        with open(settings_path, "w", encoding="utf-8") as f:
+            json.dump({"email": {"smtp_server": "127.0.0.1", "smtp_port": smtp_server.server_address[1],
+                                 "smtp_username": "raporty", "smtp_password": "haslo", "use_tls": False,
+                                 "sender_email": "raporty@firma.pl", "enabled": True}}, f)
+
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'mail.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = session_factory()
+        shifts = []
+        for number in range(6):
+            employee_id = f"P{number}"
+            db.add(models.Employee(id=employee_id, name=f"Pracownik {number}", pin="1234", hourly_rate=30))
+            shifts += [models.Shift(employee_id=employee_id, start_time=datetime(2025, 3, day, 8),
+                                    stop_time=datetime(2025, 3, day, 8 + number + 1)) for day in (3, 4)]
+        db.add_all(shifts)
+        refresh_for_shifts(db, shifts)
+        db.commit()
+        db.close()
+
+        original = (email_service.config_store, mail_queue.MAIL_RETRY_SECONDS, report_jobs.REPORT_CACHE_DIR,
+                    report_jobs.REPORT_CACHE_FILES)
+        email_service.config_store = ConfigStore(settings_path=settings_path)
+        mail_queue.MAIL_RETRY_SECONDS = 0.05
+        report_jobs.REPORT_CACHE_DIR = os.path.join(tmp_dir, "cache")
+        # Mniej plików w pamięci podręcznej niż załączników - przycinanie w trakcie wysyłki
+        report_jobs.REPORT_CACHE_FILES = 2
+        try:
+            smtp_server.rcpt_replies = {"p1@firma.pl": [451, 451], "zly@firma.pl": [550, 550, 550]}
+            recipients = [{"email": f"p{number}@firma.pl", "worker_id": f"P{number}"} for number in range(6)]
+            recipients += ["kadry@firma.pl", {"email": "zly@firma.pl"}, {"email": "nikt@firma.pl", "worker_id": "X"}]
+            job = start_mailing({"kind": "summary", "date_from": "2025-03-01", "date_to": "2025-03-31",
+                                 "recipients": recipients}, owner="admin", session_factory=session_factory)
+            assert job.done.wait(20), "Wysyłka nie zakończyła się w czasie"
+            result = job.result()
+            assert (result["sent"], result["failed"], result["retries"]) == (7, 2, 2), result
+            assert result["status"] == "error" and result["detail"] == "Nie wysłano 2 z 9 wiadomości"
+            assert {error["email"] for error in result["errors"]} == {"zly@firma.pl", "nikt@firma.pl"}
+            assert smtp_server.connections <= mail_queue.MAIL_SENDERS, "Połączenia używane ponownie"
+            assert smtp_server.logins == smtp_server.connections
+            assert not os.path.exists(job.attachment_dir), "Katalog załączników usunięty po wysyłce"
+            assert len([name for name in os.listdir(report_jobs.REPORT_CACHE_DIR) if name.endswith(".csv")]) <= 2
+            print("   ✅ Wysyłka do 9 odbiorców połączeniami z puli, 451 ponowione, 550 bez ponowień")
+
+            messages = delivered(smtp_server)
+            rows = attachment_rows(messages["p3@firma.pl"])
+            assert len(rows) == 3 and all(row.startswith("P3,Pracownik 3,2025-03-0") for row in rows[1:])
+            assert "Pracownik 3" in messages["p3@firma.pl"].get_payload(0).get_payload(decode=True).decode()
+            assert len(attachment_rows(messages["kadry@firma.pl"])) == 7, "Wspólne podsumowanie wszystkich"
+            assert messages["p1@firma.pl"]["Subject"] == "Raport Lista Obecności (2025-03-01 - 2025-03-31)"
+            print("   ✅ Osobny załącznik dla każdego pracownika, wspólny dla pozostałych")
+
+            # Zerwane połączenie w połowie paczki - kolejne wiadomości idą nowym połączeniem
+            smtp_server.messages.clear()
+            smtp_server.drop_after = 2
+            discarded = email_service.smtp_pool.discarded
+            job = start_mailing({"kind": "payroll", "month": "2025-03", "subject": "Lista płac",
+                                 "recipients": [f"ksiegowosc{number}@firma.pl" for number in range(5)]},
+                                session_factory=session_factory)
+            assert job.done.wait(20) and job.status == "success" and job.sent == 5
+            assert len(delivered(smtp_server)) == 5
+            assert email_service.smtp_pool.discarded == discarded + 1
+            print("   ✅ Zerwane połączenie zastąpione nowym, wiadomości ponowione")
+
+            # Brak pliku załącznika - błąd lokalny: bez ponowień i bez zamykania połączenia
+            failed, retries = mail_queue.mail_queue.failed, mail_queue.mail_queue.retries
+            discarded = email_service.smtp_pool.discarded
+            mail_queue.mail_queue.submit(OutgoingMail("brak@firma.pl", "Test", "<p>Test</p>",
+                                                      os.path.join(tmp_dir, "brak.csv"), "brak.csv"))
+            deadline = time.monotonic() + 5
+            while mail_queue.mail_queue.failed == failed and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert mail_queue.mail_queue.failed == failed + 1 and mail_queue.mail_queue.retries == retries
+            assert email_service.smtp_pool.discarded == discarded
+            assert not is_temporary(FileNotFoundError("brak.csv")) and is_temporary(ConnectionResetError())
+            print("   ✅ Brak pliku załącznika bez ponowień i bez zamykania połączenia")
+
+            connections = smtp_server.connections
+            email_service.send_email("szef@firma.pl", "Test", "<p>Test</p>", b"a;b", "test.csv")
+            assert smtp_server.connections == connections, "send_email korzysta z puli połączeń"
+            assert mail_queue.mail_queue.snapshot()["queued"] == 0
+
+            for data in ({"recipients": []}, {"recipients": ["bez-malpy"]}, {"recipients": [{"worker_id": "A"}]}):
+                try:
+                    parse_recipients(data)
+                    assert False, f"Oczekiwano MailError dla {data}"
+                except MailError:
+                    pass
+            print("   ✅ send_email z puli połączeń i walidacja odbiorców")
+        finally:
+            (email_service.config_store, mail_queue.MAIL_RETRY_SECONDS, report_jobs.REPORT_CACHE_DIR,
+             report_jobs.REPORT_CACHE_FILES) = original
+            shutdown_mail_queue()
+            mailing_jobs.clear()
+            smtp_server.shutdown()
+            smtp_server.server_close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("\n===== TEST KOLEJKI WYSYŁKI EMAILI =====")
+    test_mail_queue()
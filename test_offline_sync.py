@@ -0,0 +1,87 @@
+"""
+Test synchronizacji zdarzeń zapisanych offline (shift_service.sync_events)
+
+Sprawdza zapis paczki start/stop w jednej transakcji: zakończenie zmiany otwartej
+przed utratą zasięgu, pełne zmiany z paczki, odrzucenie zdarzeń w złej kolejności,
+nieznanych pracowników i błędnych danych, deduplikację w paczce, przy ponownym
+wysłaniu i względem kluczy /api/start, oraz aktualizację rejestru otwartych zmian.
+Używa tymczasowej bazy SQLite.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from active_shifts import active_shifts, install_session_hooks
+from database import Base
+from migrations import run_migrations
+from shift_service import clock_in, sync_events
+
+DAY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+def at(hour, minute=0):
+    return (DAY + timedelta(hours=hour, minutes=minute)).isoformat()
+
+def test_sync_batch():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'sync.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        install_session_hooks(session_factory)
+
+        db = session_factory()
+        for employee_id in ("JAN001", "ANN002", "PIO003"):
+            db.add(models.Employee(id=employee_id, name=employee_id, pin="1234"))
+        # Zmiana rozpoczęta online, zanim telefon stracił zasięg
+        db.add(models.Shift(employee_id="ANN002", start_time=DAY + timedelta(hours=6)))
+        db.commit()
+        active_shifts.load(db)
+        start_id = clock_in(db, "PIO003", "Biuro", None, None, "start-PIO003-1")
+
+        batch = [
+            {"event_id": "e1", "type": "start", "worker_id": "JAN001", "time": at(8), "lokalizacja_start": {"lat": 52.1, "lon": 21.0}},
+            {"event_id": "e2", "type": "stop", "worker_id": "ANN002", "time": at(14)},
+            {"event_id": "e3", "type": "stop", "worker_id": "JAN001", "time": at(16), "location": "Budowa"},
+            {"event_id": "e3", "type": "stop", "worker_id": "JAN001", "time": at(16)},
+            {"event_id": "e4", "type": "start", "worker_id": "JAN001", "time": at(15)},
+            {"event_id": "e5", "type": "start", "worker_id": "JAN001", "time": at(17)},
+            {"event_id": "e6", "type": "start", "worker_id": "NIKT", "time": at(8)},
+            {"event_id": "e7", "type": "pauza", "worker_id": "JAN001", "time": at(9)},
+            {"event_id": "e8", "type": "start", "worker_id": "ANN002", "time": (datetime.now() + timedelta(hours=2)).isoformat()},
+            {"event_id": "start-PIO003-1", "type": "start", "worker_id": "PIO003", "time": at(7)},
+        ]
+        results = sync_events(db, batch)
+        statuses = [result["status"] for result in results]
+        assert statuses == ["applied", "applied", "applied", "duplicate", "rejected", "applied",
+                            "rejected", "rejected", "rejected", "duplicate"], statuses
+        assert results[2]["duration_min"] == 480 and results[1]["duration_min"] == 480
+        assert results[0]["shift_id"] == results[2]["shift_id"]
+        assert results[9]["shift_id"] == start_id, "Zdarzenie wysłane wcześniej przez /api/start"
+        print("   ✅ Paczka 10 zdarzeń: 4 zapisane, 2 duplikaty, 4 odrzucone")
+
+        db.expire_all()
+        jan = db.query(models.Shift).filter(models.Shift.employee_id == "JAN001").order_by(models.Shift.id).all()
+        assert [(s.start_time.hour, s.stop_time.hour if s.stop_time else None) for s in jan] == [(8, 16), (17, None)]
+        assert jan[0].start_latitude == 52.1 and jan[0].stop_location == "Budowa"
+        row = db.get(models.DailyAttendance, ("JAN001", DAY.date()))
+        assert row.completed_shifts == 1 and row.minutes == 480
+        assert active_shifts.get("JAN001")["id"] == jan[1].id
+        assert active_shifts.get("ANN002") is None, "Zakończona zmiana zniknęła z rejestru"
+
+        # Ponowne wysłanie tej samej paczki (np. utracona odpowiedź) niczego nie zmienia
+        shifts_before = db.query(models.Shift).count()
+        again = sync_events(db, batch)
+        assert [result["status"] for result in again].count("applied") == 0
+        assert again[2]["shift_id"] == results[2]["shift_id"] and again[2]["duration_min"] == 480
+        assert db.query(models.Shift).count() == shifts_before
+        db.close()
+        engine.dispose()
+        print("   ✅ Ponowne wysłanie paczki zwraca zapisane wyniki bez nowych zmian")
+
+if __name__ == "__main__":
+    print("\n===== TEST SYNCHRONIZACJI OFFLINE =====")
+    test_sync_batch()
@@ -0,0 +1,88 @@
+"""
+Test listy płac (payroll.py)
+
+Sprawdza podział zmian na minuty zwykłe, sobotnie, niedzielne, nocne i nadgodziny
+(zmiany przez północ, przejście piątek/sobota, kilka zmian jednego dnia, sekundy),
+zastępowanie pustych stawek stawką godzinową oraz miesięczną listę płac z bazy.
+Używa tymczasowej bazy SQLite.
+"""
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from migrations import run_migrations
+from payroll import CATEGORIES, split_shift_minutes, monthly_payroll
+
+# 2026-10-14 to środa, 2026-10-17 sobota, 2026-10-18 niedziela
+SHIFTS = [
+    ("A", datetime(2026, 10, 14, 20), datetime(2026, 10, 15, 7)),
+    ("A", datetime(2026, 10, 16, 20), datetime(2026, 10, 17, 4)),
+    ("B", datetime(2026, 10, 17, 10), datetime(2026, 10, 17, 14)),
+    ("B", datetime(2026, 10, 17, 15), datetime(2026, 10, 17, 21)),
+    ("B", datetime(2026, 10, 18, 8), datetime(2026, 10, 18, 9, 30, 30)),
+]
+
+def minutes_row(regular=0, saturday=0, sunday=0, night=0, overtime=0):
+    return [regular, saturday, sunday, night, overtime]
+
+def test_split_shift_minutes():
+    employee_index = np.array([0 if employee == "A" else 1 for employee, _, _ in SHIFTS])
+    start = np.array([shift[1] for shift in SHIFTS], dtype="datetime64[s]")
+    stop = np.array([shift[2] for shift in SHIFTS], dtype="datetime64[s]")
+    minutes = split_shift_minutes(employee_index, start, stop)
+    expected = [
+        minutes_row(regular=120, night=360, overtime=180),  # nadgodziny 4:00-7:00, noc 22:00-4:00
+        minutes_row(regular=120, night=120, saturday=240),  # piątek do 24:00, potem sobota
+        minutes_row(saturday=240),
+        minutes_row(saturday=240, overtime=120),             # 10 h tego samego dnia
+        minutes_row(sunday=90.5),
+    ]
+    assert np.allclose(minutes, expected), minutes
+    assert np.allclose(minutes.sum(axis=1), (stop - start) / np.timedelta64(1, "m"))
+    print("   ✅ Zmiany podzielone na kategorie minut")
+
+def test_monthly_payroll():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'payroll.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        db.add(models.Employee(id="A", name="Anna", pin="1111", hourly_rate=30, rate_saturday=40,
+                               rate_sunday=50, rate_night=35, rate_overtime=45))
+        db.add(models.Employee(id="B", name="Bartek", pin="2222", hourly_rate=20))
+        db.add(models.Employee(id="C", name="Celina", pin="3333", hourly_rate=25))
+        for employee_id, start, stop in SHIFTS:
+            db.add(models.Shift(employee_id=employee_id, start_time=start, stop_time=stop))
+        # Pominięte: zmiana otwarta, zmiana z listopada i zmiana usuniętego pracownika
+        db.add(models.Shift(employee_id="C", start_time=datetime(2026, 10, 20, 8)))
+        db.add(models.Shift(employee_id="C", start_time=datetime(2026, 11, 2, 8), stop_time=datetime(2026, 11, 2, 16)))
+        db.add(models.Shift(employee_id="X", start_time=datetime(2026, 10, 5, 8), stop_time=datetime(2026, 10, 5, 16)))
+        db.commit()
+
+        payroll = monthly_payroll(db, 2026, 10)
+        assert payroll["month"] == "2026-10" and payroll["days"] == 31 and payroll["shift_count"] == 5
+        employees = {employee["id"]: employee for employee in payroll["employees"]}
+        anna = employees["A"]
+        assert anna["minutes"] == {"regular": 240, "saturday": 240, "sunday": 0, "night": 480, "overtime": 180}
+        assert anna["amounts"] == {"regular": 120.0, "saturday": 160.0, "sunday": 0.0, "night": 280.0, "overtime": 135.0}
+        assert anna["total_amount"] == 695.0
+        bartek = employees["B"]
+        assert bartek["rates"] == dict.fromkeys(CATEGORIES, 20.0), "Puste stawki = stawka godzinowa"
+        assert bartek["total_minutes"] == 690
+        assert bartek["total_amount"] == round(20 * (600 + 90.5) / 60, 2)
+        assert employees["C"]["total_amount"] == 0.0
+        assert payroll["total_amount"] == round(anna["total_amount"] + bartek["total_amount"], 2)
+        db.close()
+        engine.dispose()
+        print("   ✅ Lista płac za miesiąc ze stawek pracowników")
+
+if __name__ == "__main__":
+    print("\n===== TEST LISTY PŁAC =====")
+    test_split_shift_minutes()
+    test_monthly_payroll()
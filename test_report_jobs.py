@@ -0,0 +1,116 @@
+"""
+Test raportów w tle (report_jobs.py)
+
+Sprawdza budowę raportów w puli wątków, pamięć podręczną wyników za zamknięte
+okresy (ponowne zlecenie zwraca gotowy plik, korekta zmiany z okresu unieważnia
+wynik, okres bieżący nie jest zapamiętywany), raport listy płac w XLSX, walidację
+zlecenia oraz usuwanie plików zadań wypadających z rejestru.
+Używa tymczasowej bazy SQLite i tymczasowego katalogu pamięci podręcznej.
+"""
+import asyncio
+import csv
+import os
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+import report_jobs
+from database import Base
+from daily_attendance import refresh_for_shifts
+from migrations import run_migrations
+from report_jobs import start_report, parse_report_request, report_jobs as jobs, ReportError, shutdown_report_pool
+
+def run_report(data, session_factory):
+    async def run():
+        job = start_report(data, owner="admin", session_factory=session_factory)
+        await job.done.wait()
+        return job
+    return asyncio.run(run())
+
+def read_csv(path):
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        return list(csv.reader(file))
+
+def test_report_jobs():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'reports.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = session_factory()
+        db.add(models.Employee(id="A", name="Anna", pin="1111", hourly_rate=30, rate_saturday=40))
+        db.add(models.Employee(id="B", name="Bartek", pin="2222", hourly_rate=20))
+        shifts = [models.Shift(employee_id=employee_id, start_time=datetime(2025, 3, day, 8),
+                               stop_time=datetime(2025, 3, day, 16)) for employee_id in ("A", "B") for day in (3, 8, 10)]
+        today = datetime.combine(date.today(), datetime.min.time())
+        shifts.append(models.Shift(employee_id="A", start_time=today + timedelta(hours=1), stop_time=today + timedelta(hours=2)))
+        db.add_all(shifts)
+        refresh_for_shifts(db, shifts)
+        db.commit()
+
+        original = (report_jobs.REPORT_CACHE_DIR, report_jobs.REPORT_JOBS_LIMIT)
+        report_jobs.REPORT_CACHE_DIR = os.path.join(tmp_dir, "cache")
+        try:
+            closed = {"kind": "summary", "date_from": "2025-03-01", "date_to": "2025-03-31"}
+            first = run_report(closed, session_factory)
+            assert first.status == "success" and not first.cached and first.processed == 2
+            assert read_csv(first.path)[1][:5] == ["A", "Anna", "24h 0min", "24.0", "3"]
+            assert os.path.dirname(first.path) == report_jobs.REPORT_CACHE_DIR
+
+            second = run_report(closed, session_factory)
+            assert second.cached and second.path == first.path and second.processed == 0
+            assert second.result()["download_url"] == f"/api/reports/{second.id}/download"
+            print("   ✅ Raport za zamknięty okres zwracany z pamięci podręcznej")
+
+            # Korekta zmiany z marca zmienia sumę kontrolną okresu
+            shifts[0].stop_time = datetime(2025, 3, 3, 18)
+            refresh_for_shifts(db, [shifts[0]])
+            db.commit()
+            third = run_report(closed, session_factory)
+            assert not third.cached and third.path != first.path
+            assert read_csv(third.path)[1][2] == "26h 0min"
+            print("   ✅ Korekta danych okresu unieważnia zapamiętany raport")
+
+            current = {"kind": "details", "worker_id": "A", "date_from": "2025-03-01",
+                       "date_to": date.today().isoformat()}
+            job = run_report(current, session_factory)
+            assert job.status == "success" and job.cache_key is None and job.processed == 4
+            assert os.path.basename(os.path.dirname(job.path)) == "jobs"
+            assert not run_report(current, session_factory).cached, "Bieżący okres liczony za każdym razem"
+
+            payroll = run_report({"kind": "payroll", "month": "2025-03", "format": "xlsx"}, session_factory)
+            assert payroll.status == "success" and payroll.filename == "raport_payroll_2025-03.xlsx"
+            with zipfile.ZipFile(payroll.path) as archive:
+                assert "xl/worksheets/sheet1.xml" in archive.namelist()
+
+            for data in ({"kind": "pdf"}, {"kind": "summary", "date_from": "2025-03-31", "date_to": "2025-03-01"},
+                         {"kind": "payroll", "month": "2025-13"}, {"kind": "by_date", "format": "ods"}):
+                try:
+                    parse_report_request(data)
+                    assert False, f"Oczekiwano ReportError dla {data}"
+                except ReportError:
+                    pass
+            print("   ✅ Raport bieżącego okresu, lista płac XLSX i walidacja zlecenia")
+
+            # Zadania wypadające z rejestru zabierają swoje pliki, pliki pamięci podręcznej zostają
+            report_jobs.REPORT_JOBS_LIMIT = 1
+            jobs.clear()
+            job = run_report(current, session_factory)
+            run_report(closed, session_factory)
+            assert job.id not in jobs and not os.path.exists(job.path)
+            assert os.path.exists(third.path)
+            print("   ✅ Pliki zadań usuwane razem z zadaniem")
+        finally:
+            report_jobs.REPORT_CACHE_DIR, report_jobs.REPORT_JOBS_LIMIT = original
+            shutdown_report_pool()
+            jobs.clear()
+        db.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("\n===== TEST RAPORTÓW W TLE =====")
+    test_report_jobs()
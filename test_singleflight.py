@@ -0,0 +1,149 @@
+"""
+Test łączenia równoczesnych żądań raportów (singleflight.py)
+
+Sprawdza, że równoczesne identyczne wywołania liczą wynik raz i dostają ten sam
+wynik albo ten sam błąd, że wspólny eksport generowany jest raz i czytany w całości
+przez wszystkie żądania (także te, które dołączyły w trakcie), że generowanie
+kończy się po rozłączeniu wszystkich odbiorców (także takich, którzy
+nie zaczęli czytać), oraz że zapis zmiany daje nowy
+klucz obliczenia. Używa tymczasowej bazy SQLite.
+"""
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from exports import csv_stream, query_chunks, shifts_statement, details_export_row, DETAILS_COLUMNS
+from migrations import run_migrations
+from singleflight import SingleFlight, flight_key, shared_stream
+
+def test_shared_calls():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"wynik": len(calls)}
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futures = [pool.submit(flights.do, ("raport", 1), compute) for _ in range(6)]
+        while flights.snapshot()["waiting"] < 5:
+            threading.Event().wait(0.01)
+        other = pool.submit(flights.do, ("raport", 2), lambda: "inny")
+        assert other.result(5) == "inny"
+        release.set()
+        results = [future.result(5) for future in futures]
+    assert len(calls) == 1 and all(result is results[0] for result in results)
+    assert flights.snapshot() == {"in_flight": 0, "waiting": 0, "computed": 2, "shared": 5}
+
+    release.clear()
+    def failing():
+        release.wait(5)
+        raise ValueError("błąd zapytania")
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flights.do, "błąd", failing) for _ in range(3)]
+        while flights.snapshot()["waiting"] < 2:
+            threading.Event().wait(0.01)
+        release.set()
+        errors = [future.exception(5) for future in futures]
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flights.do("błąd", lambda: "ok") == "ok", "Błąd nie zostaje zapamiętany"
+    print("   ✅ Równoczesne wywołania dzielą jeden wynik i jeden błąd")
+
+def test_shared_stream():
+    flights = SingleFlight()
+    started = []
+    step = threading.Semaphore(0)
+
+    def produce():
+        started.append(1)
+        for number in range(20):
+            step.acquire(timeout=5)
+            yield f"wiersz {number}\n".encode()
+
+    first = flights.stream("eksport", produce)
+    step.release()
+    assert next(first) == b"wiersz 0\n"
+    second = flights.stream("eksport", produce)   # Dołącza w trakcie - czyta od początku
+    for _ in range(19):
+        step.release()
+    expected = b"".join(f"wiersz {number}\n".encode() for number in range(20))
+    assert b"wiersz 0\n" + b"".join(first) == expected
+    assert b"".join(second) == expected
+    assert len(started) == 1 and flights.snapshot()["in_flight"] == 0
+
+    # Wszyscy odbiorcy rozłączeni - generowanie kończy się przed końcem pliku
+    produced = []
+    def endless():
+        for number in range(10000):
+            produced.append(number)
+            yield b"x" * 100
+    reader = flights.stream("długi", endless)
+    next(reader)
+    reader.close()
+    for _ in range(500):
+        if flights.snapshot()["in_flight"] == 0:
+            break
+        threading.Event().wait(0.01)
+    assert flights.snapshot()["in_flight"] == 0 and len(produced) < 10000
+    reader.close()   # Ponowne zamknięcie nie odłącza czytelnika drugi raz
+
+    # Odpowiedź porzucona przed pierwszą porcją - czytelnik nigdy nie zaczął czytać
+    produced.clear()
+    never_read = flights.stream("porzucony", endless)
+    shared = flights._streams["porzucony"]
+    del never_read
+    for _ in range(500):
+        if flights.snapshot()["in_flight"] == 0 and shared._file.closed:
+            break
+        threading.Event().wait(0.01)
+    assert flights.snapshot()["in_flight"] == 0 and len(produced) < 10000
+    assert shared.readers == 0 and shared._file.closed, "Plik tymczasowy zamknięty"
+    print("   ✅ Wspólny eksport generowany raz, przerwany po rozłączeniu odbiorców")
+
+def test_flight_keys_and_exports():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'flights.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = session_factory()
+        db.add(models.Employee(id="A", name="Anna", pin="1111", hourly_rate=30))
+        db.add_all([models.Shift(employee_id="A", start_time=datetime(2025, 3, day, 8),
+                                 stop_time=datetime(2025, 3, day, 16)) for day in range(1, 29)])
+        db.commit()
+
+        key = flight_key(db, "attendance_summary", date(2025, 3, 1), date(2025, 3, 31))
+        assert flight_key(db, "attendance_summary", date(2025, 3, 1), date(2025, 3, 31)) == key
+        db.add(models.Shift(employee_id="A", start_time=datetime(2025, 3, 30, 8)))
+        db.commit()
+        assert flight_key(db, "attendance_summary", date(2025, 3, 1), date(2025, 3, 31)) != key, \
+            "Żądanie po zapisie nie dołącza do starszego obliczenia"
+
+        statement = shifts_statement(date(2025, 3, 1), date(2025, 3, 31))
+        def produce(session):
+            return csv_stream(DETAILS_COLUMNS, query_chunks(session, statement, details_export_row))
+        flights = SingleFlight()
+        readers = [shared_stream(db, "export", ("marzec", "csv"), produce, flights=flights,
+                                 session_factory=session_factory) for _ in range(3)]
+        contents = [b"".join(reader) for reader in readers]
+        assert contents[0] == contents[1] == contents[2]
+        assert len(contents[0].decode("utf-8-sig").splitlines()) == 30
+        assert flights.computed == 1 and flights.shared == 2
+        db.close()
+        engine.dispose()
+    print("   ✅ Klucz z wersją danych, eksport CSV współdzielony przez trzy żądania")
+
+if __name__ == "__main__":
+    print("\n===== TEST ŁĄCZENIA RÓWNOCZESNYCH ŻĄDAŃ =====")
+    test_shared_calls()
+    test_shared_stream()
+    test_flight_keys_and_exports()
@@ -0,0 +1,171 @@
+"""
+Test pamięci podręcznej podsumowań obecności (summary_cache.py)
+
+Sprawdza trafienia i chybienia dla podsumowania okresu i obecności dnia,
+dokładne unieważnianie po commicie (tylko wpisy obejmujące dzień zmiany, także
+dzień sprzed przeniesienia zmiany, zapisy zbiorcze przez refresh_daily_attendance),
+brak unieważnienia po rollbacku, nowy klucz po zmianie pracownika, odrzucenie
+wpisu zamkniętego miesiąca po korekcie z innego procesu (bez hooków), wygasanie
+wpisów bieżącego okresu przy stałych wpisach zamkniętych miesięcy oraz limit LRU.
+Używa tymczasowej bazy SQLite.
+"""
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from attendance import summarize_attendance, attendance_for_day
+from daily_attendance import refresh_for_shifts, refresh_daily_attendance
+from database import Base
+from migrations import run_migrations
+from summary_cache import SummaryCache, summary_cache, cached_result, install_cache_hooks, is_closed_period
+from worker_batch import run_batch
+
+def test_summary_cache():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'cache.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        install_cache_hooks(session_factory)
+
+        db = session_factory()
+        db.add(models.Employee(id="A", name="Anna", pin="1111", hourly_rate=30))
+        db.add(models.Employee(id="B", name="Bartek", pin="2222", hourly_rate=20))
+        shifts = [models.Shift(employee_id="A", start_time=datetime(2025, 3, day, 8),
+                               stop_time=datetime(2025, 3, day, 16)) for day in (3, 10)]
+        shifts.append(models.Shift(employee_id="B", start_time=datetime.now() - timedelta(hours=2)))
+        db.add_all(shifts)
+        refresh_for_shifts(db, shifts)
+        db.commit()
+
+        calls = []
+        def summary(date_from, date_to):
+            def compute():
+                calls.append(("summary", date_from, date_to))
+                return summarize_attendance(db, date_from, date_to)
+            return cached_result(db, "attendance_summary", date_from, date_to, compute)
+
+        def by_date(day):
+            def compute():
+                calls.append(("by_date", day))
+                return attendance_for_day(db, day)
+            return cached_result(db, "attendance_by_date", day, day, compute)
+
+        march, february = (date(2025, 3, 1), date(2025, 3, 31)), (date(2025, 2, 1), date(2025, 2, 28))
+        today = date.today()
+        current = (today.replace(day=1), today)
+        summary_cache.clear()
+        try:
+            assert summary(*march)[0]["total_time"] == "16h 0min"
+            assert summary(*march)[0]["total_time"] == "16h 0min"
+            assert len(calls) == 1 and summary_cache.hits == 1
+            summary(*february)
+            by_date(date(2025, 3, 3))
+            by_date(date(2025, 3, 10))
+            summary(*current)
+            assert len(calls) == 5
+            print("   ✅ Powtórzone zapytanie obsłużone z pamięci podręcznej")
+
+            # Korekta zmiany z 3 marca - tylko wpisy obejmujące ten dzień
+            shifts[0].stop_time = datetime(2025, 3, 3, 18)
+            refresh_for_shifts(db, [shifts[0]])
+            db.commit()
+            calls.clear()
+            assert summary(*march)[0]["total_time"] == "18h 0min"
+            assert by_date(date(2025, 3, 3))[0]["duration"] == "10h 0min"
+            by_date(date(2025, 3, 10))
+            summary(*february)
+            summary(*current)
+            assert calls == [("summary", *march), ("by_date", date(2025, 3, 3))], calls
+            print("   ✅ Korekta zmiany unieważnia tylko zakresy obejmujące jej dzień")
+
+            # Przeniesienie zmiany z 10 marca na 20 lutego - oba dni nieaktualne
+            previous_day = shifts[1].start_time.date()
+            shifts[1].start_time = datetime(2025, 2, 20, 8)
+            shifts[1].stop_time = datetime(2025, 2, 20, 12)
+            refresh_daily_attendance(db, [("A", previous_day), ("A", date(2025, 2, 20))])
+            db.commit()
+            calls.clear()
+            assert by_date(previous_day) == []
+            assert summary(*february)[0]["total_time"] == "4h 0min"
+            assert summary(*march)[0]["total_time"] == "10h 0min"
+            summary(*current)
+            assert len(calls) == 3
+
+            # Rollback nie usuwa niczego
+            shifts[0].stop_time = datetime(2025, 3, 3, 9)
+            db.flush()
+            db.rollback()
+            calls.clear()
+            summary(*march)
+            assert calls == []
+            print("   ✅ Przeniesiona zmiana unieważnia stary i nowy dzień, rollback nic nie usuwa")
+
+            # Awaryjne zakończenie zmian (UPDATE zbiorczy) unieważnia bieżący okres
+            run_batch(db, "force_stop", ["B"], {"reason": "test"}, "admin")
+            summary(*current)
+            summary(*march)
+            assert calls == [("summary", *current)]
+
+            # Zmiana pracownika (licznik wersji employees) to nowy klucz
+            db.get(models.Employee, "A").name = "Anna Nowak"
+            db.commit()
+            assert summary(*march)[0]["name"] == "Anna Nowak"
+            print("   ✅ Zapis zbiorczy i zmiana pracownika dają świeży wynik")
+
+            # Korekta zamkniętego miesiąca z innego procesu (sesja bez hooków unieważniania)
+            summary(*march)
+            summary(*february)
+            by_date(date(2025, 3, 3))
+            calls.clear()
+            other = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+            corrected = other.get(models.Shift, shifts[0].id)
+            corrected.stop_time = datetime(2025, 3, 3, 20)
+            refresh_for_shifts(other, [corrected])
+            other.commit()
+            other.close()
+            db.expire_all()  # W aplikacji każde żądanie ma nową sesję
+            stale = summary_cache.stale
+            assert summary(*march)[0]["total_time"] == "12h 0min"
+            assert by_date(date(2025, 3, 3))[0]["duration"] == "12h 0min"
+            assert summary(*february)[0]["total_time"] == "4h 0min"
+            assert calls == [("summary", *march), ("by_date", date(2025, 3, 3))], calls
+            assert summary_cache.stale == stale + 2
+            print("   ✅ Korekta z innego procesu odrzuca tylko wpisy jej okresu")
+
+            # Wpisy bieżącego okresu wygasają, zamknięte miesiące nie
+            assert is_closed_period(march[1]) and not is_closed_period(current[1])
+            original_ttl, summary_cache.ttl = summary_cache.ttl, 0
+            try:
+                summary(*current)
+                summary(*march)
+            finally:
+                summary_cache.ttl = original_ttl
+            calls.clear()
+            summary(*current)
+            summary(*march)
+            assert calls == [("summary", *current)] and summary_cache.expired >= 1
+            snapshot = summary_cache.snapshot()
+            assert snapshot["hits"] > 0 and snapshot["misses"] > 0 and snapshot["invalidated"] >= 5
+        finally:
+            summary_cache.clear()
+
+        cache = SummaryCache(max_entries=2)
+        for day in (1, 2, 3):
+            cache.put(("x", day), date(2025, 1, day), date(2025, 1, day), [day])
+        assert cache.get(("x", 1)) is None and cache.get(("x", 3)) == [3] and cache.evicted == 1
+        generation = cache.generation
+        cache.invalidate([(date(2025, 1, 3), date(2025, 1, 3))])
+        cache.put(("x", 4), date(2025, 1, 4), date(2025, 1, 4), [4], generation)
+        assert cache.get(("x", 4)) is None, "Wynik liczony w trakcie unieważnienia nie trafia do pamięci"
+        print("   ✅ Wygasanie bieżącego okresu, limit LRU i liczniki trafień")
+        db.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("\n===== TEST PAMIĘCI PODRĘCZNEJ PODSUMOWAŃ =====")
+    test_summary_cache()
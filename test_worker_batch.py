@@ -0,0 +1,112 @@
+"""
+Test operacji wsadowych na pracownikach (worker_batch.py)
+
+Sprawdza zbiorcze UPDATE/DELETE paczkami identyfikatorów (także powyżej rozmiaru
+paczki), ustawianie stawek z walidacją, reset PIN-ów razem z hasłem panelu,
+awaryjne zakończenie wszystkich otwartych zmian z aktualizacją podsumowań dziennych
+i rejestru otwartych zmian, oraz jeden zbiorczy wpis AdminLog na operację.
+Używa tymczasowej bazy SQLite.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+import worker_batch
+from active_shifts import active_shifts, install_session_hooks
+from auth import get_password_hash, verify_password
+from database import Base
+from migrations import run_migrations
+from worker_batch import run_batch, generate_pins, BatchError
+
+def test_worker_batch():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'batch.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        install_session_hooks(session_factory)
+
+        db = session_factory()
+        worker_ids = [f"P{number:03d}" for number in range(12)]
+        for worker_id in worker_ids:
+            db.add(models.Employee(id=worker_id, name=worker_id, pin="1111", hourly_rate=25.0))
+        start = datetime.now() - timedelta(hours=3)
+        db.add(models.Shift(employee_id="P000", start_time=start))
+        db.add(models.Shift(employee_id="P001", start_time=start))
+        db.add(models.Shift(employee_id="P002", start_time=start - timedelta(hours=5),
+                            stop_time=start - timedelta(hours=1), duration_min=240))
+        db.commit()
+        active_shifts.load(db)
+
+        # Paczki po 5 identyfikatorów - 12 pracowników to 3 zapytania UPDATE
+        original_chunk_size = worker_batch.BATCH_CHUNK_SIZE
+        worker_batch.BATCH_CHUNK_SIZE = 5
+        try:
+            result = run_batch(db, "set_rate", worker_ids + ["NIKT", "P000"], {"hourly_rate": "31.5"}, "admin")
+            assert result["affected"] == 12 and result["status"] == "success"
+            result = run_batch(db, "set_rates", worker_ids[:3],
+                               {"rate_saturday": 40, "rate_night": "35", "rate_overtime": None}, "admin")
+            assert result["affected"] == 3 and result["rates"] == {"rate_saturday": 40.0, "rate_night": 35.0}
+            for data in ({"rate_sunday": -1}, {"rate_sunday": "abc"}, {}):
+                try:
+                    run_batch(db, "set_rates", worker_ids, data, "admin")
+                    assert False, "Oczekiwano BatchError"
+                except BatchError:
+                    pass
+            db.expire_all()
+            employees = {e.id: e for e in db.query(models.Employee).all()}
+            assert all(employee.hourly_rate == 31.5 for employee in employees.values())
+            assert employees["P002"].rate_saturday == 40.0 and employees["P003"].rate_saturday != 40.0
+            print("   ✅ Stawki ustawione zbiorczo, błędne wartości odrzucone")
+
+            pins = generate_pins(["P003", "P004", "NIKT"])
+            hashes = {worker_id: get_password_hash(pin) for worker_id, pin in pins.items()}
+            result = run_batch(db, "reset_pin", list(pins), {}, "admin", pins=pins, password_hashes=hashes)
+            assert result["affected"] == 2 and set(result["pins"]) == {"P003", "P004"}
+            db.expire_all()
+            employee = db.get(models.Employee, "P003")
+            assert employee.pin == pins["P003"] and len(employee.pin) == 4 and employee.pin.isdigit()
+            assert verify_password(pins["P003"], employee.password_hash)
+            print("   ✅ PIN-y zresetowane razem z hasłem panelu")
+
+            result = run_batch(db, "force_stop", worker_ids, {"reason": "Koniec budowy"}, "admin")
+            assert result["affected"] == 2
+            assert sorted(shift["worker_id"] for shift in result["shifts"]) == ["P000", "P001"]
+            db.expire_all()
+            stopped = db.query(models.Shift).filter(models.Shift.employee_id == "P000").one()
+            assert stopped.stop_location == "Zakończono awaryjnie: Koniec budowy"
+            assert 179 <= stopped.duration_min <= 181
+            assert db.query(models.Shift).filter(models.Shift.stop_time == None).count() == 0
+            assert db.query(models.Shift).filter(models.Shift.employee_id == "P002").one().duration_min == 240
+            summary = db.get(models.DailyAttendance, ("P000", start.date()))
+            assert summary.completed_shifts == 1 and summary.minutes == stopped.duration_min
+            assert active_shifts.get("P000") is None and active_shifts.get("P001") is None
+            assert run_batch(db, "force_stop", worker_ids, {}, "admin")["affected"] == 0
+            print("   ✅ Otwarte zmiany zakończone jednym UPDATE, rejestr i podsumowania aktualne")
+
+            result = run_batch(db, "delete", worker_ids[6:] + ["NIKT"], {}, "admin")
+            assert result["affected"] == 6
+            assert db.query(models.Employee).count() == 6
+            assert active_shifts.employee("P011") is None and active_shifts.employee("P000") is not None
+        finally:
+            worker_batch.BATCH_CHUNK_SIZE = original_chunk_size
+
+        try:
+            run_batch(db, "archive", worker_ids, {}, "admin")
+            assert False, "Oczekiwano BatchError"
+        except BatchError:
+            pass
+        logs = [log.action_type for log in db.query(models.AdminLog).order_by(models.AdminLog.id)]
+        assert logs == ["BATCH_SET_RATE", "BATCH_SET_RATES", "BATCH_RESET_PIN",
+                        "BATCH_FORCE_STOP", "BATCH_FORCE_STOP", "BATCH_DELETE"], logs
+        db.close()
+        engine.dispose()
+        print("   ✅ Jeden wpis AdminLog na operację")
+
+if __name__ == "__main__":
+    print("\n===== TEST OPERACJI WSADOWYCH NA PRACOWNIKACH =====")
+    test_worker_batch()
@@ -0,0 +1,131 @@
+"""
+Test kolejki zapisów z grupowym commitem (write_queue.py)
+
+Wysyła równolegle starty zmian wielu pracowników (także powtórzone i z kluczem
+idempotencji) przez jeden wątek zapisujący i sprawdza, że zlecenia są zatwierdzane
+paczkami, każde żądanie dostaje własny wynik albo błąd, błąd jednego zlecenia nie
+wycofuje pozostałych z paczki, zmiany dziennika obecności przechodzą przez
+ten sam wątek, a rejestr otwartych zmian widzi tylko zapisane zmiany.
+Używa tymczasowej bazy SQLite.
+"""
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from active_shifts import active_shifts, install_session_hooks
+from database import Base
+from migrations import run_migrations
+from shift_service import (start_shift, stop_shift, record_shift, recover_start, recover_stop, ShiftError,
+                           record_batch_shifts, update_shift, delete_shift)
+from write_queue import WriteQueue
+
+EMPLOYEE_COUNT = 100
+
+def test_group_commit():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'queue.db')}",
+                               connect_args={"check_same_thread": False, "timeout": 30})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        install_session_hooks(session_factory)
+
+        db = session_factory()
+        employee_ids = [f"EMP{i:03d}" for i in range(EMPLOYEE_COUNT)]
+        db.add_all(models.Employee(id=employee_id, name=employee_id, pin="1234") for employee_id in employee_ids)
+        db.commit()
+        active_shifts.load(db)
+
+        queue = WriteQueue(session_factory, max_batch=32, max_delay_ms=20)
+        queue.start()
+
+        # Każdy pracownik: start z kluczem, jego ponowienie i drugi start bez klucza
+        def submit(employee_id):
+            return [
+                queue.submit(start_shift, employee_id, "Brama", idempotency_key=f"start-{employee_id}", recover=recover_start),
+                queue.submit(start_shift, employee_id, "Brama", idempotency_key=f"start-{employee_id}", recover=recover_start),
+                queue.submit(start_shift, employee_id, "Brama", recover=recover_start)
+            ]
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            futures = list(pool.map(submit, employee_ids))
+        unknown = queue.submit(record_shift, "NIKT", None, None)
+
+        for employee_id, (first, retry, duplicate) in zip(employee_ids, futures):
+            shift_id = first.result(timeout=30)
+            assert retry.result(timeout=30) == shift_id, "Ponowienie dostaje wynik pierwszego żądania"
+            try:
+                duplicate.result(timeout=30)
+                assert False, "Oczekiwano ShiftError"
+            except ShiftError as e:
+                assert e.status_code == 400
+            assert active_shifts.get(employee_id)["id"] == shift_id
+        try:
+            unknown.result(timeout=30)
+            assert False, "Oczekiwano ShiftError"
+        except ShiftError as e:
+            assert e.status_code == 404
+
+        stats = queue.snapshot()
+        assert stats["jobs"] == 3 * EMPLOYEE_COUNT + 1
+        assert stats["batches"] < stats["jobs"] / 2, stats
+        assert stats["failed_batches"] == 0
+        assert db.query(models.Shift).count() == EMPLOYEE_COUNT
+        print(f"   ✅ {stats['jobs']} zleceń w {stats['batches']} paczkach, "
+              f"{EMPLOYEE_COUNT} zmian, duplikaty odrzucone")
+
+        # Paczka z zakończeniem nieistniejącej zmiany w środku - pozostałe zapisy zostają
+        results = [
+            queue.submit(stop_shift, "EMP000", idempotency_key="stop-EMP000", recover=recover_stop),
+            queue.submit(stop_shift, "EMP000", recover=recover_stop),
+            queue.submit(stop_shift, "EMP001", recover=recover_stop)
+        ]
+        assert results[0].result(timeout=30) == 0
+        try:
+            results[1].result(timeout=30)
+            assert False, "Oczekiwano ShiftError"
+        except ShiftError as e:
+            assert e.status_code == 400
+        assert results[2].result(timeout=30) == 0
+        assert active_shifts.get("EMP000") is None and active_shifts.get("EMP001") is None
+        assert active_shifts.get("EMP002") is not None
+
+        # Zmiany dziennika obecności (/api/logs/batch, PATCH, DELETE) przez ten sam wątek
+        batch = queue.submit(record_batch_shifts, [{"employee_id": "EMP003", "date": "2025-03-03"},
+                                                   {"employee_id": "NIKT", "date": "2025-03-03"},
+                                                   {"employee_id": "EMP003", "date": "błąd"}])
+        assert batch.result(timeout=30) == 1
+        logged = db.query(models.Shift).filter(models.Shift.start_location == "Dodane ręcznie (batch)").one()
+        queue.submit(update_shift, logged.id, "2025-03-04T07:00:00", "2025-03-04T15:30:00",
+                     is_sick="tak").result(timeout=30)
+        db.expire_all()
+        assert logged.duration_min == 510 and logged.is_sick
+        assert db.get(models.DailyAttendance, ("EMP003", date(2025, 3, 3))) is None, "Wpis przeniesiony na inny dzień"
+        assert db.get(models.DailyAttendance, ("EMP003", date(2025, 3, 4))).shift_count == 1
+        queue.submit(delete_shift, logged.id).result(timeout=30)
+        try:
+            queue.submit(delete_shift, logged.id).result(timeout=30)
+            assert False, "Oczekiwano ShiftError"
+        except ShiftError as e:
+            assert e.status_code == 404
+        db.expire_all()
+        assert db.get(models.DailyAttendance, ("EMP003", date(2025, 3, 4))) is None
+        queue.stop()
+        assert not queue.running
+
+        db.expire_all()
+        assert db.query(models.Shift).filter(models.Shift.stop_time != None).count() == 2
+        row = db.get(models.DailyAttendance, (employee_ids[0], db.get(models.Shift, 1).start_time.date()))
+        assert row.completed_shifts == 1
+        db.close()
+        engine.dispose()
+        print("   ✅ Błąd jednego zlecenia nie wycofuje pozostałych z paczki")
+
+if __name__ == "__main__":
+    print("\n===== TEST KOLEJKI ZAPISÓW =====")
+    test_group_commit()
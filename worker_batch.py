@@ -0,0 +1,199 @@
+"""
+Operacje wsadowe na zaznaczonych pracownikach (/api/workers/batch)
+
+Zamiast pobierać każdego pracownika osobnym zapytaniem, operacje wykonują
+UPDATE/DELETE ... WHERE id IN (...) paczkami po BATCH_CHUNK_SIZE identyfikatorów
+(limit parametrów zapytania SQLite). Każda operacja zapisuje jeden zbiorczy wpis
+AdminLog. Funkcje nie zatwierdzają transakcji - robi to wywołujący.
+
+Operacje:
+  - delete       - usunięcie pracowników,
+  - set_rate     - stawka godzinowa,
+  - set_rates    - stawki za sobotę, niedzielę, godziny nocne i nadgodziny,
+  - reset_pin    - nowe losowe PIN-y (hasło panelu = PIN, hashowane w puli procesów),
+  - force_stop   - awaryjne zakończenie wszystkich otwartych zmian zaznaczonych pracowników.
+"""
+import datetime as dt
+import secrets
+from types import SimpleNamespace
+
+from sqlalchemy import bindparam, delete, select, update
+
+import models
+from active_shifts import queue_shift_changes, queue_employees_deleted
+from daily_attendance import refresh_daily_attendance
+from events import queue_shift_events
+
+BATCH_CHUNK_SIZE = 500
+
+# Pola stawek, które można ustawić operacją set_rates
+RATE_FIELDS = ("hourly_rate", "rate_saturday", "rate_sunday", "rate_night", "rate_overtime")
+
+# Ile identyfikatorów wypisać w notatce wpisu AdminLog
+LOG_IDS_LIMIT = 50
+
+class BatchError(Exception):
+    """Błędne dane operacji wsadowej (odpowiedź 400)"""
+
+def chunks(items, size=BATCH_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def unique_ids(worker_ids):
+    """Identyfikatory bez powtórzeń, w kolejności podania"""
+    return list(dict.fromkeys(str(worker_id) for worker_id in worker_ids))
+
+def log_batch(db, action_type, admin_id, worker_ids, affected, details="", ip_address=None):
+    """Jeden zbiorczy wpis AdminLog dla całej operacji"""
+    listed = ", ".join(worker_ids[:LOG_IDS_LIMIT])
+    if len(worker_ids) > LOG_IDS_LIMIT:
+        listed += f" (+{len(worker_ids) - LOG_IDS_LIMIT})"
+    db.add(models.AdminLog(
+        action_type=action_type,
+        admin_id=admin_id,
+        target_id=f"{len(worker_ids)} pracowników",
+        notes=f"{details}Zmieniono: {affected} z {len(worker_ids)}. Pracownicy: {listed}",
+        ip_address=ip_address
+    ))
+
+def _update_employees(db, worker_ids, values):
+    affected = 0
+    for chunk in chunks(worker_ids):
+        affected += db.execute(
+            update(models.Employee)
+            .where(models.Employee.id.in_(chunk))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    return affected
+
+def delete_employees(db, worker_ids):
+    affected = 0
+    for chunk in chunks(worker_ids):
+        deleted = db.scalars(
+            delete(models.Employee)
+            .where(models.Employee.id.in_(chunk))
+            .returning(models.Employee.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        queue_employees_deleted(db, deleted)
+        affected += len(deleted)
+    return affected
+
+def set_rates(db, worker_ids, rates):
+    """Ustawia podane stawki (RATE_FIELDS); brakujące pola pozostają bez zmian"""
+    values = {}
+    for field in RATE_FIELDS:
+        if rates.get(field) is None:
+            continue
+        try:
+            values[field] = float(rates[field])
+        except (TypeError, ValueError):
+            raise BatchError(f"Nieprawidłowa wartość {field}: {rates[field]}")
+        if values[field] < 0:
+            raise BatchError(f"Stawka {field} nie może być ujemna")
+    if not values:
+        raise BatchError("Brak stawek do ustawienia (" + ", ".join(RATE_FIELDS) + ")")
+    return _update_employees(db, worker_ids, values), values
+
+def generate_pins(worker_ids, length=4):
+    """Losowe PIN-y o podanej liczbie cyfr"""
+    return {worker_id: "".join(secrets.choice("0123456789") for _ in range(length)) for worker_id in worker_ids}
+
+def reset_pins(db, pins, password_hashes):
+    """Zapisuje nowe PIN-y i hashe haseł jednym UPDATE wykonanym dla wszystkich pracowników"""
+    existing = set()
+    for chunk in chunks(list(pins)):
+        existing.update(db.scalars(select(models.Employee.id).where(models.Employee.id.in_(chunk))))
+    rows = [{"b_id": worker_id, "b_pin": pins[worker_id], "b_hash": password_hashes[worker_id]}
+            for worker_id in pins if worker_id in existing]
+    if rows:
+        db.execute(
+            update(models.Employee.__table__)
+            .where(models.Employee.__table__.c.id == bindparam("b_id"))
+            .values(pin=bindparam("b_pin"), password_hash=bindparam("b_hash")),
+            rows
+        )
+    return {row["b_id"]: row["b_pin"] for row in rows}
+
+def force_stop_shifts(db, worker_ids, reason):
+    """Kończy wszystkie otwarte zmiany zaznaczonych pracowników; zwraca listę zakończonych zmian"""
+    stop_time = dt.datetime.now()
+    stopped = []
+    for chunk in chunks(worker_ids):
+        # Warunek stop_time IS NULL zajmuje zmiany - równoległe zakończenie nie zostanie nadpisane
+        rows = db.execute(
+            update(models.Shift)
+            .where(models.Shift.employee_id.in_(chunk), models.Shift.stop_time == None)
+            .values(stop_time=stop_time, stop_location=f"Zakończono awaryjnie: {reason}",
+                    stop_latitude=0.0, stop_longitude=0.0)
+            .returning(models.Shift.id, models.Shift.employee_id, models.Shift.start_time,
+                       models.Shift.start_location, models.Shift.start_latitude, models.Shift.start_longitude)
+            .execution_options(synchronize_session=False)
+        ).all()
+        stopped.extend(
+            SimpleNamespace(id=row.id, employee_id=row.employee_id, start_time=row.start_time,
+                            start_location=row.start_location, start_latitude=row.start_latitude,
+                            start_longitude=row.start_longitude, stop_time=stop_time,
+                            stop_location=f"Zakończono awaryjnie: {reason}",
+                            duration_min=int((stop_time - row.start_time).total_seconds() // 60))
+            for row in rows
+        )
+    if not stopped:
+        return stopped
+
+    db.execute(
+        update(models.Shift.__table__)
+        .where(models.Shift.__table__.c.id == bindparam("b_id"))
+        .values(duration_min=bindparam("b_duration")),
+        [{"b_id": shift.id, "b_duration": shift.duration_min} for shift in stopped]
+    )
+    refresh_daily_attendance(db, [(shift.employee_id, shift.start_time.date()) for shift in stopped])
+    # Zapisy zbiorcze omijają jednostkę pracy ORM - rejestr i kanał zdarzeń dostają je jawnie
+    queue_shift_changes(db, stopped)
+    queue_shift_events(db, [], stopped)
+    return stopped
+
+def run_batch(db, operation, worker_ids, data, admin_id=None, ip_address=None, pins=None, password_hashes=None):
+    """Wykonuje operację wsadową z jednym wpisem AdminLog i jednym commitem; zwraca odpowiedź API"""
+    worker_ids = unique_ids(worker_ids)
+    try:
+        if operation == "delete":
+            affected = delete_employees(db, worker_ids)
+            log_batch(db, "BATCH_DELETE", admin_id, worker_ids, affected, ip_address=ip_address)
+            result = {"message": f"Usunięto {affected} pracowników"}
+        elif operation == "set_rate":
+            if data.get("hourly_rate") is None:
+                raise BatchError("Brak stawki godzinowej")
+            affected, values = set_rates(db, worker_ids, {"hourly_rate": data.get("hourly_rate")})
+            log_batch(db, "BATCH_SET_RATE", admin_id, worker_ids, affected,
+                      f"Stawka godzinowa: {values['hourly_rate']}. ", ip_address)
+            result = {"message": f"Zmieniono stawkę dla {affected} pracowników"}
+        elif operation == "set_rates":
+            affected, values = set_rates(db, worker_ids, data)
+            details = ", ".join(f"{field}={value}" for field, value in values.items())
+            log_batch(db, "BATCH_SET_RATES", admin_id, worker_ids, affected, f"Stawki: {details}. ", ip_address)
+            result = {"message": f"Zmieniono stawki dla {affected} pracowników", "rates": values}
+        elif operation == "reset_pin":
+            new_pins = reset_pins(db, pins, password_hashes)
+            affected = len(new_pins)
+            # Nowe PIN-y trafiają tylko do odpowiedzi, nie do logu
+            log_batch(db, "BATCH_RESET_PIN", admin_id, worker_ids, affected, ip_address=ip_address)
+            result = {"message": f"Zresetowano PIN dla {affected} pracowników", "pins": new_pins}
+        elif operation == "force_stop":
+            reason = data.get("reason") or "Zakończenie awaryjne przez administratora"
+            stopped = force_stop_shifts(db, worker_ids, reason)
+            affected = len(stopped)
+            log_batch(db, "BATCH_FORCE_STOP", admin_id, worker_ids, affected, f"Powód: {reason}. ", ip_address)
+            result = {
+                "message": f"Zakończono {affected} otwartych zmian",
+                "shifts": [{"shift_id": shift.id, "worker_id": shift.employee_id,
+                            "duration_min": shift.duration_min} for shift in stopped]
+            }
+        else:
+            raise BatchError(f"Nieobsługiwana operacja: {operation}")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"status": "success", "affected": affected, **result}
@@ -0,0 +1,241 @@
+"""
+Kolejka zapisów z grupowym commitem (jeden wątek zapisujący)
+
+Przy porannym szczycie (6:00) setki /api/start trafiają do bazy naraz. Bez kolejki
+każde żądanie to osobna transakcja SQLite na osobnym połączeniu: zapisujący czekają
+na blokadę pliku, a po przekroczeniu limitu dostają "database is locked"; każdy
+commit to też osobny zapis dziennika na dysk.
+
+Włączana zmienną środowiskową WRITE_QUEUE=1. Zapisy start/stop i wpisy dziennika
+obecności trafiają wtedy do jednego wątku zapisującego, który:
+  - zbiera zlecenia przez WRITE_QUEUE_MAX_DELAY_MS albo do WRITE_QUEUE_MAX_BATCH zleceń,
+  - wykonuje je w jednej transakcji (BEGIN IMMEDIATE - blokada zapisu od początku,
+    z czekaniem busy_timeout zamiast błędu w połowie transakcji), każde w osobnym
+    punkcie zapisu (SAVEPOINT), więc błąd jednego zlecenia wycofuje tylko jego zmiany,
+  - zatwierdza paczkę jednym commitem i każdemu żądaniu zwraca jego własny wynik
+    albo wyjątek.
+Jeśli commit paczki się nie powiedzie, zlecenia są wykonywane ponownie pojedynczo.
+
+Kolejka działa w obrębie procesu: serwer główny, alternatywny (server_alt_port.py)
+i panel (run_web_panel.py) mają każdy własny wątek zapisujący, więc o plik bazy
+konkurują najwyżej trzy transakcje zamiast jednej na każde żądanie.
+Stan kolejki dostępny jest pod /api/write-queue.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+
+logger = logging.getLogger("app")
+
+WRITE_QUEUE_ENABLED = os.environ.get("WRITE_QUEUE", "0").lower() in ("1", "true", "tak")
+WRITE_QUEUE_MAX_BATCH = int(os.environ.get("WRITE_QUEUE_MAX_BATCH", "64"))
+WRITE_QUEUE_MAX_DELAY_MS = float(os.environ.get("WRITE_QUEUE_MAX_DELAY_MS", "5"))
+
+class _WriteJob:
+    __slots__ = ("operation", "args", "kwargs", "recover", "future")
+
+    def __init__(self, operation, args, kwargs, recover):
+        self.operation = operation
+        self.args = args
+        self.kwargs = kwargs
+        self.recover = recover
+        self.future = Future()
+
+def run_write(db, operation, *args, recover=None, **kwargs):
+    """Pojedynczy zapis we własnej transakcji (bez kolejki).
+
+    operation(db, *args, **kwargs) wykonuje zmiany bez commitu. Po błędzie
+    transakcja jest wycofywana, a recover(db, error, *args, **kwargs) może zwrócić
+    wynik zastępczy (np. zapisany wynik równoległego żądania) albo zgłosić błąd.
+    """
+    try:
+        result = operation(db, *args, **kwargs)
+        db.commit()
+        return result
+    except Exception as error:
+        db.rollback()
+        if recover is None:
+            raise
+        return recover(db, error, *args, **kwargs)
+
+def _queued_side_effects(db):
+    """Listy zmian czekających na commit w session.info (rejestr zmian, kanał zdarzeń)"""
+    return {key: (value, len(value)) for key, value in db.info.items() if isinstance(value, list)}
+
+def _restore_side_effects(db, queued):
+    # Hooki z active_shifts.py i events.py czyszczą te listy przy każdym rollbacku,
+    # także punktu zapisu - zmiany wcześniejszych zleceń z paczki muszą zostać
+    for key in [key for key, value in db.info.items() if isinstance(value, list)]:
+        del db.info[key]
+    for key, (value, length) in queued.items():
+        del value[length:]
+        db.info[key] = value
+
+class WriteQueue:
+    """Jeden wątek zapisujący, który zatwierdza zlecenia paczkami"""
+
+    def __init__(self, session_factory, max_batch=WRITE_QUEUE_MAX_BATCH, max_delay_ms=WRITE_QUEUE_MAX_DELAY_MS):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.jobs = 0
+        self.largest_batch = 0
+        self.failed_batches = 0
+        self.total_commit_time = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+            self._thread.start()
+        logger.info(f"Kolejka zapisów uruchomiona (paczka do {self.max_batch} zleceń, "
+                    f"{self.max_delay * 1000:g} ms)")
+
+    def stop(self, timeout=10.0):
+        """Kończy wątek po wykonaniu zleceń, które już są w kolejce"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._jobs.put(None)
+        thread.join(timeout)
+
+    def submit(self, operation, *args, recover=None, **kwargs):
+        """Dodaje zlecenie do kolejki; wynik (albo wyjątek) trafia do zwróconego Future.
+
+        Argumenty jak w run_write() - operation nie może wywoływać commit ani rollback.
+        """
+        if not self.running:
+            raise RuntimeError("Kolejka zapisów nie jest uruchomiona")
+        job = _WriteJob(operation, args, kwargs, recover)
+        self._jobs.put(job)
+        return job.future
+
+    async def execute(self, operation, *args, recover=None, **kwargs):
+        return await asyncio.wrap_future(self.submit(operation, *args, recover=recover, **kwargs))
+
+    def snapshot(self):
+        return {
+            "enabled": self.running,
+            "max_batch": self.max_batch,
+            "max_delay_ms": self.max_delay * 1000,
+            "pending": self._jobs.qsize(),
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "avg_batch": round(self.jobs / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+            "failed_batches": self.failed_batches,
+            "avg_commit_ms": round(self.total_commit_time / self.batches * 1000, 3) if self.batches else 0
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            job = self._jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._jobs.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._write_batch(batch)
+
+        # Zlecenia dodane tuż przed zatrzymaniem wykonujemy pojedynczo
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._write_single(job)
+
+    def _write_batch(self, batch):
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            outcomes = [self._apply(db, job) for job in batch]
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.failed_batches += 1
+            logger.warning(f"Zapis paczki {len(batch)} zleceń nie powiódł się ({str(e)}) - zapisuję pojedynczo")
+            outcomes = None
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.jobs += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.total_commit_time += time.perf_counter() - started
+
+        if outcomes is None:
+            for job in batch:
+                self._write_single(job)
+            return
+        for job, (result, error) in zip(batch, outcomes):
+            if error is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(error)
+
+    def _apply(self, db, job):
+        """Wykonuje zlecenie w punkcie zapisu; zwraca (wynik, błąd)"""
+        queued = _queued_side_effects(db)
+        savepoint = db.begin_nested()
+        try:
+            result = job.operation(db, *job.args, **job.kwargs)
+            savepoint.commit()
+            return result, None
+        except Exception as error:
+            if db.in_nested_transaction():
+                savepoint.rollback()
+            _restore_side_effects(db, queued)
+            if job.recover is None:
+                return None, error
+            try:
+                return job.recover(db, error, *job.args, **job.kwargs), None
+            except Exception as recover_error:
+                return None, recover_error
+
+    def _write_single(self, job):
+        db = self.session_factory()
+        try:
+            job.future.set_result(run_write(db, job.operation, *job.args, recover=job.recover, **job.kwargs))
+        except Exception as e:
+            job.future.set_exception(e)
+        finally:
+            db.close()
+
+write_queue = WriteQueue(SessionLocal)
+
+async def execute_write(db, operation, *args, recover=None, **kwargs):
+    """Zapis przez kolejkę, gdy jest uruchomiona, albo w puli wątków na sesji żądania"""
+    if write_queue.running:
+        return await write_queue.execute(operation, *args, recover=recover, **kwargs)
+    return await run_in_threadpool(run_write, db, operation, *args, recover=recover, **kwargs)